@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark the rank-collapse reduction of text traces.
+
+Builds a synthetic trace in which every rank has its own copy of the
+records of tests/valid_trace.txt (see bench_parser.py), so its size grows
+with the number of ranks like the dump of a large job with independently
+accessed files. Reports the scan and rewrite time of --collapse_ranks and
+the size reduction, next to the time of just reading the file.
+
+Blocks are processed on COLLAPSE_WORKERS processes; compare --workers 1
+with the default to see how it scales with the cores of the machine.
+
+    python benchmarks/bench_collapse.py --size_mb 1000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench_parser import make_trace
+from bench_validate import read_seconds
+from ion_cli.collapse import BLOCK_SIZE, collapse_blocks, file_blocks, plan_collapse
+from ion_cli.config import COLLAPSE_WORKERS
+
+
+def run(size_mb: float, block_size: int, repeat: int, workers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.txt')
+        make_trace(path, size_mb)
+        size = os.path.getsize(path)
+
+        read = min(read_seconds(path, block_size) for _ in range(repeat))
+        scans = []
+        rewrites = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            plan = plan_collapse(file_blocks(path, block_size), workers)
+            scans.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            output = sum(len(block) for block in collapse_blocks(file_blocks(path, block_size), plan, workers))
+            rewrites.append(time.perf_counter() - start)
+
+    total = min(scans) + min(rewrites)
+    return {
+        'benchmark': 'collapse',
+        'bytes': size,
+        'workers': workers,
+        'output_bytes': output,
+        'reduction': size / output,
+        'records': plan.records,
+        'files': plan.files,
+        'ranks': plan.max_ranks,
+        'read_seconds': read,
+        'scan_seconds': min(scans),
+        'rewrite_seconds': min(rewrites),
+        'collapse_mb_per_sec': size / total / 1e6,
+    }
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the rank-collapse reduction of text traces")
+    parser.add_argument("--size_mb", type=float, default=500, help="Size of the synthetic trace in MB")
+    parser.add_argument("--block_mb", type=float, default=BLOCK_SIZE / (1024 * 1024),
+                        help="Block size of the reads in MB")
+    parser.add_argument("--workers", type=int, default=COLLAPSE_WORKERS, help="Number of processes")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs; the best is reported")
+    parsed_args = parser.parse_args(args)
+    result = run(parsed_args.size_mb, int(parsed_args.block_mb * 1024 * 1024), parsed_args.repeat,
+                 parsed_args.workers)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark reopening traces saved by --convert against parsing the text.
+
+Builds a synthetic trace (see bench_parser.py), converts it to every
+columnar format that can be written here (arrow and parquet need pyarrow),
+and then opens each file in a fresh process, like a new ion-cli command
+would. Reports the time to open the trace, the time to summarize it once
+open, and the memory the process gained while doing both (peak RSS after
+opening minus RSS after the imports). Memory-mapped formats only bring the
+pages of the columns the summary reads into memory.
+
+    python benchmarks/bench_columnar.py --size_mb 1000
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_parser import make_trace
+from ion_cli.columnar import FORMATS, convert_trace
+
+# Run in a child process per measurement, so every open starts with a cold process and its own peak RSS
+OPEN_TRACE = """
+import json, resource, sys, time
+from ion_cli.columnar import columnar_format, load_trace
+from ion_cli.darshan import parse_trace
+from ion_cli.summary import summarize
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+path = sys.argv[1]
+before = rss()
+start = time.perf_counter()
+trace = load_trace(path) if columnar_format(path) else parse_trace(path)
+opened = time.perf_counter() - start
+open_rss = rss() - before
+start = time.perf_counter()
+summary = summarize(trace)
+summarized = time.perf_counter() - start
+print(json.dumps({'open_seconds': opened, 'summary_seconds': summarized, 'rows': len(trace),
+                  'open_rss_bytes': open_rss,
+                  'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - before}))
+"""
+
+
+def measure(path: str, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', OPEN_TRACE, path], capture_output=True, text=True,
+                                check=True)
+        runs.append(json.loads(result.stdout))
+    best = min(runs, key=lambda run: run['open_seconds'])
+    best['bytes'] = os.path.getsize(path)
+    return best
+
+
+def run(size_mb: float, repeat: int) -> dict:
+    formats = [fmt for fmt in FORMATS if fmt == 'npz' or importlib.util.find_spec('pyarrow')]
+    results = {'benchmark': 'columnar', 'formats': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.txt')
+        make_trace(path, size_mb)
+        results['text'] = measure(path, repeat)
+        for fmt in formats:
+            target = os.path.join(tmp, 'trace' + FORMATS[fmt])
+            start = time.perf_counter()
+            convert_trace(path, target, fmt)
+            convert_seconds = time.perf_counter() - start
+            result = measure(target, repeat)
+            result['convert_seconds'] = convert_seconds
+            result['open_speedup'] = results['text']['open_seconds'] / result['open_seconds']
+            results['formats'][fmt] = result
+    return results
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark reopening columnar traces against parsing text")
+    parser.add_argument("--size_mb", type=float, default=200, help="Size of the synthetic trace in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs; the fastest open is reported")
+    parsed_args = parser.parse_args(args)
+    print(json.dumps(run(parsed_args.size_mb, parsed_args.repeat), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
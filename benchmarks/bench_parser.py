@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmark the streaming Darshan text parser.
+
+Builds a synthetic trace by replicating the records of tests/valid_trace.txt
+across ranks until it reaches the requested size, then reports lines/sec and
+MB/s for a full parse and for batch-wise streaming.
+
+    python benchmarks/bench_parser.py --size_mb 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from ion_cli.darshan import TraceReader, parse_trace
+
+SAMPLE_TRACE = os.path.join(os.path.dirname(__file__), '..', 'tests', 'valid_trace.txt')
+
+
+def make_trace(path: str, size_mb: float) -> int:
+    """
+    Write a synthetic trace of roughly size_mb megabytes.
+
+    Returns:
+        int: Number of lines written
+    """
+    with open(SAMPLE_TRACE) as f:
+        lines = f.readlines()
+    header = [line for line in lines if line.startswith('#') or line == '\n']
+    records = [line.split('\t') for line in lines if not line.startswith('#') and line.strip()]
+
+    target = size_mb * 1024 * 1024
+    written = 0
+    count = 0
+    with open(path, 'w') as out:
+        out.writelines(header)
+        rank = 0
+        while written < target:
+            for fields in records:
+                fields = list(fields)
+                fields[1] = str(rank)
+                line = '\t'.join(fields)
+                out.write(line)
+                written += len(line)
+                count += 1
+            rank += 1
+    return count
+
+
+def run(size_mb: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.txt')
+        lines = make_trace(path, size_mb)
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        trace = parse_trace(path)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = sum(len(batch) for batch in TraceReader(path).batches())
+        streamed = time.perf_counter() - start
+
+    return {
+        'benchmark': 'parser',
+        'bytes': size,
+        'lines': lines,
+        'rows': rows,
+        'column_bytes': trace.nbytes,
+        'parse_seconds': full,
+        'parse_lines_per_sec': lines / full,
+        'parse_mb_per_sec': size / full / 1e6,
+        'stream_seconds': streamed,
+        'stream_lines_per_sec': lines / streamed,
+    }
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Darshan text parser")
+    parser.add_argument("--size_mb", type=float, default=100, help="Size of the synthetic trace in MB")
+    parsed_args = parser.parse_args(args)
+    print(json.dumps(run(parsed_args.size_mb), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
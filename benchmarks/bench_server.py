@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""
+Benchmark the CLI against a local stand-in ION server.
+
+Runs ion_cli.mock_server in-process, optionally with the latency and
+bandwidth of a real link, and measures:
+
+- upload: throughput of multipart and chunked uploads by file size
+- list: latency of listing --traces traces (first fetch, revalidation with
+  an ETag, and 'ion-cli --list' end to end)
+- startup: import and --help time of the CLI (see bench_startup.py)
+- batch: uploads of many small files, analysis launches and deletes
+
+All results are printed as one JSON document, and written to --output, so
+runs can be compared to track regressions.
+
+    python benchmarks/bench_server.py --latency_ms 20 --bandwidth_mbps 1000 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# The upload ledger and caches go to a scratch directory; ion_cli.config reads this when imported
+ION_HOME = os.environ['ION_HOME'] = tempfile.mkdtemp(prefix='ion-bench-')
+
+import bench_startup  # noqa: E402
+from bench_parser import SAMPLE_TRACE, make_trace  # noqa: E402
+from ion_cli.batch import UPLOADED, BatchUploader  # noqa: E402
+from ion_cli.client import IONClient  # noqa: E402
+from ion_cli.config import DEFAULT_MODEL, UPLOAD_CONCURRENCY  # noqa: E402
+from ion_cli.launch import LAUNCHED, BatchLauncher  # noqa: E402
+from ion_cli.mock_server import MockIONServer  # noqa: E402
+from ion_cli.traces import invalidate_user_traces  # noqa: E402
+
+EMAIL = 'bench@example.com'
+
+BENCHMARKS = ['upload', 'list', 'startup', 'batch']
+
+
+def timings(function, repeat: int) -> dict:
+    """
+    Run function `repeat` times and summarise its wall time in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'best_ms': min(samples), 'median_ms': statistics.median(samples)}
+
+
+def bench_upload(server: MockIONServer, user_id: str, sizes_mb: list, workdir: str) -> list:
+    results = []
+    for size_mb in sizes_mb:
+        source = os.path.join(workdir, 'source.txt')
+        make_trace(source, size_mb)
+        size = os.path.getsize(source)
+        for mode in ('multipart', 'chunked'):
+            path = os.path.join(workdir, f'upload_{size_mb:g}mb_{mode}.txt')
+            shutil.copyfile(source, path)
+            uploader = BatchUploader(user_id, concurrency=1, chunked=mode == 'chunked', force=True,
+                                     endpoint=server.url)
+            result = uploader.upload(path)
+            if result.status != UPLOADED:
+                raise RuntimeError(f"upload of {path} failed: {result.message}")
+            results.append({
+                'benchmark': 'upload',
+                'mode': mode,
+                'bytes': size,
+                'seconds': result.seconds,
+                'mb_per_sec': size / result.seconds / 1e6,
+            })
+            IONClient(user_id, endpoint=server.url).delete(os.path.splitext(os.path.basename(path))[0])
+            os.remove(path)
+    return results
+
+
+def bench_list(server: MockIONServer, user_id: str, traces: int, repeat: int) -> list:
+    list_user = server.add_user('list@example.com')
+    server.add_traces(list_user, traces)
+    client = IONClient(list_user, endpoint=server.url)
+
+    def first_fetch():
+        invalidate_user_traces(list_user, server.url)
+        assert len(client.traces()) == traces
+
+    env = dict(os.environ, ION_API_ENDPOINT=server.url, ION_OUTPUT='quiet')
+
+    def cli_list():
+        subprocess.run([sys.executable, '-m', 'ion_cli.cli', '-e', 'list@example.com', '--list'],
+                       env=env, stdout=subprocess.DEVNULL, check=True)
+
+    # One untimed run verifies the email and fills the caches the timed runs revalidate
+    cli_list()
+    return [
+        dict(benchmark='list', case='first_fetch', traces=traces, **timings(first_fetch, repeat)),
+        dict(benchmark='list', case='revalidate', traces=traces, **timings(client.traces, repeat)),
+        dict(benchmark='list', case='cli', traces=traces, **timings(cli_list, repeat)),
+    ]
+
+
+def bench_batch(server: MockIONServer, user_id: str, files: int, jobs: int, workdir: str) -> list:
+    batch_dir = os.path.join(workdir, 'batch')
+    os.makedirs(batch_dir)
+    paths = []
+    for i in range(files):
+        path = os.path.join(batch_dir, f'batch_{i}.txt')
+        shutil.copyfile(SAMPLE_TRACE, path)
+        paths.append(path)
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    results = []
+
+    start = time.perf_counter()
+    uploads = BatchUploader(user_id, concurrency=jobs, force=True, endpoint=server.url).run(paths)
+    seconds = time.perf_counter() - start
+    results.append({'benchmark': 'batch', 'operation': 'upload', 'count': files, 'jobs': jobs,
+                    'failed': sum(1 for result in uploads if result.status != UPLOADED),
+                    'seconds': seconds, 'per_sec': files / seconds})
+
+    start = time.perf_counter()
+    launches = BatchLauncher(user_id, concurrency=jobs, rate=1e9, burst=files, endpoint=server.url).run(
+        names, [DEFAULT_MODEL])
+    seconds = time.perf_counter() - start
+    results.append({'benchmark': 'batch', 'operation': 'launch', 'count': files, 'jobs': jobs,
+                    'failed': sum(1 for result in launches if result.status != LAUNCHED),
+                    'seconds': seconds, 'per_sec': files / seconds})
+
+    # Deletes are sent one after the other, as 'ion-cli --delete <pattern>' does
+    client = IONClient(user_id, endpoint=server.url)
+    start = time.perf_counter()
+    for name in names:
+        client.delete(name)
+    seconds = time.perf_counter() - start
+    results.append({'benchmark': 'batch', 'operation': 'delete', 'count': files, 'jobs': 1,
+                    'failed': 0, 'seconds': seconds, 'per_sec': files / seconds})
+    return results
+
+
+def run(parsed_args) -> dict:
+    bandwidth = parsed_args.bandwidth_mbps * 1e6 / 8 if parsed_args.bandwidth_mbps else None
+    results = []
+    with MockIONServer(latency=parsed_args.latency_ms / 1000, bandwidth=bandwidth) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        user_id = server.add_user(EMAIL)
+        if 'upload' in parsed_args.only:
+            results += bench_upload(server, user_id, parsed_args.upload_sizes_mb, workdir)
+        if 'list' in parsed_args.only:
+            results += bench_list(server, user_id, parsed_args.traces, parsed_args.repeat)
+        if 'startup' in parsed_args.only:
+            results.append(bench_startup.run(parsed_args.repeat))
+        if 'batch' in parsed_args.only:
+            results += bench_batch(server, user_id, parsed_args.batch_files, parsed_args.jobs, workdir)
+
+    return {
+        'suite': 'server',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency_ms': parsed_args.latency_ms,
+        'bandwidth_mbps': parsed_args.bandwidth_mbps,
+        'results': results,
+    }
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ion-cli against a local stand-in ION server")
+    parser.add_argument("--latency_ms", type=float, default=0, help="Delay the server adds to every request")
+    parser.add_argument("--bandwidth_mbps", type=float, default=None,
+                        help="Bandwidth of the simulated link in megabits/s (default unlimited)")
+    parser.add_argument("--upload_sizes_mb", type=float, nargs="+", default=[1, 16, 64],
+                        help="Sizes of the uploaded traces in MB")
+    parser.add_argument("--traces", type=int, default=10000, help="Number of traces in the listed account")
+    parser.add_argument("--batch_files", type=int, default=100, help="Number of files in the batch benchmarks")
+    parser.add_argument("--jobs", type=int, default=UPLOAD_CONCURRENCY, help="Parallel requests of batch operations")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs of the latency benchmarks")
+    parser.add_argument("--only", type=str, nargs="+", choices=BENCHMARKS, default=BENCHMARKS,
+                        help="Benchmarks to run")
+    parser.add_argument("--output", type=str, default=None, help="Also write the results to this JSON file")
+    parsed_args = parser.parse_args(args)
+    try:
+        report = run(parsed_args)
+    finally:
+        shutil.rmtree(ION_HOME, ignore_errors=True)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if parsed_args.output:
+        with open(parsed_args.output, 'w') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Benchmark the start-up time of the command line tool.
+
+Imports ion_cli.cli in fresh interpreters with -X importtime and reports the
+best cumulative import time, the wall time of 'ion-cli --help', and which
+heavy modules were loaded. Exits with status 1 if the import exceeds the
+budget or pulls in a heavy module, so it can guard against regressions.
+
+    python benchmarks/bench_startup.py --budget_ms 100
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Modules that only the commands using them may import
+HEAVY_MODULES = ['requests', 'urllib3', 'rich', 'sqlite3', 'subprocess', 'numpy', 'zstandard']
+
+LIST_MODULES = "import sys, ion_cli.cli; print(' '.join(name.split('.')[0] for name in sys.modules))"
+
+
+def import_time_us(module: str) -> int:
+    """
+    Cumulative import time of a module in a fresh interpreter, in microseconds.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def help_seconds() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'ion_cli.cli', '--help'], capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def heavy_imports() -> list:
+    result = subprocess.run([sys.executable, '-c', LIST_MODULES], capture_output=True, text=True, check=True)
+    loaded = set(result.stdout.split())
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def run(repeat: int) -> dict:
+    import_us = min(import_time_us('ion_cli.cli') for _ in range(repeat))
+    return {
+        'benchmark': 'startup',
+        'import_ms': import_us / 1000,
+        'help_seconds': min(help_seconds() for _ in range(repeat)),
+        'heavy_imports': heavy_imports(),
+    }
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the start-up time of ion-cli")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs; the best is reported")
+    parser.add_argument("--budget_ms", type=float, default=100, help="Maximum import time of ion_cli.cli")
+    parsed_args = parser.parse_args(args)
+    result = run(parsed_args.repeat)
+    result['budget_ms'] = parsed_args.budget_ms
+    print(json.dumps(result, indent=2))
+    return 0 if result['import_ms'] <= parsed_args.budget_ms and not result['heavy_imports'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark the local I/O health summary of text traces.
+
+Builds a synthetic trace (see bench_parser.py) and reports the time of
+summarize_trace, split into scanning the counters out of the file and
+aggregating them, next to the time of just reading the file with the same
+block size.
+
+Scanning runs on VALIDATE_WORKERS threads; compare --workers 1 with the
+default to see how it scales with the cores of the machine.
+
+    python benchmarks/bench_summary.py --size_mb 1000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from bench_parser import make_trace
+from bench_validate import read_seconds
+from ion_cli.config import VALIDATE_WORKERS
+from ion_cli.summary import summarize_trace
+from ion_cli.validate import SCAN_BLOCK_SIZE
+
+
+def run(size_mb: float, block_size: int, repeat: int, workers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.txt')
+        make_trace(path, size_mb)
+        size = os.path.getsize(path)
+
+        read = min(read_seconds(path, block_size) for _ in range(repeat))
+        summaries = [summarize_trace(path, block_size=block_size, workers=workers) for _ in range(repeat)]
+        best = min(summaries, key=lambda summary: summary.parse_seconds + summary.analysis_seconds)
+
+    total = best.parse_seconds + best.analysis_seconds
+    return {
+        'benchmark': 'summary',
+        'bytes': size,
+        'workers': workers,
+        'rows': best.rows,
+        'files': best.file_count,
+        'findings': len(best.findings),
+        'read_seconds': read,
+        'read_gb_per_sec': size / read / 1e9,
+        'scan_seconds': best.parse_seconds,
+        'analysis_seconds': best.analysis_seconds,
+        'summary_seconds': total,
+        'summary_gb_per_sec': size / total / 1e9,
+    }
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the local I/O summary of text traces")
+    parser.add_argument("--size_mb", type=float, default=500, help="Size of the synthetic trace in MB")
+    parser.add_argument("--block_mb", type=float, default=SCAN_BLOCK_SIZE / (1024 * 1024),
+                        help="Block size of the reads in MB")
+    parser.add_argument("--workers", type=int, default=VALIDATE_WORKERS, help="Number of blocks scanned in parallel")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs; the best is reported")
+    parsed_args = parser.parse_args(args)
+    result = run(parsed_args.size_mb, int(parsed_args.block_mb * 1024 * 1024), parsed_args.repeat,
+                 parsed_args.workers)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Benchmark the full-file structural check of text traces.
+
+Builds a synthetic trace (see bench_parser.py) and reports the throughput
+of check_trace_structure next to the throughput of just reading the file
+with the same block size, i.e. the bandwidth the check is bounded by.
+
+The check runs on VALIDATE_WORKERS threads; compare --workers 1 with the
+default to see how it scales with the cores of the machine.
+
+    python benchmarks/bench_validate.py --size_mb 1000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench_parser import make_trace
+from ion_cli.config import VALIDATE_WORKERS
+from ion_cli.validate import SCAN_BLOCK_SIZE, check_trace_structure
+
+
+def read_seconds(path: str, block_size: int) -> float:
+    buffer = bytearray(block_size)
+    start = time.perf_counter()
+    with open(path, 'rb', buffering=0) as f:
+        while f.readinto(buffer):
+            pass
+    return time.perf_counter() - start
+
+
+def run(size_mb: float, block_size: int, repeat: int, workers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.txt')
+        make_trace(path, size_mb)
+        size = os.path.getsize(path)
+
+        read = min(read_seconds(path, block_size) for _ in range(repeat))
+        reports = [check_trace_structure(path, block_size=block_size, workers=workers) for _ in range(repeat)]
+        best = min(reports, key=lambda report: report.seconds)
+
+    return {
+        'benchmark': 'validate',
+        'bytes': size,
+        'workers': workers,
+        'lines': best.lines,
+        'records': best.records,
+        'errors': best.error_count,
+        'read_seconds': read,
+        'read_gb_per_sec': size / read / 1e9,
+        'check_seconds': best.seconds,
+        'check_gb_per_sec': size / best.seconds / 1e9,
+        'check_lines_per_sec': best.lines / best.seconds,
+    }
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the structural check of text traces")
+    parser.add_argument("--size_mb", type=float, default=500, help="Size of the synthetic trace in MB")
+    parser.add_argument("--block_mb", type=float, default=SCAN_BLOCK_SIZE / (1024 * 1024),
+                        help="Block size of the reads in MB")
+    parser.add_argument("--workers", type=int, default=VALIDATE_WORKERS, help="Number of blocks checked in parallel")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs; the best is reported")
+    parsed_args = parser.parse_args(args)
+    result = run(parsed_args.size_mb, int(parsed_args.block_mb * 1024 * 1024), parsed_args.repeat,
+                 parsed_args.workers)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Shared HTTP client for the ION API.
+
+All requests go through one keep-alive requests.Session per endpoint, so a
+command that makes several calls pays for TCP and TLS setup once. Batch
+operations reuse the same connection pool from many threads.
+
+Every request has connect and read timeouts. Reads that are safe to repeat
+are retried with jittered exponential backoff after connection errors,
+timeouts and overload responses, and can be hedged: if the answer is late,
+a duplicate request is sent and whichever answers first is used.
+"""
+
+import gzip
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from email.utils import parsedate_to_datetime
+from json import dumps
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ion_cli import profiling
+from ion_cli.config import (
+    API_BACKOFF_BASE, API_BACKOFF_MAX, API_COMPRESS_REQUESTS, API_CONNECT_TIMEOUT, API_HEDGE_DELAY,
+    API_MAX_RETRIES, API_POOL_SIZE, API_READ_TIMEOUT, DEFAULT_API_ENDPOINT
+)
+from ion_cli.user_cache import UserCache
+
+
+# JSON bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+
+# Responses that mean the server does not accept the user id sent with the request
+USER_REJECTED_STATUSES = (401, 403)
+
+# Responses of an overloaded or briefly unavailable server, worth retrying
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+
+class ProfiledSession(requests.Session):
+    """
+    Session that records every request in the active profile (see ion_cli.profiling).
+    """
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        profile = profiling.active()
+        if profile is None:
+            return super().send(request, **kwargs)
+
+        # A request that opens a connection also pays for DNS, TCP and TLS setup
+        adapter = self.get_adapter(request.url)
+        connections = _connections_opened(adapter)
+        name = f"{request.method} {urlsplit(request.url).path}"
+        with profile.span(name, profiling.HTTP, bytes_sent=_body_size(request)) as span:
+            response = super().send(request, **kwargs)
+            span.update(status=response.status_code, new_connection=_connections_opened(adapter) > connections,
+                        headers_seconds=response.elapsed.total_seconds(),
+                        bytes_received=int(response.headers.get('Content-Length') or 0))
+        return response
+
+
+def _connections_opened(adapter) -> int:
+    # Connections opened so far by all pools of an adapter (approximate while other threads send)
+    pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+    if pools is None:
+        return 0
+    return sum(getattr(pools.get(key), 'num_connections', 0) for key in pools.keys())
+
+
+def _body_size(request: requests.PreparedRequest) -> int:
+    if request.headers.get('Content-Length'):
+        return int(request.headers['Content-Length'])
+    return len(request.body) if isinstance(request.body, (bytes, str)) else 0
+
+
+class APIClient:
+    """
+    Owns a pooled, keep-alive session to one ION API endpoint.
+
+    Args:
+        endpoint: Base URL of the ION API
+        pool_size: Maximum number of connections kept open to the endpoint
+        timeout: (connect, read) timeout in seconds applied to every request
+        compress_requests: Gzip large JSON request bodies
+        max_retries: Retries of idempotent requests
+        hedge_delay: Seconds before a hedged request is duplicated; 0 disables hedging
+    """
+
+    def __init__(self, endpoint: Optional[str] = None, pool_size: int = API_POOL_SIZE,
+                 timeout: Tuple[float, float] = (API_CONNECT_TIMEOUT, API_READ_TIMEOUT),
+                 compress_requests: bool = API_COMPRESS_REQUESTS, max_retries: int = API_MAX_RETRIES,
+                 hedge_delay: float = API_HEDGE_DELAY):
+        self.endpoint = (endpoint or DEFAULT_API_ENDPOINT).rstrip('/')
+        self.timeout = timeout
+        self.compress_requests = compress_requests
+        self.max_retries = max_retries
+        self.hedge_delay = hedge_delay
+        self._hedge_pool = None
+        self.pool_size = 0
+        self.session = ProfiledSession()
+        self._lock = threading.Lock()
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size: int) -> None:
+        """
+        Grow the connection pool so pool_size threads can share it without blocking.
+        """
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.pool_size = pool_size
+
+    def url(self, path: str) -> str:
+        return f"{self.endpoint}{path}"
+
+    def post(self, path: str, json: Optional[dict] = None, idempotent: bool = False, hedge: bool = False,
+             **kwargs) -> requests.Response:
+        """
+        POST to an API path, e.g. '/api/user_traces'.
+
+        Args:
+            path: Path below the endpoint, starting with '/'
+            json: Payload sent as JSON (gzip-compressed if enabled and large enough)
+            idempotent: The request only reads, so it is retried after connection
+                errors, timeouts and RETRYABLE_STATUSES
+            hedge: Send a duplicate if the answer takes longer than hedge_delay
+                (only for idempotent requests)
+            **kwargs: Passed through to requests (data, files, params, headers, timeout)
+
+        Returns:
+            requests.Response: The server response (the last one if retries ran out)
+
+        Raises:
+            requests.RequestException: If no response was received
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        payload = json
+        if json is not None and self.compress_requests:
+            body = dumps(json).encode('utf-8')
+            if len(body) >= COMPRESS_MIN_BYTES:
+                headers = dict(kwargs.pop('headers', None) or {})
+                headers['Content-Type'] = 'application/json'
+                headers['Content-Encoding'] = 'gzip'
+                kwargs['data'] = gzip.compress(body)
+                kwargs['headers'] = headers
+                json = None
+        if json is not None:
+            kwargs['json'] = json
+        if idempotent:
+            response = self._post_idempotent(path, hedge, kwargs)
+        else:
+            response = self.session.post(self.url(path), **kwargs)
+        if response.status_code in USER_REJECTED_STATUSES and isinstance(payload, dict) and payload.get('user_id'):
+            # A cached verification is no longer valid; the next command asks the server again
+            UserCache().forget(self.endpoint, payload['user_id'])
+        return response
+
+    def _post_idempotent(self, path: str, hedge: bool, kwargs: dict) -> requests.Response:
+        def send():
+            return self.session.post(self.url(path), **kwargs)
+
+        hedged = hedge and self.hedge_delay > 0
+        return send_with_retries(lambda: self._hedged(send) if hedged else send(), self.max_retries,
+                                 f"retry {path}")
+
+    def _hedged(self, send) -> requests.Response:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=max(2, self.pool_size),
+                                                      thread_name_prefix='ion-hedge')
+            pool = self._hedge_pool
+        first = pool.submit(send)
+        try:
+            return first.result(timeout=self.hedge_delay)
+        except FutureTimeoutError:
+            pass
+        except requests.RequestException:
+            # Fails fast; the retry loop decides what to do
+            raise
+        profiling.mark('hedge')
+        error = None
+        for future in as_completed([first, pool.submit(send)]):
+            try:
+                return future.result()
+            except requests.RequestException as e:
+                error = e
+        raise error
+
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+
+def backoff_delay(attempt: int, base: float = API_BACKOFF_BASE, cap: float = API_BACKOFF_MAX) -> float:
+    """
+    Delay before retry number attempt + 1: exponential backoff with full jitter.
+
+    Args:
+        attempt: Number of failed attempts so far, minus one (0 for the first retry)
+        base: Delay bound of the first retry in seconds
+        cap: Largest delay bound in seconds
+
+    Returns:
+        float: Random delay between 0 and min(cap, base * 2 ** attempt)
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def send_with_retries(send: Callable[[], requests.Response], max_retries: int, label: str,
+                      rewind: Optional[Callable[[], None]] = None) -> requests.Response:
+    """
+    Send a request that is safe to repeat, retrying transient failures.
+
+    Connection errors, timeouts and RETRYABLE_STATUSES are retried after
+    backoff_delay (or the server's Retry-After, capped at API_BACKOFF_MAX).
+
+    Args:
+        send: Sends the request once and returns the response
+        max_retries: Number of retries after the first attempt
+        label: Name of the event marked in the active profile for every retry
+        rewind: Called before every retry, e.g. to seek a request body back to its start
+
+    Returns:
+        requests.Response: The first non-retryable response, or the last one
+
+    Raises:
+        requests.RequestException: If the last attempt received no response
+    """
+    attempt = 0
+    while True:
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= max_retries:
+                raise
+            profiling.mark(label, error=type(e).__name__)
+            delay = backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRYABLE_STATUSES or attempt >= max_retries:
+                return response
+            profiling.mark(label, status=response.status_code)
+            delay = min(retry_after_seconds(response, default=backoff_delay(attempt)), API_BACKOFF_MAX)
+            response.close()
+        time.sleep(delay)
+        if rewind is not None:
+            rewind()
+        attempt += 1
+
+
+def retry_after_seconds(response: requests.Response, default: float) -> float:
+    """
+    Read the delay requested by a 429/503 response's Retry-After header.
+
+    Args:
+        response: Server response
+        default: Delay used when the header is missing or malformed
+
+    Returns:
+        float: Seconds to wait before retrying (never negative)
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return default
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(endpoint: Optional[str] = None) -> APIClient:
+    """
+    Return the process-wide client for an endpoint, creating it on first use.
+
+    Args:
+        endpoint: Base URL of the ION API
+
+    Returns:
+        APIClient: Shared client
+    """
+    endpoint = (endpoint or DEFAULT_API_ENDPOINT).rstrip('/')
+    with _clients_lock:
+        client = _clients.get(endpoint)
+        if client is None:
+            client = _clients[endpoint] = APIClient(endpoint)
+        return client
+
+
+def close_clients() -> None:
+    """
+    Close every shared client (their sessions and pooled connections).
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
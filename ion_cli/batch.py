@@ -0,0 +1,317 @@
+"""
+Parallel upload of many trace files.
+
+Each file runs through a pipeline of validation, content hashing and ledger
+lookup, conversion of .darshan logs (and columnar traces) to text, optional
+reduction, and transfer. Conversion streams darshan-parser output into the transfer, so
+the parsers of different files run in parallel with each other and with
+the uploads. Files are processed by a bounded
+thread pool, so validating one file overlaps with uploading others. All
+workers share the endpoint's APIClient and therefore one connection pool.
+"""
+
+import glob
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+import requests
+
+from ion_cli.api import get_client
+from ion_cli.collapse import open_collapsed_stream
+from ion_cli.columnar import columnar_format, open_text_stream
+from ion_cli.config import (
+    COLLAPSE_WORKERS, DEFAULT_API_ENDPOINT, UPLOAD_CHUNK_SIZE, UPLOAD_CONCURRENCY, UPLOAD_TIMEOUT
+)
+from ion_cli.convert import find_darshan_parser, is_darshan_log, open_darshan_stream, text_file_name
+from ion_cli.ledger import UploadLedger
+from ion_cli.profiling import phase
+from ion_cli.reduce import open_reduced_stream
+from ion_cli.traces import invalidate_user_traces
+from ion_cli.upload import ChunkedUpload, TraceExistsError, UploadError, multipart_upload, open_file_stream
+from ion_cli.validate import TRACE_EXTENSIONS, check_trace_file, check_trace_structure
+
+
+# Outcomes of a single file in a batch; the first three count as success
+UPLOADED = "uploaded"
+SKIPPED = "skipped"
+EXISTS = "exists"
+INVALID = "invalid"
+FAILED = "failed"
+
+SUCCESS_STATUSES = [UPLOADED, SKIPPED, EXISTS]
+
+
+def expand_upload_paths(patterns: Iterable[str]) -> List[str]:
+    """
+    Expand files, directories and glob patterns into a list of trace files.
+
+    Directories are searched recursively for .txt and .darshan files. Patterns
+    that match nothing are kept as given so they are reported as missing.
+
+    Args:
+        patterns: Paths, directories or glob patterns
+
+    Returns:
+        list: File paths in a stable order, without duplicates
+    """
+    paths = []
+    for pattern in patterns:
+        if any(char in pattern for char in '*?['):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            candidates = matches or [pattern]
+        else:
+            candidates = [pattern]
+        for candidate in candidates:
+            if os.path.isdir(candidate):
+                for root, dirs, files in os.walk(candidate):
+                    dirs.sort()
+                    paths.extend(
+                        os.path.join(root, name) for name in sorted(files)
+                        if os.path.splitext(name)[1].lower() in TRACE_EXTENSIONS
+                    )
+            else:
+                paths.append(candidate)
+
+    seen = set()
+    unique = []
+    for path in paths:
+        key = os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+class UploadResult:
+    """
+    Outcome of uploading one file of a batch.
+    """
+
+    def __init__(self, path: str, status: str, size: int = 0, sent_bytes: int = 0,
+                 seconds: float = 0.0, message: str = ""):
+        self.path = path
+        self.status = status
+        self.size = size
+        self.sent_bytes = sent_bytes
+        self.seconds = seconds
+        self.message = message
+
+    @property
+    def ok(self) -> bool:
+        return self.status in SUCCESS_STATUSES
+
+
+class _Claim:
+    """
+    First file of a batch with some content, and the outcome of its upload.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.status = None
+        self.done = threading.Event()
+
+
+class BatchUploader:
+    """
+    Uploads many files concurrently over a shared connection pool.
+
+    Args:
+        user_id: User's ID
+        concurrency: Number of files processed at the same time
+        chunked: Use the chunked, resumable protocol
+        chunk_size: Number of bytes sent per request in chunked mode
+        compression: Content encoding for chunked uploads, or None
+        reduce: Reduce .txt traces (and converted .darshan logs) before sending
+        force: Ignore the upload ledger
+        convert: Convert .darshan logs to text with darshan-parser if it is installed
+        check: Check every line of .txt traces before sending and reject malformed ones
+        collapse_ranks: Merge the per-rank records of each file into shared records before
+            sending (and before reducing); the files of the batch share the cores
+        endpoint: Base URL of the ION API
+        on_bytes: Called with the number of newly acknowledged bytes
+        on_result: Called with each UploadResult as soon as a file is done
+    """
+
+    def __init__(self, user_id: str, concurrency: int = UPLOAD_CONCURRENCY, chunked: bool = False,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE, compression: Optional[str] = None,
+                 reduce: bool = False, force: bool = False, endpoint: Optional[str] = None,
+                 convert: bool = True, check: bool = False, on_bytes: Optional[Callable[[int], None]] = None,
+                 on_result: Optional[Callable[[UploadResult], None]] = None, collapse_ranks: bool = False):
+        self.user_id = user_id
+        self.concurrency = max(1, concurrency)
+        self.chunked = chunked or bool(compression)
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self.reduce = reduce
+        self.force = force
+        self.darshan_parser = find_darshan_parser() if convert else None
+        self.check = check
+        self.collapse_ranks = collapse_ranks
+        self.client = get_client(endpoint or DEFAULT_API_ENDPOINT)
+        self.client.ensure_pool_size(self.concurrency)
+        self.endpoint = self.client.endpoint
+        self.session = self.client.session
+        self.on_bytes = on_bytes
+        self.on_result = on_result
+        # Content hash -> _Claim of the first file of this batch with it, to catch copies within the batch
+        self._claimed = {}
+        self._lock = threading.Lock()
+
+    def run(self, paths: List[str]) -> List[UploadResult]:
+        """
+        Upload all paths, returning one result per path in input order.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(self._process, paths))
+        if any(result.status == UPLOADED for result in results):
+            invalidate_user_traces(self.user_id, self.endpoint)
+        return results
+
+    def upload(self, path: str) -> UploadResult:
+        """
+        Run the whole pipeline for one file on the calling thread.
+        """
+        return self._process(path)
+
+    def _process(self, path: str) -> UploadResult:
+        start = time.perf_counter()
+        try:
+            result = self._upload(path)
+        except (UploadError, OSError, UnicodeDecodeError, requests.RequestException) as e:
+            result = UploadResult(path, FAILED, message=str(e))
+        except Exception as e:
+            result = UploadResult(path, FAILED, message=f"{type(e).__name__}: {e}")
+        result.seconds = time.perf_counter() - start
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    def _upload(self, path: str) -> UploadResult:
+        with phase('validate'):
+            error = check_trace_file(path)
+        if error:
+            return UploadResult(path, INVALID, message=error)
+        size = os.path.getsize(path)
+        if self.check and path.lower().endswith('.txt'):
+            with phase('validate (full)'):
+                report = check_trace_structure(path)
+            if not report.ok:
+                return UploadResult(path, INVALID, size, message=f"malformed trace, {report.summary()}")
+        file_name = os.path.basename(path)
+
+        content_hash = None
+        try:
+            with UploadLedger() as ledger:
+                content_hash = ledger.content_hash(path)
+                previous = ledger.lookup(content_hash, self.endpoint, self.user_id)
+        except sqlite3.Error:
+            previous = None
+        if previous and not self.force:
+            return UploadResult(path, SKIPPED, size,
+                                message=f"identical to trace '{previous.trace_name}' ({previous.uploaded_date})")
+        claim = None
+        if content_hash:
+            with self._lock:
+                claim = self._claimed.setdefault(content_hash, _Claim(path))
+            if claim.path != path and not self.force:
+                # Only skip the copy once the first file has reached the server
+                claim.done.wait()
+                if claim.status in SUCCESS_STATUSES:
+                    return UploadResult(path, SKIPPED, size, message=f"identical to '{claim.path}' in this batch")
+                return UploadResult(path, FAILED, size,
+                                    message=f"identical to '{claim.path}' in this batch, which failed to upload")
+
+        status = FAILED
+        try:
+            result = self._transfer(path, size, file_name, content_hash)
+            status = result.status
+            return result
+        finally:
+            if claim is not None and claim.path == path:
+                claim.status = status
+                claim.done.set()
+
+    def _transfer(self, path: str, size: int, file_name: str, content_hash: Optional[str]) -> UploadResult:
+        open_stream = open_file_stream(path)
+        total_size = size
+        read_lines = None
+        notes = []
+        if self.darshan_parser and is_darshan_log(path):
+            open_stream = open_darshan_stream(path, self.darshan_parser)
+            read_lines = open_stream.read_lines
+            # The size of the text form is only known once it has been produced
+            total_size = None
+            file_name = text_file_name(path)
+            notes.append("converted with darshan-parser")
+        elif columnar_format(path):
+            open_stream = open_text_stream(path)
+            read_lines = open_stream.read_lines
+            total_size = None
+            file_name = text_file_name(path)
+            notes.append("rendered as text")
+        if self.collapse_ranks and (read_lines or path.lower().endswith('.txt')):
+            workers = max(1, COLLAPSE_WORKERS // self.concurrency)
+            open_stream = open_collapsed_stream(path, read_lines=read_lines, workers=workers)
+            read_lines = open_stream.read_lines
+            total_size = open_stream.plan.output_bytes
+            notes.append(f"collapsed {open_stream.plan.records} per-rank records")
+        if self.reduce and (read_lines or path.lower().endswith('.txt')):
+            open_stream = open_reduced_stream(path, read_lines=read_lines)
+            total_size = open_stream.plan.output_bytes
+            notes.append(f"reduced to {total_size} bytes")
+
+        if self.chunked:
+            sent = self._send_chunked(file_name, open_stream, total_size)
+        else:
+            sent = self._send_multipart(file_name, open_stream, total_size)
+        if sent is None:
+            return UploadResult(path, EXISTS, size, message="a trace with this name already exists")
+
+        if content_hash:
+            try:
+                with UploadLedger() as ledger:
+                    ledger.record(content_hash, self.endpoint, self.user_id, os.path.splitext(file_name)[0],
+                                  os.path.basename(path), size)
+            except sqlite3.Error:
+                pass
+        return UploadResult(path, UPLOADED, size, sent, message="; ".join(notes))
+
+    def _send_chunked(self, file_name: str, open_stream, total_size: Optional[int]) -> Optional[int]:
+        acknowledged = [0]
+
+        def on_progress(offset):
+            if self.on_bytes and offset > acknowledged[0]:
+                self.on_bytes(offset - acknowledged[0])
+            acknowledged[0] = max(acknowledged[0], offset)
+
+        upload = ChunkedUpload(self.user_id, file_name, open_stream, total_size=total_size,
+                               chunk_size=self.chunk_size, endpoint=self.endpoint,
+                               encoding=self.compression or 'identity', on_progress=on_progress,
+                               session=self.session)
+        try:
+            upload.run()
+        except TraceExistsError:
+            return None
+        return upload.sent_bytes
+
+    def _send_multipart(self, file_name: str, open_stream, total_size: Optional[int]) -> Optional[int]:
+        with open_stream() as stream:
+            if total_size is None:
+                # requests reads the whole body into memory anyway; doing it here gives its size
+                stream = io.BytesIO(stream.read())
+                total_size = len(stream.getvalue())
+            response = multipart_upload(file_name, stream, self.user_id, session=self.session,
+                                        endpoint=self.endpoint, timeout=UPLOAD_TIMEOUT)
+        if response.status_code == 400 and "already exists" in response.text:
+            return None
+        if response.status_code != 200:
+            raise UploadError(response.text)
+        if self.on_bytes:
+            self.on_bytes(total_size)
+        return total_size
@@ -6,37 +6,45 @@ Command line utility for uploading .txt files to a public endpoint.
 import argparse
 import os
 import sys
-import requests
-import subprocess
-from typing import Optional
-from ion_cli.config import DEFAULT_API_ENDPOINT, SUPPORTED_MODELS, VALID_TASK_STATUSES, VALID_STATUS_FOR_VIEW
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+from ion_cli.config import DEFAULT_API_ENDPOINT, SUPPORTED_MODELS, VALID_TASK_STATUSES, VALID_STATUS_FOR_VIEW, UPLOAD_CHUNK_SIZE, UPLOAD_COMPRESSION, UPLOAD_CONCURRENCY, UPLOAD_ENCODINGS, UPLOAD_SHARD_RANKS, TRACE_STATUS_MAX_AGE, LAUNCH_CONCURRENCY, LAUNCH_RATE, DEFAULT_MODEL, SUMMARY_TOP_FILES
+from ion_cli import profiling
+from ion_cli.validate import MAX_ERRORS, check_trace_file, check_trace_structure
 
-# Import Rich components
-from rich.console import Console
-from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.theme import Theme
-from rich.traceback import install
+# Rich components are created lazily, and not at all in plain or quiet mode
+from ion_cli.output import (
+    BarColumn, DownloadColumn, Live, Markdown, Panel, Progress, SpinnerColumn, Table, TextColumn,
+    TimeElapsedColumn, TimeRemainingColumn, TransferSpeedColumn, console, get_mode, set_mode
+)
 
-# Install rich traceback handler for better error display
-install()
+# requests and the API modules are imported by the commands that use them, so
+# that starting the tool (or just printing --help) stays fast
+if TYPE_CHECKING:
+    from ion_cli.api import APIClient
+    from ion_cli.client import IONClient
 
 
-# Create a custom theme
-custom_theme = Theme({
-    "info": "cyan",
-    "warning": "yellow",
-    "error": "bold red",
-    "success": "bold green",
-})
+def api_client() -> 'APIClient':
+    """
+    Return the shared, connection-pooling client for the configured endpoint.
+    """
+    from ion_cli.api import get_client
+    return get_client(DEFAULT_API_ENDPOINT)
+
 
-# Create console with custom theme
-console = Console(theme=custom_theme)
+def ion_client(user_id: Optional[str] = None) -> 'IONClient':
+    """
+    Return an IONClient for the user on the shared client of the configured endpoint.
+    """
+    from ion_cli.client import IONClient
+    return IONClient(user_id, api=api_client())
 
 
 def validate_file(file_path: str) -> bool:
     """
-    Validate that the file exists and is either a .txt or .darshan file.
+    Validate that the file exists and is a .txt, .darshan or columnar trace.
     
     Args:
         file_path: Path to the file to validate
@@ -44,44 +52,479 @@ def validate_file(file_path: str) -> bool:
     Returns:
         bool: True if file is valid, False otherwise
     """
-    if not os.path.exists(file_path):
-        console.print(f"[error]Error:[/] File '{file_path}' does not exist.")
+    with profiling.phase('validate'):
+        error = check_trace_file(file_path)
+    if error:
+        console.print(f"[error]Error:[/] {error}")
         return False
     
-    file_extension = os.path.splitext(file_path)[1].lower()
+    return True
+
+
+def check_trace(file_path: str, max_errors: int = MAX_ERRORS) -> bool:
+    """
+    Check every line of a text trace and report the problems found.
     
-    # Check if file has valid extension
-    if file_extension not in ['.txt', '.darshan']:
-        console.print(f"[error]Error:[/] File '{file_path}' must be either a .txt or .darshan file.")
+    Args:
+        file_path: Path to the .txt trace
+        max_errors: Number of problems listed with their line numbers
+        
+    Returns:
+        bool: True if the trace is well formed, False otherwise
+    """
+    try:
+        with profiling.phase('validate (full)'):
+            report = check_trace_structure(file_path, max_errors=max_errors)
+    except OSError as e:
+        console.print(f"[error]Error:[/] Cannot read '{file_path}': {str(e)}")
+        return False
+    
+    rate = format_size(report.bytes / report.seconds) if report.seconds else format_size(report.bytes)
+    if report.ok:
+        console.print(f"[success]'{file_path}' is well formed:[/] {report.lines} lines, "
+                      f"{report.records} records ({format_size(report.bytes)} checked at {rate}/s)")
+        return True
+    
+    table = Table(title=f"Problems in '{file_path}'")
+    table.add_column("Line", justify="right", style="cyan")
+    table.add_column("Problem")
+    for line, message in report.errors:
+        table.add_row(str(line), f"[error]{message}[/]")
+    console.print(table)
+    shown = f" (first {len(report.errors)} shown)" if report.error_count > len(report.errors) else ""
+    console.print(f"[error]Error:[/] '{file_path}' has {report.error_count} problems{shown}.")
+    return False
+
+
+def validate_traces(patterns: list, max_errors: int = MAX_ERRORS) -> bool:
+    """
+    Fully check trace files without uploading them.
+    
+    Args:
+        patterns: Paths, directories or glob patterns of traces
+        max_errors: Number of problems listed per file
+        
+    Returns:
+        bool: True if every file is a well-formed trace, False otherwise
+    """
+    from ion_cli.batch import expand_upload_paths
+    from ion_cli.columnar import columnar_format
+    paths = expand_upload_paths(patterns)
+    if not paths:
+        console.print("[warning]No trace files matched.[/]")
+        return False
+    
+    results = []
+    for path in paths:
+        if not validate_file(path):
+            results.append(False)
+        elif path.lower().endswith('.txt'):
+            results.append(check_trace(path, max_errors))
+        elif columnar_format(path):
+            results.append(check_columnar_trace(path))
+        else:
+            console.print(f"[info]'{path}' is a binary Darshan log; only text traces are checked.[/]")
+            results.append(True)
+    return all(results)
+
+
+def check_columnar_trace(file_path: str) -> bool:
+    """
+    Check that a columnar trace written by --convert opens and that its columns are consistent.
+    
+    Args:
+        file_path: Path to the .npz, .arrow or .parquet trace
+        
+    Returns:
+        bool: True if the trace is well formed, False otherwise
+    """
+    from ion_cli.columnar import check_trace as check_columns, load_trace
+    with profiling.phase('validate (full)'):
+        problems = check_columns(file_path)
+    if problems:
+        for problem in problems:
+            console.print(f"[error]Error:[/] '{file_path}': {problem}")
         return False
     
-    # For .txt files, validate text content
-    if file_extension == '.txt':
+    trace = load_trace(file_path)
+    console.print(f"[success]'{file_path}' is well formed:[/] {len(trace)} counters of {len(trace.files)} files")
+    return True
+
+
+def convert_traces(patterns: list, fmt: str = "npz", convert: bool = True, reduce: bool = False,
+                   collapse_ranks: bool = False) -> bool:
+    """
+    Parse trace files once and save them as columnar files next to them (e.g. run.txt -> run.npz).
+    
+    Args:
+        patterns: Paths, directories or glob patterns of traces
+        fmt: Columnar format, 'npz', 'arrow' or 'parquet'
+        convert: Convert .darshan logs with darshan-parser (otherwise they are skipped)
+        reduce: Drop zero/unmonitored counters and unused mount entries first
+        collapse_ranks: Merge the per-rank records of each file into shared records first
+        
+    Returns:
+        bool: True if every file was converted, False otherwise
+    """
+    from ion_cli.batch import expand_upload_paths
+    from ion_cli.columnar import columnar_format, convert_trace, open_text_stream, output_path
+    from ion_cli.upload import UploadError
+    paths = expand_upload_paths(patterns)
+    if not paths:
+        console.print("[warning]No trace files matched.[/]")
+        return False
+    
+    results = []
+    for path in paths:
+        if not validate_file(path):
+            results.append(False)
+            continue
+        target = output_path(path, fmt)
+        if columnar_format(path) == fmt:
+            console.print(f"[info]'{path}' is already in the {fmt} format.[/]")
+            results.append(True)
+            continue
+        
+        start = time.perf_counter()
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                # Try to read a small sample of the file
-                sample = file.read(1024)
-                
-                # Check if the sample contains null bytes, which typically indicate binary data
-                if '\0' in sample:
-                    console.print(f"[error]Error:[/] File '{file_path}' appears to be a binary file, not a text file.")
-                    return False
-                    
-        except UnicodeDecodeError:
-            console.print(f"[error]Error:[/] File '{file_path}' contains invalid text encoding.")
+            open_stream = None
+            if columnar_format(path):
+                open_stream = open_text_stream(path)
+            elif not path.lower().endswith('.txt'):
+                open_stream = convert_for_upload(path, upload=False) if convert else None
+                if open_stream is None:
+                    console.print(f"[error]Error:[/] Cannot convert the binary Darshan log '{path}' "
+                                  f"without darshan-parser.")
+                    results.append(False)
+                    continue
+            if collapse_ranks:
+                open_stream = collapse_for_upload(path, open_stream) or open_stream
+            if reduce:
+                open_stream = reduce_for_upload(path, open_stream) or open_stream
+            
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                console=console
+            ) as progress:
+                task = progress.add_task(f"[info]Writing {target}...[/]", total=None)
+                trace = convert_trace(open_stream.read_lines if open_stream else path, target, fmt,
+                                      name=os.path.basename(path))
+                progress.update(task, completed=True)
+        except (OSError, UnicodeDecodeError, ValueError, UploadError) as e:
+            console.print(f"[error]Error:[/] Cannot convert '{path}': {str(e)}")
+            results.append(False)
+            continue
+        
+        console.print(f"[success]'{path}' -> '{target}':[/] {len(trace)} counters of {len(trace.files)} files, "
+                      f"{format_size(os.path.getsize(target))} ({time.perf_counter() - start:.2f} s)")
+        results.append(True)
+    return all(results)
+
+
+def _fraction(value) -> str:
+    return f"{value:.0%}" if value is not None else "-"
+
+
+def summarize_traces(patterns: list, top: int = SUMMARY_TOP_FILES, convert: bool = True) -> bool:
+    """
+    Print a local I/O health summary of trace files, without uploading them.
+    
+    Args:
+        patterns: Paths, directories or glob patterns of traces
+        top: Number of files listed per trace, by bytes moved
+        convert: Convert .darshan logs with darshan-parser (otherwise they are skipped)
+        
+    Returns:
+        bool: True if every file was summarized, False otherwise
+    """
+    from ion_cli.batch import expand_upload_paths
+    from ion_cli.columnar import columnar_format
+    paths = expand_upload_paths(patterns)
+    if not paths:
+        console.print("[warning]No trace files matched.[/]")
+        return False
+    
+    results = []
+    for path in paths:
+        if not validate_file(path):
+            results.append(False)
+            continue
+        source = path
+        if not path.lower().endswith('.txt') and not columnar_format(path):
+            converted = convert_for_upload(path, upload=False) if convert else None
+            if converted is None:
+                console.print(f"[error]Error:[/] Cannot summarize the binary Darshan log '{path}' "
+                              f"without darshan-parser.")
+                results.append(False)
+                continue
+            source = converted
+        results.append(summarize_trace_file(path, source, top))
+    return all(results)
+
+
+def summarize_trace_file(file_path: str, source, top: int = SUMMARY_TOP_FILES) -> bool:
+    """
+    Summarize one trace and print the report.
+    
+    Args:
+        file_path: Path to the trace, as shown in the report
+        source: The path of a text or columnar trace, or the stream factory of a converted .darshan log
+        top: Number of files listed, by bytes moved
+        
+    Returns:
+        bool: True if the trace was summarized, False otherwise
+    """
+    from ion_cli.columnar import columnar_format, load_trace
+    from ion_cli.summary import MODULE_PREFIXES, summarize, summarize_trace
+    try:
+        if not callable(source) and columnar_format(source):
+            start = time.perf_counter()
+            trace = load_trace(source)
+            opened = time.perf_counter() - start
+            summary = summarize(trace, top=top)
+            summary.parse_seconds = opened
+        elif callable(source):
+            with source() as stream:
+                summary = summarize_trace(stream, top=top)
+        else:
+            summary = summarize_trace(source, top=top)
+    except (OSError, ValueError) as e:
+        console.print(f"[error]Error:[/] Cannot summarize '{file_path}': {str(e)}")
+        return False
+    
+    with profiling.phase('render summary'):
+        print_summary(file_path, summary, list(MODULE_PREFIXES))
+    return True
+
+
+def print_summary(file_path: str, summary, module_names: list) -> None:
+    """
+    Print the module, access pattern and file tables and the findings of a summary.
+    
+    Args:
+        file_path: Path to the summarized trace
+        summary: TraceSummary of the trace
+        module_names: Modules in display order
+    """
+    header = summary.header
+    job = [f"exe: {header.exe}" if header.exe else None,
+           f"{header.nprocs} processes" if header.nprocs else None,
+           f"run time {header.run_time:g} s" if header.run_time else None]
+    console.print(Panel(
+        " | ".join(item for item in job if item) + "\n"
+        f"{summary.rows} counters of {summary.file_count} files, parsed in {summary.parse_seconds:.2f} s "
+        f"and analysed in {summary.analysis_seconds * 1000:.0f} ms",
+        title=f"I/O summary of '{file_path}'",
+        border_style="cyan"
+    ))
+    
+    if not summary.modules:
+        console.print("[warning]The trace has no POSIX, MPI-IO or STDIO records.[/]")
+        return
+    
+    table = Table(title="Modules")
+    table.add_column("Module", style="cyan")
+    table.add_column("Files", justify="right")
+    table.add_column("Read", justify="right")
+    table.add_column("Written", justify="right")
+    table.add_column("Read time", justify="right")
+    table.add_column("Write time", justify="right")
+    table.add_column("Meta time", justify="right")
+    table.add_column("Meta share", justify="right")
+    for stats in summary.modules:
+        table.add_row(
+            stats.name,
+            str(stats.files),
+            format_size(stats.metrics['bytes_read']),
+            format_size(stats.metrics['bytes_written']),
+            f"{stats.metrics['read_time']:.2f} s",
+            f"{stats.metrics['write_time']:.2f} s",
+            f"{stats.metrics['meta_time']:.2f} s",
+            _fraction(stats.meta_time_share)
+        )
+    console.print(table)
+    
+    posix = summary.module('POSIX')
+    if posix is not None and posix.operations:
+        table = Table(title="POSIX access pattern")
+        table.add_column("", style="cyan")
+        table.add_column("Reads", justify="right")
+        table.add_column("Writes", justify="right")
+        table.add_row("Operations", f"{posix.metrics['reads']:.0f}", f"{posix.metrics['writes']:.0f}")
+        table.add_row("Small (< 1 MiB)", _fraction(posix.small_read_fraction), _fraction(posix.small_write_fraction))
+        table.add_row("Sequential", _fraction(posix.sequential_read_fraction),
+                      _fraction(posix.sequential_write_fraction))
+        table.add_row("Consecutive", _fraction(posix.consecutive_read_fraction),
+                      _fraction(posix.consecutive_write_fraction))
+        alignment = f" ({posix.alignment} B)" if posix.alignment else ""
+        table.add_row(f"Misaligned{alignment}", _fraction(posix.misaligned_fraction), "")
+        console.print(table)
+    
+    if summary.files:
+        shown = f"top {len(summary.files)} of {summary.file_count}" if summary.file_count > len(summary.files) \
+            else str(summary.file_count)
+        table = Table(title=f"Files by bytes moved ({shown})")
+        table.add_column("File", style="cyan", overflow="fold")
+        table.add_column("Module")
+        table.add_column("Ranks", justify="right")
+        table.add_column("Read", justify="right")
+        table.add_column("Written", justify="right")
+        table.add_column("Small I/O", justify="right")
+        table.add_column("Misaligned", justify="right")
+        table.add_column("Sequential", justify="right")
+        table.add_column("Imbalance", justify="right")
+        for stats in summary.files:
+            table.add_row(
+                stats.name,
+                stats.module,
+                str(stats.ranks),
+                format_size(stats.metrics['bytes_read']),
+                format_size(stats.metrics['bytes_written']),
+                _fraction(stats.small_fraction),
+                _fraction(stats.misaligned_fraction),
+                _fraction(stats.sequential_fraction),
+                _fraction(stats.time_imbalance)
+            )
+        console.print(table)
+    
+    if summary.findings:
+        console.print("[warning]Possible I/O problems:[/]")
+        for finding in summary.findings:
+            console.print(f"  - {finding}")
+    else:
+        console.print("[success]No I/O problems detected.[/]")
+
+
+def diff_traces(file_paths: list, top: int = SUMMARY_TOP_FILES, convert: bool = True) -> bool:
+    """
+    Compare traces of the same application and print what changed.
+    
+    Args:
+        file_paths: Paths of two or more traces; the first one is the baseline
+        top: Number of changes listed per category
+        convert: Convert .darshan logs with darshan-parser (otherwise they are rejected)
+        
+    Returns:
+        bool: True if the traces were compared, False otherwise
+    """
+    from ion_cli import diff
+    from ion_cli.columnar import columnar_format, load_trace
+    if len(file_paths) < 2:
+        console.print("[error]Error:[/] --diff needs at least two traces.")
+        return False
+    
+    sources = []
+    for path in file_paths:
+        if not validate_file(path):
             return False
-        except Exception as e:
-            console.print(f"[error]Error reading file:[/] '{file_path}': {str(e)}")
+        if path.lower().endswith('.txt'):
+            sources.append(path)
+            continue
+        if columnar_format(path):
+            try:
+                sources.append(load_trace(path))
+            except (OSError, ValueError) as e:
+                console.print(f"[error]Error:[/] Cannot open '{path}': {str(e)}")
+                return False
+            continue
+        converted = convert_for_upload(path, upload=False) if convert else None
+        if converted is None:
+            console.print(f"[error]Error:[/] Cannot compare the binary Darshan log '{path}' without darshan-parser.")
             return False
+        sources.append(converted.read_lines())
     
-    # For .darshan files, we just verify it exists (already checked above)
-    # You might want to add additional validation for .darshan files if there's
-    # a specific format or header you can check
-
+    try:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console
+        ) as progress:
+            task = progress.add_task(f"[info]Comparing {len(file_paths)} traces...[/]", total=None)
+            result = diff.diff_traces(sources, paths=list(file_paths), top=top)
+            progress.update(task, completed=True)
+    except (OSError, ValueError) as e:
+        console.print(f"[error]Error:[/] Cannot compare the traces: {str(e)}")
+        return False
     
+    with profiling.phase('render diff'):
+        print_diff(result)
     return True
 
 
+def _format_amount(kind: str, value: float) -> str:
+    if kind == 'bytes':
+        return format_size(value)
+    if kind == 'time':
+        return f"{value:.2f} s"
+    return f"{value:.0f}"
+
+
+def _format_change(kind: str, value: float, baseline: float) -> str:
+    # A value of a compared trace, with its change against the baseline
+    text = _format_amount(kind, value)
+    if value == baseline:
+        return text
+    if not baseline:
+        return f"{text} [warning](new)[/]"
+    return f"{text} [warning]({(value - baseline) / baseline:+.0%})[/]"
+
+
+def print_diff(result) -> None:
+    """
+    Print the settings, module totals and largest changes of a trace comparison.
+    
+    Args:
+        result: TraceDiff of the compared traces
+    """
+    console.print(Panel(
+        "\n".join(f"{'baseline' if i == 0 else f'trace {i + 1}'}: {path} ({rows} counters)"
+                  for i, (path, rows) in enumerate(zip(result.paths, result.rows))) + "\n"
+        f"{result.aligned} counters of {result.files} files aligned; parsed in {result.parse_seconds:.2f} s "
+        f"and compared in {result.analysis_seconds * 1000:.0f} ms",
+        title=f"Comparison of {len(result.paths)} traces",
+        border_style="cyan"
+    ))
+    
+    if result.settings:
+        table = Table(title="Settings that differ")
+        table.add_column("Setting", style="cyan")
+        for label in result.labels:
+            table.add_column(label)
+        for name, values in result.settings:
+            table.add_row(name, *[value if value is not None else "-" for value in values])
+        console.print(table)
+    
+    table = Table(title="Totals")
+    table.add_column("Module", style="cyan")
+    table.add_column("Measure")
+    for label in result.labels:
+        table.add_column(label, justify="right")
+    for total in result.totals:
+        table.add_row(total.module, total.kind, *[
+            _format_change(total.kind, value, total.values[0]) for value in total.values
+        ])
+    console.print(table)
+    
+    changed = False
+    for kind, changes in result.changes.items():
+        if not changes:
+            continue
+        changed = True
+        table = Table(title=f"Largest changes in {kind}")
+        table.add_column("File", style="cyan", overflow="fold")
+        table.add_column("Counter")
+        for label in result.labels:
+            table.add_column(label, justify="right")
+        for change in changes:
+            table.add_row(change.file, change.counter, *[
+                _format_change(kind, value, change.values[0]) for value in change.values
+            ])
+        console.print(table)
+    if not changed:
+        console.print("[success]No differences in bytes, time or operation counts.[/]")
+
+
 def validate_email(email: str) -> bool:
     """
     Simple validation for email format.
@@ -99,30 +542,406 @@ def validate_email(email: str) -> bool:
     return True
 
 
-def upload_file(file_path: str, user_id: str) -> bool:
+def format_size(num_bytes: float) -> str:
+    """
+    Format a byte count for display.
+    
+    Args:
+        num_bytes: Number of bytes
+        
+    Returns:
+        str: Human readable size, e.g. '1.5 MiB'
+    """
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(num_bytes) < 1024 or unit == 'GiB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+def find_previous_upload(file_path: str, user_id: str):
+    """
+    Hash the file and look its content up in the local upload ledger.
+    
+    Args:
+        file_path: Path to the file to upload
+        user_id: User's ID
+        
+    Returns:
+        tuple: (content hash, LedgerEntry of a previous upload or None); the
+        hash is None if the file or the ledger cannot be read
+    """
+    import sqlite3
+    from ion_cli.ledger import UploadLedger
+    try:
+        with UploadLedger() as ledger:
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                console=console
+            ) as progress:
+                task = progress.add_task("[info]Hashing file...[/]", total=None)
+                content_hash = ledger.content_hash(file_path)
+                progress.update(task, completed=True)
+            return content_hash, ledger.lookup(content_hash, DEFAULT_API_ENDPOINT, user_id)
+    except (OSError, sqlite3.Error):
+        return None, None
+
+
+def record_upload(file_path: str, user_id: str, content_hash: Optional[str]) -> None:
+    """
+    Remember a successful upload in the local ledger (best effort).
+    
+    Args:
+        file_path: Path to the uploaded file
+        user_id: User's ID
+        content_hash: Hash returned by find_previous_upload
+    """
+    import sqlite3
+    from ion_cli.ledger import UploadLedger
+    from ion_cli.traces import invalidate_user_traces
+    invalidate_user_traces(user_id, api_client().endpoint)
+    if not content_hash:
+        return
+    file_name = os.path.basename(file_path)
+    try:
+        with UploadLedger() as ledger:
+            ledger.record(content_hash, DEFAULT_API_ENDPOINT, user_id, os.path.splitext(file_name)[0],
+                          file_name, os.path.getsize(file_path))
+    except (OSError, sqlite3.Error):
+        pass
+
+
+def upload_file_chunked(file_path: str, user_id: str, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                        compression: Optional[str] = None, open_stream=None,
+                        total_size: Optional[int] = None, content_hash: Optional[str] = None,
+                        upload_name: Optional[str] = None) -> bool:
+    """
+    Upload the file in fixed-size parts, resuming from the last acknowledged offset on failure.
+    
+    Args:
+        file_path: Path to the file to upload
+        user_id: User's ID
+        chunk_size: Number of bytes sent per request
+        compression: Content encoding applied to each part ('gzip' or 'zstd'), or None
+        open_stream: Factory for the bytes to send in place of the file (e.g. a reduced trace)
+        total_size: Size of the stream produced by open_stream
+        content_hash: Content hash recorded in the upload ledger on success
+        upload_name: File name sent to the server, if not the file's own name
+        
+    Returns:
+        bool: True if upload was successful, False otherwise
+    """
+    import requests
+    from ion_cli.upload import TraceExistsError, UploadError, chunked_upload
+    file_name = os.path.basename(file_path)
+    try:
+        # Show real byte progress and throughput during upload
+        with Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            DownloadColumn(),
+            TransferSpeedColumn(),
+            TimeRemainingColumn(),
+            console=console
+        ) as progress:
+            if open_stream is None:
+                total_size = os.path.getsize(file_path)
+            task = progress.add_task("[info]Uploading file...[/]", total=total_size)
+            client = api_client()
+            upload = chunked_upload(
+                file_path,
+                user_id,
+                chunk_size=chunk_size,
+                encoding=compression or 'identity',
+                on_progress=lambda offset: progress.update(task, completed=offset),
+                open_stream=open_stream,
+                total_size=total_size,
+                file_name=upload_name,
+                session=client.session,
+                endpoint=client.endpoint
+            )
+            
+    except TraceExistsError:
+        console.print(Panel(f"[warning]File '{file_name}' already exists.[/]", 
+                            title="Warning", border_style="yellow"))
+        return True
+    except (UploadError, OSError, requests.RequestException) as e:
+        console.print(Panel(f"[error]Error uploading file:[/] {str(e)}", 
+                           title="Error", border_style="red"))
+        return False
+    
+    message = f"[success]File '{file_name}' successfully uploaded.[/]"
+    if compression:
+        if upload.encoding == 'identity':
+            message += f"\n[warning]Server does not accept {compression}; sent uncompressed.[/]"
+        elif upload.sent_bytes:
+            message += (f"\nSent {format_size(upload.sent_bytes)} ({upload.encoding}) for "
+                        f"{format_size(upload.raw_bytes)} of trace data "
+                        f"({upload.raw_bytes / upload.sent_bytes:.1f}x smaller)")
+    console.print(Panel(message, title="Success", border_style="green"))
+    record_upload(file_path, user_id, content_hash)
+    return True
+
+
+def upload_file_sharded(file_path: str, user_id: str, mode: str, rank_groups: int = UPLOAD_SHARD_RANKS,
+                        concurrency: int = UPLOAD_CONCURRENCY, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                        compression: Optional[str] = None, content_hash: Optional[str] = None) -> bool:
+    """
+    Split a text trace into module/rank shards, upload them in parallel and register them as one trace.
+    
+    Args:
+        file_path: Path to the .txt trace
+        user_id: User's ID
+        mode: How the trace is split ('module', 'rank' or 'module+rank')
+        rank_groups: Number of rank ranges when splitting by rank
+        concurrency: Number of shards sent at the same time
+        chunk_size: Number of bytes sent per request
+        compression: Content encoding applied to each part ('gzip' or 'zstd'), or None
+        content_hash: Content hash from find_previous_upload; the server checks the reassembled trace against it
+        
+    Returns:
+        bool: True if upload was successful, False otherwise
+    """
+    import requests
+    from ion_cli.shard import ShardedUpload, plan_shards
+    from ion_cli.upload import TraceExistsError, UploadError
+    file_name = os.path.basename(file_path)
+    try:
+        plan = plan_shards(file_path, mode, rank_groups)
+        if content_hash is None:
+            from ion_cli.ledger import hash_file
+            content_hash = hash_file(file_path)
+        with Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            DownloadColumn(),
+            TransferSpeedColumn(),
+            TimeRemainingColumn(),
+            console=console
+        ) as progress:
+            task = progress.add_task(f"[info]Uploading {len(plan.shards)} shards...[/]",
+                                     total=sum(shard.size for shard in plan.shards))
+            client = api_client()
+            upload = ShardedUpload(
+                user_id,
+                plan,
+                content_hash,
+                concurrency=concurrency,
+                chunk_size=chunk_size,
+                encoding=compression or 'identity',
+                endpoint=client.endpoint,
+                session=client.session,
+                on_bytes=lambda count: progress.update(task, advance=count)
+            )
+            upload.run()
+    except TraceExistsError:
+        console.print(Panel(f"[warning]File '{file_name}' already exists.[/]", 
+                            title="Warning", border_style="yellow"))
+        return True
+    except (UploadError, OSError, requests.RequestException) as e:
+        console.print(Panel(f"[error]Error uploading file:[/] {str(e)}", 
+                           title="Error", border_style="red"))
+        return False
+    
+    table = Table(title=f"Shards of {file_name}")
+    table.add_column("Shard", style="cyan")
+    table.add_column("Module")
+    table.add_column("Ranks")
+    table.add_column("Size", justify="right")
+    for shard in plan.shards:
+        ranks = f"{shard.ranks[0]}-{shard.ranks[1]}" if shard.ranks else "all"
+        table.add_row(shard.name, shard.module or "all", ranks, format_size(shard.size))
+    console.print(table)
+    console.print(Panel(f"[success]File '{file_name}' successfully uploaded as {len(plan.shards)} shards.[/]",
+                        title="Success", border_style="green"))
+    record_upload(file_path, user_id, content_hash)
+    return True
+
+
+def convert_for_upload(file_path: str, upload: bool = True):
+    """
+    Prepare the streaming conversion of a .darshan log to text with darshan-parser.
+    
+    Args:
+        file_path: Path to the .darshan log
+        upload: Whether the log is being uploaded, in which case a missing
+            darshan-parser means the binary log is sent as is; local commands
+            report the missing parser themselves
+        
+    Returns:
+        Stream factory for the text trace, or None if darshan-parser is not installed
+    """
+    from ion_cli.convert import find_darshan_parser, open_darshan_stream
+    parser = find_darshan_parser()
+    if not parser:
+        if upload:
+            console.print("[info]darshan-parser not found; uploading the binary log as is.[/]")
+        return None
+    console.print(f"[info]Converting to text with[/] {parser}")
+    return open_darshan_stream(file_path, parser)
+
+
+def collapse_for_upload(file_path: str, converted=None):
+    """
+    Prepare the rank-collapsed form of a text trace and report the size reduction.
+    
+    Args:
+        file_path: Path to the trace
+        converted: Stream factory returned by convert_for_upload for a .darshan log
+        
+    Returns:
+        Stream factory for the collapsed trace, or None if the file cannot be collapsed
+    """
+    from ion_cli.collapse import open_collapsed_stream
+    if converted is None and os.path.splitext(file_path)[1].lower() != '.txt':
+        console.print(f"[warning]Warning:[/] Only .txt traces can be collapsed; uploading '{file_path}' as is.")
+        return None
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console
+    ) as progress:
+        task = progress.add_task("[info]Collapsing ranks...[/]", total=None)
+        open_stream = open_collapsed_stream(file_path, read_lines=converted.read_lines if converted else None)
+        progress.update(task, completed=True)
+    
+    plan = open_stream.plan
+    saved = 1 - plan.output_bytes / plan.input_bytes if plan.input_bytes else 0
+    console.print(
+        f"[info]Collapsed ranks:[/] {format_size(plan.input_bytes)} -> {format_size(plan.output_bytes)} "
+        f"({saved:.0%} smaller; merged {plan.records} per-rank records of {plan.files} files "
+        f"into shared records, up to {plan.max_ranks} ranks each)"
+    )
+    return open_stream
+
+
+def reduce_for_upload(file_path: str, converted=None):
+    """
+    Prepare the reduced form of a text trace and report the size reduction.
+    
+    Args:
+        file_path: Path to the trace
+        converted: Stream factory returned by convert_for_upload for a .darshan log,
+            or by collapse_for_upload
+        
+    Returns:
+        Stream factory for the reduced trace, or None if the file cannot be reduced
+    """
+    from ion_cli.reduce import open_reduced_stream
+    if converted is None and os.path.splitext(file_path)[1].lower() != '.txt':
+        console.print(f"[warning]Warning:[/] Only .txt traces can be reduced; uploading '{file_path}' as is.")
+        return None
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console
+    ) as progress:
+        task = progress.add_task("[info]Reducing trace...[/]", total=None)
+        open_stream = open_reduced_stream(file_path, read_lines=converted.read_lines if converted else None)
+        progress.update(task, completed=True)
+    
+    plan = open_stream.plan
+    saved = 1 - plan.output_bytes / plan.input_bytes if plan.input_bytes else 0
+    console.print(
+        f"[info]Reduced trace:[/] {format_size(plan.input_bytes)} -> {format_size(plan.output_bytes)} "
+        f"({saved:.0%} smaller; omitted {plan.dropped_counters} zero/unmonitored counters "
+        f"and {plan.dropped_mounts} unused mount entries)"
+    )
+    return open_stream
+
+
+def upload_file(file_path: str, user_id: str, chunked: bool = False, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                compression: Optional[str] = None, reduce: bool = False, force: bool = False,
+                convert: bool = True, shard: Optional[str] = None, shard_ranks: int = UPLOAD_SHARD_RANKS,
+                concurrency: int = UPLOAD_CONCURRENCY, collapse_ranks: bool = False) -> bool:
     """
     Upload the file to the public endpoint.
     
     Args:
         file_path: Path to the file to upload
         user_id: User's ID
+        chunked: Stream the file in resumable fixed-size parts
+        chunk_size: Number of bytes sent per request in chunked mode
+        compression: Compress parts on the fly ('gzip' or 'zstd'); implies chunked mode
+        reduce: Drop zero/unmonitored counters and unused mount entries before sending
+        force: Upload even if the ledger shows identical content was uploaded before
+        convert: Send a .darshan log as text if darshan-parser is installed
+        shard: Split a .txt trace into shards by 'module', 'rank' or 'module+rank' and upload them in parallel
+        shard_ranks: Number of rank ranges when sharding by rank
+        concurrency: Number of shards sent at the same time
+        collapse_ranks: Merge the per-rank records of each file into one shared record before sending
         
     Returns:
         bool: True if upload was successful, False otherwise
     """
+    from ion_cli.columnar import columnar_format, open_text_stream
+    from ion_cli.convert import is_darshan_log, text_file_name
+    from ion_cli.upload import UploadError, multipart_upload
+    # Identical content is caught locally, before any bytes are sent
+    content_hash, previous = find_previous_upload(file_path, user_id)
+    if previous and not force:
+        console.print(Panel(
+            f"[warning]Identical content was already uploaded as trace '{previous.trace_name}' "
+            f"(from '{previous.file_name}' on {previous.uploaded_date}); skipping.[/]\n"
+            "Use [bold]--force[/] to upload it again.",
+            title="Already Uploaded",
+            border_style="yellow"
+        ))
+        return True
+    
+    if shard:
+        # Shards are byte ranges of the file on disk, so only unmodified text traces can be split
+        if reduce or collapse_ranks or os.path.splitext(file_path)[1].lower() != '.txt':
+            console.print(f"[warning]Warning:[/] Only unreduced, uncollapsed .txt traces can be sharded; "
+                          f"uploading '{file_path}' as one trace.")
+        else:
+            return upload_file_sharded(file_path, user_id, shard, shard_ranks, concurrency, chunk_size,
+                                       compression, content_hash)
+    
+    open_stream = None
+    upload_name = os.path.basename(file_path)
+    if convert and is_darshan_log(file_path):
+        # darshan-parser output is streamed into the upload, without a temporary file
+        open_stream = convert_for_upload(file_path)
+        if open_stream:
+            upload_name = text_file_name(file_path)
+    elif columnar_format(file_path):
+        # The server takes text traces, so columnar ones are rendered back to text on the fly
+        open_stream = open_text_stream(file_path)
+        upload_name = text_file_name(file_path)
+    
+    total_size = None
+    if collapse_ranks:
+        try:
+            collapsed = collapse_for_upload(file_path, open_stream)
+        except (OSError, UnicodeDecodeError, ValueError, UploadError) as e:
+            console.print(Panel(f"[error]Error collapsing ranks:[/] {str(e)}", 
+                               title="Error", border_style="red"))
+            return False
+        if collapsed:
+            open_stream = collapsed
+            total_size = collapsed.plan.output_bytes
+    
+    if reduce:
+        try:
+            reduced = reduce_for_upload(file_path, open_stream)
+        except (OSError, UnicodeDecodeError, ValueError, UploadError) as e:
+            console.print(Panel(f"[error]Error reducing file:[/] {str(e)}", 
+                               title="Error", border_style="red"))
+            return False
+        if reduced:
+            open_stream = reduced
+            total_size = reduced.plan.output_bytes
+    
+    if chunked or compression:
+        return upload_file_chunked(file_path, user_id, chunk_size, compression, open_stream, total_size,
+                                   content_hash, upload_name)
     
     try:
-        # Open the file in binary mode
-        with open(file_path, 'rb') as file:
-            # Create a multipart form-data request
-            files = {
-                'file': (os.path.basename(file_path), file, 'text/plain')
-            }
-            
-            form_data = {
-                'user_id': user_id
-            }
-            
+        # Open the file (or its reduced form) in binary mode
+        with (open_stream() if open_stream else open(file_path, 'rb')) as file:
             # Show a spinner during upload
             with Progress(
                 SpinnerColumn(),
@@ -130,11 +949,9 @@ def upload_file(file_path: str, user_id: str) -> bool:
                 console=console
             ) as progress:
                 task = progress.add_task("[info]Uploading file...[/]", total=None)
-                response = requests.post(
-                    f"{DEFAULT_API_ENDPOINT}/api/upload_trace", 
-                    files=files,
-                    data=form_data
-                )
+                client = api_client()
+                response = multipart_upload(upload_name, file, user_id,
+                                            session=client.session, endpoint=client.endpoint)
                 progress.update(task, completed=True)
 
         if response.status_code == 400 and "already exists" in response.text:
@@ -145,6 +962,7 @@ def upload_file(file_path: str, user_id: str) -> bool:
         if response.status_code == 200:
             console.print(Panel(f"[success]File '{os.path.basename(file_path)}' successfully uploaded.[/]", 
                                title="Success", border_style="green"))
+            record_upload(file_path, user_id, content_hash)
             return True
         else:
             console.print(Panel(f"[error]Error uploading file:[/] {response.text}", 
@@ -157,6 +975,117 @@ def upload_file(file_path: str, user_id: str) -> bool:
         return False
     
 
+def upload_files(patterns: list, user_id: str, concurrency: int = UPLOAD_CONCURRENCY, chunked: bool = False,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE, compression: Optional[str] = None,
+                 reduce: bool = False, force: bool = False, convert: bool = True, check: bool = False,
+                 collapse_ranks: bool = False) -> bool:
+    """
+    Upload many files, directories and glob patterns in parallel.
+    
+    Args:
+        patterns: Paths, directories or glob patterns to upload
+        user_id: User's ID
+        concurrency: Number of files uploaded at the same time
+        chunked: Stream each file in resumable fixed-size parts
+        chunk_size: Number of bytes sent per request in chunked mode
+        compression: Compress parts on the fly ('gzip' or 'zstd'); implies chunked mode
+        reduce: Drop zero/unmonitored counters and unused mount entries before sending
+        force: Upload even if the ledger shows identical content was uploaded before
+        convert: Send .darshan logs as text if darshan-parser is installed; the
+            conversions of different files run in parallel
+        check: Check every line of .txt traces first and skip malformed ones
+        collapse_ranks: Merge the per-rank records of each file into one shared record before sending
+        
+    Returns:
+        bool: True if every file was uploaded or skipped, False otherwise
+    """
+    from ion_cli.batch import EXISTS, FAILED, INVALID, SKIPPED, UPLOADED, BatchUploader, expand_upload_paths
+    paths = expand_upload_paths(patterns)
+    if not paths:
+        console.print("[warning]No trace files matched.[/]")
+        return False
+    
+    lock = threading.Lock()
+    counts = {'sent': 0, 'failed': 0}
+    start = time.perf_counter()
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("{task.completed:.0f}/{task.total:.0f} files"),
+        TextColumn("{task.fields[sent]} at {task.fields[rate]}/s"),
+        TextColumn("[error]{task.fields[failed]} failed[/]"),
+        TimeElapsedColumn(),
+        console=console
+    ) as progress:
+        task = progress.add_task("[info]Uploading files...[/]", total=len(paths),
+                                 sent=format_size(0), rate=format_size(0), failed=0)
+        
+        def on_bytes(count):
+            with lock:
+                counts['sent'] += count
+                elapsed = max(time.perf_counter() - start, 1e-6)
+                progress.update(task, sent=format_size(counts['sent']),
+                                rate=format_size(counts['sent'] / elapsed))
+        
+        def on_result(result):
+            with lock:
+                if not result.ok:
+                    counts['failed'] += 1
+                progress.update(task, advance=1, failed=counts['failed'])
+        
+        uploader = BatchUploader(
+            user_id,
+            concurrency=concurrency,
+            chunked=chunked,
+            chunk_size=chunk_size,
+            compression=compression,
+            reduce=reduce,
+            force=force,
+            convert=convert,
+            check=check,
+            collapse_ranks=collapse_ranks,
+            endpoint=DEFAULT_API_ENDPOINT,
+            on_bytes=on_bytes,
+            on_result=on_result
+        )
+        results = uploader.run(paths)
+    
+    # Per-file summary
+    table = Table(title="Upload Summary")
+    table.add_column("File", style="cyan")
+    table.add_column("Status")
+    table.add_column("Size", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Details", style="dim")
+    status_style = {
+        UPLOADED: "[green]Uploaded[/]",
+        SKIPPED: "[yellow]Skipped[/]",
+        EXISTS: "[yellow]Already Exists[/]",
+        INVALID: "[red]Invalid[/]",
+        FAILED: "[red]Failed[/]",
+    }
+    for result in results:
+        table.add_row(
+            result.path,
+            status_style.get(result.status, result.status),
+            format_size(result.size),
+            f"{result.seconds:.1f}s",
+            result.message
+        )
+    console.print(table)
+    
+    failed = sum(1 for result in results if not result.ok)
+    uploaded = sum(1 for result in results if result.status == UPLOADED)
+    summary = f"{uploaded} uploaded, {len(results) - uploaded - failed} skipped, {failed} failed"
+    if failed:
+        console.print(Panel(f"[error]{summary}[/]", title="Batch Upload", border_style="red"))
+        return False
+    console.print(Panel(f"[success]{summary}[/]", title="Batch Upload", border_style="green"))
+    return True
+
+
 def list_user_traces(user_id: str) -> bool:
     """
     List all traces uploaded by the user.
@@ -167,31 +1096,28 @@ def list_user_traces(user_id: str) -> bool:
     Returns:
         bool: True if listing was successful, False otherwise
     """
+    from ion_cli.client import IONError
     try:
-        # Prepare the request payload
-        payload = {
-            'user_id': user_id
-        }
-        
-        # Show a spinner during the request
+        # Show a spinner during the request; an unchanged list is answered from the local cache
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             console=console
         ) as progress:
             task = progress.add_task("[info]Fetching your traces...[/]", total=None)
-            response = requests.post(f"{DEFAULT_API_ENDPOINT}/api/user_traces", json=payload)
+            try:
+                traces = ion_client(user_id).traces()
+            except IONError as e:
+                traces = None
+                error_msg = str(e)
             progress.update(task, completed=True)
         
-        if response.status_code == 200:
-            traces = response.json()
-            
+        if traces is not None:
             if not traces:
                 console.print("[info]You haven't uploaded any traces yet.[/]")
                 return True
             
             # Create a table to display the traces
-            from rich.table import Table
             table = Table(title="Your Uploaded Traces")
             
             # Add columns
@@ -208,21 +1134,20 @@ def list_user_traces(user_id: str) -> bool:
                     "in_progress": "[yellow]In Progress[/]",
                     "not_started": "[grey]Not Started[/]",
                     "failed": "[red]Failed[/]"
-                }.get(trace.get('status', 'not_started'), trace.get('status', 'not_started'))
+                }.get(trace.status, trace.status)
                 
                 table.add_row(
-                    trace.get('trace_name', 'Unknown'),
-                    trace.get('trace_description', 'No description'),
-                    trace.get('upload_date', 'Unknown'),
+                    trace.trace_name,
+                    trace.description or 'No description',
+                    trace.upload_date or 'Unknown',
                     status_style,
-                    trace.get('model', 'gpt-4o')
+                    trace.model or 'gpt-4o'
                 )
             
             # Print the table
             console.print(table)
             return True
         else:
-            error_msg = response.json().get('error', 'Unknown error')
             console.print(Panel(f"[error]Error listing traces:[/] {error_msg}", 
                                title="Error", border_style="red"))
             return False
@@ -237,7 +1162,10 @@ def check_user_verified(user_email: str = None) -> str:
     """
     Check if the user is verified.
     If user_email is not provided, check environment variable ION_USER_EMAIL.
+    A previous verification is reused from the user cache until it expires.
     """
+    from ion_cli.client import IONError
+    from ion_cli.user_cache import UserCache
     if not user_email:
         user_email = os.environ.get("ION_USER_EMAIL")
         if not user_email:
@@ -257,10 +1185,13 @@ def check_user_verified(user_email: str = None) -> str:
         os.environ["ION_USER_EMAIL"] = user_email
         console.print(f"[info]Setting user email environment variable:[/] {user_email}")
 
-    request_body = {
-        "email": user_email
-    }
-    
+    client = api_client()
+    user_cache = UserCache()
+    user_id = user_cache.get(client.endpoint, user_email)
+    if user_id:
+        console.print(f"[success]User verified:[/] {user_email} [dim](cached)[/]")
+        return user_id
+
     # Show a spinner during verification
     with Progress(
         SpinnerColumn(),
@@ -268,11 +1199,19 @@ def check_user_verified(user_email: str = None) -> str:
         console=console
     ) as progress:
         task = progress.add_task("[info]Verifying user...[/]", total=None)
-        response = requests.post(f"{DEFAULT_API_ENDPOINT}/api/user", json=request_body)
+        try:
+            user_id = ion_client().verify(user_email, use_cache=False)
+        except IONError as e:
+            user_id = None
+            error_msg = str(e)
+        else:
+            error_msg = None
         progress.update(task, completed=True)
-    
-    result = response.json()
-    user_id = result.get("user_id")
+
+    if error_msg:
+        console.print(Panel(f"[error]Error verifying user:[/] {error_msg}",
+                           title="Error", border_style="red"))
+        return None
 
     if user_id:
         console.print(f"[success]User verified:[/] {user_email}")
@@ -290,19 +1229,43 @@ def check_user_verified(user_email: str = None) -> str:
 
 
 
-def get_trace_status(trace_name: str, user_id: str) -> str:
+def get_trace_status(trace_name: str, user_id: str, max_age: float = TRACE_STATUS_MAX_AGE) -> str:
     """
     Get the status of a specific trace.
+    Uses the trace index shared by all commands of this process; when it has to be
+    built, the trace list is taken from the local cache if it is at most max_age seconds old.
     """
-    payload = {
-        "user_id": user_id
-    }
-    response = requests.post(f"{DEFAULT_API_ENDPOINT}/api/user_traces", json=payload)
-    traces = response.json()
-    for trace in traces:
-        if trace["trace_name"] == trace_name:
-            return trace["status"]
-    return None
+    return ion_client(user_id).status(trace_name, max_age=max_age)
+
+
+def resolve_trace_names(pattern: str, user_id: str) -> list:
+    """
+    Expand a trace name or glob pattern (e.g. 'amrex*') into trace names.
+    
+    Args:
+        pattern: Trace name or pattern using *, ? and [...]
+        user_id: User's ID
+        
+    Returns:
+        list: Matching trace names; a plain name is returned as given
+    """
+    from ion_cli.client import IONError
+    from ion_cli.traces import has_wildcards
+    if not has_wildcards(pattern):
+        return [pattern]
+    try:
+        names = ion_client(user_id).match(pattern)
+    except IONError as e:
+        console.print(Panel(f"[error]Error listing traces:[/] {str(e)}", 
+                           title="Error", border_style="red"))
+        return []
+    if not names:
+        console.print(Panel(
+            f"[error]Error:[/] No traces match '{pattern}'.",
+            title="Error",
+            border_style="red"
+        ))
+    return names
 
 def check_trace_name_valid(trace_name: str, user_id: str) -> bool:
     """
@@ -339,6 +1302,7 @@ def launch_analysis(trace_id: str, user_id: str, llm: str) -> bool:
     Returns:
         bool: True if analysis was successfully launched, False otherwise
     """
+    from ion_cli.client import IONError
     try:
         if not check_trace_name_valid(trace_id, user_id):
             console.print(Panel(
@@ -347,13 +1311,6 @@ def launch_analysis(trace_id: str, user_id: str, llm: str) -> bool:
                 border_style="red"
             ))
             return False
-        # Prepare the request payload
-        payload = {
-            'user_id': user_id,
-            'trace_name': trace_id,
-            'llm': llm
-        }
-        
         # Show a spinner during the request
         with Progress(
             SpinnerColumn(),
@@ -361,15 +1318,17 @@ def launch_analysis(trace_id: str, user_id: str, llm: str) -> bool:
             console=console
         ) as progress:
             task = progress.add_task("[info]Launching analysis...[/]", total=None)
-            response = requests.post(f"{DEFAULT_API_ENDPOINT}/api/run_analysis", json=payload)
+            try:
+                analysis = ion_client(user_id).run_analysis(trace_id, llm)
+                error_msg = None
+            except IONError as e:
+                error_msg = str(e)
             progress.update(task, completed=True)
         
-        if response.status_code == 202:
-            result = response.json()
-            task_id = result.get('task_id')
+        if error_msg is None:
             console.print(Panel(
                 f"[success]Analysis task submitted successfully![/]\n"
-                f"Task ID: {task_id}\n"
+                f"Task ID: {analysis.task_id}\n"
                 f"Trace: {trace_id}\n"
                 f"Model: {llm}",
                 title="Analysis Launched",
@@ -377,7 +1336,6 @@ def launch_analysis(trace_id: str, user_id: str, llm: str) -> bool:
             ))
             return True
         else:
-            error_msg = response.json().get('error', 'Unknown error')
             console.print(Panel(
                 f"[error]Error launching analysis:[/] {error_msg}",
                 title="Error",
@@ -392,53 +1350,215 @@ def launch_analysis(trace_id: str, user_id: str, llm: str) -> bool:
             border_style="red"
         ))
         return False
-    
 
-def view_trace_diagnosis(trace_name: str, user_id: str, verbose: bool = False) -> bool:
+
+def launch_analyses(trace_names: list, user_id: str, models: list, concurrency: int = LAUNCH_CONCURRENCY,
+                    rate: float = LAUNCH_RATE, launched: Optional[list] = None) -> bool:
     """
-    View the final diagnosis for a specific trace.
+    Launch analyses for many traces, and optionally several models, concurrently.
     
     Args:
-        trace_name: Name of the trace to view diagnosis for
+        trace_names: Names of the traces to analyze
         user_id: User's ID
+        models: Language models to run on every trace
+        concurrency: Number of launch requests in flight at the same time
+        rate: Maximum number of launch requests per second
+        launched: If given, the names of the traces with a launched analysis are appended to it
         
     Returns:
-        bool: True if viewing was successful, False otherwise
+        bool: True if every analysis was launched, False otherwise
     """
+    import requests
+    from ion_cli.launch import BUSY, LAUNCHED, NOT_FOUND, RATE_LIMITED, BatchLauncher
+    from ion_cli.traces import TraceListError
+    lock = threading.Lock()
+    counts = {'failed': 0}
+    
     try:
-        # First check if the trace status is valid for viewing
-        status = get_trace_status(trace_name, user_id)
-        if status not in VALID_STATUS_FOR_VIEW:
-            console.print(Panel(
-                f"[error]Error:[/] Trace '{trace_name}' is not ready for viewing. Current status: {status}",
-                title="Error",
-                border_style="red"
-            ))
-            return False
-        
-        # Prepare the request payload
-        payload = {
-            'user_id': user_id
-        }
-        
-        # Show a spinner during the request
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.completed:.0f}/{task.total:.0f} analyses"),
+            TextColumn("[error]{task.fields[failed]} failed[/]"),
+            TimeElapsedColumn(),
             console=console
         ) as progress:
-            task = progress.add_task("[info]Fetching diagnosis...[/]", total=None)
-            response = requests.post(f"{DEFAULT_API_ENDPOINT}/api/trace_examples/{trace_name}/final_diagnosis", json=payload)
-            progress.update(task, completed=True)
+            task = progress.add_task("[info]Launching analyses...[/]",
+                                     total=len(set(trace_names)) * len(models), failed=0)
+            
+            def on_result(result):
+                with lock:
+                    if not result.ok:
+                        counts['failed'] += 1
+                    progress.update(task, advance=1, failed=counts['failed'])
+            
+            launcher = BatchLauncher(
+                user_id,
+                concurrency=concurrency,
+                rate=rate,
+                endpoint=api_client().endpoint,
+                on_result=on_result
+            )
+            results = launcher.run(trace_names, models)
+    except (TraceListError, requests.RequestException) as e:
+        console.print(Panel(f"[error]Error launching analyses:[/] {str(e)}", 
+                           title="Error", border_style="red"))
+        return False
+    
+    table = Table(title="Launched Analyses")
+    table.add_column("Trace Name", style="cyan")
+    table.add_column("Model", style="blue")
+    table.add_column("Status")
+    table.add_column("Task ID", style="green")
+    table.add_column("Details", style="dim")
+    status_style = {
+        LAUNCHED: "[green]Launched[/]",
+        NOT_FOUND: "[red]Not Found[/]",
+        BUSY: "[yellow]Busy[/]",
+        RATE_LIMITED: "[red]Rate Limited[/]",
+    }
+    for result in results:
+        table.add_row(
+            result.trace_name,
+            result.model,
+            status_style.get(result.status, "[red]Failed[/]"),
+            result.task_id or "",
+            result.message
+        )
+    console.print(table)
+    
+    if launched is not None:
+        launched.extend(dict.fromkeys(result.trace_name for result in results if result.ok))
+    launched_count = sum(1 for result in results if result.ok)
+    summary = f"{launched_count} launched, {len(results) - launched_count} failed"
+    if launched_count < len(results):
+        console.print(Panel(f"[error]{summary}[/]", title="Batch Analysis", border_style="red"))
+        return False
+    console.print(Panel(f"[success]{summary}[/]", title="Batch Analysis", border_style="green"))
+    return True
+    
+
+def watch_traces(trace_names: list, user_id: str, terminal: list = VALID_TASK_STATUSES,
+                 timeout: Optional[float] = None, show_diagnosis: bool = False, verbose: bool = False) -> bool:
+    """
+    Track traces in a live table until their analyses are done.
+    
+    Args:
+        trace_names: Names of the traces to watch
+        user_id: User's ID
+        terminal: Statuses in which a trace counts as done
+        timeout: Maximum number of seconds to wait, or None to wait indefinitely
+        show_diagnosis: Show the diagnosis of every trace that completed
+        verbose: Include the sources when showing diagnoses
         
-        if response.status_code == 200:
-            result = response.json()
-            diagnosis = result.get('trace_diagnosis', {})
-            content = diagnosis.get('content', 'No diagnosis content available')
-            sources = diagnosis.get('sources', [])
+    Returns:
+        bool: True if every trace completed before the timeout, False otherwise
+    """
+    import requests
+    from ion_cli.traces import TraceListError
+    from ion_cli.watch import MISSING, TraceWatcher
+    status_style = {
+        "completed": "[green]Completed[/]",
+        "in_progress": "[yellow]In Progress[/]",
+        "not_started": "[grey]Not Started[/]",
+        "failed": "[red]Failed[/]",
+        MISSING: "[red]Not Found[/]",
+    }
+    
+    def render(watcher):
+        now = time.monotonic()
+        table = Table(title="Watching Analyses")
+        table.add_column("Trace Name", style="cyan")
+        table.add_column("Status")
+        table.add_column("Since", justify="right", style="dim")
+        for name in watcher.trace_names:
+            status = watcher.statuses.get(name)
+            since = f"{now - watcher.changed_at[name]:.0f}s" if name in watcher.changed_at else ""
+            table.add_row(name, status_style.get(status, status or "..."), since)
+        done = len(watcher.trace_names) - len(watcher.pending())
+        table.caption = (f"{done}/{len(watcher.trace_names)} done, "
+                         f"next check in {max(0.0, watcher.next_poll - now):.0f}s")
+        return table
+    
+    watcher = TraceWatcher(user_id, trace_names, terminal=terminal, client=api_client())
+    try:
+        with Live(render(watcher), console=console, refresh_per_second=2) as live:
+            watcher.on_tick = lambda w: live.update(render(w))
+            finished = watcher.run(timeout=timeout)
+            live.update(render(watcher))
+    except (TraceListError, requests.RequestException) as e:
+        console.print(Panel(f"[error]Error watching traces:[/] {str(e)}", 
+                           title="Error", border_style="red"))
+        return False
+    except KeyboardInterrupt:
+        console.print("[info]Stopped watching.[/]")
+        return False
+    
+    completed = [name for name in watcher.trace_names if watcher.statuses.get(name) == "completed"]
+    if show_diagnosis:
+        for name in completed:
+            view_trace_diagnosis(name, user_id, verbose)
+    
+    if not finished:
+        console.print(Panel(
+            f"[warning]Timed out with {len(watcher.pending())} of {len(watcher.trace_names)} traces still running.[/]",
+            title="Timeout",
+            border_style="yellow"
+        ))
+        return False
+    return all(watcher.statuses.get(name) not in ("failed", MISSING) for name in watcher.trace_names)
+
+
+def view_trace_diagnosis(trace_name: str, user_id: str, verbose: bool = False, refresh: bool = False) -> bool:
+    """
+    View the final diagnosis for a specific trace.
+    Completed diagnoses are shown from the local cache when available, also offline.
+    
+    Args:
+        trace_name: Name of the trace to view diagnosis for
+        user_id: User's ID
+        verbose: Also show the sources of the diagnosis
+        refresh: Fetch the diagnosis from the server even if it is cached
+        
+    Returns:
+        bool: True if viewing was successful, False otherwise
+    """
+    from ion_cli.client import IONError
+    try:
+        client = ion_client(user_id)
+        diagnosis = None if refresh else client.cached_diagnosis(trace_name)
+        error = None
+        
+        if diagnosis is None:
+            # First check if the trace status is valid for viewing
+            status = get_trace_status(trace_name, user_id)
+            if status not in VALID_STATUS_FOR_VIEW:
+                console.print(Panel(
+                    f"[error]Error:[/] Trace '{trace_name}' is not ready for viewing. Current status: {status}",
+                    title="Error",
+                    border_style="red"
+                ))
+                return False
+            
+            # Show a spinner during the request
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                console=console
+            ) as progress:
+                task = progress.add_task("[info]Fetching diagnosis...[/]", total=None)
+                try:
+                    diagnosis = client.diagnosis(trace_name, refresh=True)
+                except IONError as e:
+                    error = e
+                progress.update(task, completed=True)
+        
+        if error is None:
+            content = diagnosis.content
+            sources = diagnosis.sources
             
             # Display the diagnosis content
-            from rich.markdown import Markdown
             console.print(Panel(
                 Markdown(content),
                 title=f"Diagnosis for {trace_name}",
@@ -448,8 +1568,6 @@ def view_trace_diagnosis(trace_name: str, user_id: str, verbose: bool = False) -
             
             # Display sources if available
             if verbose and sources:
-                from rich.table import Table
-                from rich.markdown import Markdown
                 source_table = Table(title="Sources", show_lines=True)
                 source_table.add_column("Source File", style="cyan")
                 source_table.add_column("Excerpts", style="green")
@@ -469,8 +1587,10 @@ def view_trace_diagnosis(trace_name: str, user_id: str, verbose: bool = False) -
                 
                 console.print(source_table)
             
+            if diagnosis.cached:
+                console.print("[dim]Shown from the local cache; use --refresh to fetch it again.[/]")
             return True
-        elif response.status_code == 404:
+        elif error.status_code == 404:
             console.print(Panel(
                 f"[warning]Diagnosis not found for trace '{trace_name}'.[/]",
                 title="Not Found",
@@ -478,9 +1598,8 @@ def view_trace_diagnosis(trace_name: str, user_id: str, verbose: bool = False) -
             ))
             return False
         else:
-            error_msg = response.json().get('error', 'Unknown error')
             console.print(Panel(
-                f"[error]Error fetching diagnosis:[/] {error_msg}",
+                f"[error]Error fetching diagnosis:[/] {str(error)}",
                 title="Error",
                 border_style="red"
             ))
@@ -505,13 +1624,8 @@ def stop_analysis(trace_name: str, user_id: str) -> bool:
     Returns:
         bool: True if stopping was successful, False otherwise
     """
+    from ion_cli.client import IONError
     try:
-        # Prepare the request payload
-        payload = {
-            'user_id': user_id,
-            'trace_name': trace_name
-        }
-        
         # Show a spinner during the request
         with Progress(
             SpinnerColumn(),
@@ -519,10 +1633,14 @@ def stop_analysis(trace_name: str, user_id: str) -> bool:
             console=console
         ) as progress:
             task = progress.add_task("[info]Stopping analysis...[/]", total=None)
-            response = requests.post(f"{DEFAULT_API_ENDPOINT}/api/stop_analysis", json=payload)
+            try:
+                ion_client(user_id).stop(trace_name)
+                error_msg = None
+            except IONError as e:
+                error_msg = str(e)
             progress.update(task, completed=True)
         
-        if response.status_code == 200:
+        if error_msg is None:
             console.print(Panel(
                 f"[success]Analysis for trace '{trace_name}' successfully stopped.[/]",
                 title="Success",
@@ -530,7 +1648,6 @@ def stop_analysis(trace_name: str, user_id: str) -> bool:
             ))
             return True
         else:
-            error_msg = response.json().get('error', 'Unknown error')
             console.print(Panel(
                 f"[error]Error stopping analysis:[/] {error_msg}",
                 title="Error",
@@ -557,8 +1674,10 @@ def delete_trace(trace_name: str, user_id: str) -> bool:
     Returns:
         bool: True if deletion was successful, False otherwise
     """
+    from ion_cli.client import IONError
     try:
-        trace_status = get_trace_status(trace_name, user_id)
+        # Whether the analysis must be stopped first depends on the current status
+        trace_status = get_trace_status(trace_name, user_id, max_age=0)
         if trace_status not in VALID_TASK_STATUSES:
             stop_result = stop_analysis(trace_name, user_id)
             if not stop_result:
@@ -583,12 +1702,6 @@ def delete_trace(trace_name: str, user_id: str) -> bool:
             console.print("[info]Deletion cancelled.[/]")
             return False
         
-        # Prepare the request payload
-        payload = {
-            'user_id': user_id,
-            'trace_name': trace_name
-        }
-        
         # Show a spinner during the request
         with Progress(
             SpinnerColumn(),
@@ -596,10 +1709,14 @@ def delete_trace(trace_name: str, user_id: str) -> bool:
             console=console
         ) as progress:
             task = progress.add_task("[info]Deleting trace...[/]", total=None)
-            response = requests.post(f"{DEFAULT_API_ENDPOINT}/api/delete_trace", json=payload)
+            try:
+                ion_client(user_id).delete(trace_name)
+                error_msg = None
+            except IONError as e:
+                error_msg = str(e)
             progress.update(task, completed=True)
         
-        if response.status_code == 200:
+        if error_msg is None:
             console.print(Panel(
                 f"[success]Trace '{trace_name}' successfully deleted.[/]",
                 title="Success",
@@ -607,7 +1724,6 @@ def delete_trace(trace_name: str, user_id: str) -> bool:
             ))
             return True
         else:
-            error_msg = response.json().get('error', 'Unknown error')
             console.print(Panel(
                 f"[error]Error deleting trace:[/] {error_msg}",
                 title="Error",
@@ -623,6 +1739,50 @@ def delete_trace(trace_name: str, user_id: str) -> bool:
         ))
         return False
 
+
+def print_profile(profile: 'profiling.Profile', path: Optional[str] = None) -> None:
+    """
+    Print where a command spent its time, and optionally save the profile.
+    
+    Args:
+        profile: Profile recorded while the command ran
+        path: File to write the profile to as a Chrome/Perfetto trace
+    """
+    table = Table(title=f"Profile ({profile.wall_seconds * 1000:.1f} ms total)")
+    table.add_column("Phase", style="cyan")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Mean", justify="right")
+    table.add_column("Max", justify="right")
+    table.add_column("Sent", justify="right")
+    table.add_column("Received", justify="right")
+    table.add_column("Details", style="dim")
+    for row in profile.summary():
+        details = [f"{status} x{count}" for status, count in row['statuses'].items()]
+        if row['new_connections']:
+            details.append(f"{row['new_connections']} new connection{'s' if row['new_connections'] > 1 else ''}")
+        if row['errors']:
+            details.append(f"[error]{row['errors']} errors[/]")
+        table.add_row(
+            row['name'],
+            str(row['calls']),
+            f"{row['total_seconds'] * 1000:.1f} ms",
+            f"{row['mean_seconds'] * 1000:.1f} ms",
+            f"{row['max_seconds'] * 1000:.1f} ms",
+            format_size(row['bytes_sent']) if row['category'] == profiling.HTTP else "",
+            format_size(row['bytes_received']) if row['category'] == profiling.HTTP else "",
+            ", ".join(details)
+        )
+    console.print(table)
+    if path:
+        try:
+            profile.write(path)
+        except OSError as e:
+            console.print(f"[error]Error:[/] Cannot write profile to '{path}': {str(e)}")
+            return
+        console.print(f"[info]Profile written to {path} (open it in chrome://tracing or ui.perfetto.dev)[/]")
+
+
 def main(args: Optional[list] = None) -> int:
     """
     Main entry point for the command line utility.
@@ -633,12 +1793,6 @@ def main(args: Optional[list] = None) -> int:
     Returns:
         int: Exit code (0 for success, 1 for failure)
     """
-    # Print a welcome banner
-    console.print(Panel.fit(
-        "[bold cyan]ION-cli[/bold cyan] - The I/O Navigator CLI",
-        border_style="cyan"
-    ))
-    
     parser = argparse.ArgumentParser(
         description="The I/O Navigator CLI"
     )
@@ -646,8 +1800,146 @@ def main(args: Optional[list] = None) -> int:
     parser.add_argument(
         "--upload", "-u",
         type=str,
+        nargs="+",
+        required=False,
+        help="Path(s) of trace files to upload; directories and glob patterns are expanded"
+    )
+
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=None,
+        help=f"Number of files or --shard shards uploaded (default {UPLOAD_CONCURRENCY}) or analyses launched "
+             f"(default {LAUNCH_CONCURRENCY}) in parallel"
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=LAUNCH_RATE,
+        help="Maximum analysis launches per second when launching several analyses"
+    )
+    
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Upload in resumable fixed-size parts (recommended for multi-GB traces)"
+    )
+
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=UPLOAD_CHUNK_SIZE // (1024 * 1024),
+        help="Part size in MiB for --chunked uploads"
+    )
+
+    parser.add_argument(
+        "--compress",
+        type=str,
+        choices=[encoding for encoding in UPLOAD_ENCODINGS if encoding != "identity"],
+        default=UPLOAD_COMPRESSION,
+        help="Compress the trace on the fly while uploading (implies --chunked)"
+    )
+
+    parser.add_argument(
+        "--reduce",
+        action="store_true",
+        help="Drop zero/unmonitored counters and unused mount entries before uploading"
+    )
+
+    parser.add_argument(
+        "--collapse_ranks",
+        action="store_true",
+        help="Merge the per-rank records of each file into one shared record (rank -1) before uploading, "
+             "like Darshan does for files opened by all ranks"
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=str,
+        choices=["module", "rank", "module+rank"],
+        default=None,
+        help="Split a large .txt trace into shards by module and/or rank range, upload them in parallel "
+             "(see --jobs) and register them as one trace"
+    )
+
+    parser.add_argument(
+        "--shard_ranks",
+        type=int,
+        default=UPLOAD_SHARD_RANKS,
+        help="Number of rank ranges a trace is split into by --shard rank"
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Upload even if identical content was uploaded before"
+    )
+
+    parser.add_argument(
+        "--raw_darshan",
+        action="store_true",
+        help="Upload .darshan logs as binaries instead of converting them with darshan-parser"
+    )
+
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Check every line of .txt traces before uploading them and skip malformed ones"
+    )
+
+    parser.add_argument(
+        "--validate",
+        type=str,
+        nargs="+",
         required=False,
-        help="Path to the .txt file to upload"
+        help="Check that trace files (paths, directories or glob patterns) are complete and well formed, "
+             "without uploading them"
+    )
+
+    parser.add_argument(
+        "--summarize",
+        type=str,
+        nargs="+",
+        required=False,
+        help="Print a local I/O health summary of trace files (paths, directories or glob patterns): "
+             "per-module and per-file volumes, small, misaligned and random I/O, metadata time and rank "
+             "imbalance, without uploading them"
+    )
+
+    parser.add_argument(
+        "--diff",
+        type=str,
+        nargs="+",
+        required=False,
+        help="Compare two or more traces of the same application against the first one: differing settings, "
+             "and the largest changes in bytes, time and operation counts per file"
+    )
+
+    parser.add_argument(
+        "--convert",
+        type=str,
+        nargs="+",
+        required=False,
+        help="Parse trace files (paths, directories or glob patterns) once and save them as columnar files "
+             "next to them, which --summarize, --diff, --validate and --upload open in milliseconds; "
+             "--reduce and --collapse_ranks are applied first"
+    )
+
+    parser.add_argument(
+        "--to",
+        type=str,
+        choices=["npz", "arrow", "parquet"],
+        default="npz",
+        help="Format written by --convert: memory-mapped NumPy archive (npz), Arrow IPC file (arrow) or "
+             "Parquet (parquet); arrow and parquet need pyarrow"
+    )
+
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=SUMMARY_TOP_FILES,
+        help="Number of files listed by --summarize (by bytes moved), and of changes per category by --diff"
     )
     
     parser.add_argument(
@@ -666,37 +1958,72 @@ def main(args: Optional[list] = None) -> int:
     parser.add_argument(
         "--analyze", "-a",
         type=str,
+        nargs="+",
         required=False,
-        help="Launch a trace analysis"
+        help="Launch a trace analysis (name or glob pattern, e.g. 'amrex*')"
     )
 
     parser.add_argument(
         "--stop", "-s",
         type=str,
         required=False,
-        help="Stop a running trace analysis"
+        help="Stop a running trace analysis (name or glob pattern, e.g. 'amrex*')"
     )
 
     parser.add_argument(
         "--delete", "-d",
         type=str,
         required=False,
-        help="Delete a specific trace"
+        help="Delete a specific trace (name or glob pattern, e.g. 'amrex*')"
     )
 
     parser.add_argument(
         "--llm", "-m",
         type=str,
+        nargs="+",
         choices=SUPPORTED_MODELS,
-        default="anthropic/claude-3-7-sonnet-20250219",
-        help="Specify the LLM to use for analysis"
+        default=[DEFAULT_MODEL],
+        help="Specify the LLM(s) to use for analysis; each model is run on every trace"
     )
 
     parser.add_argument(
         "--view", "-v",
         type=str,
         required=False,
-        help="View the final diagnosis for a specific trace"
+        help="View the final diagnosis for a specific trace (name or glob pattern, e.g. 'amrex*')"
+    )
+
+    parser.add_argument(
+        "--watch", "-w",
+        type=str,
+        nargs="+",
+        required=False,
+        help="Track traces (names or glob patterns) until their analyses are done"
+    )
+
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="With --analyze, track the launched analyses until they are done"
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Maximum number of seconds to wait with --wait or --watch"
+    )
+
+    parser.add_argument(
+        "--show_diagnosis",
+        action="store_true",
+        help="With --wait or --watch, show the diagnosis of every completed trace"
+    )
+
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="With --view, fetch the diagnosis from the server even if it is cached locally"
     )
 
     parser.add_argument(
@@ -704,18 +2031,118 @@ def main(args: Optional[list] = None) -> int:
         action="store_true",
         help="Verbose output"
     )
+
+    parser.add_argument(
+        "--plain",
+        action="store_true",
+        help="Unstyled output without colours, boxes or progress bars (also ION_OUTPUT=plain)"
+    )
+
+    parser.add_argument(
+        "--quiet", "-q",
+        action="store_true",
+        help="Only print results and errors, unstyled (also ION_OUTPUT=quiet)"
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+        metavar="FILE",
+        help="Print where the command spent its time (HTTP requests, validation, hashing, rendering); "
+             "with FILE, also save it as a Chrome/Perfetto trace"
+    )
     
     parsed_args = parser.parse_args(args)
+    if parsed_args.quiet:
+        set_mode("quiet")
+    elif parsed_args.plain:
+        set_mode("plain")
+    
+    if parsed_args.profile is None:
+        return run_command(parsed_args, parser)
+    profiling.enable()
+    try:
+        return run_command(parsed_args, parser)
+    finally:
+        print_profile(profiling.disable(), parsed_args.profile or None)
+
+
+def run_command(parsed_args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
+    """
+    Run the command selected by the parsed arguments.
+    
+    Args:
+        parsed_args: Arguments parsed by main()
+        parser: Parser, used to print the help if no command is given
+        
+    Returns:
+        int: Exit code (0 for success, 1 for failure)
+    """
+    # Print a welcome banner
+    if get_mode() == "rich":
+        console.print(Panel.fit(
+            "[bold cyan]ION-cli[/bold cyan] - The I/O Navigator CLI",
+            border_style="cyan"
+        ))
+    
+    # Checking files is local and needs no account
+    if parsed_args.validate:
+        return 0 if validate_traces(parsed_args.validate) else 1
+    if parsed_args.summarize:
+        success = summarize_traces(parsed_args.summarize, top=parsed_args.top, convert=not parsed_args.raw_darshan)
+        return 0 if success else 1
+    if parsed_args.diff:
+        success = diff_traces(parsed_args.diff, top=parsed_args.top, convert=not parsed_args.raw_darshan)
+        return 0 if success else 1
+    if parsed_args.convert:
+        success = convert_traces(parsed_args.convert, fmt=parsed_args.to, convert=not parsed_args.raw_darshan,
+                                 reduce=parsed_args.reduce, collapse_ranks=parsed_args.collapse_ranks)
+        return 0 if success else 1
     
     user_id = check_user_verified(parsed_args.user_email)
     if not user_id:
         return 1
 
     if parsed_args.upload:
-        if not validate_file(parsed_args.upload):
+        single = parsed_args.upload[0]
+        if len(parsed_args.upload) > 1 or os.path.isdir(single) or any(char in single for char in '*?['):
+            success = upload_files(
+                parsed_args.upload,
+                user_id,
+                concurrency=parsed_args.jobs or UPLOAD_CONCURRENCY,
+                chunked=parsed_args.chunked,
+                chunk_size=parsed_args.chunk_size * 1024 * 1024,
+                compression=parsed_args.compress,
+                reduce=parsed_args.reduce,
+                force=parsed_args.force,
+                convert=not parsed_args.raw_darshan,
+                check=parsed_args.check,
+                collapse_ranks=parsed_args.collapse_ranks
+            )
+            return 0 if success else 1
+        
+        if not validate_file(single):
+            return 1
+        if parsed_args.check and single.lower().endswith('.txt') and not check_trace(single):
             return 1
         
-        success = upload_file(parsed_args.upload, user_id)
+        success = upload_file(
+            single,
+            user_id,
+            chunked=parsed_args.chunked,
+            chunk_size=parsed_args.chunk_size * 1024 * 1024,
+            compression=parsed_args.compress,
+            reduce=parsed_args.reduce,
+            force=parsed_args.force,
+            convert=not parsed_args.raw_darshan,
+            shard=parsed_args.shard,
+            shard_ranks=parsed_args.shard_ranks,
+            concurrency=parsed_args.jobs or UPLOAD_CONCURRENCY,
+            collapse_ranks=parsed_args.collapse_ranks
+        )
         return 0 if success else 1
     
     # If no file is specified but --list is used, list the user's files
@@ -723,24 +2150,60 @@ def main(args: Optional[list] = None) -> int:
         success = list_user_traces(user_id)
         return 0 if success else 1
     
+    # Trace arguments may be glob patterns matched against the user's trace names
     if parsed_args.analyze:
-        success = launch_analysis(parsed_args.analyze, user_id, parsed_args.llm)
+        from ion_cli.traces import has_wildcards
+        from ion_cli.watch import FINISHED_STATUSES
+        single = parsed_args.analyze[0]
+        if len(parsed_args.analyze) == 1 and not has_wildcards(single) and len(parsed_args.llm) == 1:
+            success = launch_analysis(single, user_id, parsed_args.llm[0])
+            launched = [single] if success else []
+        else:
+            names = [name for pattern in parsed_args.analyze for name in resolve_trace_names(pattern, user_id)]
+            if not names:
+                return 1
+            launched = []
+            success = launch_analyses(
+                names,
+                user_id,
+                parsed_args.llm,
+                concurrency=parsed_args.jobs or LAUNCH_CONCURRENCY,
+                rate=parsed_args.rate,
+                launched=launched
+            )
+        if parsed_args.wait and launched:
+            success = watch_traces(launched, user_id, terminal=FINISHED_STATUSES, timeout=parsed_args.timeout,
+                                   show_diagnosis=parsed_args.show_diagnosis,
+                                   verbose=True if parsed_args.verbose else False) and success
         return 0 if success else 1
     
-    if parsed_args.stop:
-        success = stop_analysis(parsed_args.stop, user_id)
+    if parsed_args.watch:
+        names = [name for pattern in parsed_args.watch for name in resolve_trace_names(pattern, user_id)]
+        if not names:
+            return 1
+        success = watch_traces(names, user_id, timeout=parsed_args.timeout,
+                               show_diagnosis=parsed_args.show_diagnosis,
+                               verbose=True if parsed_args.verbose else False)
         return 0 if success else 1
+    
+    if parsed_args.stop:
+        names = resolve_trace_names(parsed_args.stop, user_id)
+        results = [stop_analysis(name, user_id) for name in names]
+        return 0 if names and all(results) else 1
         
     if parsed_args.delete:
-        success = delete_trace(parsed_args.delete, user_id)
-        return 0 if success else 1
+        names = resolve_trace_names(parsed_args.delete, user_id)
+        results = [delete_trace(name, user_id) for name in names]
+        return 0 if names and all(results) else 1
     
     if parsed_args.view:
-        success = view_trace_diagnosis(parsed_args.view, user_id, True if parsed_args.verbose else False)
-        return 0 if success else 1
+        names = resolve_trace_names(parsed_args.view, user_id)
+        results = [view_trace_diagnosis(name, user_id, True if parsed_args.verbose else False,
+                                        refresh=parsed_args.refresh) for name in names]
+        return 0 if names and all(results) else 1
         
     # If no action is specified, show help
-    if not (parsed_args.upload or parsed_args.list or parsed_args.analyze or parsed_args.stop or parsed_args.delete or parsed_args.view):
+    if not (parsed_args.upload or parsed_args.list or parsed_args.analyze or parsed_args.watch or parsed_args.stop or parsed_args.delete or parsed_args.view):
         parser.print_help()
         return 1
 
@@ -0,0 +1,454 @@
+"""
+Programmatic client for the ION API.
+
+IONClient exposes every operation of the command line tool as a method that
+returns data objects and raises IONError instead of printing. AsyncIONClient
+offers the same methods as coroutines, so hundreds of operations can run
+concurrently from one event loop::
+
+    async with AsyncIONClient(user_id) as ion:
+        tasks = await asyncio.gather(*(ion.run_analysis(name) for name in names))
+
+Both clients share the keep-alive connection pool of ion_cli.api, and the
+trace-list cache and index of ion_cli.traces.
+"""
+
+import asyncio
+import functools
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import requests
+
+from ion_cli.api import APIClient, get_client
+from ion_cli.batch import SUCCESS_STATUSES, BatchUploader, UploadResult
+from ion_cli.config import (
+    ASYNC_MAX_CONCURRENCY, DEFAULT_MODEL, TRACE_STATUS_MAX_AGE, UPLOAD_CHUNK_SIZE
+)
+from ion_cli.diagnoses import DiagnosisCache
+from ion_cli.ledger import UploadLedger
+from ion_cli.traces import TraceIndex, TraceListCache, TraceListError, get_trace_index, invalidate_user_traces
+from ion_cli.user_cache import UserCache
+
+
+class IONError(Exception):
+    """
+    Raised when the server rejects or fails a request.
+
+    Attributes:
+        status_code: HTTP status of the response, if there was one
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Trace:
+    """
+    An uploaded trace as listed by the server.
+    """
+
+    def __init__(self, trace_name: str, status: str, description: str = "", upload_date: str = "",
+                 model: Optional[str] = None, raw: Optional[dict] = None):
+        self.trace_name = trace_name
+        self.status = status
+        self.description = description
+        self.upload_date = upload_date
+        self.model = model
+        self.raw = raw if raw is not None else {}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Trace':
+        return cls(
+            data.get('trace_name', 'Unknown'),
+            data.get('status', 'not_started'),
+            data.get('trace_description', ''),
+            data.get('upload_date', ''),
+            data.get('model'),
+            data
+        )
+
+    def __repr__(self) -> str:
+        return f"Trace({self.trace_name!r}, status={self.status!r})"
+
+
+class AnalysisTask:
+    """
+    A submitted analysis.
+    """
+
+    def __init__(self, task_id: Optional[str], trace_name: str, model: str):
+        self.task_id = task_id
+        self.trace_name = trace_name
+        self.model = model
+
+    def __repr__(self) -> str:
+        return f"AnalysisTask({self.task_id!r}, trace_name={self.trace_name!r}, model={self.model!r})"
+
+
+class Diagnosis:
+    """
+    Final diagnosis of an analysed trace.
+
+    Attributes:
+        content: Markdown text of the diagnosis
+        sources: Source dictionaries ('file', 'text') the diagnosis refers to
+        model: Model of the analysis, if known
+        cached: Whether the diagnosis was read from the local cache
+    """
+
+    def __init__(self, trace_name: str, content: str, sources: Optional[list] = None,
+                 model: Optional[str] = None, cached: bool = False):
+        self.trace_name = trace_name
+        self.content = content
+        self.sources = sources or []
+        self.model = model
+        self.cached = cached
+
+    def __repr__(self) -> str:
+        return f"Diagnosis({self.trace_name!r}, {len(self.content)} chars)"
+
+
+def _error(response, default: str = 'Unknown error') -> IONError:
+    try:
+        message = response.json().get('error', default)
+    except (ValueError, AttributeError):
+        message = response.text or default
+    return IONError(message, response.status_code)
+
+
+class IONClient:
+    """
+    Blocking client for one user of an ION endpoint.
+
+    Args:
+        user_id: User's ID; can be set later with verify()
+        endpoint: Base URL of the ION API
+        api: Shared APIClient to use instead of the endpoint's default one
+    """
+
+    def __init__(self, user_id: Optional[str] = None, endpoint: Optional[str] = None,
+                 api: Optional[APIClient] = None):
+        self.api = api or get_client(endpoint)
+        self.user_id = user_id
+
+    @property
+    def endpoint(self) -> str:
+        return self.api.endpoint
+
+    def _require_user(self) -> str:
+        if not self.user_id:
+            raise IONError("No user id; call verify() first")
+        return self.user_id
+
+    def verify(self, email: str, use_cache: bool = True) -> Optional[str]:
+        """
+        Resolve an email to its user id and use it for later calls.
+
+        Args:
+            email: Email address of the user
+            use_cache: Reuse a cached verification instead of asking the server
+
+        Returns:
+            str: User id, or None if the email is not verified
+        """
+        cache = UserCache()
+        user_id = cache.get(self.endpoint, email) if use_cache else None
+        if not user_id:
+            try:
+                response = self.api.post("/api/user", idempotent=True, json={'email': email})
+            except requests.RequestException as e:
+                raise IONError(str(e))
+            if not response.ok:
+                raise _error(response)
+            user_id = response.json().get('user_id')
+            if user_id:
+                cache.put(self.endpoint, email, user_id)
+        if user_id:
+            self.user_id = user_id
+        return user_id
+
+    def traces(self, refresh: bool = True) -> List[Trace]:
+        """
+        List the user's traces.
+
+        Args:
+            refresh: Revalidate the list with the server instead of reusing this process's copy
+        """
+        try:
+            index = get_trace_index(self._require_user(), client=self.api, refresh=refresh)
+        except TraceListError as e:
+            raise IONError(str(e))
+        return [Trace.from_dict(trace) for trace in index.traces]
+
+    def trace(self, trace_name: str, max_age: float = TRACE_STATUS_MAX_AGE) -> Optional[Trace]:
+        """
+        Look a trace up by name, or return None if there is no such trace.
+
+        Args:
+            trace_name: Name of the trace
+            max_age: Accept a cached trace list up to this many seconds old
+        """
+        try:
+            index = get_trace_index(self._require_user(), max_age=max_age, client=self.api)
+        except TraceListError as e:
+            raise IONError(str(e))
+        data = index.get(trace_name)
+        return Trace.from_dict(data) if data else None
+
+    def status(self, trace_name: str, max_age: float = TRACE_STATUS_MAX_AGE) -> Optional[str]:
+        """
+        Return the status of a trace, or None if there is no such trace.
+        """
+        trace = self.trace(trace_name, max_age=max_age)
+        return trace.status if trace else None
+
+    def match(self, pattern: str) -> List[str]:
+        """
+        Resolve a trace name or glob pattern (e.g. 'amrex*') to trace names.
+        """
+        try:
+            index = get_trace_index(self._require_user(), max_age=TRACE_STATUS_MAX_AGE, client=self.api)
+        except TraceListError as e:
+            raise IONError(str(e))
+        return index.match(pattern)
+
+    def upload(self, file_path: str, chunked: bool = False, chunk_size: int = UPLOAD_CHUNK_SIZE,
+               compression: Optional[str] = None, reduce: bool = False, force: bool = False,
+               convert: bool = True, check: bool = False) -> UploadResult:
+        """
+        Upload a trace file.
+
+        Args:
+            file_path: Path to a .txt or .darshan trace
+            chunked: Use the chunked, resumable protocol
+            chunk_size: Number of bytes sent per request in chunked mode
+            compression: 'gzip' or 'zstd' to compress on the fly (implies chunked)
+            reduce: Drop uninformative lines of text traces before sending
+            force: Upload even if the ledger shows identical content was uploaded before
+            convert: Send .darshan logs as text if darshan-parser is installed
+            check: Check every line of a .txt trace first and refuse a malformed one
+
+        Returns:
+            UploadResult: Outcome; status is one of the ion_cli.batch status constants
+
+        Raises:
+            IONError: If the file is invalid or the upload failed
+        """
+        uploader = BatchUploader(self._require_user(), concurrency=1, chunked=chunked, chunk_size=chunk_size,
+                                 compression=compression, reduce=reduce, force=force, endpoint=self.endpoint,
+                                 convert=convert, check=check)
+        result = uploader.upload(file_path)
+        if result.status not in SUCCESS_STATUSES:
+            raise IONError(result.message)
+        invalidate_user_traces(self.user_id, self.endpoint)
+        return result
+
+    def run_analysis(self, trace_name: str, model: str = DEFAULT_MODEL) -> AnalysisTask:
+        """
+        Launch an analysis of a trace.
+
+        Args:
+            trace_name: Name of the trace
+            model: Language model to use
+
+        Returns:
+            AnalysisTask: The submitted task
+        """
+        payload = {'user_id': self._require_user(), 'trace_name': trace_name, 'llm': model}
+        response = self.api.post("/api/run_analysis", json=payload)
+        if response.status_code != 202:
+            raise _error(response)
+        invalidate_user_traces(self.user_id, self.endpoint)
+        return AnalysisTask(response.json().get('task_id'), trace_name, model)
+
+    def stop(self, trace_name: str) -> None:
+        """
+        Stop the running analysis of a trace.
+        """
+        payload = {'user_id': self._require_user(), 'trace_name': trace_name}
+        response = self.api.post("/api/stop_analysis", json=payload)
+        if response.status_code != 200:
+            raise _error(response)
+        invalidate_user_traces(self.user_id, self.endpoint)
+
+    def delete(self, trace_name: str) -> None:
+        """
+        Delete a trace and its associated files.
+        """
+        payload = {'user_id': self._require_user(), 'trace_name': trace_name}
+        response = self.api.post("/api/delete_trace", json=payload)
+        if response.status_code != 200:
+            raise _error(response)
+        invalidate_user_traces(self.user_id, self.endpoint)
+        try:
+            with UploadLedger() as ledger:
+                ledger.forget(self.endpoint, self.user_id, trace_name)
+            with DiagnosisCache() as cache:
+                cache.forget(self.endpoint, self.user_id, trace_name)
+        except (OSError, sqlite3.Error):
+            pass
+
+    def _diagnosis_key(self, trace: Trace) -> Tuple[str, str]:
+        # Model and content version under which a trace's diagnosis is cached
+        try:
+            with UploadLedger() as ledger:
+                content_hash = ledger.trace_hash(self.endpoint, self.user_id, trace.trace_name)
+        except (OSError, sqlite3.Error):
+            content_hash = None
+        version = content_hash or f"uploaded:{trace.upload_date}"
+        return trace.model or '', version
+
+    def _known_trace(self, trace_name: str) -> Tuple[Optional[Trace], bool]:
+        # Look a trace up, falling back to the last saved list when the server is unreachable
+        try:
+            return self.trace(trace_name), True
+        except (IONError, requests.RequestException):
+            entry = TraceListCache().load(self.endpoint, self._require_user())
+            data = TraceIndex(entry['traces']).get(trace_name) if entry else None
+            return (Trace.from_dict(data) if data else None), False
+
+    def cached_diagnosis(self, trace_name: str) -> Optional[Diagnosis]:
+        """
+        Return the locally cached diagnosis of a completed trace, or None.
+
+        Works offline: if the server cannot be reached, the last saved trace
+        list is used to find the trace's model and version.
+        """
+        self._require_user()
+        trace, online = self._known_trace(trace_name)
+        if online and (trace is None or trace.status != 'completed'):
+            return None
+        model, version = self._diagnosis_key(trace) if trace else (None, None)
+        try:
+            with DiagnosisCache() as cache:
+                entry = cache.get(self.endpoint, self.user_id, trace_name, model, version)
+        except (OSError, sqlite3.Error):
+            return None
+        if entry is None:
+            return None
+        content, sources, model = entry
+        return Diagnosis(trace_name, content, sources, model=model or None, cached=True)
+
+    def diagnosis(self, trace_name: str, refresh: bool = False) -> Diagnosis:
+        """
+        Get the final diagnosis of an analysed trace.
+
+        Completed diagnoses are cached locally and served from the cache
+        unless refresh is set.
+
+        Args:
+            trace_name: Name of the trace
+            refresh: Fetch the diagnosis from the server even if it is cached
+
+        Raises:
+            IONError: With status_code 404 if the trace has no diagnosis
+        """
+        if not refresh:
+            cached = self.cached_diagnosis(trace_name)
+            if cached is not None:
+                return cached
+        payload = {'user_id': self._require_user()}
+        response = self.api.post(f"/api/trace_examples/{trace_name}/final_diagnosis", json=payload,
+                                 idempotent=True, hedge=True)
+        if response.status_code != 200:
+            raise _error(response, default='Diagnosis not found' if response.status_code == 404 else 'Unknown error')
+        data = response.json().get('trace_diagnosis', {})
+        diagnosis = Diagnosis(trace_name, data.get('content', 'No diagnosis content available'),
+                              data.get('sources', []))
+
+        trace, online = self._known_trace(trace_name)
+        if online and trace is not None and trace.status == 'completed':
+            model, version = self._diagnosis_key(trace)
+            diagnosis.model = trace.model
+            try:
+                with DiagnosisCache() as cache:
+                    cache.put(self.endpoint, self.user_id, trace_name, model, version,
+                              diagnosis.content, diagnosis.sources)
+            except (OSError, sqlite3.Error):
+                pass
+        return diagnosis
+
+
+class AsyncIONClient:
+    """
+    Asyncio client with the methods of IONClient as coroutines.
+
+    Requests run on a bounded pool of worker threads over the shared
+    keep-alive session, so up to max_concurrency operations are in flight
+    at once while the event loop stays free.
+
+    Args:
+        user_id: User's ID; can be set later with verify()
+        endpoint: Base URL of the ION API
+        max_concurrency: Maximum number of operations in flight
+    """
+
+    def __init__(self, user_id: Optional[str] = None, endpoint: Optional[str] = None,
+                 max_concurrency: int = ASYNC_MAX_CONCURRENCY):
+        self.sync = IONClient(user_id, endpoint)
+        self.sync.api.ensure_pool_size(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='ion-client')
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.sync.user_id
+
+    @user_id.setter
+    def user_id(self, user_id: Optional[str]) -> None:
+        self.sync.user_id = user_id
+
+    @property
+    def endpoint(self) -> str:
+        return self.sync.endpoint
+
+    async def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def verify(self, email: str, use_cache: bool = True) -> Optional[str]:
+        return await self._call(self.sync.verify, email, use_cache)
+
+    async def traces(self, refresh: bool = True) -> List[Trace]:
+        return await self._call(self.sync.traces, refresh)
+
+    async def trace(self, trace_name: str, max_age: float = TRACE_STATUS_MAX_AGE) -> Optional[Trace]:
+        return await self._call(self.sync.trace, trace_name, max_age)
+
+    async def status(self, trace_name: str, max_age: float = TRACE_STATUS_MAX_AGE) -> Optional[str]:
+        return await self._call(self.sync.status, trace_name, max_age)
+
+    async def match(self, pattern: str) -> List[str]:
+        return await self._call(self.sync.match, pattern)
+
+    async def upload(self, file_path: str, **kwargs) -> UploadResult:
+        return await self._call(self.sync.upload, file_path, **kwargs)
+
+    async def run_analysis(self, trace_name: str, model: str = DEFAULT_MODEL) -> AnalysisTask:
+        return await self._call(self.sync.run_analysis, trace_name, model)
+
+    async def stop(self, trace_name: str) -> None:
+        await self._call(self.sync.stop, trace_name)
+
+    async def delete(self, trace_name: str) -> None:
+        await self._call(self.sync.delete, trace_name)
+
+    async def cached_diagnosis(self, trace_name: str) -> Optional[Diagnosis]:
+        return await self._call(self.sync.cached_diagnosis, trace_name)
+
+    async def diagnosis(self, trace_name: str, refresh: bool = False) -> Diagnosis:
+        return await self._call(self.sync.diagnosis, trace_name, refresh)
+
+    async def close(self) -> None:
+        """
+        Shut the worker threads down (the shared connection pool stays open).
+        """
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> 'AsyncIONClient':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
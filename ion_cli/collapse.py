@@ -0,0 +1,575 @@
+"""
+Rank-collapse reduction of darshan-parser text traces before upload.
+
+Darshan only merges the records of a file into one shared record (rank -1)
+when every rank of the job opened it. Files opened by a subset of the
+ranks, and the per-rank heatmaps, keep a full record per rank, so the text
+dump grows with nprocs. This stage merges all per-rank records of the same
+module and record id into one shared record, with Darshan's own reduction
+semantics: counts, bytes and times are summed, start timestamps take the
+minimum and end timestamps the maximum, the most common access sizes and
+strides are recomputed over all ranks, and the fastest/slowest rank and the
+variance counters are derived from each rank's I/O time and bytes.
+
+The trace is read in blocks of whole lines that are scanned and rewritten
+by a pool of processes, so the reduction streams and uses every core: one
+pass aggregates the records, a second one writes the collapsed trace with
+each merged record in place of its first per-rank record.
+"""
+
+import io
+import itertools
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from ion_cli.config import COLLAPSE_WORKERS
+from ion_cli.profiling import phase
+from ion_cli.upload import IterStream
+from ion_cli.validate import line_blocks
+
+
+COLLAPSE_NOTE = (
+    "# ion-cli collapse: merged {records} per-rank records of {files} files"
+    " into shared records (rank -1)\n"
+)
+
+# Lines are processed in blocks of about this size, one block per task of the pool
+BLOCK_SIZE = 8 * 1024 * 1024
+
+# How the values of a counter are combined over ranks
+SUM = 'sum'
+MIN = 'min'
+MAX = 'max'
+FIRST = 'first'
+RANK = 'rank'
+SLOT = 'slot'
+MAX_TIME = 'max_time'
+
+_RANK_COUNTERS = re.compile(
+    rb'_(FASTEST_RANK|FASTEST_RANK_BYTES|SLOWEST_RANK|SLOWEST_RANK_BYTES|'
+    rb'F_FASTEST_RANK_TIME|F_SLOWEST_RANK_TIME|F_VARIANCE_RANK_TIME|F_VARIANCE_RANK_BYTES)$'
+)
+# Settings and layout; all ranks see the same value
+_FIRST_COUNTERS = re.compile(
+    rb'(_MODE|_ALIGNMENT|_RENAMED_FROM|_NDIMS|_NPOINTS|_DATATYPE_SIZE|_CHUNK_SIZE_D\d+|_USE_[A-Z_]+|'
+    rb'_HINTS|_BIN_WIDTH_SECONDS|_NBINS)$|^LUSTRE_'
+)
+# POSIX_ACCESS1_ACCESS / POSIX_ACCESS1_COUNT, POSIX_STRIDE2_STRIDE / POSIX_STRIDE2_COUNT, ...
+_SLOT_COUNTERS = re.compile(rb'^(\w+?)_(ACCESS|STRIDE)(\d)_(ACCESS|STRIDE|COUNT)$')
+# POSIX_F_MAX_READ_TIME / POSIX_MAX_READ_TIME_SIZE: the slowest operation and its size
+_MAX_TIME_COUNTERS = re.compile(rb'^(\w+?)_(?:F_MAX_(READ|WRITE)_TIME|MAX_(READ|WRITE)_TIME_SIZE)$')
+
+_TIME_SUFFIXES = (b'_F_READ_TIME', b'_F_WRITE_TIME', b'_F_META_TIME')
+_BYTES_SUFFIXES = (b'_BYTES_READ', b'_BYTES_WRITTEN')
+
+
+@lru_cache(maxsize=4096)
+def combine_rule(counter: bytes) -> Tuple[str, tuple]:
+    """
+    Find how the per-rank values of a counter are combined into a shared record.
+
+    Args:
+        counter: Darshan counter name
+
+    Returns:
+        tuple: (rule, detail); for SLOT the detail is (group, kind, slot, part), e.g.
+        (b'POSIX', b'ACCESS', 1, b'COUNT'), and for MAX_TIME it is (group, operation, part)
+    """
+    if _RANK_COUNTERS.search(counter):
+        return RANK, ()
+    match = _SLOT_COUNTERS.match(counter)
+    if match:
+        group, kind, slot, part = match.groups()
+        return SLOT, (group, kind, int(slot), b'COUNT' if part == b'COUNT' else b'VALUE')
+    match = _MAX_TIME_COUNTERS.match(counter)
+    if match:
+        if match.group(2):
+            return MAX_TIME, (match.group(1), match.group(2), b'TIME')
+        return MAX_TIME, (match.group(1), match.group(3), b'SIZE')
+    if _FIRST_COUNTERS.search(counter):
+        return FIRST, ()
+    if counter.endswith(b'_START_TIMESTAMP'):
+        return MIN, ()
+    if counter.endswith(b'_END_TIMESTAMP') or counter.endswith((b'_MAX_BYTE_READ', b'_MAX_BYTE_WRITTEN')):
+        return MAX, ()
+    return SUM, ()
+
+
+@lru_cache(maxsize=4096)
+def _counter_info(counter: bytes) -> tuple:
+    # combine_rule, and which per-rank total (0: I/O time, 1: bytes moved) a summed counter adds to
+    rule, detail = combine_rule(counter)
+    total = None
+    if rule == SUM and counter.endswith(_TIME_SUFFIXES):
+        total = 0
+    elif rule == SUM and counter.endswith(_BYTES_SUFFIXES):
+        total = 1
+    return rule, detail, total
+
+
+def _number(text: bytes):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class _Record:
+    """
+    Partial aggregate of the per-rank records of one file, mergeable across blocks.
+    """
+
+    def __init__(self, module: bytes, record_id: bytes, file: bytes, mount: bytes, fs_type: bytes):
+        self.module = module
+        self.record_id = record_id
+        self.file = file
+        self.mount = mount
+        self.fs_type = fs_type
+        self.counters = []
+        self.values = {}
+        # rank -> [I/O time, bytes moved]
+        self.ranks = {}
+        self.shared = False
+        self.size = 0
+        # (block, line) of the first line of the record
+        self.first = None
+        # Halves of value/count and time/size pairs whose other half is in another block
+        self.pending = {}
+        # (group, kind) -> {access size or stride: count}
+        self.slots = {}
+        # (group, operation) -> (time, size) of the slowest operation
+        self.slowest = {}
+
+    def add(self, rank: int, counter: bytes, text: bytes) -> None:
+        value = _number(text)
+        if rank < 0:
+            self.shared = True
+        values = self.values
+        if counter not in values:
+            self.counters.append(counter)
+            values[counter] = None
+        totals = self.ranks.get(rank)
+        if totals is None:
+            totals = self.ranks[rank] = [0.0, 0]
+        rule, detail, total = _counter_info(counter)
+        if rule == SUM:
+            # -1 means the counter was not monitored on that rank
+            if value != -1:
+                current = values[counter]
+                values[counter] = value if current is None else current + value
+                if total is not None:
+                    totals[total] += value
+        elif rule == MIN:
+            self._merge_value(counter, value, MIN)
+        elif rule == MAX:
+            self._merge_value(counter, value, MAX)
+        elif rule == FIRST:
+            self._merge_value(counter, (rank, value), FIRST)
+        elif rule in (SLOT, MAX_TIME):
+            self._add_half((rank,) + detail[:-1], detail[-1], value)
+
+    def _merge_value(self, counter: bytes, value, rule: str) -> None:
+        current = self.values.get(counter)
+        if current is None:
+            self.values[counter] = value
+        elif rule == MIN:
+            # A start timestamp of 0 means the operation never happened on that rank
+            if value and (not current or value < current):
+                self.values[counter] = value
+        elif rule == MAX:
+            self.values[counter] = max(current, value)
+        elif value[0] < current[0]:
+            self.values[counter] = value
+
+    def _add_half(self, key: tuple, part: bytes, value) -> None:
+        halves = self.pending.setdefault(key, {})
+        halves[part] = value
+        if len(halves) < 2:
+            return
+        del self.pending[key]
+        if len(key) == 4:
+            # (rank, group, kind, slot): the value and the count of a common access size or stride
+            count, size = halves[b'COUNT'], halves[b'VALUE']
+            if count > 0:
+                counts = self.slots.setdefault(key[1:3], {})
+                counts[size] = counts.get(size, 0) + count
+        else:
+            time, size = halves[b'TIME'], halves[b'SIZE']
+            best = self.slowest.get(key[1:])
+            if best is None or time > best[0]:
+                self.slowest[key[1:]] = (time, size)
+
+    def merge(self, other: '_Record') -> None:
+        """Absorb the aggregate of the same record from a later block."""
+        self.shared = self.shared or other.shared
+        self.size += other.size
+        for counter in other.counters:
+            value = other.values[counter]
+            if counter not in self.values:
+                self.counters.append(counter)
+                self.values[counter] = value
+                continue
+            if value is None:
+                continue
+            rule = combine_rule(counter)[0]
+            if rule == SUM:
+                current = self.values[counter]
+                self.values[counter] = value if current is None else current + value
+            elif rule in (MIN, MAX, FIRST):
+                self._merge_value(counter, value, rule)
+        for rank, (time, moved) in other.ranks.items():
+            totals = self.ranks.setdefault(rank, [0.0, 0])
+            totals[0] += time
+            totals[1] += moved
+        for key, counts in other.slots.items():
+            mine = self.slots.setdefault(key, {})
+            for size, count in counts.items():
+                mine[size] = mine.get(size, 0) + count
+        for key, (time, size) in other.slowest.items():
+            best = self.slowest.get(key)
+            if best is None or time > best[0]:
+                self.slowest[key] = (time, size)
+        for key, halves in other.pending.items():
+            for part, value in halves.items():
+                self._add_half(key, part, value)
+
+    def shared_lines(self) -> bytes:
+        """Render the merged record as darshan-parser lines with rank -1."""
+        ranks = sorted(self.ranks)
+        times = [self.ranks[rank][0] for rank in ranks]
+        moved = [self.ranks[rank][1] for rank in ranks]
+        fastest = min(range(len(ranks)), key=lambda i: (times[i], ranks[i]))
+        slowest = max(range(len(ranks)), key=lambda i: (times[i], -ranks[i]))
+        derived = {
+            b'_FASTEST_RANK': ranks[fastest],
+            b'_FASTEST_RANK_BYTES': moved[fastest],
+            b'_SLOWEST_RANK': ranks[slowest],
+            b'_SLOWEST_RANK_BYTES': moved[slowest],
+            b'_F_FASTEST_RANK_TIME': times[fastest],
+            b'_F_SLOWEST_RANK_TIME': times[slowest],
+            b'_F_VARIANCE_RANK_TIME': _variance(times),
+            b'_F_VARIANCE_RANK_BYTES': _variance(moved),
+        }
+        suffix = b'\t' + b'\t'.join((self.file, self.mount, self.fs_type)) + b'\n'
+        prefix = b'\t'.join((self.module, b'-1', self.record_id)) + b'\t'
+        lines = []
+        for counter in self.counters:
+            rule, detail = combine_rule(counter)
+            value = self.values[counter]
+            if rule == RANK:
+                value = derived[_RANK_COUNTERS.search(counter).group(0)]
+            elif rule == SLOT:
+                group, kind, slot, part = detail
+                common = sorted(self.slots.get((group, kind), {}).items(), key=lambda item: (-item[1], -item[0]))
+                pair = common[slot - 1] if slot <= len(common) else (0, 0)
+                value = pair[1] if part == b'COUNT' else pair[0]
+            elif rule == MAX_TIME:
+                group, operation, part = detail
+                time, size = self.slowest.get((group, operation), (0.0, 0))
+                value = time if part == b'TIME' else size
+            elif rule == FIRST:
+                value = value[1] if value is not None else -1
+            elif value is None:
+                value = -1
+            lines.append(prefix + counter + b'\t' + _format(counter, value) + suffix)
+        return b''.join(lines)
+
+
+def _variance(values: list) -> float:
+    mean = sum(values) / len(values)
+    return sum((value - mean) ** 2 for value in values) / len(values)
+
+
+def _format(counter: bytes, value) -> bytes:
+    # darshan-parser prints the floating point (_F_) counters with 6 decimals
+    if b'_F_' in counter or isinstance(value, float) and not value.is_integer():
+        return b'%.6f' % value
+    return b'%d' % value
+
+
+def _scan_block(block: bytes) -> tuple:
+    """
+    Aggregate the records of one block of lines.
+
+    Returns:
+        tuple: ({(module, record id): _Record}, index of the line the note goes before or None)
+    """
+    records = {}
+    note = None
+    lines = block.split(b'\n')
+    last = len(lines) - 1
+    for index, line in enumerate(lines):
+        # Comments, blank lines and DXT segments (indented) are not records
+        fields = line.split(b'\t') if line and line[0] not in b'# \r' else ()
+        if len(fields) != 8:
+            if note is None and line.startswith(b'# description of columns'):
+                note = index
+            continue
+        module, rank, record_id, counter, value, file, mount, fs_type = fields
+        try:
+            rank = int(rank)
+        except ValueError:
+            continue
+        if note is None:
+            note = index
+        key = (module, record_id)
+        record = records.get(key)
+        if record is None:
+            record = records[key] = _Record(module, record_id, file, mount, fs_type.rstrip(b'\r'))
+            record.first = index
+        record.size += len(line) + (index < last)
+        try:
+            record.add(rank, counter, value)
+        except ValueError:
+            # A value that is not a number: leave the record as it is
+            record.shared = True
+    return records, note
+
+
+def _rewrite_block(block: bytes, drop: frozenset, inserts: Dict[int, bytes]) -> bytes:
+    """
+    Replace the per-rank records of collapsed files in one block.
+
+    Args:
+        block: Lines of the original trace
+        drop: (module, record id) of the records to leave out
+        inserts: Text written before the line with this index (merged records, the note)
+
+    Returns:
+        bytes: Lines of the collapsed trace
+    """
+    if not drop and not inserts:
+        return block
+    lines = block.split(b'\n')
+    last = len(lines) - 1
+    pieces = []
+    for index, line in enumerate(lines):
+        text = inserts.get(index)
+        if text:
+            pieces.append(text)
+        if drop:
+            # Only records of collapsed files are dropped, and they all have 8 fields
+            fields = line.split(b'\t', 3)
+            if len(fields) == 4 and (fields[0], fields[2]) in drop and line[0] not in b'# ':
+                continue
+        if index < last:
+            pieces.append(line + b'\n')
+        elif line:
+            pieces.append(line)
+    return b''.join(pieces)
+
+
+def _map_ordered(function: Callable, tasks: Iterable[tuple], workers: int) -> Iterator:
+    """
+    Apply a function to every task on a process pool, yielding the results in order.
+
+    At most two tasks per worker are in flight, so blocks are read only as fast as
+    results are consumed. A single task, or a single worker, runs in this process.
+    """
+    tasks = iter(tasks)
+    head = list(itertools.islice(tasks, 2))
+    if workers <= 1 or len(head) < 2:
+        for args in itertools.chain(head, tasks):
+            yield function(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for args in itertools.chain(head, tasks):
+            pending.append(pool.submit(function, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class CollapsePlan:
+    """
+    Result of scanning a trace: which records are merged and the collapsed size.
+
+    Attributes:
+        input_bytes: Size of the original trace
+        output_bytes: Exact size of the collapsed trace
+        records: Number of per-rank records that are merged
+        files: Number of shared records they are merged into
+        max_ranks: Largest number of ranks merged into one record
+    """
+
+    def __init__(self):
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.records = 0
+        self.files = 0
+        self.max_ranks = 0
+        # Per block: (records to drop, text to insert before a line index)
+        self.edits = []
+        # The note, if the trace has no column description or record to put it before
+        self.trailing_note = b''
+
+    @property
+    def note(self) -> str:
+        return COLLAPSE_NOTE.format(records=self.records, files=self.files)
+
+
+def plan_collapse(blocks: Iterable[bytes], workers: int = COLLAPSE_WORKERS) -> CollapsePlan:
+    """
+    Scan a trace once to merge the per-rank records of every file.
+
+    Args:
+        blocks: Blocks of whole lines of the trace
+        workers: Number of processes scanning blocks
+
+    Returns:
+        CollapsePlan: Merged records and size statistics
+    """
+    plan = CollapsePlan()
+    records = {}
+    block_keys = []
+    note = None
+    for index, (block_records, block_note, size) in enumerate(
+            _map_ordered(_scan_block_sized, ((block,) for block in blocks), workers)):
+        plan.input_bytes += size
+        block_keys.append(set(block_records))
+        if note is None and block_note is not None:
+            note = (index, block_note)
+        for key, record in block_records.items():
+            known = records.get(key)
+            if known is None:
+                record.first = (index, record.first)
+                records[key] = record
+            else:
+                known.merge(record)
+
+    # Records that a rank shares with others are merged; files of a single rank stay as they are
+    collapsed = {key: record for key, record in records.items()
+                 if len(record.ranks) > 1 and not record.shared}
+    plan.records = sum(len(record.ranks) for record in collapsed.values())
+    plan.files = len(collapsed)
+    plan.max_ranks = max((len(record.ranks) for record in collapsed.values()), default=0)
+    plan.edits = [(frozenset(keys & collapsed.keys()), {}) for keys in block_keys]
+    plan.output_bytes = plan.input_bytes
+    for record in collapsed.values():
+        block, line = record.first
+        text = record.shared_lines()
+        plan.edits[block][1][line] = text
+        plan.output_bytes += len(text) - record.size
+
+    note_text = plan.note.encode('utf-8')
+    plan.output_bytes += len(note_text)
+    if note is None:
+        plan.trailing_note = note_text
+    else:
+        inserts = plan.edits[note[0]][1]
+        inserts[note[1]] = note_text + inserts.get(note[1], b'')
+    return plan
+
+
+def _scan_block_sized(block: bytes) -> tuple:
+    records, note = _scan_block(block)
+    return records, note, len(block)
+
+
+def collapse_blocks(blocks: Iterable[bytes], plan: CollapsePlan, workers: int = COLLAPSE_WORKERS) -> Iterator[bytes]:
+    """
+    Yield the blocks of the collapsed trace.
+
+    Args:
+        blocks: Blocks of the original trace, the same ones plan_collapse scanned
+        plan: Result of plan_collapse
+        workers: Number of processes rewriting blocks
+
+    Returns:
+        Iterator over the blocks of the collapsed trace, with a note describing the
+        reduction inserted before the column description (or the first record)
+    """
+    tasks = ((block,) + plan.edits[index] for index, block in enumerate(blocks))
+    yield from _map_ordered(_rewrite_block, tasks, workers)
+    if plan.trailing_note:
+        yield plan.trailing_note
+
+
+def file_blocks(file_path: str, block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """Read a file in blocks of whole lines."""
+    with open(file_path, 'rb', buffering=0) as f:
+        for buffer, length in line_blocks(f, block_size):
+            yield bytes(buffer[:length])
+
+
+def text_blocks(lines: Iterable[str], block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """Join text lines into blocks of about block_size bytes."""
+    block = []
+    size = 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= block_size:
+            yield ''.join(block).encode('utf-8')
+            block = []
+            size = 0
+    if block:
+        yield ''.join(block).encode('utf-8')
+
+
+def open_collapsed_stream(file_path: str, plan: Optional[CollapsePlan] = None,
+                          read_lines: Optional[Callable[[], Iterable[str]]] = None,
+                          workers: int = COLLAPSE_WORKERS, block_size: int = BLOCK_SIZE) -> Callable:
+    """
+    Build a stream factory producing the collapsed trace.
+
+    Args:
+        file_path: Path to a darshan-parser text trace
+        plan: Precomputed plan; scanned from the file if not given
+        read_lines: Source of the trace lines in place of the file, e.g. the
+            output of darshan-parser for a .darshan log; called once for the
+            scan and once per opened stream
+        workers: Number of processes scanning and rewriting blocks
+        block_size: Number of bytes per block
+
+    Returns:
+        Callable returning a fresh binary stream of the collapsed trace, with
+        the plan attached as its `plan` attribute and the collapsed lines
+        available from its `read_lines` attribute (e.g. for ion_cli.reduce)
+    """
+    if read_lines is None:
+        def read_blocks():
+            return file_blocks(file_path, block_size)
+    else:
+        def read_blocks():
+            return text_blocks(read_lines(), block_size)
+
+    if plan is None:
+        with phase('collapse scan'):
+            plan = plan_collapse(read_blocks(), workers)
+
+    def open_stream():
+        return IterStream(collapse_blocks(read_blocks(), plan, workers), name=os.path.basename(file_path))
+
+    def collapsed_lines():
+        for block in collapse_blocks(read_blocks(), plan, workers):
+            yield from io.StringIO(block.decode('utf-8'), newline='')
+
+    open_stream.plan = plan
+    open_stream.read_lines = collapsed_lines
+    return open_stream
+
+
+def collapse_file(file_path: str, output_path: str, workers: int = COLLAPSE_WORKERS) -> CollapsePlan:
+    """
+    Write the collapsed form of a trace to a new file.
+
+    Args:
+        file_path: Path to a darshan-parser text trace
+        output_path: Where to write the collapsed trace
+        workers: Number of processes scanning and rewriting blocks
+
+    Returns:
+        CollapsePlan: Size statistics of the reduction
+    """
+    open_stream = open_collapsed_stream(file_path, workers=workers)
+    with open(output_path, 'wb') as out:
+        for block in collapse_blocks(file_blocks(file_path), open_stream.plan, workers):
+            out.write(block)
+    return open_stream.plan
@@ -0,0 +1,423 @@
+"""
+Columnar files of parsed traces.
+
+``ion-cli --convert`` parses a text trace (or the darshan-parser output of a
+.darshan log) once and saves its counter columns, string tables and header
+in one of three formats:
+
+- npz: uncompressed NumPy archive. Its members are stored, so every column
+  is memory-mapped straight from the file when it is opened again.
+- arrow: Arrow IPC file, also memory-mapped (requires pyarrow).
+- parquet: compressed Parquet file, for other tools; it is decoded when
+  opened, so it is smaller but slower to open (requires pyarrow).
+
+Reopening a trace with load_trace costs a few file reads instead of a full
+parse, and only the pages of the columns actually used are read from disk.
+Local commands take these files wherever they take text traces; uploads
+and reductions render them back to darshan-parser text with open_text_stream.
+
+Records and counters come back in darshan-parser order, but comments
+between the module sections and DXT traces are not kept, so the rendered
+text is equivalent to the original rather than identical.
+"""
+
+import io
+import json
+import os
+import struct
+import zipfile
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+from ion_cli.convert import text_file_name
+from ion_cli.darshan import (
+    COLUMN_DTYPES, DEFAULT_BATCH_SIZE, CounterColumns, DarshanTrace, StringTable, TraceHeader, TraceReader,
+    is_float_counter
+)
+from ion_cli.profiling import phase
+from ion_cli.upload import IterStream
+
+
+# Format -> file extension
+FORMATS = {'npz': '.npz', 'arrow': '.arrow', 'parquet': '.parquet'}
+
+# Version of the layout below, stored with every file
+LAYOUT_VERSION = 1
+
+# Name of the JSON member (npz) or schema metadata key (arrow, parquet) holding header and string tables
+META_KEY = 'ion_cli'
+
+# Rows formatted at a time when rendering text
+RENDER_ROWS = 1 << 16
+
+# Size of a zip local file header before its name and extra field
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+
+class ColumnarError(ValueError):
+    """Raised for a file that is not a columnar trace, or a format that cannot be used."""
+
+
+def columnar_format(file_path: str) -> Optional[str]:
+    """
+    Return the columnar format of a file from its extension, e.g. 'run.npz' -> 'npz'.
+
+    Args:
+        file_path: Path of the file
+
+    Returns:
+        str: 'npz', 'arrow' or 'parquet', or None for other files
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    for fmt, fmt_extension in FORMATS.items():
+        if extension == fmt_extension:
+            return fmt
+    return None
+
+
+def output_path(file_path: str, fmt: str) -> str:
+    """
+    Path of the columnar file written next to a trace, e.g. 'run.darshan' -> 'run.npz'.
+    """
+    return os.path.splitext(file_path)[0] + FORMATS[fmt]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ColumnarError("The arrow and parquet formats require the 'pyarrow' package (pip install pyarrow)")
+    return pyarrow
+
+
+def _meta(trace: DarshanTrace, source: Optional[str] = None) -> dict:
+    header = trace.header
+    return {
+        'version': LAYOUT_VERSION,
+        'source': source,
+        'ints': len(trace.ints),
+        'floats': len(trace.floats),
+        'header': {
+            'fields': header.fields,
+            'metadata': header.metadata,
+            'mounts': header.mounts,
+            'comments': header.comments,
+        },
+        'modules': trace.modules.strings,
+        'counters': trace.counters.strings,
+        'files': trace.files.strings,
+        'mount_points': trace.mount_points.strings,
+        'fs_types': trace.fs_types,
+    }
+
+
+def _trace(meta: dict, ints: Dict[str, np.ndarray], floats: Dict[str, np.ndarray]) -> DarshanTrace:
+    if meta.get('version') != LAYOUT_VERSION:
+        raise ColumnarError(f"Unsupported columnar trace layout {meta.get('version')!r}")
+    header = TraceHeader()
+    header.fields = meta['header']['fields']
+    header.metadata = meta['header']['metadata']
+    header.mounts = [tuple(mount) for mount in meta['header']['mounts']]
+    header.comments = meta['header']['comments']
+    return DarshanTrace(header, StringTable(meta['modules']), StringTable(meta['counters']),
+                        StringTable(meta['files']), StringTable(meta['mount_points']),
+                        CounterColumns(np.int64, **ints), CounterColumns(np.float64, **floats),
+                        meta['fs_types'])
+
+
+def save_trace(trace: DarshanTrace, path: str, fmt: Optional[str] = None, source: Optional[str] = None) -> int:
+    """
+    Write a parsed trace to a columnar file.
+
+    Args:
+        trace: Parsed trace
+        path: Output file
+        fmt: 'npz', 'arrow' or 'parquet' (default: from the extension of path)
+        source: Name of the original trace, kept in the file
+
+    Returns:
+        int: Size of the written file in bytes
+
+    Raises:
+        ColumnarError: If the format is unknown or pyarrow is missing
+    """
+    fmt = fmt or columnar_format(path)
+    if fmt not in FORMATS:
+        raise ColumnarError(f"Unknown columnar format for '{path}'; use one of {', '.join(FORMATS)}")
+    meta = _meta(trace, source)
+    with phase(f'write {fmt}'):
+        if fmt == 'npz':
+            _save_npz(trace, path, meta)
+        else:
+            _save_arrow(trace, path, meta, fmt)
+    return os.path.getsize(path)
+
+
+def _save_npz(trace: DarshanTrace, path: str, meta: dict) -> None:
+    arrays = {f'{table}.{name}': column
+              for table in ('ints', 'floats') for name, column in getattr(trace, table).columns.items()}
+    arrays[META_KEY] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    # A temporary name keeps a failed write from leaving a truncated trace behind
+    temporary = path + '.part'
+    with open(temporary, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temporary, path)
+
+
+def _arrow_table(trace: DarshanTrace, meta: dict):
+    pa = _pyarrow()
+    # One table holds both kinds of rows: the integer rows first, then the floating point ones
+    columns = {name: np.concatenate([trace.ints.columns[name], trace.floats.columns[name]])
+               for name in COLUMN_DTYPES}
+    columns['int_value'] = np.concatenate([trace.ints.value, np.zeros(len(trace.floats), dtype=np.int64)])
+    columns['float_value'] = np.concatenate([np.zeros(len(trace.ints), dtype=np.float64), trace.floats.value])
+    table = pa.table({name: pa.array(column) for name, column in columns.items()})
+    return table.replace_schema_metadata({META_KEY: json.dumps(meta)})
+
+
+def _save_arrow(trace: DarshanTrace, path: str, meta: dict, fmt: str) -> None:
+    pa = _pyarrow()
+    table = _arrow_table(trace, meta)
+    temporary = path + '.part'
+    if fmt == 'parquet':
+        pa.parquet.write_table(table, temporary, compression='zstd')
+    else:
+        with pa.OSFile(temporary, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(1, len(table)))
+    os.replace(temporary, path)
+
+
+def load_trace(path: str) -> DarshanTrace:
+    """
+    Open a columnar trace written by save_trace.
+
+    Columns of npz and arrow files are memory-mapped, so opening costs the
+    same whatever the size of the trace; parquet files are decoded.
+
+    Args:
+        path: Path of a .npz, .arrow or .parquet file
+
+    Returns:
+        DarshanTrace: The trace, with read-only columns
+
+    Raises:
+        ColumnarError: If the file is not a columnar trace
+        OSError: If the file cannot be read
+    """
+    fmt = columnar_format(path)
+    if fmt is None:
+        raise ColumnarError(f"'{path}' is not a columnar trace ({', '.join(FORMATS.values())})")
+    with phase(f'open {fmt}'):
+        try:
+            if fmt == 'npz':
+                return _load_npz(path)
+            return _load_arrow(path, fmt)
+        except (KeyError, TypeError, zipfile.BadZipFile, json.JSONDecodeError) as e:
+            raise ColumnarError(f"'{path}' is not a columnar trace: {e}")
+
+
+def _member_arrays(path: str) -> Dict[str, np.ndarray]:
+    """
+    Memory-map the arrays of an uncompressed .npz file.
+    """
+    arrays = {}
+    with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ColumnarError(f"'{path}' is compressed and cannot be memory-mapped")
+            f.seek(info.header_offset)
+            local = _ZIP_LOCAL_HEADER.unpack(f.read(_ZIP_LOCAL_HEADER.size))
+            f.seek(info.header_offset + _ZIP_LOCAL_HEADER.size + local[-2] + local[-1])
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if dtype.hasobject:
+                raise ColumnarError(f"'{path}' holds Python objects in '{name}'")
+            if not np.prod(shape, dtype=np.int64):
+                arrays[name] = np.zeros(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(f, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                     order='F' if fortran_order else 'C')
+    return arrays
+
+
+def _load_npz(path: str) -> DarshanTrace:
+    arrays = _member_arrays(path)
+    meta = json.loads(bytes(arrays.pop(META_KEY)).decode('utf-8'))
+    tables = {'ints': {}, 'floats': {}}
+    for name, column in arrays.items():
+        table, _, column_name = name.partition('.')
+        tables[table][column_name] = column
+    return _trace(meta, tables['ints'], tables['floats'])
+
+
+def _load_arrow(path: str, fmt: str) -> DarshanTrace:
+    pa = _pyarrow()
+    if fmt == 'parquet':
+        table = pa.parquet.read_table(path, memory_map=True)
+    else:
+        # The map stays open as long as the returned columns reference it
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    meta = json.loads(table.schema.metadata[META_KEY.encode()].decode('utf-8'))
+    ints = meta['ints']
+
+    def column(name):
+        # A single chunk is converted without copying it out of the map
+        chunks = table.column(name).chunks
+        if not chunks:
+            return np.zeros(0, dtype=table.schema.field(name).type.to_pandas_dtype())
+        return (chunks[0] if len(chunks) == 1 else pa.concat_arrays(chunks)).to_numpy()
+
+    columns = {name: column(name) for name in COLUMN_DTYPES}
+    int_value, float_value = column('int_value'), column('float_value')
+    int_columns = {name: values[:ints] for name, values in columns.items()}
+    int_columns['value'] = int_value[:ints]
+    float_columns = {name: values[ints:] for name, values in columns.items()}
+    float_columns['value'] = float_value[ints:]
+    return _trace(meta, int_columns, float_columns)
+
+
+def convert_trace(source: Union[str, Callable[[], Iterator[str]]], path: str, fmt: Optional[str] = None,
+                  name: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> DarshanTrace:
+    """
+    Parse a text trace and write it to a columnar file.
+
+    Args:
+        source: Path to a text trace, or a callable returning its lines (e.g. the
+            read_lines of a converted .darshan log, or of a reduced trace)
+        path: Output file
+        fmt: 'npz', 'arrow' or 'parquet' (default: from the extension of path)
+        name: Name of the original trace, kept in the file
+        batch_size: Number of counter rows parsed at a time
+
+    Returns:
+        DarshanTrace: The parsed trace
+    """
+    reader = TraceReader(source if isinstance(source, str) else source(), batch_size)
+    trace = reader.read()
+    save_trace(trace, path, fmt, source=name or (os.path.basename(source) if isinstance(source, str) else None))
+    return trace
+
+
+def check_trace(path: str) -> List[str]:
+    """
+    Check that the columns of a columnar trace are consistent.
+
+    Args:
+        path: Path of a .npz, .arrow or .parquet file
+
+    Returns:
+        list: Descriptions of the problems found (empty for a valid trace)
+    """
+    try:
+        trace = load_trace(path)
+    except (ColumnarError, OSError, ValueError) as e:
+        return [str(e)]
+    problems = []
+    if not trace.header.version:
+        problems.append("The job header has no darshan log version")
+    tables = {'module': trace.modules, 'counter': trace.counters, 'file': trace.files, 'mount': trace.mount_points}
+    float_counters = np.array([is_float_counter(name) for name in trace.counters] or [False])
+    for label, table in (('integer', trace.ints), ('floating point', trace.floats)):
+        if any(len(column) != len(table) for column in table.columns.values()):
+            problems.append(f"The {label} columns have different lengths")
+            continue
+        dangling = [name for name, strings in tables.items() if len(table) and
+                    (getattr(table, name).min() < 0 or getattr(table, name).max() >= len(strings))]
+        for name in dangling:
+            problems.append(f"The {label} {name} column refers to strings that do not exist")
+        if len(table) and not dangling and np.any(float_counters[table.counter] != (table is trace.floats)):
+            problems.append(f"The {label} rows hold counters of the other kind")
+    return problems
+
+
+def _order(trace: DarshanTrace) -> np.ndarray:
+    """
+    Row order of the text form: records in order of appearance, and the counters of a record in order of
+    first appearance in the trace, which is the order in which darshan-parser prints them.
+    """
+    counter = np.concatenate([trace.ints.counter, trace.floats.counter])
+    module = np.concatenate([trace.ints.module, trace.floats.module])
+    rank = np.concatenate([trace.ints.rank, trace.floats.rank])
+    record_id = np.concatenate([trace.ints.record_id, trace.floats.record_id])
+    rows = np.arange(len(module))
+    if not len(rows):
+        return rows
+    keys = np.lexsort((record_id, rank, module))
+    sorted_keys = np.stack([module[keys].astype(np.int64), rank[keys], record_id[keys].view(np.int64)])
+    starts = np.flatnonzero(np.r_[True, np.any(sorted_keys[:, 1:] != sorted_keys[:, :-1], axis=0)])
+    # First row of every record, spread back to all rows of the record
+    group = np.empty(len(rows), dtype=np.int64)
+    group[keys] = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(keys)]))
+    first = np.minimum.reduceat(keys, starts)[group]
+    return np.lexsort((rows, counter, first))
+
+
+def render_lines(trace: DarshanTrace) -> Iterator[str]:
+    """
+    Yield the darshan-parser text form of a trace.
+
+    Args:
+        trace: Parsed or loaded trace
+
+    Returns:
+        Iterator over the header comments and record lines
+    """
+    yield from trace.header.comments
+    order = _order(trace)
+    ints = len(trace.ints)
+    columns = {name: np.concatenate([trace.ints.columns[name], trace.floats.columns[name]])
+               for name in COLUMN_DTYPES}
+    modules, counters, files = trace.modules.strings, trace.counters.strings, trace.files.strings
+    mounts = trace.mount_points.strings
+    fs_types = [trace.fs_types.get(mount, 'UNKNOWN') for mount in mounts]
+    for start in range(0, len(order), RENDER_ROWS):
+        rows = order[start:start + RENDER_ROWS]
+        is_float = rows >= ints
+        texts = np.empty(len(rows), dtype=object)
+        texts[~is_float] = [str(value) for value in trace.ints.value[rows[~is_float]].tolist()]
+        texts[is_float] = [f'{value:.6f}' for value in trace.floats.value[rows[is_float] - ints].tolist()]
+        yield ''.join(
+            f'{modules[module]}\t{rank}\t{record_id}\t{counters[counter]}\t{text}\t{files[file]}\t'
+            f'{mounts[mount]}\t{fs_types[mount]}\n'
+            for module, rank, record_id, counter, text, file, mount in zip(
+                columns['module'][rows].tolist(), columns['rank'][rows].tolist(),
+                columns['record_id'][rows].tolist(), columns['counter'][rows].tolist(), texts.tolist(),
+                columns['file'][rows].tolist(), columns['mount'][rows].tolist())
+        )
+
+
+def _blocks(lines: Iterator[str]) -> Iterator[bytes]:
+    for text in lines:
+        yield text.encode('utf-8')
+
+
+def open_text_stream(file_path: str) -> Callable[[], io.RawIOBase]:
+    """
+    Build a stream factory producing the darshan-parser text form of a columnar trace.
+
+    Args:
+        file_path: Path of a .npz, .arrow or .parquet file
+
+    Returns:
+        Callable returning a fresh binary stream of the text trace, with a
+        `read_lines` attribute returning the trace line by line (as used by
+        reduction and rank collapsing)
+    """
+    def read_lines():
+        for text in render_lines(load_trace(file_path)):
+            yield from text.splitlines(keepends=True)
+
+    def open_stream():
+        return IterStream(_blocks(render_lines(load_trace(file_path))), name=text_file_name(file_path))
+
+    open_stream.read_lines = read_lines
+    return open_stream
+
@@ -14,6 +14,101 @@ MODELS_LIST = SUPPORTED_MODELS = [
     "anthropic/claude-3-7-sonnet-20250219"
 ]
 
+DEFAULT_MODEL = "anthropic/claude-3-7-sonnet-20250219"
+
 VALID_TASK_STATUSES = ["completed", "failed", "not_started"]
 
-VALID_STATUS_FOR_VIEW = ["completed"]
\ No newline at end of file
+VALID_STATUS_FOR_VIEW = ["completed"]
+
+# HTTP client settings shared by all API calls
+API_POOL_SIZE = int(os.environ.get("ION_API_POOL_SIZE", "16"))
+
+API_CONNECT_TIMEOUT = float(os.environ.get("ION_API_CONNECT_TIMEOUT", "10"))
+
+API_READ_TIMEOUT = float(os.environ.get("ION_API_READ_TIMEOUT", "60"))
+
+# Retries of idempotent API reads (user, user_traces, final_diagnosis) after connection errors,
+# timeouts and 429/502/503/504: delays grow from API_BACKOFF_BASE seconds, doubling up to
+# API_BACKOFF_MAX, with full jitter
+API_MAX_RETRIES = int(os.environ.get("ION_API_MAX_RETRIES", "3"))
+
+API_BACKOFF_BASE = float(os.environ.get("ION_API_BACKOFF_BASE", "0.5"))
+
+API_BACKOFF_MAX = float(os.environ.get("ION_API_BACKOFF_MAX", "10"))
+
+# Seconds after which a latency-sensitive read is sent a second time if it has not been
+# answered yet; the first answer wins (0 disables hedging)
+API_HEDGE_DELAY = float(os.environ.get("ION_API_HEDGE_DELAY", "0"))
+
+# Gzip large JSON request bodies (the server must accept Content-Encoding: gzip)
+API_COMPRESS_REQUESTS = os.environ.get("ION_API_COMPRESS_REQUESTS", "").lower() in ("1", "true", "yes")
+
+# Chunked upload settings
+UPLOAD_CHUNK_SIZE = int(os.environ.get("ION_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+UPLOAD_MAX_RETRIES = int(os.environ.get("ION_UPLOAD_MAX_RETRIES", "5"))
+
+UPLOAD_TIMEOUT = float(os.environ.get("ION_UPLOAD_TIMEOUT", "60"))
+
+# Number of files (or shards of a trace) uploaded at the same time
+UPLOAD_CONCURRENCY = int(os.environ.get("ION_UPLOAD_CONCURRENCY", "4"))
+
+# Number of rank ranges a trace is split into by sharded uploads (--shard rank)
+UPLOAD_SHARD_RANKS = int(os.environ.get("ION_UPLOAD_SHARD_RANKS", "4"))
+
+# Default on-the-fly compression for uploads ("gzip", "zstd" or unset)
+UPLOAD_COMPRESSION = os.environ.get("ION_UPLOAD_COMPRESSION") or None
+
+# Content encodings of chunked uploads
+UPLOAD_ENCODINGS = ["identity", "gzip", "zstd"]
+
+# Program that converts binary .darshan logs to text before upload; empty uploads the binary logs as is
+DARSHAN_PARSER = os.environ.get("ION_DARSHAN_PARSER", "darshan-parser")
+
+# Blocks of a text trace scanned in parallel by the full structural check and --summarize
+VALIDATE_WORKERS = int(os.environ.get("ION_VALIDATE_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Processes scanning and rewriting blocks of a text trace for --collapse_ranks
+COLLAPSE_WORKERS = int(os.environ.get("ION_COLLAPSE_WORKERS", os.cpu_count() or 1))
+
+# Files listed by --summarize, by bytes moved
+SUMMARY_TOP_FILES = int(os.environ.get("ION_SUMMARY_TOP_FILES", 10))
+
+# Local state (upload ledger, caches)
+ION_HOME = os.environ.get("ION_HOME", os.path.join(os.path.expanduser("~"), ".ion"))
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Seconds a verified email -> user id resolution is reused without asking the server (0 disables)
+USER_CACHE_TTL = float(os.environ.get("ION_USER_CACHE_TTL", 24 * 60 * 60))
+
+# Seconds a cached trace list may be used for status checks without revalidating it
+TRACE_STATUS_MAX_AGE = float(os.environ.get("ION_TRACE_STATUS_MAX_AGE", "15"))
+
+# Batch analysis launches: parallel requests, and a token bucket of LAUNCH_RATE requests/s with bursts of LAUNCH_BURST
+LAUNCH_CONCURRENCY = int(os.environ.get("ION_LAUNCH_CONCURRENCY", "8"))
+
+LAUNCH_RATE = float(os.environ.get("ION_LAUNCH_RATE", "5"))
+
+LAUNCH_BURST = int(os.environ.get("ION_LAUNCH_BURST", "10"))
+
+LAUNCH_MAX_RETRIES = int(os.environ.get("ION_LAUNCH_MAX_RETRIES", "5"))
+
+# Polling of --wait / --watch: delay starts at WATCH_POLL_INITIAL seconds, grows by WATCH_POLL_FACTOR
+# while nothing changes up to WATCH_POLL_MAX, and up to WATCH_POLL_JITTER of it is randomised
+WATCH_POLL_INITIAL = float(os.environ.get("ION_WATCH_POLL_INITIAL", "2"))
+
+WATCH_POLL_MAX = float(os.environ.get("ION_WATCH_POLL_MAX", "60"))
+
+WATCH_POLL_FACTOR = float(os.environ.get("ION_WATCH_POLL_FACTOR", "1.5"))
+
+WATCH_POLL_JITTER = float(os.environ.get("ION_WATCH_POLL_JITTER", "0.2"))
+
+# Maximum number of operations an AsyncIONClient runs at the same time
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("ION_ASYNC_MAX_CONCURRENCY", "64"))
+
+# Size bound of the local cache of completed diagnoses; least recently viewed entries are evicted first
+DIAGNOSIS_CACHE_MAX_BYTES = int(os.environ.get("ION_DIAGNOSIS_CACHE_MB", "64")) * 1024 * 1024
+
+# Console output: 'rich' (styled, with progress), 'plain' (unstyled text) or 'quiet' (results and errors only)
+OUTPUT_MODE = os.environ.get("ION_OUTPUT", "rich")
@@ -0,0 +1,116 @@
+"""
+Local conversion of binary .darshan logs to darshan-parser text.
+
+When darshan-parser is installed, its output is streamed straight into the
+upload (and optionally through reduction and compression) instead of being
+written to a temporary file. Every call of a stream factory starts a new
+parser process, so a resumed upload simply converts the log again. Batch
+uploads run one parser per upload worker, so conversions of many logs
+overlap.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import BinaryIO, Callable, Iterator, Optional
+
+from ion_cli.config import DARSHAN_PARSER
+from ion_cli.upload import IterStream, UploadError
+
+
+# Size of the blocks read from the parser's output
+BLOCK_SIZE = 1 << 20
+
+
+class ConversionError(UploadError):
+    """Raised when darshan-parser fails on a log."""
+
+
+def is_darshan_log(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() == '.darshan'
+
+
+def text_file_name(file_path: str) -> str:
+    """
+    Name under which the converted form of a log is uploaded, e.g. 'run.darshan' -> 'run.txt'.
+    """
+    return os.path.splitext(os.path.basename(file_path))[0] + '.txt'
+
+
+def find_darshan_parser(parser: Optional[str] = None) -> Optional[str]:
+    """
+    Locate the darshan-parser executable.
+
+    Args:
+        parser: Program name or path; defaults to DARSHAN_PARSER
+
+    Returns:
+        str: Full path of the executable, or None if it is not installed
+    """
+    parser = DARSHAN_PARSER if parser is None else parser
+    return shutil.which(parser) if parser else None
+
+
+def parser_output(file_path: str, parser: str, block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Run darshan-parser on a log and yield its output in blocks.
+
+    The process is killed if the consumer stops early.
+
+    Args:
+        file_path: Path to the .darshan log
+        parser: Path of the darshan-parser executable
+        block_size: Maximum size of the yielded blocks
+
+    Returns:
+        Iterator over the text trace as bytes
+
+    Raises:
+        ConversionError: If darshan-parser exits with an error
+    """
+    # stderr goes to an anonymous file so a chatty parser can never block on a full pipe
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen([parser, file_path], stdout=subprocess.PIPE, stderr=errors,
+                                   stdin=subprocess.DEVNULL)
+        try:
+            while True:
+                block = process.stdout.read(block_size)
+                if not block:
+                    break
+                yield block
+            if process.wait() != 0:
+                errors.seek(0)
+                message = errors.read().decode('utf-8', 'replace').strip().splitlines()
+                raise ConversionError(f"darshan-parser failed on '{file_path}' (exit status {process.returncode})"
+                                      + (f": {message[-1]}" if message else ""))
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+
+
+def open_darshan_stream(file_path: str, parser: str) -> Callable[[], BinaryIO]:
+    """
+    Build a stream factory producing the text form of a .darshan log.
+
+    Args:
+        file_path: Path to the .darshan log
+        parser: Path of the darshan-parser executable
+
+    Returns:
+        Callable returning a fresh binary stream of the text trace, with a
+        `read_lines` attribute returning the trace line by line (as used by
+        reduction)
+    """
+    def open_stream():
+        return IterStream(parser_output(file_path, parser), name=text_file_name(file_path))
+
+    def read_lines():
+        with io.TextIOWrapper(open_stream(), encoding='utf-8', newline='') as text:
+            yield from text
+
+    open_stream.read_lines = read_lines
+    return open_stream
@@ -0,0 +1,403 @@
+"""
+Streaming parser for darshan-parser text output.
+
+Record lines have the form::
+
+    <module> <rank> <record id> <counter> <value> <file name> <mount pt> <fs type>
+
+and are parsed into compact NumPy columns. File names, mount points, modules
+and counter names are interned into string tables so every row only stores
+small integer codes. Integer and floating point (``*_F_*``) counters are kept
+in separate tables so values keep their native dtype.
+
+Large traces can be consumed batch by batch with ``TraceReader.batches`` so
+memory stays bounded by the batch size and the number of distinct strings.
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ion_cli.profiling import nullcontext, phase
+
+
+DEFAULT_BATCH_SIZE = 1 << 18
+
+COLUMN_DTYPES = {
+    'module': np.int16,
+    'rank': np.int64,
+    'record_id': np.uint64,
+    'counter': np.int32,
+    'file': np.int32,
+    'mount': np.int32,
+}
+
+
+def is_float_counter(counter_name: str) -> bool:
+    """
+    Check whether a counter holds a floating point value (e.g. POSIX_F_READ_TIME).
+
+    Args:
+        counter_name: Darshan counter name
+
+    Returns:
+        bool: True for floating point counters
+    """
+    return '_F_' in counter_name
+
+
+class StringTable:
+    """
+    Interns strings to dense integer codes.
+    """
+
+    def __init__(self, strings: Iterable[str] = ()):
+        self.strings = []
+        self.index = {}
+        for string in strings:
+            self.intern(string)
+
+    def intern(self, string: str) -> int:
+        code = self.index.get(string)
+        if code is None:
+            code = self.index[string] = len(self.strings)
+            self.strings.append(string)
+        return code
+
+    def code(self, string: str) -> int:
+        """Return the code of a string, or -1 if it was never interned."""
+        return self.index.get(string, -1)
+
+    def __getitem__(self, code: int) -> str:
+        return self.strings[code]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.strings)
+
+
+class TraceHeader:
+    """
+    Job-level information from the comment header of a trace.
+
+    Attributes:
+        fields: Every ``# key: value`` pair of the job header, as strings
+        metadata: Parsed ``# metadata: key = value`` entries
+        mounts: (mount point, fs type) pairs from the mount table
+        comments: Comment and blank lines before the first record, as read
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.metadata = {}
+        self.mounts = []
+        self.comments = []
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.fields.get('darshan log version')
+
+    @property
+    def exe(self) -> Optional[str]:
+        return self.fields.get('exe')
+
+    @property
+    def nprocs(self) -> Optional[int]:
+        value = self.fields.get('nprocs')
+        return int(value) if value is not None else None
+
+    @property
+    def run_time(self) -> Optional[float]:
+        value = self.fields.get('run time')
+        return float(value) if value is not None else None
+
+    def parse_comment(self, line: str, in_job_header: bool) -> None:
+        """
+        Absorb one comment line.
+
+        Args:
+            line: Comment line, including the leading '#'
+            in_job_header: Whether ``key: value`` pairs still belong to the job header
+        """
+        body = line[1:].strip()
+        if body.startswith('mount entry:'):
+            parts = body[len('mount entry:'):].split()
+            if len(parts) >= 2:
+                self.mounts.append((parts[0], parts[1]))
+            return
+        if not in_job_header or not line.startswith('# ') or line[2:3].isspace():
+            return
+        key, sep, value = body.partition(':')
+        if not sep:
+            return
+        key, value = key.strip(), value.strip()
+        if key == 'metadata':
+            meta_key, meta_sep, meta_value = value.partition('=')
+            if meta_sep:
+                self.metadata[meta_key.strip()] = meta_value.strip()
+            return
+        self.fields.setdefault(key, value)
+
+
+class CounterColumns:
+    """
+    Column store of counter rows sharing one value dtype.
+
+    Attributes:
+        module, rank, record_id, counter, file, mount: Per-row columns; string
+            valued columns hold codes into the owning trace's string tables
+        value: Counter values (int64 or float64)
+    """
+
+    def __init__(self, value_dtype, **columns):
+        for name, dtype in COLUMN_DTYPES.items():
+            setattr(self, name, np.asarray(columns.get(name, ()), dtype=dtype))
+        self.value = np.asarray(columns.get('value', ()), dtype=value_dtype)
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        result = {name: getattr(self, name) for name in COLUMN_DTYPES}
+        result['value'] = self.value
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def select(self, mask) -> 'CounterColumns':
+        """
+        Return the rows selected by a boolean mask or index array.
+        """
+        return CounterColumns(self.value.dtype, **{name: column[mask] for name, column in self.columns.items()})
+
+    @classmethod
+    def concat(cls, parts: List['CounterColumns'], value_dtype) -> 'CounterColumns':
+        if not parts:
+            return cls(value_dtype)
+        return cls(value_dtype, **{
+            name: np.concatenate([part.columns[name] for part in parts]) for name in parts[0].columns
+        })
+
+
+class DarshanTrace:
+    """
+    Parsed trace: header, string tables and integer/float counter columns.
+
+    Batches yielded by ``TraceReader.batches`` are DarshanTrace objects too;
+    they share header and string tables with the reader and hold only the
+    rows of their batch.
+    """
+
+    def __init__(self, header: TraceHeader, modules: StringTable, counters: StringTable,
+                 files: StringTable, mount_points: StringTable, ints: CounterColumns,
+                 floats: CounterColumns, fs_types: Optional[Dict[str, str]] = None):
+        self.header = header
+        self.modules = modules
+        self.counters = counters
+        self.files = files
+        self.mount_points = mount_points
+        self.ints = ints
+        self.floats = floats
+        self.fs_types = fs_types if fs_types is not None else {}
+
+    def __len__(self) -> int:
+        return len(self.ints) + len(self.floats)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ints.nbytes + self.floats.nbytes
+
+    def table_for(self, counter_name: str) -> CounterColumns:
+        """Return the integer or float table that holds the given counter."""
+        return self.floats if is_float_counter(counter_name) else self.ints
+
+    def counter(self, counter_name: str) -> CounterColumns:
+        """
+        Select all rows of one counter.
+
+        Args:
+            counter_name: Darshan counter name, e.g. 'POSIX_BYTES_READ'
+
+        Returns:
+            CounterColumns: Matching rows (empty if the counter never appears)
+        """
+        table = self.table_for(counter_name)
+        return table.select(table.counter == self.counters.code(counter_name))
+
+
+class _ColumnBuilder:
+    """
+    Accumulates one batch of rows.
+
+    Consecutive lines of a record share module, rank, id, file and mount, so
+    those are stored once per run of lines and expanded when the batch is built.
+    """
+
+    def __init__(self, value_typecode: str):
+        self.value_typecode = value_typecode
+        self.run = array('q')
+        self.counter = array('l')
+        self.value = array(value_typecode)
+
+    def build(self, runs: Dict[str, array], value_dtype) -> CounterColumns:
+        run = np.frombuffer(self.run, dtype=np.int64) if len(self.run) else np.zeros(0, dtype=np.int64)
+        columns = {name: np.asarray(runs[name], dtype=COLUMN_DTYPES[name])[run] for name in runs}
+        columns['counter'] = np.asarray(self.counter, dtype=np.int32)
+        columns['value'] = np.frombuffer(self.value, dtype=value_dtype) if len(self.value) else ()
+        return CounterColumns(value_dtype, **columns)
+
+
+class TraceReader:
+    """
+    Streams darshan-parser text output into columnar batches.
+
+    Args:
+        source: Path to a text trace, or an iterable of text lines
+        batch_size: Maximum number of counter rows per batch
+    """
+
+    def __init__(self, source: Union[str, Iterable[str]], batch_size: int = DEFAULT_BATCH_SIZE):
+        self.source = source
+        self.batch_size = batch_size
+        self.header = TraceHeader()
+        self.modules = StringTable()
+        self.counters = StringTable()
+        self.files = StringTable()
+        self.mount_points = StringTable()
+        self.fs_types = {}
+        self.lines = 0
+        self.skipped_lines = 0
+        self._counter_is_float = []
+
+    def _open(self):
+        if isinstance(self.source, str):
+            return open(self.source, 'r', encoding='utf-8', errors='replace', buffering=1 << 20)
+        return nullcontext(self.source)
+
+    def _trace(self, ints: CounterColumns, floats: CounterColumns) -> DarshanTrace:
+        return DarshanTrace(self.header, self.modules, self.counters, self.files, self.mount_points,
+                            ints, floats, self.fs_types)
+
+    def batches(self) -> Iterator[DarshanTrace]:
+        """
+        Parse the source, yielding a DarshanTrace per batch of rows.
+        """
+        for ints, floats in self._column_batches():
+            yield self._trace(ints, floats)
+
+    def read(self) -> DarshanTrace:
+        """
+        Parse the whole source into a single DarshanTrace.
+        """
+        int_parts, float_parts = [], []
+        with phase('parse trace'):
+            for ints, floats in self._column_batches():
+                int_parts.append(ints)
+                float_parts.append(floats)
+        return self._trace(CounterColumns.concat(int_parts, np.int64),
+                           CounterColumns.concat(float_parts, np.float64))
+
+    def _column_batches(self) -> Iterator[Tuple[CounterColumns, CounterColumns]]:
+        header = self.header
+        counter_index = self.counters.index
+        counter_is_float = self._counter_is_float
+        in_job_header = True
+        in_preamble = True
+
+        rows = 0
+        last_key = None
+        run = -1
+
+        def new_batch():
+            return ({name: array('q') for name in ('module', 'rank', 'file', 'mount')},
+                    array('Q'), _ColumnBuilder('q'), _ColumnBuilder('d'))
+
+        def flush():
+            run_columns = dict(runs)
+            run_columns['record_id'] = record_ids
+            return ints.build(run_columns, np.int64), floats.build(run_columns, np.float64)
+
+        runs, record_ids, ints, floats = new_batch()
+        with self._open() as lines:
+            for line in lines:
+                self.lines += 1
+                if not line or line[0] == '#' or line == '\n':
+                    if in_preamble and line:
+                        header.comments.append(line)
+                    if line and line[0] == '#':
+                        if line.startswith('# description of columns'):
+                            in_job_header = False
+                        header.parse_comment(line, in_job_header)
+                    continue
+
+                fields = line.rstrip('\r\n').split('\t')
+                if len(fields) != 8:
+                    fields = line.split()
+                    if len(fields) != 8:
+                        self.skipped_lines += 1
+                        continue
+                in_job_header = in_preamble = False
+
+                key = (fields[0], fields[1], fields[2], fields[5])
+                if key != last_key:
+                    try:
+                        rank = int(fields[1])
+                        record_id = int(fields[2])
+                    except ValueError:
+                        self.skipped_lines += 1
+                        continue
+                    last_key = key
+                    runs['module'].append(self.modules.intern(fields[0]))
+                    runs['rank'].append(rank)
+                    runs['file'].append(self.files.intern(fields[5]))
+                    runs['mount'].append(self.mount_points.intern(fields[6]))
+                    record_ids.append(record_id)
+                    self.fs_types.setdefault(fields[6], fields[7])
+                    run = len(record_ids) - 1
+
+                counter = fields[3]
+                code = counter_index.get(counter)
+                if code is None:
+                    code = self.counters.intern(counter)
+                    counter_is_float.append(is_float_counter(counter))
+                try:
+                    if counter_is_float[code]:
+                        floats.value.append(float(fields[4]))
+                        builder = floats
+                    else:
+                        ints.value.append(int(fields[4]))
+                        builder = ints
+                except (ValueError, OverflowError):
+                    self.skipped_lines += 1
+                    continue
+                builder.run.append(run)
+                builder.counter.append(code)
+
+                rows += 1
+                if rows >= self.batch_size:
+                    yield flush()
+                    runs, record_ids, ints, floats = new_batch()
+                    rows = 0
+                    last_key = None
+        if rows:
+            yield flush()
+
+
+def parse_trace(source: Union[str, Iterable[str]], batch_size: int = DEFAULT_BATCH_SIZE) -> DarshanTrace:
+    """
+    Parse a darshan-parser text dump into a DarshanTrace.
+
+    Args:
+        source: Path to a text trace, or an iterable of text lines
+        batch_size: Number of rows accumulated before converting to arrays
+
+    Returns:
+        DarshanTrace: Header, string tables and counter columns
+    """
+    return TraceReader(source, batch_size).read()
@@ -0,0 +1,145 @@
+"""
+Local cache of completed diagnoses.
+
+A diagnosis never changes once its analysis has completed, so it is stored
+in ION_HOME/diagnoses.sqlite the first time it is viewed and rendered from
+there afterwards, also without network access. Entries are keyed by trace
+name, model and content version (the content hash from the upload ledger,
+or the upload date for traces uploaded elsewhere), so re-uploading or
+re-analysing a trace never shows an outdated diagnosis. The cache is bounded
+in size and evicts the least recently viewed entries first.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+from ion_cli.config import DIAGNOSIS_CACHE_MAX_BYTES, ION_HOME
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diagnoses (
+    endpoint TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    trace_name TEXT NOT NULL,
+    model TEXT NOT NULL,
+    version TEXT NOT NULL,
+    content TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, user_id, trace_name, model, version)
+);
+"""
+
+
+class DiagnosisCache:
+    """
+    SQLite-backed, size-bounded LRU cache of diagnoses.
+
+    Args:
+        path: Location of the database (defaults to ION_HOME/diagnoses.sqlite)
+        max_bytes: Total size of cached content and sources to keep
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DIAGNOSIS_CACHE_MAX_BYTES):
+        self.path = path or os.path.join(ION_HOME, 'diagnoses.sqlite')
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'DiagnosisCache':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get(self, endpoint: str, user_id: str, trace_name: str, model: Optional[str] = None,
+            version: Optional[str] = None) -> Optional[Tuple[str, list, str]]:
+        """
+        Look a diagnosis up and mark it as recently used.
+
+        Args:
+            endpoint: Base URL of the ION API
+            user_id: User's ID
+            trace_name: Name of the trace
+            model: Model of the analysis; None accepts any (the most recently viewed wins)
+            version: Content version of the trace; None accepts any
+
+        Returns:
+            tuple: (content, sources, model), or None if nothing matches
+        """
+        query = ("SELECT model, version, content, sources FROM diagnoses "
+                 "WHERE endpoint = ? AND user_id = ? AND trace_name = ?")
+        params = [endpoint, user_id, trace_name]
+        if model is not None:
+            query += " AND model = ?"
+            params.append(model)
+        if version is not None:
+            query += " AND version = ?"
+            params.append(version)
+        row = self.connection.execute(query + " ORDER BY accessed_at DESC LIMIT 1", params).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute(
+                "UPDATE diagnoses SET accessed_at = ? WHERE endpoint = ? AND user_id = ? AND trace_name = ? "
+                "AND model = ? AND version = ?",
+                (time.time(), endpoint, user_id, trace_name, row[0], row[1])
+            )
+        return row[2], json.loads(row[3]), row[0]
+
+    def put(self, endpoint: str, user_id: str, trace_name: str, model: str, version: str,
+            content: str, sources: list) -> None:
+        """
+        Store a diagnosis, evicting least recently used entries beyond max_bytes.
+        """
+        sources_json = json.dumps(sources)
+        size = len(content.encode('utf-8')) + len(sources_json.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO diagnoses "
+                "(endpoint, user_id, trace_name, model, version, content, sources, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (endpoint, user_id, trace_name, model, version, content, sources_json, size, time.time())
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM diagnoses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.connection.execute("SELECT rowid, size FROM diagnoses ORDER BY accessed_at").fetchall()
+        evicted = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        self.connection.executemany("DELETE FROM diagnoses WHERE rowid = ?", evicted)
+
+    def forget(self, endpoint: str, user_id: str, trace_name: str) -> int:
+        """
+        Drop every cached diagnosis of a trace, e.g. after it was deleted.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "DELETE FROM diagnoses WHERE endpoint = ? AND user_id = ? AND trace_name = ?",
+                (endpoint, user_id, trace_name)
+            )
+        return cursor.rowcount
+
+    @property
+    def total_bytes(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM diagnoses").fetchone()[0]
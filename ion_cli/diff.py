@@ -0,0 +1,353 @@
+"""
+Comparison of traces of the same application run in different configurations.
+
+Every trace is streamed through TraceReader batch by batch and reduced to
+one value per (file, module, counter): records of the same file written by
+different ranks are summed, so memory is bounded by the number of distinct
+files and counters rather than by the number of records. The reduced traces
+are then aligned by file path and module in one NumPy matrix (a row per
+counter, a column per trace), and the counters that changed the most
+against the first trace are ranked in three categories:
+
+- bytes: *_BYTES_READ, *_BYTES_WRITTEN
+- time: *_F_READ_TIME, *_F_WRITE_TIME, *_F_META_TIME
+- operations: calls such as *_OPENS, *_READS, *_WRITES, *_SEEKS, *_STATS
+
+Counters that are not sums over the records (timestamps, ranks, variances,
+maxima) are not compared.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from ion_cli.darshan import DEFAULT_BATCH_SIZE, DarshanTrace, StringTable, TraceHeader, TraceReader
+from ion_cli.profiling import phase
+
+
+KIND_BYTES = 'bytes'
+KIND_TIME = 'time'
+KIND_OPERATIONS = 'operations'
+KINDS = [KIND_BYTES, KIND_TIME, KIND_OPERATIONS]
+
+# Counter name, after the module prefix, -> kind
+_SUFFIX_KINDS = {
+    'BYTES_READ': KIND_BYTES,
+    'BYTES_WRITTEN': KIND_BYTES,
+    'F_READ_TIME': KIND_TIME,
+    'F_WRITE_TIME': KIND_TIME,
+    'F_META_TIME': KIND_TIME,
+}
+_SUFFIX_KINDS.update((suffix, KIND_OPERATIONS) for suffix in [
+    'OPENS', 'FDOPENS', 'READS', 'WRITES', 'SEEKS', 'STATS', 'MMAPS', 'FSYNCS', 'FDSYNCS', 'SYNCS', 'FLUSHES',
+    'DUPS', 'FILENOS', 'RENAME_SOURCES', 'RENAME_TARGETS', 'VIEWS', 'INDEP_OPENS', 'COLL_OPENS',
+    'INDEP_READS', 'INDEP_WRITES', 'COLL_READS', 'COLL_WRITES', 'SPLIT_READS', 'SPLIT_WRITES',
+    'NB_READS', 'NB_WRITES',
+])
+
+# Per-file settings shown next to the job header when they differ between traces
+SETTING_COUNTERS = ['LUSTRE_STRIPE_SIZE', 'LUSTRE_STRIPE_WIDTH']
+
+# Layout of the int64 key of a (file, module, counter) row
+_COUNTER_BITS = 20
+_MODULE_BITS = 8
+
+# Relative differences below this are taken as equal values
+_TOLERANCE = 1e-9
+
+TOP_CHANGES = 10
+
+
+def counter_kind(counter_name: str) -> Optional[str]:
+    """
+    Return the category of a counter compared by traces diffs.
+
+    Args:
+        counter_name: Darshan counter name, e.g. 'POSIX_BYTES_READ'
+
+    Returns:
+        str: One of KINDS, or None for counters that are not compared
+    """
+    module, _, suffix = counter_name.partition('_')
+    if module == 'HEATMAP':
+        return None
+    return _SUFFIX_KINDS.get(suffix)
+
+
+class ReducedTrace:
+    """
+    Counter sums of one trace per (file, module, counter).
+
+    Attributes:
+        path: Path of the trace
+        header: Job header of the trace
+        files, modules, counters: String tables the codes of `key` refer to
+        key: Sorted int64 keys packing (file, module, counter) codes
+        value: Sum of the counter over the records of the file (-1 values count as 0)
+        settings: Distinct values of every counter in SETTING_COUNTERS
+        rows: Number of counter rows read
+    """
+
+    def __init__(self, path: str, header: TraceHeader, files: StringTable, modules: StringTable,
+                 counters: StringTable, key, value, settings: Dict[str, List[float]], rows: int):
+        self.path = path
+        self.header = header
+        self.files = files
+        self.modules = modules
+        self.counters = counters
+        self.key = key
+        self.value = value
+        self.settings = settings
+        self.rows = rows
+
+
+def reduce_trace(source: Union[str, Iterable[str], DarshanTrace], path: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> ReducedTrace:
+    """
+    Read a trace and sum its compared counters per (file, module).
+
+    Args:
+        source: Path to a text trace, an iterable of its text lines, or a
+            trace that is already parsed (e.g. opened from a columnar file)
+        path: Name of the trace in reports (default: source, if a path)
+        batch_size: Number of counter rows parsed at a time
+
+    Returns:
+        ReducedTrace: Counter sums of the trace
+    """
+    if isinstance(source, DarshanTrace):
+        # Header and string tables are read from the trace like from a reader
+        reader, batches = source, [source]
+    else:
+        reader = TraceReader(source, batch_size)
+        batches = reader.batches()
+    key = np.zeros(0, dtype=np.int64)
+    value = np.zeros(0, dtype=np.float64)
+    settings = {}
+    rows = 0
+    with phase('reduce trace'):
+        for batch in batches:
+            rows += len(batch)
+            names = reader.counters.strings
+            compared = np.array([counter_kind(name) is not None for name in names], dtype=bool)
+            for table in (batch.ints, batch.floats):
+                if not len(table):
+                    continue
+                kept = compared[table.counter]
+                batch_key = _pack(table.file[kept], table.module[kept], table.counter[kept])
+                key, value = _merge(key, value, batch_key, np.maximum(table.value[kept], 0).astype(np.float64))
+                for name in SETTING_COUNTERS:
+                    code = reader.counters.code(name)
+                    if code >= 0:
+                        found = table.value[table.counter == code]
+                        if len(found):
+                            settings[name] = sorted(set(settings.get(name, [])) | set(found.tolist()))
+    if len(reader.counters) >= 1 << _COUNTER_BITS or len(reader.modules) >= 1 << _MODULE_BITS:
+        raise ValueError(f"Too many distinct counters or modules in {path or source}")
+    return ReducedTrace(path or (source if isinstance(source, str) else '<stream>'), reader.header, reader.files,
+                        reader.modules, reader.counters, key, value, settings, rows)
+
+
+def _pack(file, module, counter):
+    return (((file.astype(np.int64) << _MODULE_BITS) | module.astype(np.int64)) << _COUNTER_BITS) \
+        | counter.astype(np.int64)
+
+
+def _merge(key, value, new_key, new_value):
+    # Sums the values of equal keys; the result is sorted by key
+    merged, inverse = np.unique(np.concatenate([key, new_key]), return_inverse=True)
+    return merged, np.bincount(inverse, weights=np.concatenate([value, new_value]), minlength=len(merged))
+
+
+class CounterChange:
+    """
+    Values of one compared quantity in every trace.
+
+    Attributes:
+        file: File path, or None for a module total
+        module: Module of the counter
+        counter: Counter name, or the kind for a module total
+        kind: One of KINDS
+        values: Value in every trace, in the order the traces were given
+    """
+
+    def __init__(self, file: Optional[str], module: str, counter: str, kind: str, values: List[float]):
+        self.file = file
+        self.module = module
+        self.counter = counter
+        self.kind = kind
+        self.values = values
+
+    @property
+    def deltas(self) -> List[float]:
+        """Change of every trace against the first one."""
+        return [value - self.values[0] for value in self.values]
+
+    @property
+    def ratios(self) -> List[Optional[float]]:
+        """Ratio of every trace to the first one (None if the first is 0)."""
+        return [value / self.values[0] if self.values[0] else None for value in self.values]
+
+
+class TraceDiff:
+    """
+    Alignment of several traces, compared against the first one.
+
+    Attributes:
+        paths: Path of every trace
+        labels: Short name of every trace, unique among them
+        headers: Job header of every trace
+        settings: (setting, value in every trace) for the job and file system
+            settings that differ between the traces
+        totals: Sums per module and kind
+        changes: Kind -> counters of one file that changed the most, largest
+            absolute change first
+        rows: Number of counter rows read from every trace
+        aligned: Number of (file, module, counter) rows compared
+        files: Number of (file, module) pairs in any trace
+        parse_seconds: Time spent reading the traces
+        analysis_seconds: Time spent aligning and ranking
+    """
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self.labels = _labels(paths)
+        self.headers = []  # type: List[TraceHeader]
+        self.settings = []  # type: List[tuple]
+        self.totals = []  # type: List[CounterChange]
+        self.changes = {kind: [] for kind in KINDS}  # type: Dict[str, List[CounterChange]]
+        self.rows = []  # type: List[int]
+        self.aligned = 0
+        self.files = 0
+        self.parse_seconds = 0.0
+        self.analysis_seconds = 0.0
+
+
+def _labels(paths: List[str]) -> List[str]:
+    labels = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    if len(set(labels)) < len(labels):
+        return list(paths)
+    return labels
+
+
+def diff_traces(sources: List[Union[str, Iterable[str], DarshanTrace]], paths: Optional[List[str]] = None,
+                top: int = TOP_CHANGES, batch_size: int = DEFAULT_BATCH_SIZE) -> TraceDiff:
+    """
+    Compare traces, the first one being the baseline.
+
+    Args:
+        sources: Paths to text traces, iterables of their text lines, or parsed traces
+        paths: Name of every trace in reports (default: the sources that are paths)
+        top: Number of changes kept per kind
+        batch_size: Number of counter rows parsed at a time
+
+    Returns:
+        TraceDiff: Aligned totals and ranked changes
+    """
+    if len(sources) < 2:
+        raise ValueError("At least two traces are needed for a comparison")
+    paths = paths or [source if isinstance(source, str) else f'trace {i + 1}' for i, source in enumerate(sources)]
+    start = time.perf_counter()
+    reduced = [reduce_trace(source, path, batch_size) for source, path in zip(sources, paths)]
+    parse_seconds = time.perf_counter() - start
+    result = compare(reduced, top)
+    result.parse_seconds = parse_seconds
+    return result
+
+
+def compare(traces: List[ReducedTrace], top: int = TOP_CHANGES) -> TraceDiff:
+    """
+    Align reduced traces by file path and module and rank their differences.
+
+    Args:
+        traces: Reduced traces, the first one being the baseline
+        top: Number of changes kept per kind
+
+    Returns:
+        TraceDiff: Aligned totals and ranked changes
+    """
+    start = time.perf_counter()
+    result = TraceDiff([trace.path for trace in traces])
+    result.headers = [trace.header for trace in traces]
+    result.rows = [trace.rows for trace in traces]
+    result.settings = _settings(traces)
+
+    with phase('compare traces', traces=len(traces)):
+        pairs = StringTable()
+        counters = StringTable()
+        keys = [_global_keys(trace, pairs, counters) for trace in traces]
+        union = np.unique(np.concatenate(keys))
+        values = np.zeros((len(union), len(traces)), dtype=np.float64)
+        for column, (key, trace) in enumerate(zip(keys, traces)):
+            order = np.argsort(key, kind='stable')
+            values[np.searchsorted(union, key[order]), column] = trace.value[order]
+
+        pair = union >> _COUNTER_BITS
+        counter = union & ((1 << _COUNTER_BITS) - 1)
+        pair_names = [name.split('\t', 1) for name in pairs.strings]
+        # Only compared counters have rows, so the -1 of the others is never looked up
+        kinds = np.array([KINDS.index(counter_kind(name)) if counter_kind(name) else -1
+                          for name in counters.strings] or [0], dtype=np.int64)
+        row_kind = kinds[counter]
+        result.aligned = len(union)
+        result.files = len(pairs)
+
+        # Module totals per kind
+        modules = sorted({module for module, _ in pair_names})
+        pair_module = np.array([modules.index(module) for module, _ in pair_names] or [0], dtype=np.int64)
+        group = pair_module[pair] * len(KINDS) + row_kind
+        sums = np.stack([np.bincount(group, weights=values[:, column], minlength=len(modules) * len(KINDS))
+                         for column in range(len(traces))], axis=1)
+        for index in np.flatnonzero(sums.any(axis=1)).tolist():
+            module, kind = modules[index // len(KINDS)], KINDS[index % len(KINDS)]
+            result.totals.append(CounterChange(None, module, kind, kind, sums[index].tolist()))
+
+        # Largest absolute change against the baseline in any trace; rounding noise of float sums is not a change
+        change = np.abs(values[:, 1:] - values[:, :1]).max(axis=1)
+        changed = change > _TOLERANCE * np.abs(values).max(axis=1)
+        for kind_index, kind in enumerate(KINDS):
+            rows = np.flatnonzero((row_kind == kind_index) & changed)
+            rows = rows[np.argsort(-change[rows], kind='stable')][:top]
+            for row in rows.tolist():
+                module, file = pair_names[int(pair[row])]
+                result.changes[kind].append(CounterChange(file, module, counters[int(counter[row])], kind,
+                                                          values[row].tolist()))
+    result.analysis_seconds = time.perf_counter() - start
+    return result
+
+
+def _global_keys(trace: ReducedTrace, pairs: StringTable, counters: StringTable):
+    # Re-packs the keys of a trace with (module, file) and counter codes shared by all traces
+    file = trace.key >> (_COUNTER_BITS + _MODULE_BITS)
+    module = (trace.key >> _COUNTER_BITS) & ((1 << _MODULE_BITS) - 1)
+    counter = trace.key & ((1 << _COUNTER_BITS) - 1)
+    local_pairs, inverse = np.unique((file << _MODULE_BITS) | module, return_inverse=True)
+    pair_codes = np.array([pairs.intern(f'{trace.modules[int(code) & ((1 << _MODULE_BITS) - 1)]}\t'
+                                        f'{trace.files[int(code) >> _MODULE_BITS]}')
+                           for code in local_pairs.tolist()] or [0], dtype=np.int64)
+    counter_codes = np.array([counters.intern(name) for name in trace.counters.strings] or [0], dtype=np.int64)
+    return (pair_codes[inverse.reshape(-1)] << _COUNTER_BITS) | counter_codes[counter]
+
+
+def _settings(traces: List[ReducedTrace]) -> List[tuple]:
+    # Job header fields, metadata entries (hint lists such as 'a=1;b=2' are split) and file system settings
+    columns = []
+    for trace in traces:
+        header = trace.header
+        settings = {'exe': header.exe, 'nprocs': header.fields.get('nprocs')}
+        for key, value in header.metadata.items():
+            entries = [entry.partition('=') for entry in value.split(';') if entry.strip()]
+            if len(entries) > 1 or (entries and entries[0][1]):
+                settings.update((name.strip(), entry_value.strip()) for name, _, entry_value in entries)
+            else:
+                settings[key] = value
+        for name, values in trace.settings.items():
+            settings[name] = ', '.join(f'{value:g}' for value in values)
+        columns.append(settings)
+    names = []
+    for settings in columns:
+        names.extend(name for name in settings if name not in names)
+    return [(name, [settings.get(name) for settings in columns]) for name in names
+            if len({settings.get(name) for settings in columns}) > 1]
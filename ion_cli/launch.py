@@ -0,0 +1,210 @@
+"""
+Concurrent launch of many analyses.
+
+Every (trace, model) pair becomes one /api/run_analysis request. Trace
+names are validated against a single fetch of the trace list, requests are
+sent from a bounded thread pool over the shared connection pool, and a
+token bucket keeps the request rate below what the server accepts. A 429
+answer pauses the whole bucket for the Retry-After delay, not just the
+worker that received it.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+import requests
+
+from ion_cli.api import get_client, retry_after_seconds
+from ion_cli.config import (
+    DEFAULT_API_ENDPOINT, LAUNCH_BURST, LAUNCH_CONCURRENCY, LAUNCH_MAX_RETRIES, LAUNCH_RATE, VALID_TASK_STATUSES
+)
+from ion_cli.profiling import mark
+from ion_cli.traces import get_trace_index, invalidate_user_traces
+
+
+# Outcomes of a single launch
+LAUNCHED = "launched"
+NOT_FOUND = "not_found"
+BUSY = "busy"
+RATE_LIMITED = "rate_limited"
+FAILED = "failed"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate: Tokens added per second; 0 or less disables limiting
+        burst: Maximum number of tokens that can accumulate
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        # Take a token, returning how long the caller must wait before using it
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        # updated lies in the future while the bucket is paused
+        wait = self.updated - now
+        if self.tokens < 0:
+            wait += -self.tokens / self.rate
+        return wait
+
+    def acquire(self) -> None:
+        """
+        Block until a token is available.
+        """
+        if self.rate <= 0:
+            with self._lock:
+                wait = self.paused_until - time.monotonic()
+        else:
+            with self._lock:
+                wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold back every caller for the given time, e.g. after a 429.
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            # Tokens that accumulated before the pause must not burst out right after it
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = max(self.updated, self.paused_until)
+
+
+class LaunchResult:
+    """
+    Outcome of launching one analysis.
+    """
+
+    def __init__(self, trace_name: str, model: str, status: str, task_id: Optional[str] = None,
+                 message: str = "", attempts: int = 0):
+        self.trace_name = trace_name
+        self.model = model
+        self.status = status
+        self.task_id = task_id
+        self.message = message
+        self.attempts = attempts
+
+    @property
+    def ok(self) -> bool:
+        return self.status == LAUNCHED
+
+
+class BatchLauncher:
+    """
+    Launches analyses for many traces and models concurrently.
+
+    Args:
+        user_id: User's ID
+        concurrency: Number of requests in flight at the same time
+        rate: Maximum launch requests per second
+        burst: Number of requests that may be sent at once before the rate applies
+        max_retries: Attempts per launch after 429, or connection errors before the request was sent
+        endpoint: Base URL of the ION API
+        on_result: Called with each LaunchResult as soon as it is known
+    """
+
+    def __init__(self, user_id: str, concurrency: int = LAUNCH_CONCURRENCY, rate: float = LAUNCH_RATE,
+                 burst: int = LAUNCH_BURST, max_retries: int = LAUNCH_MAX_RETRIES,
+                 endpoint: Optional[str] = None,
+                 on_result: Optional[Callable[[LaunchResult], None]] = None):
+        self.user_id = user_id
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.client = get_client(endpoint or DEFAULT_API_ENDPOINT)
+        self.client.ensure_pool_size(self.concurrency)
+        self.on_result = on_result
+
+    def run(self, trace_names: Iterable[str], models: List[str]) -> List[LaunchResult]:
+        """
+        Launch every model on every trace.
+
+        Args:
+            trace_names: Names of the traces to analyze
+            models: Models to run on each trace
+
+        Returns:
+            list: One LaunchResult per (trace, model), traces in input order
+        """
+        trace_names = list(dict.fromkeys(trace_names))
+        # A single list fetch validates every trace
+        index = get_trace_index(self.user_id, client=self.client)
+        jobs = []
+        results = []
+        for trace_name in trace_names:
+            status = index.status(trace_name)
+            for model in models:
+                if status is None:
+                    results.append(self._finish(LaunchResult(trace_name, model, NOT_FOUND,
+                                                             message="trace not found")))
+                elif status not in VALID_TASK_STATUSES:
+                    results.append(self._finish(LaunchResult(trace_name, model, BUSY,
+                                                             message=f"trace is currently {status}")))
+                else:
+                    jobs.append((trace_name, model))
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results.extend(pool.map(lambda job: self._finish(self._launch(*job)), jobs))
+            invalidate_user_traces(self.user_id, self.client.endpoint)
+
+        order = {name: position for position, name in enumerate(trace_names)}
+        results.sort(key=lambda result: (order[result.trace_name], models.index(result.model)))
+        return results
+
+    def _finish(self, result: LaunchResult) -> LaunchResult:
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    def _launch(self, trace_name: str, model: str) -> LaunchResult:
+        payload = {'user_id': self.user_id, 'trace_name': trace_name, 'llm': model}
+        message = ""
+        rate_limited = False
+        for attempt in range(1, self.max_retries + 2):
+            self.bucket.acquire()
+            try:
+                response = self.client.post("/api/run_analysis", json=payload)
+            except requests.ConnectionError as e:
+                # Also covers ConnectTimeout: the request never reached the server, so sending it again
+                # cannot start a second analysis
+                message = str(e)
+                rate_limited = False
+                mark('retry run_analysis', error=type(e).__name__)
+                time.sleep(min(2 ** attempt * 0.1, 5.0))
+                continue
+            except requests.RequestException as e:
+                # E.g. a read timeout: the server may have started the analysis, and launches are not idempotent
+                return LaunchResult(trace_name, model, FAILED, message=str(e), attempts=attempt)
+            if response.status_code == 202:
+                return LaunchResult(trace_name, model, LAUNCHED, response.json().get('task_id'),
+                                    attempts=attempt)
+            if response.status_code == 429:
+                message = "rate limited by the server"
+                rate_limited = True
+                mark('retry run_analysis', status=429)
+                self.bucket.pause(retry_after_seconds(response, default=min(2 ** attempt, 30)))
+                continue
+            try:
+                message = response.json().get('error', 'Unknown error')
+            except ValueError:
+                message = f"HTTP {response.status_code}"
+            return LaunchResult(trace_name, model, FAILED, message=message, attempts=attempt)
+        status = RATE_LIMITED if rate_limited else FAILED
+        return LaunchResult(trace_name, model, status, message=message, attempts=self.max_retries + 1)
@@ -0,0 +1,194 @@
+"""
+Content hashing and the local ledger of uploaded traces.
+
+The ledger is a small SQLite database under ION_HOME. It maps the BLAKE2b
+hash of a trace's content to the name it was uploaded under. Identical
+content is then recognised before any bytes leave the machine, whatever the
+file is called. Hashes are cached by path, size and modification time, so
+unchanged files are not re-read on every run.
+"""
+
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from ion_cli.config import HASH_BLOCK_SIZE, ION_HOME
+from ion_cli.profiling import phase
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    content_hash TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    trace_name TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, endpoint, user_id)
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+"""
+
+
+def hash_file(file_path: str, block_size: int = HASH_BLOCK_SIZE) -> str:
+    """
+    Compute the BLAKE2b digest of a file.
+
+    Blocks are read on the calling thread and hashed on a second thread.
+    hashlib releases the GIL for large buffers, so reading and hashing
+    overlap. The queue between them is bounded, so memory stays at a few blocks.
+
+    Args:
+        file_path: Path to the file to hash
+        block_size: Size of the blocks read from disk
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    blocks = queue.Queue(maxsize=4)
+
+    def consume():
+        while True:
+            block = blocks.get()
+            if block is None:
+                return
+            digest.update(block)
+
+    hasher = threading.Thread(target=consume, daemon=True)
+    hasher.start()
+    try:
+        with open(file_path, 'rb', buffering=0) as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                blocks.put(block)
+    finally:
+        blocks.put(None)
+        hasher.join()
+    return digest.hexdigest()
+
+
+class LedgerEntry:
+    """
+    A previously uploaded trace.
+    """
+
+    def __init__(self, content_hash: str, trace_name: str, file_name: str, size: int, uploaded_at: float):
+        self.content_hash = content_hash
+        self.trace_name = trace_name
+        self.file_name = file_name
+        self.size = size
+        self.uploaded_at = uploaded_at
+
+    @property
+    def uploaded_date(self) -> str:
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.uploaded_at))
+
+
+class UploadLedger:
+    """
+    SQLite-backed record of uploaded content, keyed by hash, endpoint and user.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(ION_HOME, 'ledger.sqlite')
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'UploadLedger':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def content_hash(self, file_path: str) -> str:
+        """
+        Hash a file, reusing the cached digest if it has not changed since.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            str: Hex digest of the file content
+        """
+        path = os.path.realpath(file_path)
+        stat = os.stat(path)
+        row = self.connection.execute(
+            "SELECT content_hash FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row:
+            return row[0]
+        with phase('hash', bytes=stat.st_size):
+            content_hash = hash_file(path)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, content_hash)
+            )
+        return content_hash
+
+    def lookup(self, content_hash: str, endpoint: str, user_id: str) -> Optional[LedgerEntry]:
+        """
+        Find a previous upload of the same content by the same user.
+        """
+        row = self.connection.execute(
+            "SELECT content_hash, trace_name, file_name, size, uploaded_at FROM uploads "
+            "WHERE content_hash = ? AND endpoint = ? AND user_id = ?",
+            (content_hash, endpoint, user_id)
+        ).fetchone()
+        return LedgerEntry(*row) if row else None
+
+    def trace_hash(self, endpoint: str, user_id: str, trace_name: str) -> Optional[str]:
+        """
+        Return the content hash of the last upload under a trace name, if it was made from here.
+        """
+        row = self.connection.execute(
+            "SELECT content_hash FROM uploads WHERE endpoint = ? AND user_id = ? AND trace_name = ? "
+            "ORDER BY uploaded_at DESC LIMIT 1",
+            (endpoint, user_id, trace_name)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, content_hash: str, endpoint: str, user_id: str, trace_name: str,
+               file_name: str, size: int) -> None:
+        """
+        Remember a successful upload.
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO uploads "
+                "(content_hash, endpoint, user_id, trace_name, file_name, size, uploaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, endpoint, user_id, trace_name, file_name, size, time.time())
+            )
+
+    def forget(self, endpoint: str, user_id: str, trace_name: str) -> int:
+        """
+        Drop the entries of a trace, e.g. after it was deleted on the server.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "DELETE FROM uploads WHERE endpoint = ? AND user_id = ? AND trace_name = ?",
+                (endpoint, user_id, trace_name)
+            )
+        return cursor.rowcount
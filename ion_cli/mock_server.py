@@ -0,0 +1,426 @@
+"""
+In-process stand-in for the ION web API.
+
+Used by the test suite to exercise the CLI end to end without network access,
+and by the benchmarks, which can give it the latency and bandwidth of a real
+link. Run ``python -m ion_cli.mock_server`` to serve it on a local port.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class MockIONServer:
+    """
+    Minimal in-memory implementation of the ION API endpoints used by the CLI.
+
+    Args:
+        host: Address to listen on
+        port: Port to listen on; 0 picks a free one
+        latency: Seconds added to every request, like a network round trip
+        bandwidth: Bytes per second of request and response bodies, shared by
+            all connections like a single link; None for unlimited
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 bandwidth: Optional[float] = None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        # Time at which the simulated link has sent everything queued so far
+        self._link_free = 0.0
+        self._link_lock = threading.Lock()
+        self.users = {}
+        self.traces = {}
+        self.files = {}
+        self.uploads = {}
+        # Completed shards waiting for the manifest of their trace, by shard id
+        self.shards = {}
+        self.encodings = ["identity", "gzip", "zstd"]
+        # Chunk request numbers (1-based) that are stored but answered with a 500
+        self.fail_chunks = set()
+        # File names whose multipart uploads are always answered with a 500
+        self.fail_uploads = set()
+        self.chunk_requests = 0
+        self.tasks = {}
+        # Final diagnoses by (user id, trace name), e.g. set by complete_analysis
+        self.diagnoses = {}
+        # Number of upcoming analysis launches answered with 429 and this Retry-After value
+        self.rate_limited = 0
+        self.retry_after = "0"
+        # Number of upcoming requests (of any kind) answered with 503, as by an overloaded proxy
+        self.unavailable = 0
+        self.request_log = []
+        self.lock = threading.Lock()
+        handler = type("Handler", (_Handler,), {"ion": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockIONServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockIONServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def add_user(self, email: str, user_id: Optional[str] = None) -> str:
+        """Register a verified user and return its id."""
+        user_id = user_id or uuid.uuid4().hex
+        self.users[email] = user_id
+        self.traces.setdefault(user_id, {})
+        return user_id
+
+    def add_traces(self, user_id: str, count: int, prefix: str = "trace") -> list:
+        """Store `count` small traces named prefix_0, prefix_1, ... and return their names."""
+        return [self.store_trace(user_id, f"{prefix}_{i}.txt", b"# darshan log version: 3.41\n")
+                for i in range(count)]
+
+    def delay(self, num_bytes: int = 0, round_trip: bool = False) -> None:
+        """Sleep for the simulated latency and the time num_bytes take on the simulated link."""
+        seconds = self.latency if round_trip else 0.0
+        if self.bandwidth and num_bytes:
+            with self._link_lock:
+                now = time.monotonic()
+                self._link_free = max(self._link_free, now) + num_bytes / self.bandwidth
+                seconds += self._link_free - now
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def decode(self, body: bytes, encoding: Optional[str]) -> bytes:
+        """Decode a chunk body sent with the given content encoding."""
+        if encoding == "gzip":
+            return gzip.decompress(body)
+        if encoding == "zstd":
+            import zstandard
+            return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        return body
+
+    def store_trace(self, user_id: str, file_name: str, data: bytes) -> Optional[str]:
+        """Store an uploaded trace, returning None if the name is taken."""
+        trace_name = os.path.splitext(file_name)[0]
+        with self.lock:
+            user_traces = self.traces.setdefault(user_id, {})
+            if trace_name in user_traces:
+                return None
+            user_traces[trace_name] = {
+                "trace_name": trace_name,
+                "trace_description": "User uploaded trace",
+                "upload_date": "2025-01-01 00:00:00",
+                "status": "not_started",
+                "model": "gpt-4o",
+            }
+            self.files[(user_id, trace_name)] = data
+        return trace_name
+
+    def complete_analysis(self, user_id: str, trace_name: str, content: str = "# Diagnosis",
+                          sources: Optional[list] = None) -> None:
+        """Mark the analysis of a trace as completed with the given diagnosis."""
+        with self.lock:
+            self.traces[user_id][trace_name]["status"] = "completed"
+            self.diagnoses[(user_id, trace_name)] = {"content": content, "sources": sources or []}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    ion = None  # type: MockIONServer
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; with Nagle's algorithm the body of every
+    # reply on a kept-alive connection would wait for the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _json(self, body: bytes) -> dict:
+        return json.loads(self.ion.decode(body, self.headers.get("Content-Encoding")) or b"{}")
+
+    def _reply(self, status: int, payload, headers: Optional[dict] = None) -> None:
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.ion.delay(len(data))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        path = url.path
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self._body()
+        self.ion.request_log.append(("POST", path))
+        self.ion.delay(len(body), round_trip=True)
+        with self.ion.lock:
+            unavailable = self.ion.unavailable > 0
+            self.ion.unavailable -= unavailable
+        if unavailable:
+            self._reply(503, {"error": "Service unavailable"})
+            return
+
+        route = {
+            "/api/user": self._user,
+            "/api/user_traces": self._user_traces,
+            "/api/upload_trace": self._upload_trace,
+            "/api/upload_trace/init": self._upload_init,
+            "/api/upload_trace/chunk": self._upload_chunk,
+            "/api/upload_trace/status": self._upload_status,
+            "/api/upload_trace/complete": self._upload_complete,
+            "/api/upload_trace/manifest": self._upload_manifest,
+            "/api/run_analysis": self._run_analysis,
+            "/api/stop_analysis": self._stop_analysis,
+            "/api/delete_trace": self._delete_trace,
+        }.get(path)
+        if route is None and path.startswith("/api/trace_examples/") and path.endswith("/final_diagnosis"):
+            route = self._final_diagnosis
+            query["trace_name"] = path[len("/api/trace_examples/"):-len("/final_diagnosis")]
+        if route is None:
+            self._reply(404, {"error": "Not found"})
+            return
+        route(body, query)
+
+    def _user(self, body, query):
+        email = self._json(body).get("email")
+        user_id = self.ion.users.get(email)
+        self._reply(200, {"user_id": user_id} if user_id else {})
+
+    def _user_traces(self, body, query):
+        user_id = self._json(body).get("user_id")
+        if user_id not in self.ion.users.values():
+            self._reply(403, {"error": "Unknown user"})
+            return
+        data = json.dumps(list(self.ion.traces.get(user_id, {}).values())).encode()
+        etag = '"%s"' % hashlib.blake2b(data, digest_size=16).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self._reply(304, b"", {"ETag": etag})
+            return
+        self._reply(200, data, {"ETag": etag})
+
+    def _upload_trace(self, body, query):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            fields[part.get_param("name", header="content-disposition")] = part
+        file_part = fields["file"]
+        user_id = fields["user_id"].get_content().strip()
+        if file_part.get_filename() in self.ion.fail_uploads:
+            self._reply(500, {"error": "Injected failure"})
+            return
+        if self.ion.store_trace(user_id, file_part.get_filename(), file_part.get_content()) is None:
+            self._reply(400, {"error": "Trace already exists"})
+            return
+        self._reply(200, {"message": "File uploaded"})
+
+    def _upload_init(self, body, query):
+        request = self._json(body)
+        # Shards are named after themselves but registered under the trace they belong to
+        trace_name = os.path.splitext(request.get("shard_of") or request["file_name"])[0]
+        if trace_name in self.ion.traces.get(request["user_id"], {}):
+            self._reply(400, {"error": f"Trace {trace_name} already exists"})
+            return
+        with self.ion.lock:
+            # Re-attach to an unfinished upload of the same file
+            for upload_id, upload in self.ion.uploads.items():
+                if (upload["user_id"], upload["file_name"], upload["total_size"]) == \
+                        (request["user_id"], request["file_name"], request.get("total_size")):
+                    self._reply(200, {"upload_id": upload_id, "offset": len(upload["data"]),
+                                      "content_encoding": upload["content_encoding"]})
+                    return
+            upload_id = uuid.uuid4().hex
+            encoding = request.get("content_encoding", "identity")
+            self.ion.uploads[upload_id] = {
+                "user_id": request["user_id"],
+                "file_name": request["file_name"],
+                "total_size": request.get("total_size"),
+                "shard_of": request.get("shard_of"),
+                "content_encoding": encoding if encoding in self.ion.encodings else "identity",
+                "data": bytearray(),
+                "received_bytes": 0,
+            }
+        self._reply(200, {"upload_id": upload_id, "offset": 0,
+                          "content_encoding": self.ion.uploads[upload_id]["content_encoding"]})
+
+    def _upload_chunk(self, body, query):
+        upload = self.ion.uploads.get(query.get("upload_id"))
+        if upload is None:
+            self._reply(404, {"error": "Unknown upload"})
+            return
+        with self.ion.lock:
+            self.ion.chunk_requests += 1
+            request_number = self.ion.chunk_requests
+            if int(query["offset"]) != len(upload["data"]):
+                self._reply(409, {"offset": len(upload["data"])})
+                return
+            upload["data"].extend(self.ion.decode(body, self.headers.get("Content-Encoding")))
+            upload["received_bytes"] += len(body)
+            offset = len(upload["data"])
+        if request_number in self.ion.fail_chunks:
+            self._reply(500, {"error": "Injected failure"})
+            return
+        self._reply(200, {"offset": offset})
+
+    def _upload_status(self, body, query):
+        upload = self.ion.uploads.get(self._json(body).get("upload_id"))
+        if upload is None:
+            self._reply(404, {"error": "Unknown upload"})
+            return
+        self._reply(200, {"offset": len(upload["data"])})
+
+    def _upload_complete(self, body, query):
+        request = self._json(body)
+        upload = self.ion.uploads.pop(request.get("upload_id"), None)
+        if upload is None:
+            self._reply(404, {"error": "Unknown upload"})
+            return
+        if upload["shard_of"]:
+            with self.ion.lock:
+                self.ion.shards[request["upload_id"]] = upload
+            self._reply(200, {"shard_id": request["upload_id"], "size": len(upload["data"])})
+            return
+        trace_name = self.ion.store_trace(upload["user_id"], upload["file_name"], bytes(upload["data"]))
+        if trace_name is None:
+            self._reply(400, {"error": "Trace already exists"})
+            return
+        self._reply(200, {"trace_name": trace_name, "size": len(upload["data"])})
+
+    def _upload_manifest(self, body, query):
+        request = self._json(body)
+        total_size = int(request["total_size"])
+        header_size = int(request["header_size"])
+        with self.ion.lock:
+            shards = [self.ion.shards.get(entry["shard_id"]) for entry in request["shards"]]
+        if any(shard is None or (shard["user_id"], shard["shard_of"]) != (request["user_id"], request["file_name"])
+               for shard in shards):
+            self._reply(404, {"error": "Unknown shard"})
+            return
+
+        # Every shard starts with the shared header; its ranges fill the rest of the trace
+        data = bytearray(total_size)
+        covered = header_size
+        for entry, shard in zip(request["shards"], shards):
+            shard_data = shard["data"]
+            if shard_data[:header_size] != shards[0]["data"][:header_size]:
+                self._reply(400, {"error": f"Shard {entry['name']} has a different header"})
+                return
+            position = header_size
+            for start, end in entry["ranges"]:
+                if not 0 <= start <= end <= total_size:
+                    self._reply(400, {"error": f"Range {start}-{end} of shard {entry['name']} is out of bounds"})
+                    return
+                data[start:end] = shard_data[position:position + end - start]
+                position += end - start
+                covered += end - start
+            if position != len(shard_data):
+                self._reply(400, {"error": f"Shard {entry['name']} does not match its ranges"})
+                return
+        data[:header_size] = shards[0]["data"][:header_size] if shards else b""
+        if covered != total_size:
+            self._reply(400, {"error": f"Shards cover {covered} of {total_size} bytes"})
+            return
+        if hashlib.blake2b(data, digest_size=32).hexdigest() != request["content_hash"]:
+            self._reply(400, {"error": "Reassembled trace does not match its content hash"})
+            return
+
+        trace_name = self.ion.store_trace(request["user_id"], request["file_name"], bytes(data))
+        if trace_name is None:
+            self._reply(400, {"error": "Trace already exists"})
+            return
+        with self.ion.lock:
+            for entry in request["shards"]:
+                self.ion.shards.pop(entry["shard_id"], None)
+        self._reply(200, {"trace_name": trace_name, "size": total_size, "shards": len(shards)})
+
+    def _run_analysis(self, body, query):
+        request = self._json(body)
+        user_id = request.get("user_id")
+        with self.ion.lock:
+            if self.ion.rate_limited > 0:
+                self.ion.rate_limited -= 1
+                self._reply(429, {"error": "Too many requests"}, {"Retry-After": self.ion.retry_after})
+                return
+            trace = self.ion.traces.get(user_id, {}).get(request.get("trace_name"))
+            if trace is None:
+                self._reply(404, {"error": "Trace not found"})
+                return
+            task_id = uuid.uuid4().hex
+            self.ion.tasks[task_id] = {"user_id": user_id, "trace_name": trace["trace_name"],
+                                       "llm": request.get("llm")}
+            trace["status"] = "in_progress"
+            trace["model"] = request.get("llm")
+        self._reply(202, {"task_id": task_id})
+
+    def _stop_analysis(self, body, query):
+        request = self._json(body)
+        with self.ion.lock:
+            trace = self.ion.traces.get(request.get("user_id"), {}).get(request.get("trace_name"))
+            if trace is None:
+                self._reply(404, {"error": "Trace not found"})
+                return
+            if trace["status"] == "in_progress":
+                trace["status"] = "not_started"
+        self._reply(200, {"message": "Analysis stopped"})
+
+    def _delete_trace(self, body, query):
+        request = self._json(body)
+        user_id, trace_name = request.get("user_id"), request.get("trace_name")
+        with self.ion.lock:
+            if self.ion.traces.get(user_id, {}).pop(trace_name, None) is None:
+                self._reply(404, {"error": "Trace not found"})
+                return
+            self.ion.files.pop((user_id, trace_name), None)
+            self.ion.diagnoses.pop((user_id, trace_name), None)
+        self._reply(200, {"message": "Trace deleted"})
+
+    def _final_diagnosis(self, body, query):
+        user_id = self._json(body).get("user_id")
+        diagnosis = self.ion.diagnoses.get((user_id, query["trace_name"]))
+        if diagnosis is None:
+            self._reply(404, {"error": "Diagnosis not found"})
+            return
+        self._reply(200, {"trace_diagnosis": diagnosis})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the ION API")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--user_email", type=str, default="test@example.com")
+    parser.add_argument("--latency_ms", type=float, default=0, help="Delay added to every request")
+    parser.add_argument("--bandwidth_mbps", type=float, default=None, help="Link bandwidth in megabits/s")
+    parsed_args = parser.parse_args()
+
+    bandwidth = parsed_args.bandwidth_mbps * 1e6 / 8 if parsed_args.bandwidth_mbps else None
+    server = MockIONServer(port=parsed_args.port, latency=parsed_args.latency_ms / 1000, bandwidth=bandwidth)
+    server.add_user(parsed_args.user_email)
+    print(f"Serving mock ION API on {server.url}")
+    server.httpd.serve_forever()
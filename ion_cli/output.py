@@ -0,0 +1,258 @@
+"""
+Console output of the command line tool.
+
+Rich is imported, and its traceback handler installed, only when something
+is first printed in the default 'rich' mode. The 'plain' mode writes
+unstyled text without spinners, boxes or colours, and 'quiet' additionally
+drops progress and informational messages, keeping only results and
+errors. Neither of them imports rich, which keeps scripted use and shell
+completion fast.
+
+The factories below (Panel, Table, Progress, ...) accept the arguments of
+the rich classes they stand for.
+"""
+
+import importlib
+import re
+import sys
+
+from ion_cli.config import OUTPUT_MODE
+from ion_cli.profiling import phase
+
+
+OUTPUT_MODES = ["rich", "plain", "quiet"]
+
+THEME = {
+    "info": "cyan",
+    "warning": "yellow",
+    "error": "bold red",
+    "success": "bold green",
+}
+
+# Console markup such as [bold cyan], [/bold cyan], [error] or [/]
+_MARKUP = re.compile(r"\[/?[a-zA-Z#][a-zA-Z0-9_.# ]*\]|\[/\]")
+
+# Messages that are printed even in quiet mode
+_ESSENTIAL_STYLES = ("error", "warning", "red", "yellow")
+
+_state = {'mode': OUTPUT_MODE if OUTPUT_MODE in OUTPUT_MODES else "rich", 'console': None}
+
+
+def set_mode(mode: str) -> None:
+    """
+    Select the output mode ('rich', 'plain' or 'quiet') for everything printed afterwards.
+    """
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{mode}'")
+    if mode != _state['mode']:
+        _state['mode'] = mode
+        _state['console'] = None
+
+
+def get_mode() -> str:
+    return _state['mode']
+
+
+def strip_markup(text: str) -> str:
+    """
+    Remove console markup from a string.
+    """
+    return _MARKUP.sub("", text)
+
+
+def get_console():
+    """
+    Return the console of the current mode, creating it on first use.
+    """
+    if _state['console'] is None:
+        if _state['mode'] == "rich":
+            from rich.console import Console
+            from rich.theme import Theme
+            from rich.traceback import install
+            install()
+            _state['console'] = Console(theme=Theme(THEME))
+        else:
+            _state['console'] = PlainConsole(quiet=_state['mode'] == "quiet")
+    return _state['console']
+
+
+class _ConsoleProxy:
+    """
+    Module-level console that resolves to the console of the current mode.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_console(), name)
+
+    def print(self, *objects, **kwargs) -> None:
+        with phase('render'):
+            get_console().print(*objects, **kwargs)
+
+
+console = _ConsoleProxy()
+
+
+class PlainConsole:
+    """
+    Console writing unstyled text; in quiet mode only results and errors.
+
+    Args:
+        quiet: Drop progress and informational messages
+        file: Stream written to (defaults to stdout at the time of printing)
+    """
+
+    def __init__(self, quiet: bool = False, file=None):
+        self.quiet = quiet
+        self.file = file
+
+    def print(self, *objects, **kwargs) -> None:
+        if self.quiet and not any(_is_essential(obj) for obj in objects):
+            return
+        text = " ".join(_to_text(obj) for obj in objects)
+        print(text, file=self.file or sys.stdout, flush=True)
+
+
+def _is_essential(obj) -> bool:
+    if isinstance(obj, str):
+        return any(f"[{style}]" in obj for style in _ESSENTIAL_STYLES)
+    # Panels, tables and diagnoses are the results of a command
+    return True
+
+
+def _to_text(obj) -> str:
+    if isinstance(obj, str):
+        return strip_markup(obj)
+    return str(obj)
+
+
+class PlainPanel:
+    def __init__(self, renderable="", *args, title=None, **kwargs):
+        self.renderable = renderable
+        self.title = title
+
+    def __str__(self):
+        text = _to_text(self.renderable)
+        if not self.title:
+            return text
+        separator = "\n" if "\n" in text else ": "
+        return f"{strip_markup(self.title)}{separator}{text}"
+
+
+class PlainMarkdown:
+    def __init__(self, markup: str = "", *args, **kwargs):
+        self.markup = markup
+
+    def __str__(self):
+        return self.markup
+
+
+class PlainTable:
+    """
+    Tab-separated table, one line per row, easy to process with cut or awk.
+    """
+
+    def __init__(self, *headers, title=None, caption=None, **kwargs):
+        self.title = title
+        self.caption = caption
+        self.columns = list(headers)
+        self.rows = []
+
+    def add_column(self, header: str = "", *args, **kwargs) -> None:
+        self.columns.append(header)
+
+    def add_row(self, *cells, **kwargs) -> None:
+        self.rows.append([_to_text(cell) if cell is not None else "" for cell in cells])
+
+    def __str__(self):
+        lines = []
+        if self.title:
+            lines.append(strip_markup(self.title))
+        lines.append("\t".join(strip_markup(str(column)) for column in self.columns))
+        lines.extend("\t".join(cell.replace("\n", " ") for cell in row) for row in self.rows)
+        if self.caption:
+            lines.append(strip_markup(self.caption))
+        return "\n".join(lines)
+
+
+class PlainProgress:
+    """
+    Progress display that shows nothing; tasks are only counted.
+    """
+
+    def __init__(self, *columns, **kwargs):
+        self.tasks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add_task(self, description: str, *args, **kwargs) -> int:
+        self.tasks += 1
+        return self.tasks - 1
+
+    def update(self, task_id: int, **kwargs) -> None:
+        pass
+
+
+class PlainLive:
+    """
+    Live display that prints only the final state when it is closed.
+    """
+
+    def __init__(self, renderable=None, *args, console=None, **kwargs):
+        self.renderable = renderable
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.renderable is not None:
+            get_console().print(self.renderable)
+        return False
+
+    def update(self, renderable, **kwargs) -> None:
+        self.renderable = renderable
+
+
+class _Factory:
+    """
+    Creates the named rich object in rich mode and the plain stand-in otherwise.
+    """
+
+    def __init__(self, module: str, name: str, plain=None):
+        self.module = module
+        self.name = name
+        self.plain = plain
+
+    def _rich_class(self):
+        return getattr(importlib.import_module(self.module), self.name)
+
+    def _create(self, method, *args, **kwargs):
+        if _state['mode'] != "rich":
+            return self.plain(*args, **kwargs) if self.plain else None
+        if isinstance(kwargs.get('console'), _ConsoleProxy):
+            kwargs['console'] = get_console()
+        rich_class = self._rich_class()
+        return getattr(rich_class, method)(*args, **kwargs) if method else rich_class(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self._create(None, *args, **kwargs)
+
+    def fit(self, *args, **kwargs):
+        return self._create('fit', *args, **kwargs)
+
+
+Panel = _Factory("rich.panel", "Panel", PlainPanel)
+Table = _Factory("rich.table", "Table", PlainTable)
+Markdown = _Factory("rich.markdown", "Markdown", PlainMarkdown)
+Live = _Factory("rich.live", "Live", PlainLive)
+Progress = _Factory("rich.progress", "Progress", PlainProgress)
+BarColumn = _Factory("rich.progress", "BarColumn")
+DownloadColumn = _Factory("rich.progress", "DownloadColumn")
+SpinnerColumn = _Factory("rich.progress", "SpinnerColumn")
+TextColumn = _Factory("rich.progress", "TextColumn")
+TimeElapsedColumn = _Factory("rich.progress", "TimeElapsedColumn")
+TimeRemainingColumn = _Factory("rich.progress", "TimeRemainingColumn")
+TransferSpeedColumn = _Factory("rich.progress", "TransferSpeedColumn")
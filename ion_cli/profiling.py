@@ -0,0 +1,223 @@
+"""
+Timing of the HTTP requests and local phases of a command (--profile).
+
+Nothing is recorded until a Profile is started with enable(). While
+profiling is off, phase() returns a shared no-op context manager and the
+HTTP hook in ion_cli.api does a single check, so the instrumented code runs
+at full speed.
+
+A profile can be summarised per phase (see Profile.summary) or written as a
+Chrome trace (chrome://tracing, https://ui.perfetto.dev), which shows the
+requests of batch operations on one lane per thread.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+# Categories of recorded spans
+HTTP = 'http'
+PHASE = 'phase'
+EVENT = 'event'
+
+
+class nullcontext:
+    """
+    Context manager that does nothing (contextlib.nullcontext needs Python 3.7).
+    """
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def __enter__(self):
+        return self.value
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOTHING = nullcontext()
+
+_active = None  # type: Optional[Profile]
+
+
+class Span:
+    """
+    One timed operation.
+
+    Attributes:
+        name: What was timed, e.g. 'POST /api/user_traces' or 'hash'
+        category: HTTP, PHASE or EVENT (an instant, e.g. a retry)
+        start: Seconds since the start of the profile
+        seconds: Wall time of the operation
+        thread: Identifier of the thread it ran on
+        fields: Details such as status, bytes_sent, bytes_received, error
+    """
+
+    __slots__ = ('name', 'category', 'start', 'seconds', 'thread', 'fields')
+
+    def __init__(self, name: str, category: str, start: float, fields: dict):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.seconds = 0.0
+        self.thread = threading.get_ident()
+        self.fields = fields
+
+    def update(self, **fields) -> None:
+        self.fields.update(fields)
+
+
+class _Timer:
+    # Context manager filling in a span; records the exception type if the operation fails
+
+    def __init__(self, profile: 'Profile', span: Span):
+        self.profile = profile
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.span.start = time.perf_counter() - self.profile.origin
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.span.seconds = time.perf_counter() - self.profile.origin - self.span.start
+        if exc_type is not None:
+            self.span.fields.setdefault('error', exc_type.__name__)
+        self.profile.spans.append(self.span)
+
+
+class Profile:
+    """
+    Collects the spans of one command.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []  # type: List[Span]
+        self.seconds = None  # type: Optional[float]
+
+    def span(self, name: str, category: str = PHASE, **fields) -> _Timer:
+        """
+        Time the body of a with statement; the span is yielded so details can be added.
+        """
+        return _Timer(self, Span(name, category, 0.0, fields))
+
+    def mark(self, name: str, **fields) -> None:
+        """
+        Record an instant event, e.g. a retry.
+        """
+        self.spans.append(Span(name, EVENT, time.perf_counter() - self.origin, fields))
+
+    def stop(self) -> None:
+        self.seconds = time.perf_counter() - self.origin
+
+    @property
+    def wall_seconds(self) -> float:
+        return self.seconds if self.seconds is not None else time.perf_counter() - self.origin
+
+    def summary(self) -> List[dict]:
+        """
+        Aggregate the spans by name, in order of first occurrence.
+
+        Returns:
+            list: One dict per name with category, calls, total/mean/max seconds,
+            bytes sent and received, new connections, statuses and errors
+        """
+        rows = {}
+        for span in sorted(self.spans, key=lambda span: span.start):
+            row = rows.get(span.name)
+            if row is None:
+                row = rows[span.name] = {
+                    'name': span.name, 'category': span.category, 'calls': 0, 'total_seconds': 0.0,
+                    'max_seconds': 0.0, 'bytes_sent': 0, 'bytes_received': 0, 'new_connections': 0,
+                    'statuses': {}, 'errors': 0,
+                }
+            row['calls'] += 1
+            row['total_seconds'] += span.seconds
+            row['max_seconds'] = max(row['max_seconds'], span.seconds)
+            row['bytes_sent'] += span.fields.get('bytes_sent', 0)
+            row['bytes_received'] += span.fields.get('bytes_received', 0)
+            row['new_connections'] += 1 if span.fields.get('new_connection') else 0
+            if 'status' in span.fields:
+                status = str(span.fields['status'])
+                row['statuses'][status] = row['statuses'].get(status, 0) + 1
+            if 'error' in span.fields:
+                row['errors'] += 1
+        for row in rows.values():
+            row['mean_seconds'] = row['total_seconds'] / row['calls']
+        return list(rows.values())
+
+    def chrome_trace(self) -> dict:
+        """
+        Return the profile in the Chrome trace event format, with the summary attached.
+        """
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for span in sorted(self.spans, key=lambda span: span.start):
+            tid = threads.setdefault(span.thread, len(threads))
+            event = {'name': span.name, 'cat': span.category, 'pid': pid, 'tid': tid,
+                     'ts': span.start * 1e6, 'args': span.fields}
+            if span.category == EVENT:
+                event.update(ph='i', s='t')
+            else:
+                event.update(ph='X', dur=span.seconds * 1e6)
+            events.append(event)
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'wall_seconds': self.wall_seconds,
+            'summary': self.summary(),
+        }
+
+    def write(self, path: str) -> None:
+        """
+        Write the profile to a JSON file that Chrome and Perfetto can open as a trace.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f, indent=1, default=str)
+
+
+def enable() -> Profile:
+    """
+    Start recording into a new profile and return it.
+    """
+    global _active
+    _active = Profile()
+    return _active
+
+
+def disable() -> Optional[Profile]:
+    """
+    Stop recording and return the finished profile, if there was one.
+    """
+    global _active
+    profile, _active = _active, None
+    if profile is not None:
+        profile.stop()
+    return profile
+
+
+def active() -> Optional[Profile]:
+    return _active
+
+
+def phase(name: str, **fields):
+    """
+    Time a local phase of a command, e.g. ``with phase('hash'): ...``.
+
+    Returns a no-op context manager (yielding None) when profiling is off.
+    """
+    profile = _active
+    return profile.span(name, PHASE, **fields) if profile is not None else _NOTHING
+
+
+def mark(name: str, **fields) -> None:
+    """
+    Record an instant event such as a retry; does nothing when profiling is off.
+    """
+    profile = _active
+    if profile is not None:
+        profile.mark(name, **fields)
@@ -0,0 +1,231 @@
+"""
+Client-side reduction of darshan-parser text traces before upload.
+
+Most record lines of a text dump carry no information: counters that are 0,
+or -1 because Darshan could not monitor them. The header also lists every
+mount of the node, although records only ever reference a few. Dropping
+those lines keeps every non-trivial counter, so the reduced trace is
+lossless for analysis while being several times smaller.
+"""
+
+import os
+from typing import Callable, Iterable, Iterator, Optional
+
+from ion_cli.profiling import phase
+from ion_cli.upload import IterStream
+
+
+MOUNT_ENTRY_PREFIX = "# mount entry:"
+
+REDUCTION_NOTE = (
+    "# ion-cli reduce: omitted {counters} counters that were 0 or -1 (not monitored)"
+    " and {mounts} mount entries not referenced by any record\n"
+)
+
+# Lines are re-joined into blocks of about this size before they are streamed
+BLOCK_SIZE = 256 * 1024
+
+
+def zero_is_significant(counter: str) -> bool:
+    """
+    Check whether a value of 0 carries information for this counter.
+
+    Rank ids (e.g. POSIX_FASTEST_RANK), open modes and Lustre layout
+    counters such as OST indices can legitimately be 0.
+
+    Args:
+        counter: Darshan counter name
+
+    Returns:
+        bool: True if a zero value must be kept
+    """
+    return counter.endswith('_RANK') or counter.endswith('_MODE') or counter.startswith('LUSTRE_')
+
+
+def is_uninformative(counter: str, value: str) -> bool:
+    """
+    Check whether a counter line can be dropped without losing information.
+
+    Args:
+        counter: Darshan counter name
+        value: Counter value as printed by darshan-parser
+
+    Returns:
+        bool: True for unmonitored (-1) counters and zero counters
+    """
+    if value == '-1' or value == '-1.000000':
+        return True
+    if value.lstrip('-').strip('0.') == '':
+        return not zero_is_significant(counter)
+    return False
+
+
+class ReductionPlan:
+    """
+    Result of scanning a trace: what the reduced output will contain.
+
+    Attributes:
+        mounts: Mount points referenced by at least one record
+        input_bytes: Size of the original trace
+        output_bytes: Exact size of the reduced trace
+        dropped_counters: Number of counter lines that will be omitted
+        dropped_mounts: Number of mount table entries that will be omitted
+    """
+
+    def __init__(self):
+        self.mounts = set()
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.dropped_counters = 0
+        self.dropped_mounts = 0
+
+    @property
+    def note(self) -> str:
+        return REDUCTION_NOTE.format(counters=self.dropped_counters, mounts=self.dropped_mounts)
+
+
+def plan_reduction(lines: Iterable[str]) -> ReductionPlan:
+    """
+    Scan a trace once to find referenced mounts and the reduced size.
+
+    Args:
+        lines: Lines of the trace
+
+    Returns:
+        ReductionPlan: Mounts to keep and size statistics
+    """
+    plan = ReductionPlan()
+    mount_lines = []
+    kept_bytes = 0
+    for line in lines:
+        size = len(line.encode('utf-8'))
+        plan.input_bytes += size
+        if line.startswith('#') or not line.strip():
+            if line.startswith(MOUNT_ENTRY_PREFIX):
+                mount_lines.append((_mount_point(line), size))
+            else:
+                kept_bytes += size
+            continue
+        fields = line.split('\t')
+        if len(fields) >= 8 and is_uninformative(fields[3], fields[4]):
+            plan.dropped_counters += 1
+            continue
+        if len(fields) >= 8:
+            plan.mounts.add(fields[6])
+        kept_bytes += size
+
+    for mount, size in mount_lines:
+        if mount in plan.mounts:
+            kept_bytes += size
+        else:
+            plan.dropped_mounts += 1
+    plan.output_bytes = kept_bytes + len(plan.note.encode('utf-8'))
+    return plan
+
+
+def reduce_lines(lines: Iterable[str], plan: ReductionPlan) -> Iterator[str]:
+    """
+    Yield the lines of the reduced trace.
+
+    Args:
+        lines: Lines of the original trace
+        plan: Result of plan_reduction over the same lines
+
+    Returns:
+        Iterator over the kept lines, with a note describing the reduction
+        inserted before the column description (or the first record)
+    """
+    noted = False
+    for line in lines:
+        if line.startswith('#') or not line.strip():
+            if line.startswith(MOUNT_ENTRY_PREFIX) and _mount_point(line) not in plan.mounts:
+                continue
+            if not noted and line.startswith('# description of columns'):
+                noted = True
+                yield plan.note
+            yield line
+            continue
+        fields = line.split('\t')
+        if len(fields) >= 8 and is_uninformative(fields[3], fields[4]):
+            continue
+        if not noted:
+            noted = True
+            yield plan.note
+        yield line
+    if not noted:
+        yield plan.note
+
+
+def _mount_point(line: str) -> str:
+    parts = line[len(MOUNT_ENTRY_PREFIX):].split()
+    return parts[0] if parts else ''
+
+
+def _blocks(lines: Iterable[str]) -> Iterator[bytes]:
+    block = []
+    size = 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield ''.join(block).encode('utf-8')
+            block = []
+            size = 0
+    if block:
+        yield ''.join(block).encode('utf-8')
+
+
+def _read_lines(file_path: str) -> Iterator[str]:
+    with open(file_path, 'r', encoding='utf-8', newline='', buffering=1 << 20) as f:
+        yield from f
+
+
+def open_reduced_stream(file_path: str, plan: Optional[ReductionPlan] = None,
+                        read_lines: Optional[Callable[[], Iterable[str]]] = None) -> Callable:
+    """
+    Build a stream factory producing the reduced trace.
+
+    Args:
+        file_path: Path to a darshan-parser text trace
+        plan: Precomputed plan; scanned from the file if not given
+        read_lines: Source of the trace lines in place of the file, e.g. the
+            output of darshan-parser for a .darshan log; called once for the
+            scan and once per opened stream
+
+    Returns:
+        Callable returning a fresh binary stream of the reduced trace, with
+        the plan attached as its `plan` attribute and a `read_lines`
+        attribute returning the reduced trace line by line
+    """
+    read_lines = read_lines or (lambda: _read_lines(file_path))
+    if plan is None:
+        with phase('reduce scan'):
+            plan = plan_reduction(read_lines())
+
+    def open_stream():
+        return IterStream(_blocks(reduce_lines(read_lines(), plan)), name=os.path.basename(file_path))
+
+    open_stream.plan = plan
+    open_stream.read_lines = lambda: reduce_lines(read_lines(), plan)
+    return open_stream
+
+
+def reduce_file(file_path: str, output_path: str) -> ReductionPlan:
+    """
+    Write the reduced form of a trace to a new file.
+
+    Args:
+        file_path: Path to a darshan-parser text trace
+        output_path: Where to write the reduced trace
+
+    Returns:
+        ReductionPlan: Size statistics of the reduction
+    """
+    open_stream = open_reduced_stream(file_path)
+    with open_stream() as stream, open(output_path, 'wb') as out:
+        while True:
+            block = stream.read(BLOCK_SIZE)
+            if not block:
+                break
+            out.write(block)
+    return open_stream.plan
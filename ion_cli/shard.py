@@ -0,0 +1,419 @@
+"""
+Sharded upload of large text traces.
+
+A darshan-parser dump is split by module (POSIX, MPI-IO, STDIO, LUSTRE,
+H5F, ...) and/or by ranges of ranks. Every shard starts with the shared job
+header of the trace, so it is a valid trace on its own, and continues with
+byte ranges of the original file: darshan-parser prints the records of a
+module and rank one after the other, so a shard is a handful of contiguous
+ranges that are read straight from disk, without temporary files.
+
+The shards are sent at the same time with the chunked protocol over the
+shared connection pool, and registered as one trace by a manifest that
+says where every range of every shard belongs in the original file. The
+server can therefore reassemble the trace byte for byte and check it
+against the content hash of the file.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from ion_cli.api import send_with_retries
+from ion_cli.config import (
+    DEFAULT_API_ENDPOINT, UPLOAD_CHUNK_SIZE, UPLOAD_CONCURRENCY, UPLOAD_MAX_RETRIES, UPLOAD_SHARD_RANKS,
+    UPLOAD_TIMEOUT
+)
+from ion_cli.darshan import TraceHeader
+from ion_cli.profiling import phase
+from ion_cli.upload import ChunkedUpload, IterStream, TraceExistsError, UploadError
+from ion_cli.validate import SCAN_BLOCK_SIZE, byte_windows, line_blocks
+
+
+SHARD_BY_MODULE = 'module'
+SHARD_BY_RANK = 'rank'
+SHARD_BY_MODULE_AND_RANK = 'module+rank'
+SHARD_MODES = [SHARD_BY_MODULE, SHARD_BY_RANK, SHARD_BY_MODULE_AND_RANK]
+
+# '# POSIX module data' lines open the section of a module
+_SECTION = re.compile(rb'^# (\S[^\n]*?) module data\r?$', re.MULTILINE)
+_BANNER = b'# ****'
+
+# Leading bytes of a line compared to find where a run of records of one module and rank ends
+_KEY_WIDTH = 32
+
+# Bytes read at a time when streaming the ranges of a shard
+_READ_SIZE = 1 << 20
+
+
+class Shard:
+    """
+    Part of a trace: the shared header followed by byte ranges of the file.
+
+    Attributes:
+        name: File name the shard is uploaded under
+        module: Module of the records, or None if the shard holds all modules
+        ranks: (first, last) rank of the records, or None if it holds all ranks;
+            shared records (rank -1) go with the first rank range
+        ranges: (start, end) byte ranges of the original file, in file order
+        header_size: Size of the shared header at the start of the shard
+    """
+
+    def __init__(self, name: str, module: Optional[str], ranks: Optional[Tuple[int, int]], header_size: int):
+        self.name = name
+        self.module = module
+        self.ranks = ranks
+        self.ranges = []
+        self.header_size = header_size
+
+    @property
+    def size(self) -> int:
+        return self.header_size + sum(end - start for start, end in self.ranges)
+
+    def add(self, start: int, end: int) -> None:
+        if self.ranges and self.ranges[-1][1] == start:
+            self.ranges[-1] = (self.ranges[-1][0], end)
+        else:
+            self.ranges.append((start, end))
+
+
+class ShardPlan:
+    """
+    How a trace is split into shards.
+
+    Attributes:
+        path: Path of the trace
+        header: Shared job header, the first bytes of the trace
+        total_size: Size of the trace
+        nprocs: Number of processes of the job, if the header gives it
+        shards: Shards in file order; together with the header they cover the file exactly once
+    """
+
+    def __init__(self, path: str, header: bytes, total_size: int, nprocs: Optional[int], shards: List[Shard]):
+        self.path = path
+        self.header = header
+        self.total_size = total_size
+        self.nprocs = nprocs
+        self.shards = shards
+
+
+def plan_shards(file_path: str, mode: str = SHARD_BY_MODULE, rank_groups: int = UPLOAD_SHARD_RANKS,
+                block_size: int = SCAN_BLOCK_SIZE) -> ShardPlan:
+    """
+    Find the module sections and rank runs of a text trace and group them into shards.
+
+    Args:
+        file_path: Path to a darshan-parser text trace
+        mode: One of SHARD_MODES
+        rank_groups: Number of rank ranges with SHARD_BY_RANK, out of the job's nprocs
+        block_size: Number of bytes scanned at a time
+
+    Returns:
+        ShardPlan: The shards, none of them empty
+    """
+    if mode not in SHARD_MODES:
+        raise ValueError(f"Unknown shard mode '{mode}'")
+    with phase('plan shards'):
+        with open(file_path, 'rb', buffering=0) as f:
+            runs, header_size, total_size = _scan_runs(f, block_size)
+            f.seek(0)
+            header = f.read(header_size)
+
+    trace_header = TraceHeader()
+    in_job_header = True
+    for line in header.decode('utf-8', 'replace').splitlines():
+        if line.startswith('# description of columns'):
+            in_job_header = False
+        if line.startswith('#'):
+            trace_header.parse_comment(line, in_job_header)
+    nprocs = trace_header.nprocs
+
+    by_module = mode in (SHARD_BY_MODULE, SHARD_BY_MODULE_AND_RANK)
+    groups = max(1, rank_groups) if mode in (SHARD_BY_RANK, SHARD_BY_MODULE_AND_RANK) and nprocs else 1
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    shards = {}
+    for start, end, module, rank in runs:
+        group = _rank_group(rank, groups, nprocs)
+        key = (module if by_module else None, group)
+        shard = shards.get(key)
+        if shard is None:
+            ranks = None
+            if groups > 1:
+                ranks = (-(-group * nprocs // groups), -(-(group + 1) * nprocs // groups) - 1)
+            parts = [stem] + ([module] if key[0] else [])
+            if ranks:
+                parts.append(f'rank{ranks[0]}' if ranks[0] == ranks[1] else f'ranks{ranks[0]}-{ranks[1]}')
+            shard = shards[key] = Shard('.'.join(parts) + '.txt', key[0], ranks, header_size)
+        shard.add(start, end)
+    return ShardPlan(file_path, header, total_size, nprocs, list(shards.values()))
+
+
+def _rank_group(rank: Optional[int], groups: int, nprocs: Optional[int]) -> int:
+    if groups == 1 or rank is None or rank < 0:
+        return 0
+    return min(rank * groups // nprocs, groups - 1)
+
+
+def _scan_runs(f: BinaryIO, block_size: int):
+    """
+    Split a trace into runs of lines of one module and rank.
+
+    Returns:
+        tuple: (runs, header size, total size); runs are (start, end, module,
+        rank) after the header in file order, with rank None for lines that are not counter records
+    """
+    runs = []
+    header_size = None
+    section = None
+    offset = 0
+
+    def add(start, end, module, rank):
+        if runs and runs[-1][1] == start and runs[-1][2:] == (module, rank):
+            runs[-1] = (runs[-1][0], end, module, rank)
+        elif end > start:
+            runs.append((start, end, module, rank))
+
+    for buffer, length in line_blocks(f, block_size):
+        data = np.frombuffer(buffer, dtype=np.uint8, count=length)
+        ends = np.flatnonzero(data == 10) + 1
+        if not len(ends) or ends[-1] != length:
+            ends = np.append(ends, length)
+        starts = np.concatenate(([0], ends[:-1]))
+
+        # Records of one run share 'module<TAB>rank'; the bytes from the second tab on are masked
+        windows = byte_windows(np, buffer, _KEY_WIDTH, starts)
+        stops = np.cumsum((windows == 9) | (windows == 10), axis=1)
+        keys = np.where(stops < 2, windows, 0)
+        # Comments, blank lines and DXT segments (indented, space separated) follow the section they are in
+        comment = np.isin(windows[:, 0], (35, 10, 13, 32))
+        keys[comment] = 0
+        keys[comment, 0] = 35
+        words = keys.view(np.uint64)
+        first = np.flatnonzero(np.concatenate(([True], (words[1:] != words[:-1]).any(axis=1))))
+        bounds = np.append(starts[first], length).tolist()
+
+        for run, line in enumerate(first.tolist()):
+            start, end = bounds[run], bounds[run + 1]
+            if comment[line]:
+                # A section banner and '# <module> module data' line open a module section
+                for match in _SECTION.finditer(buffer, start, end):
+                    begin = match.start()
+                    previous = max(buffer.rfind(b'\n', start, begin - 1) + 1, start)
+                    if previous < begin and buffer.startswith(_BANNER, previous):
+                        begin = previous
+                    if header_size is None:
+                        header_size = offset + begin
+                    elif section is not None:
+                        add(offset + start, offset + begin, section, None)
+                    start = begin
+                    section = match.group(1).decode('utf-8', 'replace')
+                if header_size is not None:
+                    add(offset + start, offset + end, section, None)
+                continue
+            fields = bytes(keys[line]).rstrip(b'\0').split(b'\t')
+            module = fields[0].decode('utf-8', 'replace')
+            try:
+                rank = int(fields[1])
+            except (IndexError, ValueError):
+                rank = None
+            if header_size is None:
+                # A trace without section banners: the header ends at the first record
+                header_size = offset + start
+            if section is None:
+                section = module
+            add(offset + start, offset + end, module, rank if rank is not None else -1)
+        offset += length
+
+    if header_size is None:
+        header_size = offset
+    return runs, header_size, offset
+
+
+def open_shard_stream(plan: ShardPlan, shard: Shard) -> Callable[[], BinaryIO]:
+    """
+    Build a stream factory producing the bytes of a shard.
+
+    Args:
+        plan: Plan the shard belongs to
+        shard: Shard to read
+
+    Returns:
+        Callable returning a fresh binary stream of the header and the ranges of the shard
+    """
+    def blocks():
+        yield plan.header
+        with open(plan.path, 'rb') as f:
+            for start, end in shard.ranges:
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    block = f.read(min(_READ_SIZE, remaining))
+                    if not block:
+                        raise UploadError(f"'{plan.path}' changed while it was being uploaded")
+                    remaining -= len(block)
+                    yield block
+
+    return lambda: IterStream(blocks(), name=shard.name)
+
+
+class ShardedUpload:
+    """
+    Uploads the shards of a trace concurrently and registers them as one trace.
+
+    Args:
+        user_id: User's ID
+        plan: Shards of the trace
+        content_hash: BLAKE2b-256 hex digest of the whole trace (see ion_cli.ledger.hash_file),
+            which the server checks the reassembled trace against
+        file_name: Name the trace is registered under (default: the file's own name)
+        concurrency: Number of shards sent at the same time
+        chunk_size: Number of bytes sent per request
+        encoding: Content encoding of the chunks (see UPLOAD_ENCODINGS)
+        endpoint: Base URL of the ION API
+        session: Session whose connection pool is used for all requests
+        on_bytes: Called with the number of newly acknowledged bytes, from any thread
+    """
+
+    def __init__(self, user_id: str, plan: ShardPlan, content_hash: str, file_name: Optional[str] = None,
+                 concurrency: int = UPLOAD_CONCURRENCY, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                 encoding: str = "identity", endpoint: Optional[str] = None,
+                 session: Optional[requests.Session] = None, on_bytes: Optional[Callable[[int], None]] = None,
+                 max_retries: int = UPLOAD_MAX_RETRIES, timeout: float = UPLOAD_TIMEOUT):
+        self.user_id = user_id
+        self.plan = plan
+        self.content_hash = content_hash
+        self.file_name = file_name or os.path.basename(plan.path)
+        self.concurrency = max(1, concurrency)
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.endpoint = endpoint or DEFAULT_API_ENDPOINT
+        self.session = session
+        self.on_bytes = on_bytes
+        self.max_retries = max_retries
+        self.timeout = timeout
+        # Raw shard bytes acknowledged vs. encoded bytes put on the wire, over all shards
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.shard_ids = {}
+        self.result = None
+        self._lock = threading.Lock()
+
+    def run(self) -> dict:
+        """
+        Send every shard, then the manifest.
+
+        Returns:
+            dict: Server response to the manifest
+
+        Raises:
+            TraceExistsError: The server already holds a trace with this name
+            UploadError: A shard or the manifest was rejected
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._send_shard, shard) for shard in self.plan.shards]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except TraceExistsError:
+                    raise
+                except (UploadError, OSError, requests.RequestException) as e:
+                    errors.append(e)
+        if errors:
+            raise UploadError(f"{len(errors)} of {len(self.plan.shards)} shards failed: {errors[0]}")
+        self.result = self.register()
+        return self.result
+
+    def _send_shard(self, shard: Shard) -> None:
+        acknowledged = [0]
+
+        def on_progress(offset):
+            if offset > acknowledged[0]:
+                with self._lock:
+                    self.raw_bytes += offset - acknowledged[0]
+                if self.on_bytes:
+                    self.on_bytes(offset - acknowledged[0])
+                acknowledged[0] = offset
+
+        upload = ChunkedUpload(self.user_id, shard.name, open_shard_stream(self.plan, shard),
+                               total_size=shard.size, chunk_size=self.chunk_size, max_retries=self.max_retries,
+                               timeout=self.timeout, endpoint=self.endpoint, encoding=self.encoding,
+                               on_progress=on_progress, session=self.session,
+                               init_fields={'shard_of': self.file_name})
+        with phase('upload shard', bytes=shard.size):
+            result = upload.run()
+        with self._lock:
+            self.sent_bytes += upload.sent_bytes
+            self.shard_ids[shard.name] = result['shard_id']
+
+    def manifest(self) -> dict:
+        """
+        Describe how the uploaded shards make up the trace.
+
+        Returns:
+            dict: Body of the manifest request
+        """
+        return {
+            'user_id': self.user_id,
+            'file_name': self.file_name,
+            'total_size': self.plan.total_size,
+            'header_size': len(self.plan.header),
+            'content_hash': self.content_hash,
+            'shards': [{
+                'shard_id': self.shard_ids[shard.name],
+                'name': shard.name,
+                'module': shard.module,
+                'ranks': list(shard.ranks) if shard.ranks else None,
+                'size': shard.size,
+                'ranges': [list(byte_range) for byte_range in shard.ranges],
+            } for shard in self.plan.shards],
+        }
+
+    def register(self) -> dict:
+        """
+        Register the uploaded shards as one trace.
+
+        Returns:
+            dict: Server response
+        """
+        def send():
+            return (self.session or requests).post(f"{self.endpoint}/api/upload_trace/manifest",
+                                                   json=self.manifest(), timeout=self.timeout)
+
+        # The server assembles a trace once; a repeat after a lost answer is reported as 'already exists'
+        response = send_with_retries(send, self.max_retries, "retry upload manifest")
+        if response.status_code == 400 and "already exists" in response.text:
+            raise TraceExistsError(response.text)
+        if response.status_code != 200:
+            raise UploadError(f"Could not register the shards: {response.text}")
+        return response.json()
+
+
+def sharded_upload(file_path: str, user_id: str, content_hash: Optional[str] = None, mode: str = SHARD_BY_MODULE,
+                   rank_groups: int = UPLOAD_SHARD_RANKS, **kwargs) -> ShardedUpload:
+    """
+    Split a text trace into shards and upload them as one trace.
+
+    Args:
+        file_path: Path to the text trace
+        user_id: User's ID
+        content_hash: Digest of the file from the upload ledger; computed if not given
+        mode: One of SHARD_MODES
+        rank_groups: Number of rank ranges with rank sharding
+        **kwargs: Passed through to ShardedUpload (e.g. concurrency, encoding)
+
+    Returns:
+        ShardedUpload: The finished upload, with the server response in `result`
+    """
+    if content_hash is None:
+        from ion_cli.ledger import hash_file
+        with phase('hash', bytes=os.path.getsize(file_path)):
+            content_hash = hash_file(file_path)
+    upload = ShardedUpload(user_id, plan_shards(file_path, mode, rank_groups), content_hash, **kwargs)
+    upload.run()
+    return upload
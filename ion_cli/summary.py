@@ -0,0 +1,665 @@
+"""
+Local I/O health summary of a Darshan trace.
+
+Aggregates the counters of the POSIX, MPI-IO and STDIO modules per module
+and per file with vectorized group-bys over counter columns, either scanned
+straight from a text trace (summarize_trace) or taken from a parsed
+DarshanTrace (summarize), and derives the ratios that usually explain poor
+I/O performance:
+
+- small I/O: share of POSIX accesses below 1 MiB (POSIX_SIZE_* histograms)
+- misalignment: POSIX_FILE_NOT_ALIGNED against all accesses, for the
+  POSIX_FILE_ALIGNMENT of the file system
+- access order: sequential (POSIX_SEQ_*) and consecutive (POSIX_CONSEC_*)
+  accesses against all reads and writes
+- metadata: share of metadata time in the total I/O time
+- imbalance: spread of the per-rank I/O time of shared files
+  (*_F_VARIANCE_RANK_TIME, *_F_SLOWEST/FASTEST_RANK_TIME)
+
+Only the counters used here are parsed, so a summary needs neither an
+upload nor an analysis on the server.
+"""
+
+import time
+from collections import deque
+from typing import BinaryIO, Dict, List, Optional, Union
+
+import numpy as np
+
+from ion_cli.config import SUMMARY_TOP_FILES, VALIDATE_WORKERS
+from ion_cli.darshan import DarshanTrace, TraceHeader
+from ion_cli.profiling import phase
+from ion_cli.validate import RECORD_COLUMNS, SCAN_BLOCK_SIZE, byte_windows, line_blocks
+
+
+# Trace module -> prefix of its counter names
+MODULE_PREFIXES = {'POSIX': 'POSIX', 'MPI-IO': 'MPIIO', 'STDIO': 'STDIO'}
+
+SIZE_BINS = ['0_100', '100_1K', '1K_10K', '10K_100K', '100K_1M', '1M_4M', '4M_10M', '10M_100M', '100M_1G',
+             '1G_PLUS']
+
+# Accesses in these bins count as small I/O (below 1 MiB)
+SMALL_SIZE_BINS = SIZE_BINS[:5]
+
+# Per-group sums; the order is the column order of the metric matrix
+METRICS = [
+    'records', 'bytes_read', 'bytes_written', 'reads', 'writes', 'read_time', 'write_time', 'meta_time',
+    'small_reads', 'sized_reads', 'small_writes', 'sized_writes', 'not_aligned',
+    'seq_reads', 'seq_writes', 'consec_reads', 'consec_writes',
+    'time_variance', 'bytes_variance', 'slowest_time', 'fastest_time',
+]
+
+# Counter suffix (after the module prefix) -> metric, for every summarized module
+_COMMON_COUNTERS = {
+    'BYTES_READ': 'bytes_read',
+    'BYTES_WRITTEN': 'bytes_written',
+    'F_READ_TIME': 'read_time',
+    'F_WRITE_TIME': 'write_time',
+    'F_META_TIME': 'meta_time',
+    'F_VARIANCE_RANK_TIME': 'time_variance',
+    'F_VARIANCE_RANK_BYTES': 'bytes_variance',
+    'F_SLOWEST_RANK_TIME': 'slowest_time',
+    'F_FASTEST_RANK_TIME': 'fastest_time',
+}
+
+# Counters of single modules -> metric
+_MODULE_COUNTERS = {
+    'POSIX_READS': 'reads',
+    'POSIX_WRITES': 'writes',
+    'POSIX_FILE_NOT_ALIGNED': 'not_aligned',
+    'POSIX_SEQ_READS': 'seq_reads',
+    'POSIX_SEQ_WRITES': 'seq_writes',
+    'POSIX_CONSEC_READS': 'consec_reads',
+    'POSIX_CONSEC_WRITES': 'consec_writes',
+    'STDIO_READS': 'reads',
+    'STDIO_WRITES': 'writes',
+}
+for _kind in ('INDEP', 'COLL', 'SPLIT', 'NB'):
+    _MODULE_COUNTERS[f'MPIIO_{_kind}_READS'] = 'reads'
+    _MODULE_COUNTERS[f'MPIIO_{_kind}_WRITES'] = 'writes'
+
+
+def _counter_metrics() -> Dict[str, List[str]]:
+    metrics = {}
+    for prefix in MODULE_PREFIXES.values():
+        for suffix, metric in _COMMON_COUNTERS.items():
+            metrics[f'{prefix}_{suffix}'] = [metric]
+    for counter, metric in _MODULE_COUNTERS.items():
+        metrics[counter] = [metric]
+    for direction in ('READ', 'WRITE'):
+        for size_bin in SIZE_BINS:
+            small = [f'small_{direction.lower()}s'] if size_bin in SMALL_SIZE_BINS else []
+            metrics[f'POSIX_SIZE_{direction}_{size_bin}'] = small + [f'sized_{direction.lower()}s']
+    # One row per record, counted rather than summed
+    for prefix in MODULE_PREFIXES.values():
+        metrics[f'{prefix}_BYTES_READ'].append('records')
+    return metrics
+
+
+# Counter name -> metrics it adds to
+COUNTER_METRICS = _counter_metrics()
+
+ALIGNMENT_COUNTER = 'POSIX_FILE_ALIGNMENT'
+
+# Counters a summary reads from the trace
+SUMMARY_COUNTERS = sorted(set(COUNTER_METRICS) | {ALIGNMENT_COUNTER})
+
+# Lookup tables indexed by position in SUMMARY_COUNTERS: module index, and up
+# to two metric indices (a size bin adds to its small and its total count)
+_COUNTER_INDEX = {name: index for index, name in enumerate(SUMMARY_COUNTERS)}
+_COUNTER_MODULE = np.array([list(MODULE_PREFIXES.values()).index(name.split('_', 1)[0])
+                            for name in SUMMARY_COUNTERS], dtype=np.int64)
+_METRIC_INDEX = np.full((2, len(SUMMARY_COUNTERS)), -1, dtype=np.int64)
+for _index, _name in enumerate(SUMMARY_COUNTERS):
+    for _slot, _metric in enumerate(COUNTER_METRICS.get(_name, [])):
+        _METRIC_INDEX[_slot, _index] = METRICS.index(_metric)
+
+# Widths of the windows fields are read in when scanning text (see _scan_block)
+_NAME_WIDTH = 32
+_NUMBER_WIDTH = 32
+_ID_WIDTH = 24
+_POWERS = 10.0 ** np.arange(_NUMBER_WIDTH + 1)
+# _WORD_MASKS[n] keeps the first n bytes of a window of 64-bit words
+_WORD_MASKS = (np.arange(_NAME_WIDTH) < np.arange(_NAME_WIDTH + 1)[:, None]).astype(np.uint8) * np.uint8(255)
+_WORD_MASKS = _WORD_MASKS.view(np.uint64)
+_HASH_FACTORS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5],
+                         dtype=np.uint64)
+_NAME_WORDS = np.frombuffer(b''.join(name.encode('ascii').ljust(_NAME_WIDTH, b'\0') for name in SUMMARY_COUNTERS),
+                            dtype=np.uint64).reshape(len(SUMMARY_COUNTERS), -1)
+_NAME_COUNTERS = np.argsort((_NAME_WORDS * _HASH_FACTORS).sum(axis=1, dtype=np.uint64))
+_NAME_WORDS = _NAME_WORDS[_NAME_COUNTERS]
+_NAME_HASHES = (_NAME_WORDS * _HASH_FACTORS).sum(axis=1, dtype=np.uint64)
+assert len(np.unique(_NAME_HASHES)) == len(SUMMARY_COUNTERS)
+
+# Findings are reported above these shares, once a module did at least MIN_OPERATIONS accesses
+# (access pattern findings) or spent MIN_IO_SECONDS in I/O (time findings)
+SMALL_IO_WARN = 0.1
+MISALIGNED_WARN = 0.1
+RANDOM_WARN = 0.2
+META_TIME_WARN = 0.3
+IMBALANCE_WARN = 0.15
+MIN_OPERATIONS = 100
+MIN_IO_SECONDS = 1.0
+
+TOP_FILES = SUMMARY_TOP_FILES
+
+
+def _ratio(part: float, whole: float) -> Optional[float]:
+    return part / whole if whole > 0 else None
+
+
+class IOStats:
+    """
+    Aggregated counters of one module or one file.
+
+    Attributes:
+        name: Module name, or file name
+        module: Module of the records
+        metrics: Sum of every metric in METRICS over the records
+        alignment: File alignment in bytes (POSIX_FILE_ALIGNMENT), if known
+        shared: Whether the file is shared by all ranks (a rank -1 record)
+        nprocs: Number of processes of the job
+        files: Number of files aggregated (1 for a file)
+    """
+
+    def __init__(self, name: str, module: str, metrics: Dict[str, float], alignment: Optional[int] = None,
+                 shared: bool = False, nprocs: Optional[int] = None, files: int = 1):
+        self.name = name
+        self.module = module
+        self.metrics = metrics
+        self.alignment = alignment
+        self.shared = shared
+        self.nprocs = nprocs
+        self.files = files
+
+    @property
+    def operations(self) -> float:
+        return self.metrics['reads'] + self.metrics['writes']
+
+    @property
+    def io_time(self) -> float:
+        return self.metrics['read_time'] + self.metrics['write_time'] + self.metrics['meta_time']
+
+    @property
+    def ranks(self) -> int:
+        """Number of ranks that accessed the file (all of them for shared files)."""
+        if self.shared and self.nprocs:
+            return self.nprocs
+        return int(self.metrics['records'])
+
+    @property
+    def small_read_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['small_reads'], self.metrics['sized_reads'])
+
+    @property
+    def small_write_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['small_writes'], self.metrics['sized_writes'])
+
+    @property
+    def small_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['small_reads'] + self.metrics['small_writes'],
+                      self.metrics['sized_reads'] + self.metrics['sized_writes'])
+
+    @property
+    def misaligned_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['not_aligned'], self.operations)
+
+    @property
+    def sequential_read_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['seq_reads'], self.metrics['reads'])
+
+    @property
+    def sequential_write_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['seq_writes'], self.metrics['writes'])
+
+    @property
+    def sequential_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['seq_reads'] + self.metrics['seq_writes'], self.operations)
+
+    @property
+    def consecutive_read_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['consec_reads'], self.metrics['reads'])
+
+    @property
+    def consecutive_write_fraction(self) -> Optional[float]:
+        return _ratio(self.metrics['consec_writes'], self.metrics['writes'])
+
+    @property
+    def meta_time_share(self) -> Optional[float]:
+        return _ratio(self.metrics['meta_time'], self.io_time)
+
+    @property
+    def time_imbalance(self) -> Optional[float]:
+        """
+        Coefficient of variation of the per-rank I/O time of a shared file.
+        """
+        if not self.shared or not self.nprocs or self.io_time <= 0:
+            return None
+        return float(np.sqrt(max(self.metrics['time_variance'], 0.0)) / (self.io_time / self.nprocs))
+
+    @property
+    def slowest_fastest_gap(self) -> Optional[float]:
+        """
+        Share of the slowest rank's time not needed by the fastest rank of a shared file.
+        """
+        if not self.shared:
+            return None
+        return _ratio(self.metrics['slowest_time'] - self.metrics['fastest_time'], self.metrics['slowest_time'])
+
+
+class TraceSummary:
+    """
+    I/O health summary of a trace.
+
+    Attributes:
+        path: Summarized trace, if read from a file
+        header: Job header of the trace
+        modules: Aggregates per module, in MODULE_PREFIXES order
+        files: Aggregates of the files that moved the most bytes, largest first
+        imbalanced: Shared files whose per-rank I/O time varies by more than
+            IMBALANCE_WARN of the mean, most imbalanced first (at most `top`)
+        imbalanced_count: Number of such files
+        file_count: Number of (module, file) pairs with records
+        findings: Short descriptions of likely I/O problems
+        rows: Number of counter rows analysed
+        parse_seconds: Time spent parsing the trace
+        analysis_seconds: Time spent aggregating the counters
+    """
+
+    def __init__(self, header: TraceHeader, path: Optional[str] = None):
+        self.path = path
+        self.header = header
+        self.modules = []  # type: List[IOStats]
+        self.files = []  # type: List[IOStats]
+        self.imbalanced = []  # type: List[IOStats]
+        self.imbalanced_count = 0
+        self.file_count = 0
+        self.findings = []  # type: List[str]
+        self.rows = 0
+        self.parse_seconds = 0.0
+        self.analysis_seconds = 0.0
+
+    def module(self, name: str) -> Optional[IOStats]:
+        return next((stats for stats in self.modules if stats.name == name), None)
+
+
+class _Rows:
+    """
+    Counter rows a summary is computed from.
+
+    Attributes:
+        files: Name of every file index
+        file: File index of every row
+        counter: Index of every row's counter in SUMMARY_COUNTERS
+        value: Counter values (-1 where Darshan could not monitor the counter)
+        shared: Whether the row belongs to a shared (rank -1) record
+    """
+
+    def __init__(self, files: List[str], file, counter, value, shared):
+        self.files = files
+        self.file = file
+        self.counter = counter
+        self.value = value
+        self.shared = shared
+
+
+def summarize_trace(source: Union[str, BinaryIO], top: int = TOP_FILES, block_size: int = SCAN_BLOCK_SIZE,
+                    workers: int = VALIDATE_WORKERS) -> TraceSummary:
+    """
+    Summarize the I/O of a text trace without parsing it completely.
+
+    The trace is read in large blocks that are scanned with vectorized NumPy
+    operations on a small thread pool, like the structural check of
+    ion_cli.validate. Only the lines of SUMMARY_COUNTERS are decoded.
+
+    Args:
+        source: Path to a text trace, or a binary stream of one (e.g. the
+            output of darshan-parser)
+        top: Number of files listed, by bytes moved
+        block_size: Number of bytes scanned at a time
+        workers: Number of blocks scanned at the same time
+
+    Returns:
+        TraceSummary: Aggregates and findings
+    """
+    start = time.perf_counter()
+    header = TraceHeader()
+    with phase('scan trace'):
+        if isinstance(source, str):
+            with open(source, 'rb', buffering=0) as f:
+                rows = _scan(f, header, block_size, workers)
+        else:
+            rows = _scan(source, header, block_size, workers)
+    parse_seconds = time.perf_counter() - start
+    summary = _summarize(rows, header, top)
+    summary.path = source if isinstance(source, str) else None
+    summary.parse_seconds = parse_seconds
+    return summary
+
+
+def summarize(trace: DarshanTrace, top: int = TOP_FILES) -> TraceSummary:
+    """
+    Summarize the I/O of a parsed trace.
+
+    Args:
+        trace: Parsed trace (rows of counters not in SUMMARY_COUNTERS are ignored)
+        top: Number of files listed, by bytes moved
+
+    Returns:
+        TraceSummary: Aggregates and findings
+    """
+    codes = np.array([_COUNTER_INDEX.get(name, -1) for name in trace.counters] or [-1], dtype=np.int64)
+    parts = []
+    for table in (trace.ints, trace.floats):
+        counter = codes[table.counter] if len(table) else np.zeros(0, dtype=np.int64)
+        kept = counter >= 0
+        parts.append((table.file[kept], counter[kept], table.value[kept], table.rank[kept] == -1))
+    rows = _Rows(trace.files.strings, *(np.concatenate(columns) for columns in zip(*parts)))
+    return _summarize(rows, trace.header, top)
+
+
+def _summarize(rows: _Rows, header: TraceHeader, top: int) -> TraceSummary:
+    start = time.perf_counter()
+    summary = TraceSummary(header)
+    summary.rows = len(rows.value)
+    with phase('summarize', rows=summary.rows):
+        _aggregate(rows, summary, top)
+        summary.findings = findings(summary)
+    summary.analysis_seconds = time.perf_counter() - start
+    return summary
+
+
+def _aggregate(rows: _Rows, summary: TraceSummary, top: int) -> None:
+    modules = list(MODULE_PREFIXES)
+    nmodules = len(modules)
+    nmetrics = len(METRICS)
+
+    # Dense (file, module) group ids, compacted to the groups that occur
+    group = rows.file.astype(np.int64) * nmodules + _COUNTER_MODULE[rows.counter]
+    present = np.zeros(max(len(rows.files), 1) * nmodules, dtype=bool)
+    present[group] = True
+    shared = np.zeros_like(present)
+    shared[group[rows.shared]] = True
+    group = (np.cumsum(present) - 1)[group]
+    group_ids = np.flatnonzero(present)
+    ngroups = len(group_ids)
+
+    sums = np.zeros(ngroups * nmetrics, dtype=np.float64)
+    value = np.maximum(rows.value, 0).astype(np.float64)
+    for slot in range(len(_METRIC_INDEX)):
+        metric = _METRIC_INDEX[slot][rows.counter]
+        used = metric >= 0
+        weights = np.where(metric[used] == METRICS.index('records'), 1.0, value[used])
+        sums += np.bincount(group[used] * nmetrics + metric[used], weights=weights, minlength=len(sums))
+    sums = sums.reshape(ngroups, nmetrics)
+    alignment = np.zeros(ngroups, dtype=np.int64)
+    aligned = rows.counter == _COUNTER_INDEX[ALIGNMENT_COUNTER]
+    np.maximum.at(alignment, group[aligned], value[aligned].astype(np.int64))
+
+    group_module = group_ids % nmodules
+    group_file = group_ids // nmodules
+    group_shared = shared[group_ids]
+    nprocs = summary.header.nprocs
+
+    for index, name in enumerate(modules):
+        selected = group_module == index
+        if not selected.any():
+            continue
+        module_alignment = alignment[selected]
+        summary.modules.append(IOStats(
+            name, name, dict(zip(METRICS, sums[selected].sum(axis=0).tolist())),
+            alignment=int(module_alignment.max()) if module_alignment.any() else None, nprocs=nprocs,
+            files=int(selected.sum())))
+
+    def stats(index):
+        return IOStats(rows.files[int(group_file[index])], modules[int(group_module[index])],
+                       dict(zip(METRICS, sums[index].tolist())),
+                       alignment=int(alignment[index]) or None, shared=bool(group_shared[index]), nprocs=nprocs)
+
+    summary.file_count = ngroups
+    moved = sums[:, METRICS.index('bytes_read')] + sums[:, METRICS.index('bytes_written')]
+    # Largest first; ties keep file order
+    summary.files = [stats(index) for index in np.argsort(-moved, kind='stable')[:top].tolist()]
+
+    if nprocs:
+        io_time = sums[:, METRICS.index('read_time')] + sums[:, METRICS.index('write_time')] \
+            + sums[:, METRICS.index('meta_time')]
+        mean_time = np.where(io_time > 0, io_time / nprocs, np.inf)
+        imbalance = np.where(group_shared, np.sqrt(sums[:, METRICS.index('time_variance')]) / mean_time, 0.0)
+        flagged = np.flatnonzero((imbalance > IMBALANCE_WARN) & (io_time >= MIN_IO_SECONDS))
+        summary.imbalanced_count = len(flagged)
+        flagged = flagged[np.argsort(-imbalance[flagged], kind='stable')][:top]
+        summary.imbalanced = [stats(index) for index in flagged.tolist()]
+
+
+def _scan(f: BinaryIO, header: TraceHeader, block_size: int, workers: int) -> _Rows:
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = max(1, workers)
+    pending = deque()
+    in_header = [True, True]
+    file_index = {}
+    files = []
+    parts = []
+
+    def collect(future):
+        block = future.result()
+        if block is None:
+            return
+        # Record ids identify files; map the ids of the block to indices shared by all blocks
+        indices = np.empty(len(block.ids), dtype=np.int64)
+        for position, (record_id, name) in enumerate(zip(block.ids.tolist(), block.names)):
+            index = file_index.get(record_id)
+            if index is None:
+                index = file_index[record_id] = len(files)
+                files.append(name)
+            indices[position] = index
+        parts.append((indices[block.inverse], block.counter, block.value, block.shared))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for buffer, length in line_blocks(f, block_size):
+            if in_header[0]:
+                _read_header(buffer, length, header, in_header)
+            pending.append(pool.submit(_scan_block, buffer, length))
+            # Bounds memory to a few blocks in flight
+            while len(pending) > 2 * workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    if not parts:
+        return _Rows(files, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0),
+                     np.zeros(0, dtype=bool))
+    return _Rows(files, *(np.concatenate(columns) for columns in zip(*parts)))
+
+
+def _read_header(buffer: bytearray, length: int, header: TraceHeader, state: List[bool]) -> None:
+    # Feeds the comment lines before the first record to the header; state is
+    # [still in the header, still in the job header] and carries over to the next block
+    position = 0
+    while position < length:
+        end = buffer.find(b'\n', position, length)
+        end = length if end < 0 else end
+        line = bytes(buffer[position:end]).decode('utf-8', 'replace').rstrip('\r')
+        position = end + 1
+        if not line:
+            continue
+        if not line.startswith('#'):
+            state[0] = False
+            return
+        if line.startswith('# description of columns'):
+            state[1] = False
+        header.parse_comment(line, state[1])
+
+
+class _BlockRows:
+    def __init__(self, ids, names, inverse, counter, value, shared):
+        self.ids = ids
+        self.names = names
+        self.inverse = inverse
+        self.counter = counter
+        self.value = value
+        self.shared = shared
+
+
+def _scan_block(buffer: bytearray, length: int) -> Optional[_BlockRows]:
+    data = np.frombuffer(buffer, dtype=np.uint8)[:length]
+
+    # Fields are found from the positions of tabs and newlines; other control bytes
+    # count as separators too, so lines with binary data get the wrong column count
+    separators = np.flatnonzero(data < 11)
+    # Column k of a record ends at bounds[:, k] and starts after bounds[:, k - 1] (column 0 at the line start)
+    if data[-1] == 10 and len(separators) % RECORD_COLUMNS == 0 \
+            and np.count_nonzero(data == 10) * RECORD_COLUMNS == len(separators) \
+            and (data[separators[RECORD_COLUMNS - 1::RECORD_COLUMNS]] == 10).all():
+        # Every line of the block has eight columns, as in all blocks after the header
+        bounds = separators.reshape(-1, RECORD_COLUMNS)
+        comments = data[np.concatenate(([0], bounds[:-1, -1] + 1))] == 35
+        if comments.any():
+            bounds = bounds[~comments]
+    else:
+        if data[-1] != 10:
+            separators = np.append(separators, length)
+        kinds = data[np.minimum(separators, length - 1)]
+        kinds[-1] = 10
+        newlines = np.flatnonzero(kinds == 10)
+        columns = np.diff(newlines, prepend=-1)
+        starts = np.concatenate(([0], separators[newlines[:-1]] + 1))
+        record = (columns == RECORD_COLUMNS) & (data[np.minimum(starts, length - 1)] != 35)
+        bounds = separators[np.repeat(record, columns)].reshape(-1, RECORD_COLUMNS)
+    if not len(bounds):
+        return None
+
+    # Counter names are looked up by a hash of their zero-padded 64-bit words
+    begin = bounds[:, 2] + 1
+    width = bounds[:, 3] - begin
+    words = byte_windows(np, buffer, _NAME_WIDTH, begin).view(np.uint64) & \
+        _WORD_MASKS[np.minimum(width, _NAME_WIDTH)]
+    hashes = _hash(words)
+    position = np.minimum(np.searchsorted(_NAME_HASHES, hashes), len(_NAME_HASHES) - 1)
+    kept = np.flatnonzero((_NAME_HASHES[position] == hashes) & (width <= _NAME_WIDTH))
+    kept = kept[(_NAME_WORDS[position[kept]] == words[kept]).all(axis=1)]
+    if not len(kept):
+        return None
+    bounds = bounds[kept]
+    counter = _NAME_COUNTERS[position[kept]]
+
+    value = _parse_values(buffer, data, bounds[:, 3] + 1, bounds[:, 4])
+    valid = ~np.isnan(value)
+
+    # Record ids only group the rows of a file, so their text is hashed rather than converted
+    begin = bounds[:, 1] + 1
+    width = bounds[:, 2] - begin
+    valid &= (width > 0) & (width <= _ID_WIDTH)
+    words = byte_windows(np, buffer, _ID_WIDTH, begin).view(np.uint64) & \
+        _WORD_MASKS[np.minimum(width, _ID_WIDTH), :_ID_WIDTH // 8]
+    record_id = _hash(words)
+    shared = data[bounds[:, 0] + 1] == 45
+
+    if not valid.all():
+        bounds, counter, value, record_id, shared = (column[valid] for column in
+                                                     (bounds, counter, value, record_id, shared))
+    ids, first, inverse = np.unique(record_id, return_index=True, return_inverse=True)
+    # Files are numbered in the order they appear in the trace
+    order = np.argsort(first)
+    ids, first = ids[order], first[order]
+    inverse = np.argsort(order)[inverse.reshape(-1)]
+    names = [bytes(buffer[bounds[row, 4] + 1:bounds[row, 5]]).decode('utf-8', 'replace') for row in first.tolist()]
+    return _BlockRows(ids, names, inverse, counter, value, shared)
+
+
+def _parse_values(buffer: bytearray, data, begin, end):
+    # Decimal numbers, with a leading '-' and at most one '.', are converted with
+    # vectorized operations and anything else with float(); NaN marks invalid values
+    width = end - begin
+    value = np.full(len(begin), np.nan)
+    # Most counters are 0 or another single digit
+    single = np.flatnonzero(width == 1)
+    digit = data[begin[single]] - np.uint8(48)
+    value[single[digit <= 9]] = digit[digit <= 9]
+    rows = np.flatnonzero((width > 1) & (width <= _NUMBER_WIDTH) & (end >= _NUMBER_WIDTH))
+    other = [single[digit > 9], np.flatnonzero((width > _NUMBER_WIDTH) | (width == 0) | (width > 1) & (
+        end < _NUMBER_WIDTH))]
+    if len(rows):
+        # Windows end at the field, so every column has a fixed power of ten
+        window = int(width[rows].max())
+        chars = byte_windows(np, buffer, window, end[rows] - window)
+        inside = np.arange(window) >= (window - width[rows])[:, None]
+        digits = chars - np.uint8(48)
+        is_digit = (digits <= 9) & inside
+        is_dot = (chars == 46) & inside
+        negative = chars[np.arange(len(rows)), window - width[rows]] == 45
+        dots = is_dot.sum(axis=1)
+        simple = (is_digit.sum(axis=1) + dots + negative == width[rows]) & (dots <= 1)
+        # Integers below 2 ** 53 are exact; dividing by a power of ten rounds like float()
+        number = np.where(is_digit, digits, 0).astype(np.float64) @ _POWERS[window - 1::-1]
+        fraction = np.flatnonzero(dots == 1)
+        if len(fraction):
+            # Digits left of the dot were counted one power of ten too high
+            scale = _POWERS[window - 1 - is_dot[fraction].argmax(axis=1)]
+            low = np.fmod(number[fraction], scale)
+            number[fraction] = ((number[fraction] - low) / 10 + low) / scale
+        number[negative] *= -1
+        value[rows[simple]] = number[simple]
+        other.append(rows[~simple])
+    for index in np.concatenate(other).tolist():
+        try:
+            value[index] = float(bytes(buffer[begin[index]:end[index]]))
+        except ValueError:
+            pass
+    return value
+
+
+def _hash(words):
+    hashes = words[:, 0] * _HASH_FACTORS[0]
+    for column in range(1, words.shape[1]):
+        hashes += words[:, column] * _HASH_FACTORS[column]
+    return hashes
+
+
+def _percent(fraction: float) -> str:
+    return f"{fraction:.0%}"
+
+
+def findings(summary: TraceSummary) -> List[str]:
+    """
+    Describe the likely I/O problems of a summary.
+
+    Args:
+        summary: Summary with module and file aggregates
+
+    Returns:
+        list: One sentence per problem, most general first
+    """
+    result = []
+    posix = summary.module('POSIX')
+    if posix is not None and posix.operations >= MIN_OPERATIONS:
+        for direction in ('read', 'write'):
+            fraction = getattr(posix, f'small_{direction}_fraction')
+            if fraction is not None and fraction > SMALL_IO_WARN:
+                count = int(posix.metrics[f'small_{direction}s'])
+                result.append(f"{_percent(fraction)} of POSIX {direction}s ({count}) are smaller than 1 MiB; "
+                              f"aggregate them into larger requests (e.g. collective MPI-IO or buffering)")
+        fraction = posix.misaligned_fraction
+        if fraction is not None and fraction > MISALIGNED_WARN:
+            alignment = f" to the {posix.alignment}-byte file alignment" if posix.alignment else ""
+            result.append(f"{_percent(fraction)} of POSIX accesses are not aligned{alignment}")
+        for direction in ('read', 'write'):
+            fraction = getattr(posix, f'sequential_{direction}_fraction')
+            if fraction is not None and posix.metrics[f'{direction}s'] >= MIN_OPERATIONS \
+                    and 1 - fraction > RANDOM_WARN:
+                result.append(f"{_percent(1 - fraction)} of POSIX {direction}s go to lower offsets than the "
+                              f"previous access (random access)")
+    for stats in summary.modules:
+        share = stats.meta_time_share
+        if share is not None and share > META_TIME_WARN and stats.io_time >= MIN_IO_SECONDS:
+            result.append(f"{stats.name} spends {_percent(share)} of its I/O time "
+                          f"({stats.metrics['meta_time']:.2f} s) "
+                          f"in metadata operations (open, stat, seek, sync)")
+    if summary.imbalanced:
+        worst = summary.imbalanced[0]
+        count = summary.imbalanced_count
+        files = f"{count} shared files" if count > 1 else "a shared file"
+        result.append(f"Ranks of {files} spend unequal time in I/O; the per-rank time of '{worst.name}' "
+                      f"({worst.module}) varies by {_percent(worst.time_imbalance)} of the mean")
+    return result
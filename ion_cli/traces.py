@@ -0,0 +1,247 @@
+"""
+Cached access to the user's trace list.
+
+/api/user_traces returns every trace of a user, which grows large for
+active users. The last response is kept under ION_HOME/trace_lists together
+with its ETag and Last-Modified validators. Later fetches send them as
+If-None-Match / If-Modified-Since, so an unchanged list costs a 304 with an
+empty body. Callers that only need an approximate status can pass max_age
+to use a recent copy without any request.
+
+Lookups go through a TraceIndex, built once per process from the list and
+shared by every command until a change made by this client invalidates it.
+"""
+
+import bisect
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+from ion_cli.api import APIClient, get_client
+from ion_cli.config import ION_HOME
+from ion_cli.profiling import phase
+from ion_cli.user_cache import save_private_json
+
+
+class TraceListError(Exception):
+    """Raised when the server does not return the trace list."""
+
+
+class TraceListCache:
+    """
+    Last trace list and its validators, one file per endpoint and user.
+
+    Args:
+        directory: Where the lists are stored (defaults to ION_HOME/trace_lists)
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.path.join(ION_HOME, 'trace_lists')
+
+    def path(self, endpoint: str, user_id: str) -> str:
+        key = hashlib.blake2b(f"{endpoint.rstrip('/')} {user_id}".encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, endpoint: str, user_id: str) -> Optional[dict]:
+        """
+        Return the cached entry (traces, etag, last_modified, fetched_at) or None.
+        """
+        try:
+            with open(self.path(endpoint, user_id), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not isinstance(entry.get('traces'), list):
+            return None
+        return entry
+
+    def save(self, endpoint: str, user_id: str, entry: dict) -> None:
+        try:
+            save_private_json(self.path(endpoint, user_id), entry)
+        except OSError:
+            pass
+
+    def invalidate(self, endpoint: str, user_id: str) -> None:
+        """
+        Mark the cached list as outdated after a change made by this client.
+
+        The validators are kept, so the next fetch is still conditional.
+        """
+        entry = self.load(endpoint, user_id)
+        if entry is not None and entry.get('fetched_at'):
+            entry['fetched_at'] = 0
+            self.save(endpoint, user_id, entry)
+
+
+def fetch_user_traces(user_id: str, max_age: float = 0, client: Optional[APIClient] = None) -> List[dict]:
+    """
+    Get the user's trace list, revalidating the cached copy if needed.
+
+    Args:
+        user_id: User's ID
+        max_age: Use the cached list without a request if it is at most this
+            many seconds old; 0 always revalidates
+        client: API client (defaults to the shared client of the default endpoint)
+
+    Returns:
+        list: Trace dictionaries as returned by /api/user_traces
+
+    Raises:
+        TraceListError: If the server answers with an error
+    """
+    client = client or get_client()
+    cache = TraceListCache()
+    entry = cache.load(client.endpoint, user_id)
+    if entry is not None and max_age > 0 and time.time() - entry.get('fetched_at', 0) <= max_age:
+        return entry['traces']
+
+    headers = {}
+    if entry is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    response = client.post("/api/user_traces", json={'user_id': user_id}, headers=headers,
+                           idempotent=True, hedge=True)
+
+    if response.status_code == 304 and entry is not None:
+        entry['fetched_at'] = time.time()
+        cache.save(client.endpoint, user_id, entry)
+        return entry['traces']
+    if response.status_code != 200:
+        try:
+            error = response.json().get('error', 'Unknown error')
+        except (ValueError, AttributeError):
+            error = f"HTTP {response.status_code}"
+        raise TraceListError(error)
+
+    with phase('parse trace list'):
+        traces = response.json()
+    cache.save(client.endpoint, user_id, {
+        'traces': traces,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': time.time(),
+    })
+    return traces
+
+
+def has_wildcards(pattern: str) -> bool:
+    """Check whether a trace name is a glob pattern."""
+    return any(char in pattern for char in '*?[')
+
+
+class TraceIndex:
+    """
+    Name-keyed index of a trace list.
+
+    Exact lookups use a dict; prefix and glob matches use a sorted list of
+    names, so only names sharing the pattern's literal prefix are examined.
+
+    Args:
+        traces: Trace dictionaries as returned by /api/user_traces
+    """
+
+    def __init__(self, traces: List[dict]):
+        self.traces = traces
+        self.by_name = {trace.get('trace_name'): trace for trace in traces if trace.get('trace_name')}
+        self.names = sorted(self.by_name)
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def __contains__(self, trace_name: str) -> bool:
+        return trace_name in self.by_name
+
+    def get(self, trace_name: str) -> Optional[dict]:
+        return self.by_name.get(trace_name)
+
+    def status(self, trace_name: str) -> Optional[str]:
+        """Return the status of a trace, or None if there is no such trace."""
+        trace = self.by_name.get(trace_name)
+        return trace.get('status') if trace else None
+
+    def with_prefix(self, prefix: str) -> List[str]:
+        """
+        Return the sorted names starting with prefix.
+        """
+        names = []
+        for name in self.names[bisect.bisect_left(self.names, prefix):]:
+            if not name.startswith(prefix):
+                break
+            names.append(name)
+        return names
+
+    def match(self, pattern: str) -> List[str]:
+        """
+        Resolve a trace name or glob pattern (e.g. 'amrex*') to sorted trace names.
+
+        Args:
+            pattern: Exact name, or a pattern using *, ? and [...]
+
+        Returns:
+            list: Matching trace names; empty if nothing matches
+        """
+        if not has_wildcards(pattern):
+            return [pattern] if pattern in self.by_name else []
+        literal = len(pattern)
+        for char in '*?[':
+            position = pattern.find(char)
+            if position != -1:
+                literal = min(literal, position)
+        return [name for name in self.with_prefix(pattern[:literal]) if fnmatch.fnmatchcase(name, pattern)]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_trace_index(user_id: str, max_age: float = 0, client: Optional[APIClient] = None,
+                    refresh: bool = False) -> TraceIndex:
+    """
+    Return the process-wide index of a user's traces, fetching the list on first use.
+
+    Args:
+        user_id: User's ID
+        max_age: Passed to fetch_user_traces when the list has to be fetched
+        client: API client (defaults to the shared client of the default endpoint)
+        refresh: Fetch the list again even if this process already has an index
+
+    Returns:
+        TraceIndex: Index over the trace list
+
+    Raises:
+        TraceListError: If the server answers with an error
+    """
+    client = client or get_client()
+    key = (client.endpoint, user_id)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is not None and not refresh:
+        return index
+    index = TraceIndex(fetch_user_traces(user_id, max_age=max_age, client=client))
+    with _indexes_lock:
+        _indexes[key] = index
+    return index
+
+
+def invalidate_user_traces(user_id: str, endpoint: Optional[str] = None) -> None:
+    """
+    Force the next fetch of a user's trace list to revalidate it.
+    """
+    endpoint = (endpoint or get_client().endpoint).rstrip('/')
+    with _indexes_lock:
+        _indexes.pop((endpoint, user_id), None)
+    TraceListCache().invalidate(endpoint, user_id)
+
+
+def clear_trace_indexes() -> None:
+    """
+    Drop every in-process index (the on-disk lists are kept).
+    """
+    with _indexes_lock:
+        _indexes.clear()
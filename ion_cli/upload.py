@@ -0,0 +1,405 @@
+"""
+Chunked, resumable uploads of trace files to the ION API.
+"""
+
+import io
+import os
+import time
+import zlib
+from typing import BinaryIO, Callable, Iterable, Optional
+
+import requests
+
+from ion_cli.api import send_with_retries
+from ion_cli.config import (
+    DEFAULT_API_ENDPOINT, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_RETRIES, UPLOAD_TIMEOUT
+)
+from ion_cli.profiling import mark
+
+
+class UploadError(Exception):
+    """Raised when a chunked upload cannot be completed."""
+
+
+class TraceExistsError(UploadError):
+    """Raised when the server already holds a trace with the same name."""
+
+
+def get_encoder(encoding: str) -> Callable[[bytes], bytes]:
+    """
+    Build a per-chunk compressor for the given content encoding.
+
+    Every chunk is compressed independently into a complete gzip member or
+    zstd frame. Concatenated members decode back to the original stream, so
+    the server can decode chunk by chunk and resume offsets stay in raw bytes.
+
+    Args:
+        encoding: One of UPLOAD_ENCODINGS
+
+    Returns:
+        Callable mapping raw chunk bytes to encoded bytes
+    """
+    if encoding == "identity":
+        return lambda chunk: chunk
+    if encoding == "gzip":
+        def encode(chunk: bytes) -> bytes:
+            # wbits=31 writes a gzip header with a zero mtime, so output is deterministic
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            return compressor.compress(chunk) + compressor.flush()
+        return encode
+    if encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise UploadError("zstd compression requires the 'zstandard' package (pip install ion-cli[zstd])")
+        return zstandard.ZstdCompressor(level=3).compress
+    raise UploadError(f"Unsupported content encoding '{encoding}'")
+
+
+def open_file_stream(file_path: str) -> Callable[[], BinaryIO]:
+    """
+    Build a stream factory for a file on disk.
+
+    Args:
+        file_path: Path to the file to stream
+
+    Returns:
+        Callable returning a fresh binary file object on every call
+    """
+    return lambda: open(file_path, 'rb')
+
+
+class _IterRaw(io.RawIOBase):
+    def __init__(self, chunks: Iterable[bytes], name: Optional[str] = None):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b'')
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        # Lets a generator release what it holds (e.g. a subprocess) when the stream is closed early
+        if not self.closed and hasattr(self._chunks, 'close'):
+            self._chunks.close()
+        super().close()
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def IterStream(chunks: Iterable[bytes], name: Optional[str] = None) -> BinaryIO:
+    """
+    Wrap an iterator of byte blocks in a read-only, non-seekable binary stream.
+
+    Lets generated data (reduced traces, subprocess output) flow through the
+    same upload code as files on disk without materialising it.
+
+    Args:
+        chunks: Iterable of byte strings
+        name: Value of the stream's `name` attribute
+
+    Returns:
+        BinaryIO: Buffered stream whose read(n) returns n bytes until EOF
+    """
+    return io.BufferedReader(_IterRaw(chunks, name), buffer_size=1 << 20)
+
+
+def seek_stream(stream: BinaryIO, offset: int, block_size: int = UPLOAD_CHUNK_SIZE) -> None:
+    """
+    Position a stream at the given offset, reading forward if it cannot seek.
+
+    Args:
+        stream: Binary stream positioned at its start
+        offset: Byte offset to move to
+        block_size: Read size used when skipping over non-seekable data
+    """
+    if stream.seekable():
+        stream.seek(offset)
+        return
+    remaining = offset
+    while remaining > 0:
+        skipped = stream.read(min(block_size, remaining))
+        if not skipped:
+            raise UploadError(f"Stream ended before resume offset {offset}")
+        remaining -= len(skipped)
+
+
+class ChunkedUpload:
+    """
+    Streams a trace to the ION API in fixed-size parts.
+
+    The server acknowledges every part with the next offset it expects, so an
+    interrupted transfer resumes from the last acknowledged byte instead of
+    starting over. Only one chunk is held in memory at a time.
+    """
+
+    def __init__(self, user_id: str, file_name: str, open_stream: Callable[[], BinaryIO],
+                 total_size: Optional[int] = None, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                 max_retries: int = UPLOAD_MAX_RETRIES, timeout: float = UPLOAD_TIMEOUT,
+                 endpoint: Optional[str] = None, encoding: str = "identity",
+                 on_progress: Optional[Callable[[int], None]] = None,
+                 session: Optional[requests.Session] = None, init_fields: Optional[dict] = None):
+        """
+        Args:
+            user_id: User's ID
+            file_name: Name the trace is registered under on the server
+            open_stream: Factory returning the trace bytes from the beginning
+            total_size: Size of the stream in bytes, if known
+            chunk_size: Number of bytes sent per request
+            max_retries: Consecutive failures tolerated before giving up
+            timeout: Per-request timeout in seconds
+            endpoint: Base URL of the ION API
+            encoding: Content encoding requested for the chunks (see UPLOAD_ENCODINGS)
+            on_progress: Called with the acknowledged offset after every chunk
+            session: Session whose connection pool is used for all requests
+            init_fields: Additional fields of the init request (e.g. 'shard_of' for a shard of a trace)
+        """
+        self.user_id = user_id
+        self.file_name = file_name
+        self.open_stream = open_stream
+        self.total_size = total_size
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.endpoint = endpoint or DEFAULT_API_ENDPOINT
+        self.on_progress = on_progress
+        self.upload_id = None
+        self.encoding = encoding
+        self.encode = get_encoder(encoding)
+        # Raw trace bytes acknowledged vs. encoded bytes put on the wire
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.result = None
+        self.session = session
+        self.init_fields = init_fields or {}
+
+    def _post(self, path: str, retry: bool = False, **kwargs) -> requests.Response:
+        def send():
+            return (self.session or requests).post(f"{self.endpoint}/api/upload_trace/{path}",
+                                                   timeout=self.timeout, **kwargs)
+
+        return send_with_retries(send, self.max_retries, f"retry upload {path}") if retry else send()
+
+    def start(self) -> int:
+        """
+        Open (or re-attach to) an upload session on the server.
+
+        Returns:
+            int: Offset already acknowledged by the server
+        """
+        # Init re-attaches to the pending upload of the same name, so repeating it is safe
+        response = self._post("init", retry=True, json={
+            'user_id': self.user_id,
+            'file_name': self.file_name,
+            'total_size': self.total_size,
+            'chunk_size': self.chunk_size,
+            'content_encoding': self.encoding,
+            **self.init_fields,
+        })
+        if response.status_code == 400 and "already exists" in response.text:
+            raise TraceExistsError(response.text)
+        if response.status_code != 200:
+            raise UploadError(f"Could not start upload: {response.text}")
+        result = response.json()
+        self.upload_id = result['upload_id']
+        # Servers that do not understand the requested encoding omit it; send raw bytes then
+        if result.get('content_encoding', 'identity') != self.encoding:
+            self.encoding = 'identity'
+            self.encode = get_encoder('identity')
+        return int(result.get('offset', 0))
+
+    def acknowledged_offset(self) -> int:
+        """
+        Ask the server how many bytes of the current upload it holds.
+
+        Returns:
+            int: Next offset the server expects
+        """
+        response = self._post("status", retry=True, json={'user_id': self.user_id, 'upload_id': self.upload_id})
+        if response.status_code != 200:
+            raise UploadError(f"Could not query upload status: {response.text}")
+        return int(response.json()['offset'])
+
+    def send_chunk(self, offset: int, chunk: bytes) -> int:
+        """
+        Encode and send one part of the stream.
+
+        Args:
+            offset: Offset of the first raw byte of the chunk
+            chunk: Raw bytes to send
+
+        Returns:
+            int: Next raw offset the server expects
+        """
+        body = self.encode(chunk)
+        headers = {'Content-Type': 'application/octet-stream'}
+        if self.encoding != 'identity':
+            headers['Content-Encoding'] = self.encoding
+        self.sent_bytes += len(body)
+        response = self._post(
+            "chunk",
+            params={'upload_id': self.upload_id, 'offset': offset, 'length': len(chunk)},
+            data=body,
+            headers=headers,
+        )
+        # 409 means the server is at a different offset; it tells us which one
+        if response.status_code in (200, 409):
+            return int(response.json()['offset'])
+        raise UploadError(f"Chunk at offset {offset} rejected ({response.status_code}): {response.text}")
+
+    def complete(self, size: int) -> dict:
+        """
+        Tell the server the stream is finished so it assembles the trace.
+
+        Args:
+            size: Total number of bytes sent
+
+        Returns:
+            dict: Server response body
+        """
+        response = self._post("complete", json={
+            'user_id': self.user_id,
+            'upload_id': self.upload_id,
+            'size': size,
+        })
+        if response.status_code != 200:
+            raise UploadError(f"Could not complete upload: {response.text}")
+        return response.json()
+
+    def run(self) -> dict:
+        """
+        Upload the whole stream, resuming after transient failures.
+
+        Returns:
+            dict: Server response to the completion request
+        """
+        offset = self.start()
+        failures = 0
+        stream = self.open_stream()
+        try:
+            seek_stream(stream, offset, self.chunk_size)
+            self._report(offset)
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                try:
+                    acked = self.send_chunk(offset, chunk)
+                except (requests.RequestException, UploadError, ValueError) as e:
+                    failures += 1
+                    mark('retry upload chunk', error=str(e))
+                    if failures > self.max_retries:
+                        raise UploadError(f"Giving up after {failures} failed attempts: {e}")
+                    time.sleep(min(2 ** (failures - 1), 30) * 0.5)
+                    acked = self._recover_offset(offset)
+                else:
+                    failures = 0
+
+                if acked != offset + len(chunk):
+                    # Server is somewhere else (lost ack or stale retry); realign
+                    if not stream.seekable():
+                        stream.close()
+                        stream = self.open_stream()
+                    seek_stream(stream, acked, self.chunk_size)
+                offset = acked
+                self._report(offset)
+        finally:
+            stream.close()
+        self.raw_bytes = offset
+        return self.complete(offset)
+
+    def _recover_offset(self, fallback: int) -> int:
+        try:
+            return self.acknowledged_offset()
+        except (requests.RequestException, UploadError, ValueError, KeyError):
+            return fallback
+
+    def _report(self, offset: int) -> None:
+        if self.on_progress:
+            self.on_progress(offset)
+
+
+def multipart_upload(file_name: str, stream: BinaryIO, user_id: str,
+                     session: Optional[requests.Session] = None,
+                     endpoint: Optional[str] = None, timeout: float = UPLOAD_TIMEOUT,
+                     max_retries: int = UPLOAD_MAX_RETRIES) -> requests.Response:
+    """
+    Upload a trace in a single multipart request to /api/upload_trace.
+
+    A seekable stream is rewound and sent again after a connection error,
+    timeout or overload response. The server never stores two traces under
+    one name, so a repeat of an upload that did arrive is answered with
+    "already exists" rather than creating a duplicate.
+
+    Args:
+        file_name: Name the trace is registered under on the server
+        stream: Binary stream with the trace content
+        user_id: User's ID
+        session: Session whose connection pool is used for the request
+        endpoint: Base URL of the ION API
+        timeout: Request timeout in seconds
+        max_retries: Retries of a seekable stream (a generated stream is sent once)
+
+    Returns:
+        requests.Response: The server response
+    """
+    start = stream.tell() if stream.seekable() else None
+
+    def send():
+        return (session or requests).post(
+            f"{endpoint or DEFAULT_API_ENDPOINT}/api/upload_trace",
+            files={'file': (file_name, stream, 'text/plain')},
+            data={'user_id': user_id},
+            timeout=timeout
+        )
+
+    if start is None:
+        return send()
+    return send_with_retries(send, max_retries, "retry upload", rewind=lambda: stream.seek(start))
+
+
+def chunked_upload(file_path: str, user_id: str, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                   on_progress: Optional[Callable[[int], None]] = None,
+                   open_stream: Optional[Callable[[], BinaryIO]] = None,
+                   total_size: Optional[int] = None, file_name: Optional[str] = None,
+                   **kwargs) -> ChunkedUpload:
+    """
+    Upload a file on disk with the chunked, resumable protocol.
+
+    Args:
+        file_path: Path to the file to upload
+        user_id: User's ID
+        chunk_size: Number of bytes sent per request
+        on_progress: Called with the acknowledged offset after every chunk
+        open_stream: Factory for the bytes to send instead of the file itself
+            (e.g. a reduced trace); the file name is still used for the trace
+        total_size: Size of the stream produced by open_stream, if known
+        file_name: Name the trace is registered under, if not the file's own name
+        **kwargs: Passed through to ChunkedUpload (e.g. encoding)
+
+    Returns:
+        ChunkedUpload: The finished upload, with the server response in `result`
+    """
+    if open_stream is None:
+        open_stream = open_file_stream(file_path)
+        total_size = os.path.getsize(file_path)
+    upload = ChunkedUpload(
+        user_id,
+        file_name or os.path.basename(file_path),
+        open_stream,
+        total_size=total_size,
+        chunk_size=chunk_size,
+        on_progress=on_progress,
+        **kwargs
+    )
+    upload.result = upload.run()
+    return upload
@@ -0,0 +1,110 @@
+"""
+On-disk cache of verified users.
+
+Every command needs the user id behind an email, which costs a round trip
+to /api/user. The resolution is stored in ION_HOME/users.json, readable
+only by the owner, and reused until USER_CACHE_TTL expires or the server
+rejects the id.
+"""
+
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+from ion_cli.config import ION_HOME, USER_CACHE_TTL
+
+
+def save_private_json(path: str, data) -> None:
+    """
+    Atomically write data as JSON to a file only the owner can read.
+
+    Args:
+        path: Destination file; its directory is created with mode 0700
+        data: JSON-serialisable value
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # mkstemp creates the file with mode 0600; replace the target atomically
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class UserCache:
+    """
+    Maps (endpoint, email) to a verified user id.
+
+    Args:
+        path: Location of the cache file (defaults to ION_HOME/users.json)
+        ttl: Seconds an entry stays valid; 0 or less disables the cache
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = USER_CACHE_TTL):
+        self.path = path or os.path.join(ION_HOME, 'users.json')
+        self.ttl = ttl
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self, entries: dict) -> None:
+        save_private_json(self.path, entries)
+
+    @staticmethod
+    def _key(endpoint: str, email: str) -> str:
+        return f"{endpoint.rstrip('/')} {email.strip().lower()}"
+
+    def get(self, endpoint: str, email: str) -> Optional[str]:
+        """
+        Return the cached user id of an email, or None if missing or expired.
+        """
+        if self.ttl <= 0:
+            return None
+        entry = self._load().get(self._key(endpoint, email))
+        if not isinstance(entry, dict) or time.time() - entry.get('verified_at', 0) > self.ttl:
+            return None
+        return entry.get('user_id')
+
+    def put(self, endpoint: str, email: str, user_id: str) -> None:
+        """
+        Remember that the server verified an email as user_id.
+        """
+        if self.ttl <= 0:
+            return
+        entries = self._load()
+        entries[self._key(endpoint, email)] = {'user_id': user_id, 'verified_at': time.time()}
+        try:
+            self._save(entries)
+        except OSError:
+            pass
+
+    def forget(self, endpoint: str, user_id: str) -> int:
+        """
+        Drop every cached email resolving to user_id at an endpoint.
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = self._load()
+        prefix = f"{endpoint.rstrip('/')} "
+        stale = [key for key, entry in entries.items()
+                 if key.startswith(prefix) and isinstance(entry, dict) and entry.get('user_id') == user_id]
+        for key in stale:
+            del entries[key]
+        if stale:
+            try:
+                self._save(entries)
+            except OSError:
+                pass
+        return len(stale)
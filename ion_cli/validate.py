@@ -0,0 +1,381 @@
+"""
+Checks run on trace files before they are uploaded.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Callable, Iterator, Optional, Tuple
+
+from ion_cli.config import VALIDATE_WORKERS
+
+
+# Parsed traces written by --convert (see ion_cli.columnar)
+COLUMNAR_EXTENSIONS = ['.npz', '.arrow', '.parquet']
+
+TRACE_EXTENSIONS = ['.txt', '.darshan'] + COLUMNAR_EXTENSIONS
+
+
+def check_trace_file(file_path: str) -> Optional[str]:
+    """
+    Check that the file exists and is a .txt, .darshan or columnar trace.
+    
+    Args:
+        file_path: Path to the file to check
+        
+    Returns:
+        str: Description of the problem, or None if the file is valid
+    """
+    if not os.path.exists(file_path):
+        return f"File '{file_path}' does not exist."
+    
+    file_extension = os.path.splitext(file_path)[1].lower()
+    
+    # Check if file has valid extension
+    if file_extension not in TRACE_EXTENSIONS:
+        return f"File '{file_path}' must be a .txt, .darshan, .npz, .arrow or .parquet file."
+    
+    # For .txt files, validate text content
+    if file_extension == '.txt':
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                # Try to read a small sample of the file
+                sample = file.read(1024)
+                
+                # Check if the sample contains null bytes, which typically indicate binary data
+                if '\0' in sample:
+                    return f"File '{file_path}' appears to be a binary file, not a text file."
+                    
+        except UnicodeDecodeError:
+            return f"File '{file_path}' contains invalid text encoding."
+        except Exception as e:
+            return f"Cannot read '{file_path}': {str(e)}"
+    
+    # For .darshan and columnar files, we just verify it exists (already checked above)
+    return None
+
+
+# Modules whose records darshan-parser prints
+KNOWN_MODULES = [
+    'POSIX', 'MPI-IO', 'STDIO', 'LUSTRE', 'HEATMAP', 'H5F', 'H5D', 'PNETCDF_FILE', 'PNETCDF_VAR', 'BG/Q',
+    'DXT_POSIX', 'DXT_MPIIO', 'MDHIM', 'APMPI', 'APXC', 'DFS', 'DAOS',
+]
+
+# Job header fields every darshan-parser dump starts with
+REQUIRED_HEADER_FIELDS = ['darshan log version', 'nprocs']
+
+# <module> <rank> <record id> <counter> <value> <file name> <mount pt> <fs type>
+RECORD_COLUMNS = 8
+NUMERIC_COLUMNS = {1: 'rank', 2: 'record id', 4: 'value'}
+NUMERIC_CHARACTERS = b'0123456789+-.eE'
+
+# Bytes checked per block; a line longer than this gets a block of its own
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Longest rank, record id or value accepted as a number
+MAX_NUMBER_WIDTH = 64
+
+MAX_ERRORS = 20
+
+
+class StructureReport:
+    """
+    Result of a full structural check of a text trace.
+
+    Attributes:
+        path: Checked file
+        bytes: Size of the file
+        lines: Number of lines
+        records: Number of counter record lines
+        header: ``# key: value`` fields of the job header
+        errors: The first (line number, message) problems, in file order
+        error_count: Number of problems found in the whole file
+        truncated: Whether the file ends in the middle of a line
+        seconds: Time the check took
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.bytes = 0
+        self.lines = 0
+        self.records = 0
+        self.header = {}
+        self.errors = []
+        self.error_count = 0
+        self.truncated = False
+        self.seconds = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error_count == 0
+
+    def summary(self) -> Optional[str]:
+        """
+        Describe the problems in one line, or return None if there are none.
+        """
+        if self.ok:
+            return None
+        line, message = self.errors[0]
+        more = f" (and {self.error_count - 1} more problems)" if self.error_count > 1 else ""
+        return f"line {line}: {message}{more}"
+
+
+def check_trace_structure(file_path: str, max_errors: int = MAX_ERRORS, block_size: int = SCAN_BLOCK_SIZE,
+                          workers: int = VALIDATE_WORKERS) -> StructureReport:
+    """
+    Check every line of a darshan-parser text trace.
+
+    The file is read in large blocks of whole lines, which are checked with
+    vectorised NumPy operations on a small thread pool (NumPy releases the
+    GIL), so the check keeps up with the disk. It verifies the required
+    header fields, that every record line has eight tab-separated columns
+    with numeric rank, record id and value and a known module, that the file
+    is UTF-8 text without NUL bytes, and that it does not end in the middle
+    of a line, which is how truncated traces look.
+
+    Args:
+        file_path: Path to the text trace
+        max_errors: Number of problems reported with their line numbers; all are counted
+        block_size: Number of bytes read and checked at a time
+        workers: Number of blocks checked at the same time
+
+    Returns:
+        StructureReport: Statistics and the first problems found
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    report = StructureReport(file_path)
+    start = time.perf_counter()
+    workers = max(1, workers)
+    pending = deque()
+    in_header = True
+
+    def collect(future):
+        result = future.result()
+        for line, message in result.errors:
+            if len(report.errors) < max_errors:
+                report.errors.append((report.lines + line, message))
+        report.error_count += result.error_count
+        report.lines += result.lines
+        report.records += result.records
+
+    with open(file_path, 'rb', buffering=0) as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        for buffer, length in line_blocks(f, block_size):
+            if in_header:
+                in_header = _parse_header(buffer, length, report)
+            report.bytes += length
+            report.truncated = buffer[length - 1] != 10
+            pending.append(pool.submit(_scan_block, buffer, length, max_errors))
+            # Bounds memory to a few blocks in flight
+            while len(pending) > 2 * workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    problems = []
+    if report.bytes == 0:
+        problems.append((0, "file is empty"))
+    else:
+        for field in REQUIRED_HEADER_FIELDS:
+            if field not in report.header:
+                problems.append((1, f"header field '# {field}:' is missing"))
+        nprocs = report.header.get('nprocs')
+        if nprocs is not None and not (nprocs.isdigit() and int(nprocs) > 0):
+            problems.append((1, f"header field '# nprocs:' is not a positive integer: '{nprocs}'"))
+        if report.records == 0:
+            problems.append((report.lines, "no counter records"))
+        if report.truncated:
+            problems.append((report.lines, "file ends in the middle of a line (truncated?)"))
+    report.error_count += len(problems)
+    report.errors = sorted(report.errors + problems, key=lambda error: error[0])[:max_errors]
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def line_blocks(f, block_size: int) -> Iterator[Tuple[bytearray, int]]:
+    """
+    Read a binary stream in blocks of whole lines.
+
+    Every buffer has MAX_NUMBER_WIDTH spare bytes after the data, so fields
+    can be read in fixed-width windows (see byte_windows).
+
+    Args:
+        f: Binary stream supporting readinto
+        block_size: Number of bytes read at a time; a longer line gets a larger block
+
+    Returns:
+        Iterator over (buffer, length) pairs with the lines in buffer[:length];
+        only the last block may end without a newline
+    """
+    carry = b''
+    while True:
+        size = max(block_size, 2 * len(carry))
+        buffer = bytearray(size + MAX_NUMBER_WIDTH)
+        buffer[:len(carry)] = carry
+        count = f.readinto(memoryview(buffer)[len(carry):size])
+        filled = len(carry) + count
+        if not count:
+            if carry:
+                yield buffer, filled
+            return
+        cut = buffer.rfind(b'\n', 0, filled) + 1
+        carry = bytes(buffer[cut:filled]) if cut else bytes(buffer[:filled])
+        if cut:
+            yield buffer, cut
+
+
+def _parse_header(buffer: bytearray, length: int, report: StructureReport) -> bool:
+    # Reads the '# key: value' lines before the first record; returns whether the header goes on in the next block
+    position = 0
+    while position < length:
+        end = buffer.find(b'\n', position, length)
+        end = length if end < 0 else end
+        line = bytes(buffer[position:end]).rstrip(b'\r')
+        position = end + 1
+        if not line:
+            continue
+        if not line.startswith(b'#'):
+            return False
+        key, sep, value = line[1:].decode('utf-8', 'replace').partition(':')
+        if sep and line.startswith(b'# ') and key.strip() != 'mount entry':
+            report.header.setdefault(key.strip(), value.strip())
+    return True
+
+
+class _BlockResult:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.lines = 0
+        self.records = 0
+        self.errors = []
+        self.error_count = 0
+
+    def flag(self, np, lines, message: Callable[[int], str]) -> None:
+        # Counts the given lines (0-based within the block) and records the first ones, 1-based
+        lines = np.unique(lines)
+        if not lines.size:
+            return
+        self.error_count += int(lines.size)
+        room = max(0, self.max_errors - len(self.errors))
+        self.errors.extend((int(index) + 1, message(int(index))) for index in lines[:room])
+
+
+def byte_windows(np, buffer: bytearray, width: int, begin):
+    """
+    Gather the `width` bytes starting at each offset as the rows of a 2D array.
+
+    Gathering whole fixed-size items is much faster than fancy indexing of
+    single bytes.
+
+    Args:
+        np: The numpy module (imported by the caller, so this module does not)
+        buffer: Buffer of a block from line_blocks
+        width: Window width, at most MAX_NUMBER_WIDTH past the end of the data
+        begin: Array of start offsets
+
+    Returns:
+        numpy.ndarray: uint8 array of shape (len(begin), width)
+    """
+    items = np.ndarray(shape=(len(buffer) - width + 1,), dtype=f'V{width}', buffer=buffer, strides=(1,))
+    return items[begin].view(np.uint8).reshape(-1, width)
+
+
+def _scan_block(buffer: bytearray, length: int, max_errors: int) -> _BlockResult:
+    # NumPy is only needed here; keep it out of the import of the CLI
+    import numpy as np
+
+    result = _BlockResult(max_errors)
+    padded = np.frombuffer(buffer, dtype=np.uint8)
+    data = padded[:length]
+
+    # Everything is derived from the positions of tabs, newlines and other control bytes
+    separators = np.flatnonzero(data < 11)
+    kinds = data[separators]
+    binary = kinds < 9
+    if binary.any():
+        binary_positions = separators[binary]
+        separators, kinds = separators[~binary], kinds[~binary]
+    newlines = np.flatnonzero(kinds == 10)
+    ends = separators[newlines]
+    if data[-1] != 10:
+        newlines = np.append(newlines, len(separators))
+        ends = np.append(ends, length)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    first_separator = np.empty_like(newlines)
+    first_separator[0] = 0
+    first_separator[1:] = newlines[:-1] + 1
+    columns = newlines - first_separator + 1
+    result.lines = len(ends)
+
+    def field(index, column):
+        line = bytes(buffer[starts[index]:ends[index]]).decode('utf-8', 'replace')
+        return line.split('\t')[column] if line.count('\t') >= column else line
+
+    lengths = ends - starts
+    first = data[np.minimum(starts, length - 1)]
+    blank = (lengths == 0) | ((lengths == 1) & (first == 13))
+    record = ~blank & (first != 35)
+    result.records = int(np.count_nonzero(record))
+
+    if binary.any():
+        result.flag(np, np.searchsorted(ends, binary_positions),
+                    lambda index: "NUL byte (binary data)" if 0 in buffer[starts[index]:ends[index]]
+                    else "control character (binary data)")
+    # bytearray.isascii needs Python 3.7
+    if data.max() >= 128:
+        try:
+            bytes(buffer[:length]).decode('utf-8')
+        except UnicodeDecodeError as e:
+            result.flag(np, np.searchsorted(ends, [e.start]), lambda index: "invalid UTF-8 text")
+
+    result.flag(np, np.flatnonzero(record & (columns != RECORD_COLUMNS)),
+                lambda index: f"expected {RECORD_COLUMNS} tab-separated columns, found {int(columns[index])}")
+
+    rows = np.flatnonzero(record & (columns == RECORD_COLUMNS))
+    if not rows.size:
+        return result
+    # Column k of a row spans bounds[:, k] + 1 to bounds[:, k + 1], with bounds[:, 0] just before the line
+    bounds = np.empty((len(rows), RECORD_COLUMNS + 1), dtype=separators.dtype)
+    bounds[:, 0] = starts[rows] - 1
+    if len(rows) == len(ends) and data[-1] == 10:
+        # Every line of the block is a complete record
+        bounds[:, 1:] = separators.reshape(-1, RECORD_COLUMNS)
+    else:
+        selected = record & (columns == RECORD_COLUMNS)
+        bounds[:, 1:] = separators[np.repeat(selected, columns)].reshape(-1, RECORD_COLUMNS)
+
+    # Each field is read as a fixed-width window that also covers the tab after it; a field
+    # is all digits when the first non-digit of its window is that tab, and only the few
+    # remaining fields are checked character by character
+    numeric = np.zeros(256, dtype=bool)
+    numeric[np.frombuffer(NUMERIC_CHARACTERS, dtype=np.uint8)] = True
+    for column, name in NUMERIC_COLUMNS.items():
+        begin = bounds[:, column] + 1
+        width = bounds[:, column + 1] - begin
+        invalid = (width == 0) | (width > MAX_NUMBER_WIDTH)
+        window = min(int(width.max()), MAX_NUMBER_WIDTH) + 1
+        chars = byte_windows(np, buffer, window, begin)
+        suspect = np.flatnonzero(((chars - np.uint8(48)) > 9).argmax(axis=1) < width)
+        inside = np.arange(window) < width[suspect, None]
+        invalid[suspect] |= (~numeric[chars[suspect]] & inside).any(axis=1)
+        result.flag(np, rows[invalid],
+                    lambda index, name=name, column=column: f"{name} is not a number: '{field(index, column)}'")
+
+    # Module names are compared as two 64-bit words, zero-padded after the name. Records come
+    # in long runs of one module, so only the first name of every run is looked up.
+    window = 16
+    width = bounds[:, 1] - bounds[:, 0] - 1
+    masks = (np.arange(window) < np.arange(window + 1)[:, None]).astype(np.uint8) * np.uint8(255)
+    words = byte_windows(np, buffer, window, bounds[:, 0] + 1).view(np.uint64) & \
+        masks.view(np.uint64)[np.minimum(width, window)]
+    run_starts = np.flatnonzero(np.concatenate(([True], (words[1:] != words[:-1]).any(axis=1))))
+    first_words = words[run_starts]
+    known_runs = np.zeros(len(run_starts), dtype=bool)
+    for module in KNOWN_MODULES:
+        name = np.frombuffer(module.encode('ascii').ljust(window, b'\0'), dtype=np.uint64)
+        known_runs |= (first_words == name).all(axis=1)
+    known = np.repeat(known_runs, np.diff(np.append(run_starts, len(rows))))
+    result.flag(np, rows[~known | (width > window)], lambda index: f"unknown module '{field(index, 0)}'")
+    return result
@@ -0,0 +1,145 @@
+"""
+Waiting for analyses to finish.
+
+All watched traces are multiplexed onto one conditional /api/user_traces
+fetch per tick, so watching a hundred traces costs the same as watching one
+(and an unchanged list is a 304). The delay between ticks grows
+exponentially while nothing changes and drops back to the initial delay as
+soon as a status changes. Each delay is jittered so many clients started
+together do not poll in lockstep.
+"""
+
+import random
+import time
+from typing import Callable, Iterable, List, Optional
+
+from ion_cli.api import APIClient, get_client
+from ion_cli.config import (
+    VALID_TASK_STATUSES, WATCH_POLL_FACTOR, WATCH_POLL_INITIAL, WATCH_POLL_JITTER, WATCH_POLL_MAX
+)
+from ion_cli.traces import get_trace_index
+
+
+# Reported for watched traces that are not (or no longer) in the trace list
+MISSING = "missing"
+
+# Terminal states of a trace whose analysis was just launched; 'not_started' only
+# means the server has not picked the task up yet
+FINISHED_STATUSES = [status for status in VALID_TASK_STATUSES if status != "not_started"]
+
+
+class PollSchedule:
+    """
+    Adaptive exponential backoff with jitter.
+
+    Args:
+        initial: Delay after a tick that saw a change, in seconds
+        maximum: Upper bound of the delay
+        factor: Growth of the delay per tick without changes
+        jitter: Fraction of the delay that is randomised (0 disables jitter)
+    """
+
+    def __init__(self, initial: float = WATCH_POLL_INITIAL, maximum: float = WATCH_POLL_MAX,
+                 factor: float = WATCH_POLL_FACTOR, jitter: float = WATCH_POLL_JITTER):
+        self.initial = initial
+        self.maximum = max(initial, maximum)
+        self.factor = factor
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        self.delay = initial
+
+    def next_delay(self, changed: bool) -> float:
+        """
+        Return the time to wait before the next tick.
+
+        Args:
+            changed: Whether the last tick observed a status change
+
+        Returns:
+            float: Seconds to sleep
+        """
+        if changed:
+            self.delay = self.initial
+        else:
+            self.delay = min(self.maximum, self.delay * self.factor)
+        return self.delay * (1 - self.jitter * random.random())
+
+
+class TraceWatcher:
+    """
+    Tracks the status of many traces until each reaches a terminal state.
+
+    Args:
+        user_id: User's ID
+        trace_names: Traces to watch
+        terminal: Statuses in which a trace is done
+        client: API client (defaults to the shared client of the default endpoint)
+        schedule: Polling schedule
+        on_tick: Called after every tick with the watcher
+    """
+
+    def __init__(self, user_id: str, trace_names: Iterable[str], terminal: Iterable[str] = VALID_TASK_STATUSES,
+                 client: Optional[APIClient] = None, schedule: Optional[PollSchedule] = None,
+                 on_tick: Optional[Callable[['TraceWatcher'], None]] = None):
+        self.user_id = user_id
+        self.trace_names = list(dict.fromkeys(trace_names))
+        self.terminal = set(terminal) | {MISSING}
+        self.client = client or get_client()
+        self.schedule = schedule or PollSchedule()
+        self.on_tick = on_tick
+        self.statuses = {}
+        self.changed_at = {}
+        self.ticks = 0
+        self.next_poll = 0.0
+        self.started = time.monotonic()
+
+    @property
+    def done(self) -> bool:
+        return all(self.statuses.get(name) in self.terminal for name in self.trace_names)
+
+    def pending(self) -> List[str]:
+        return [name for name in self.trace_names if self.statuses.get(name) not in self.terminal]
+
+    def poll(self) -> List[str]:
+        """
+        Fetch the trace list once and update every watched trace.
+
+        Returns:
+            list: Names of the traces whose status changed
+        """
+        index = get_trace_index(self.user_id, client=self.client, refresh=True)
+        self.ticks += 1
+        now = time.monotonic()
+        changed = []
+        for name in self.trace_names:
+            status = index.status(name) or MISSING
+            if self.statuses.get(name) != status:
+                self.statuses[name] = status
+                self.changed_at[name] = now
+                changed.append(name)
+        return changed
+
+    def run(self, timeout: Optional[float] = None) -> bool:
+        """
+        Poll until every trace is in a terminal state or the timeout expires.
+
+        Args:
+            timeout: Maximum number of seconds to wait; None waits indefinitely
+
+        Returns:
+            bool: True if every trace reached a terminal state
+        """
+        deadline = None if timeout is None else self.started + timeout
+        while True:
+            changed = self.poll()
+            delay = self.schedule.next_delay(bool(changed))
+            self.next_poll = time.monotonic() + delay
+            if self.on_tick:
+                self.on_tick(self)
+            if self.done:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(delay)
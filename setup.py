@@ -7,7 +7,12 @@ setup(
     install_requires=[
         "requests>=2.25.0",
         "rich>=10.0.0",
+        "numpy>=1.17",
     ],
+    extras_require={
+        "zstd": ["zstandard>=0.15"],
+        "arrow": ["pyarrow>=8.0"],
+    },
     entry_points={
         "console_scripts": [
             "ion-cli=ion_cli.cli:main",
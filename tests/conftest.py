@@ -0,0 +1,29 @@
+import pytest
+from unittest.mock import patch
+
+from ion_cli.api import close_clients
+from ion_cli.mock_server import MockIONServer
+from ion_cli.traces import clear_trace_indexes
+
+
+@pytest.fixture(autouse=True)
+def ion_home(tmp_path):
+    # Keep the ledger and caches out of the real home directory
+    home = str(tmp_path / 'ion_home')
+    with patch('ion_cli.ledger.ION_HOME', home), \
+            patch('ion_cli.user_cache.ION_HOME', home), \
+            patch('ion_cli.traces.ION_HOME', home), \
+            patch('ion_cli.diagnoses.ION_HOME', home):
+        yield home
+    clear_trace_indexes()
+
+
+@pytest.fixture
+def ion_server():
+    # Local stand-in for the ION API; every module that builds URLs is pointed at it
+    with MockIONServer() as server:
+        with patch('ion_cli.cli.DEFAULT_API_ENDPOINT', server.url), \
+                patch('ion_cli.upload.DEFAULT_API_ENDPOINT', server.url), \
+                patch('ion_cli.shard.DEFAULT_API_ENDPOINT', server.url):
+            yield server
+        close_clients()
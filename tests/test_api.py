@@ -0,0 +1,127 @@
+import io
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from ion_cli.api import APIClient, backoff_delay, close_clients, get_client
+from ion_cli.upload import multipart_upload
+
+
+def test_get_client_is_shared():
+    try:
+        client = get_client('http://ion.example/')
+        assert get_client('http://ion.example') is client
+        assert get_client('http://other.example') is not client
+    finally:
+        close_clients()
+
+
+def test_session_is_reused_across_calls(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    client = APIClient(ion_server.url)
+    with patch('requests.Session', side_effect=AssertionError('new session')):
+        for _ in range(3):
+            response = client.post('/api/user_traces', json={'user_id': user_id})
+            assert response.status_code == 200
+    client.close()
+
+
+def test_post_applies_default_timeout():
+    client = APIClient('http://ion.example', timeout=(1, 2))
+    with patch.object(client.session, 'post') as post:
+        client.post('/api/user', json={'email': 'user@example.com'})
+        assert post.call_args.kwargs['timeout'] == (1, 2)
+        assert post.call_args.args[0] == 'http://ion.example/api/user'
+        client.post('/api/user', json={}, timeout=5)
+        assert post.call_args.kwargs['timeout'] == 5
+
+
+def test_large_bodies_are_compressed(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    client = APIClient(ion_server.url, compress_requests=True)
+    with patch.object(client.session, 'post', wraps=client.session.post) as post:
+        client.post('/api/user_traces', json={'user_id': user_id})
+        assert 'json' in post.call_args.kwargs
+
+        response = client.post('/api/user_traces', json={'user_id': user_id, 'padding': 'x' * 4096})
+        assert post.call_args.kwargs['headers']['Content-Encoding'] == 'gzip'
+        assert len(post.call_args.kwargs['data']) < 1024
+        assert response.status_code == 200
+    client.close()
+
+
+def test_ensure_pool_size_only_grows():
+    client = APIClient('http://ion.example', pool_size=4)
+    adapter = client.session.get_adapter('http://ion.example')
+    client.ensure_pool_size(2)
+    assert client.session.get_adapter('http://ion.example') is adapter
+    client.ensure_pool_size(32)
+    assert client.pool_size == 32
+    assert client.session.get_adapter('http://ion.example') is not adapter
+
+
+def test_idempotent_reads_are_retried(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    client = APIClient(ion_server.url, max_retries=2)
+    ion_server.unavailable = 2
+    with patch('ion_cli.api.time.sleep') as sleep:
+        assert client.post('/api/user_traces', json={'user_id': user_id}, idempotent=True).status_code == 200
+        assert sleep.call_count == 2
+
+        ion_server.unavailable = 3
+        assert client.post('/api/user_traces', json={'user_id': user_id}, idempotent=True).status_code == 503
+        ion_server.unavailable = 1
+        assert client.post('/api/delete_trace', json={'user_id': user_id}).status_code == 503
+    client.close()
+
+
+def test_connection_errors_are_retried():
+    client = APIClient('http://ion.example', max_retries=1)
+    ok = MagicMock(status_code=200)
+    with patch.object(client.session, 'post', side_effect=[requests.ConnectionError(), ok]), \
+            patch('ion_cli.api.time.sleep'):
+        assert client.post('/api/user', json={}, idempotent=True) is ok
+    with patch.object(client.session, 'post', side_effect=requests.Timeout()) as post, \
+            patch('ion_cli.api.time.sleep'):
+        with pytest.raises(requests.Timeout):
+            client.post('/api/user', json={}, idempotent=True)
+        assert post.call_count == 2
+
+
+def test_backoff_delay():
+    for attempt in range(8):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=4) <= min(4, 0.5 * 2 ** attempt)
+
+
+def test_slow_reads_are_hedged():
+    client = APIClient('http://ion.example', hedge_delay=0.05)
+    first_sent = threading.Event()
+    release = threading.Event()
+
+    def post(url, **kwargs):
+        if not first_sent.is_set():
+            first_sent.set()
+            release.wait(5)
+            return MagicMock(status_code=500)
+        return MagicMock(status_code=200)
+
+    with patch.object(client.session, 'post', side_effect=post) as mock_post:
+        start = time.perf_counter()
+        assert client.post('/api/user_traces', json={}, idempotent=True, hedge=True).status_code == 200
+        assert time.perf_counter() - start < 2
+        assert mock_post.call_count == 2
+    release.set()
+    client.close()
+
+
+def test_multipart_upload_is_resent(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.unavailable = 1
+    with patch('ion_cli.api.time.sleep'):
+        response = multipart_upload('run', io.BytesIO(b'trace data'), user_id, endpoint=ion_server.url)
+    assert response.status_code == 200
+    assert ion_server.traces[user_id]['run'] is not None
+    assert ion_server.request_log.count(('POST', '/api/upload_trace')) == 2
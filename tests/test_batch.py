@@ -0,0 +1,118 @@
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from ion_cli.batch import EXISTS, FAILED, INVALID, SKIPPED, UPLOADED, BatchUploader, expand_upload_paths
+from ion_cli.cli import main, upload_files
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+
+def make_traces(directory, count):
+    paths = []
+    with open(TRACE_PATH) as f:
+        content = f.read()
+    for i in range(count):
+        path = directory / f'trace_{i}.txt'
+        # Distinct content so the ledger does not deduplicate them
+        path.write_text(content + f'# copy {i}\n')
+        paths.append(str(path))
+    return paths
+
+
+def test_expand_upload_paths(tmp_path):
+    make_traces(tmp_path, 2)
+    nested = tmp_path / 'nested'
+    nested.mkdir()
+    (nested / 'run.darshan').write_bytes(b'\x00')
+    (nested / 'notes.md').write_text('skip me')
+
+    from_dir = expand_upload_paths([str(tmp_path)])
+    assert [os.path.basename(path) for path in from_dir] == ['trace_0.txt', 'trace_1.txt', 'run.darshan']
+
+    from_glob = expand_upload_paths([str(tmp_path / 'trace_*.txt'), str(tmp_path / 'trace_0.txt')])
+    assert [os.path.basename(path) for path in from_glob] == ['trace_0.txt', 'trace_1.txt']
+
+    assert expand_upload_paths([str(tmp_path / 'missing_*.txt')]) == [str(tmp_path / 'missing_*.txt')]
+
+
+def test_batch_upload(ion_server, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    paths = make_traces(tmp_path, 6)
+    sent = []
+    finished = []
+
+    uploader = BatchUploader(user_id, concurrency=3, endpoint=ion_server.url,
+                             on_bytes=sent.append, on_result=finished.append)
+    results = uploader.run(paths)
+
+    assert [result.path for result in results] == paths
+    assert all(result.status == UPLOADED for result in results)
+    assert len(finished) == 6
+    assert sum(sent) == sum(os.path.getsize(path) for path in paths)
+    assert sorted(ion_server.traces[user_id]) == [f'trace_{i}' for i in range(6)]
+
+
+def test_batch_upload_chunked_reduced(ion_server, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    paths = make_traces(tmp_path, 3)
+
+    results = BatchUploader(user_id, concurrency=2, chunked=True, chunk_size=32 * 1024, reduce=True,
+                            endpoint=ion_server.url).run(paths)
+
+    assert all(result.status == UPLOADED for result in results)
+    assert all(len(ion_server.files[(user_id, f'trace_{i}')]) < os.path.getsize(paths[i]) for i in range(3))
+
+
+def test_batch_upload_statuses(ion_server, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    paths = make_traces(tmp_path, 2)
+    duplicate = str(tmp_path / 'duplicate.txt')
+    shutil.copy(paths[0], duplicate)
+    existing = str(tmp_path / 'existing.txt')
+    shutil.copy(TRACE_PATH, existing)
+    ion_server.store_trace(user_id, 'existing.txt', b'')
+    bad = str(tmp_path / 'bad.csv')
+    open(bad, 'w').close()
+
+    results = BatchUploader(user_id, concurrency=1, endpoint=ion_server.url).run(
+        paths + [duplicate, existing, bad])
+
+    assert [result.status for result in results] == [UPLOADED, UPLOADED, SKIPPED, EXISTS, INVALID]
+    # Second run: everything uploaded before is skipped by the ledger
+    again = BatchUploader(user_id, concurrency=2, endpoint=ion_server.url).run(paths)
+    assert [result.status for result in again] == [SKIPPED, SKIPPED]
+
+
+@pytest.mark.parametrize('concurrency', [1, 2])
+def test_batch_upload_duplicate_of_failed_file(ion_server, tmp_path, concurrency):
+    user_id = ion_server.add_user('user@example.com')
+    paths = make_traces(tmp_path, 1)
+    duplicate = str(tmp_path / 'duplicate.txt')
+    shutil.copy(paths[0], duplicate)
+    ion_server.fail_uploads = {os.path.basename(paths[0])}
+
+    results = BatchUploader(user_id, concurrency=concurrency, endpoint=ion_server.url).run(paths + [duplicate])
+
+    # The copy is not reported as uploaded when the first file never reached the server
+    assert [result.status for result in results] == [FAILED, FAILED]
+    assert 'which failed to upload' in results[1].message
+    assert not ion_server.traces.get(user_id)
+
+
+def test_upload_files_exit_status(ion_server, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    make_traces(tmp_path, 2)
+    assert upload_files([str(tmp_path)], user_id, concurrency=2) is True
+    assert upload_files([str(tmp_path / 'missing.txt')], user_id) is False
+
+
+def test_main_upload_directory(ion_server, tmp_path):
+    ion_server.add_user('user@example.com')
+    make_traces(tmp_path, 3)
+    with patch.dict('os.environ'):
+        assert main(['--user_email', 'user@example.com', '--upload', str(tmp_path), '--jobs', '2']) == 0
+    assert len(ion_server.traces[ion_server.users['user@example.com']]) == 3
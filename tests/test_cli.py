@@ -47,7 +47,7 @@ def test_validate_email_valid():
 # Test upload_file function
 def test_upload_file_success():
     with patch('builtins.open', mock_open(read_data='file content')):
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = MagicMock()
             mock_response.status_code = 200
             mock_post.return_value = mock_response
@@ -57,7 +57,7 @@ def test_upload_file_success():
 
 def test_upload_file_failure():
     with patch('builtins.open', mock_open(read_data='file content')):
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = MagicMock()
             mock_response.status_code = 400
             mock_response.text = 'Bad request'
@@ -74,7 +74,7 @@ def test_check_user_verified_no_email():
 
 def test_check_user_verified_from_env():
     with patch.dict('os.environ', {'ION_USER_EMAIL': 'user@example.com'}):
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = MagicMock()
             mock_response.json.return_value = {
                 "user_id": "1234567890"
@@ -85,7 +85,7 @@ def test_check_user_verified_from_env():
 
 
 def test_check_user_verified_success():
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_response = MagicMock()
         mock_response.json.return_value = {
             "user_id": "1234567890"
@@ -96,7 +96,7 @@ def test_check_user_verified_success():
 
 
 def test_check_user_verified_failure():
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_response = MagicMock()
         mock_response.json.return_value = {}
         mock_post.return_value = mock_response
@@ -0,0 +1,96 @@
+import asyncio
+import os
+
+import pytest
+
+from ion_cli.api import APIClient
+from ion_cli.batch import SKIPPED, UPLOADED
+from ion_cli.client import AsyncIONClient, IONClient, IONError
+from ion_cli.cli import view_trace_diagnosis
+from ion_cli.traces import invalidate_user_traces
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+
+def test_client_round_trip(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion = IONClient(endpoint=ion_server.url)
+    with pytest.raises(IONError):
+        ion.traces()
+    assert ion.verify('user@example.com') == user_id
+    assert ion.verify('nobody@example.com') is None
+    assert ion.user_id == user_id
+
+    result = ion.upload(TRACE_PATH)
+    assert result.status == UPLOADED
+    assert ion.upload(TRACE_PATH).status == SKIPPED
+    assert [trace.trace_name for trace in ion.traces()] == ['valid_trace']
+    assert ion.status('valid_trace') == 'not_started'
+
+    task = ion.run_analysis('valid_trace', 'openai/gpt-4o')
+    assert task.task_id in ion_server.tasks
+    assert ion.status('valid_trace') == 'in_progress'
+    ion.stop('valid_trace')
+    assert ion.status('valid_trace') == 'not_started'
+
+    with pytest.raises(IONError) as excinfo:
+        ion.diagnosis('valid_trace')
+    assert excinfo.value.status_code == 404
+    ion_server.complete_analysis(user_id, 'valid_trace', content='# All good')
+    assert ion.diagnosis('valid_trace').content == '# All good'
+
+    ion.delete('valid_trace')
+    assert ion.trace('valid_trace', max_age=0) is None
+    with pytest.raises(IONError, match='not found'):
+        ion.run_analysis('valid_trace')
+
+
+def test_verify_errors(ion_server):
+    ion_server.add_user('user@example.com')
+    ion_server.unavailable = 1
+    ion = IONClient(api=APIClient(ion_server.url, max_retries=0))
+    with pytest.raises(IONError) as excinfo:
+        ion.verify('user@example.com', use_cache=False)
+    assert excinfo.value.status_code == 503
+    assert ion.user_id is None
+
+    # Nothing listens on port 9 of the loopback interface
+    with pytest.raises(IONError):
+        IONClient(api=APIClient('http://127.0.0.1:9', max_retries=0)).verify('user@example.com', use_cache=False)
+
+
+def test_upload_invalid_file(ion_server, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    path = tmp_path / 'notes.md'
+    path.write_text('hello')
+    with pytest.raises(IONError):
+        IONClient(user_id, endpoint=ion_server.url).upload(str(path))
+
+
+def test_async_client_concurrent_launches(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    names = [f'run_{i}' for i in range(100)]
+    for name in names:
+        ion_server.store_trace(user_id, f'{name}.txt', b'data')
+
+    async def launch_all():
+        async with AsyncIONClient(user_id, endpoint=ion_server.url, max_concurrency=32) as ion:
+            tasks = await asyncio.gather(*(ion.run_analysis(name, 'openai/gpt-4o') for name in names))
+            statuses = await asyncio.gather(*(ion.status(name, max_age=0) for name in names))
+            return tasks, statuses
+
+    tasks, statuses = asyncio.run(launch_all())
+    assert [task.trace_name for task in tasks] == names
+    assert len(ion_server.tasks) == 100
+    assert set(statuses) == {'in_progress'}
+
+
+def test_cli_view_uses_client(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    assert not view_trace_diagnosis('run', user_id)
+    ion_server.complete_analysis(user_id, 'run')
+    # The status changed on the server; a new command would start with a fresh index
+    invalidate_user_traces(user_id, ion_server.url)
+    assert view_trace_diagnosis('run', user_id)
@@ -0,0 +1,165 @@
+import os
+
+import pytest
+
+from ion_cli.cli import main
+from ion_cli.collapse import FIRST, MAX, MAX_TIME, MIN, RANK, SLOT, SUM, combine_rule, open_collapsed_stream
+from ion_cli.reduce import open_reduced_stream
+from ion_cli.validate import check_trace_structure
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+HEADER = '# darshan log version: 3.41\n# nprocs: 4\n# run time: 10.0\n\n# description of columns:\n'
+
+
+def record(rank, counter, value, record_id='11', name='/scratch/out.h5', module='POSIX'):
+    return f'{module}\t{rank}\t{record_id}\t{counter}\t{value}\t{name}\t/scratch\tlustre\n'
+
+
+def rank_record(rank, reads, read_time, write_time, bytes_read, open_start, close_end, access, max_read):
+    return [
+        record(rank, 'POSIX_OPENS', 1),
+        record(rank, 'POSIX_READS', reads),
+        record(rank, 'POSIX_MMAPS', -1),
+        record(rank, 'POSIX_MODE', 436 + rank),
+        record(rank, 'POSIX_BYTES_READ', bytes_read),
+        record(rank, 'POSIX_MAX_BYTE_READ', bytes_read - 1),
+        record(rank, 'POSIX_MAX_READ_TIME_SIZE', max_read[1]),
+        record(rank, 'POSIX_ACCESS1_ACCESS', access[0][0]),
+        record(rank, 'POSIX_ACCESS2_ACCESS', access[1][0]),
+        record(rank, 'POSIX_ACCESS1_COUNT', access[0][1]),
+        record(rank, 'POSIX_ACCESS2_COUNT', access[1][1]),
+        record(rank, 'POSIX_FASTEST_RANK', rank),
+        record(rank, 'POSIX_FASTEST_RANK_BYTES', bytes_read),
+        record(rank, 'POSIX_SLOWEST_RANK', rank),
+        record(rank, 'POSIX_F_OPEN_START_TIMESTAMP', f'{open_start:.6f}'),
+        record(rank, 'POSIX_F_CLOSE_END_TIMESTAMP', f'{close_end:.6f}'),
+        record(rank, 'POSIX_F_READ_TIME', f'{read_time:.6f}'),
+        record(rank, 'POSIX_F_WRITE_TIME', f'{write_time:.6f}'),
+        record(rank, 'POSIX_F_META_TIME', '0.000000'),
+        record(rank, 'POSIX_F_MAX_READ_TIME', f'{max_read[0]:.6f}'),
+        record(rank, 'POSIX_F_SLOWEST_RANK_TIME', '0.000000'),
+        record(rank, 'POSIX_F_VARIANCE_RANK_TIME', '0.000000'),
+        record(rank, 'POSIX_F_VARIANCE_RANK_BYTES', '0.000000'),
+    ]
+
+
+def make_trace(tmp_path):
+    lines = [HEADER]
+    lines += rank_record(0, 10, 1.0, 0.5, 1000, 0.0, 5.0, [(100, 8), (4096, 2)], (0.25, 100))
+    lines += rank_record(1, 20, 3.0, 0.0, 3000, 1.5, 9.0, [(4096, 5), (100, 1)], (0.75, 4096))
+    # A file of one rank, and a file Darshan has already reduced, stay as they are
+    lines += [record(2, 'POSIX_READS', 7, record_id='22', name='/scratch/own.dat')]
+    lines += rank_record(3, 30, 2.0, 0.0, 2000, 2.5, 7.0, [(100, 3), (8, 1)], (0.5, 8))
+    lines += [record(-1, 'POSIX_READS', 9, record_id='33', name='/scratch/shared.dat'),
+              record(1, 'POSIX_READS', 1, record_id='33', name='/scratch/shared.dat')]
+    path = tmp_path / 'trace.txt'
+    path.write_text(''.join(lines))
+    return str(path)
+
+
+def collapsed_values(text):
+    values = {}
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) == 8 and fields[2] == '11':
+            assert fields[1] == '-1'
+            values[fields[3]] = fields[4]
+    return values
+
+
+def test_combine_rule():
+    assert combine_rule(b'POSIX_BYTES_READ')[0] == SUM
+    assert combine_rule(b'HEATMAP_WRITE_BIN_12')[0] == SUM
+    assert combine_rule(b'POSIX_F_READ_START_TIMESTAMP')[0] == MIN
+    assert combine_rule(b'MPIIO_F_CLOSE_END_TIMESTAMP')[0] == MAX
+    assert combine_rule(b'POSIX_MAX_BYTE_WRITTEN')[0] == MAX
+    assert combine_rule(b'POSIX_MEM_ALIGNMENT')[0] == FIRST
+    assert combine_rule(b'LUSTRE_STRIPE_SIZE')[0] == FIRST
+    assert combine_rule(b'HEATMAP_F_BIN_WIDTH_SECONDS')[0] == FIRST
+    assert combine_rule(b'POSIX_F_VARIANCE_RANK_BYTES')[0] == RANK
+    assert combine_rule(b'STDIO_SLOWEST_RANK_BYTES')[0] == RANK
+    assert combine_rule(b'POSIX_STRIDE3_COUNT') == (SLOT, (b'POSIX', b'STRIDE', 3, b'COUNT'))
+    assert combine_rule(b'MPIIO_ACCESS2_ACCESS') == (SLOT, (b'MPIIO', b'ACCESS', 2, b'VALUE'))
+    assert combine_rule(b'POSIX_MAX_WRITE_TIME_SIZE') == (MAX_TIME, (b'POSIX', b'WRITE', b'SIZE'))
+
+
+@pytest.mark.parametrize('workers, block_size', [(1, 1 << 20), (2, 700)])
+def test_collapse(tmp_path, workers, block_size):
+    open_stream = open_collapsed_stream(make_trace(tmp_path), workers=workers, block_size=block_size)
+    with open_stream() as stream:
+        data = stream.read()
+    text = data.decode()
+
+    plan = open_stream.plan
+    assert (plan.records, plan.files, plan.max_ranks) == (3, 1, 3)
+    assert len(data) == plan.output_bytes < plan.input_bytes
+    assert '# ion-cli collapse: merged 3 per-rank records of 1 files into shared records (rank -1)\n' \
+           '# description of columns:\n' in text
+    # The merged record replaces the first per-rank record; the others are untouched
+    assert text.index('\t11\tPOSIX_OPENS') < text.index('\t22\tPOSIX_READS') < text.index('\t33\t')
+    assert record(2, 'POSIX_READS', 7, record_id='22', name='/scratch/own.dat') in text
+    assert record(-1, 'POSIX_READS', 9, record_id='33', name='/scratch/shared.dat') in text
+
+    values = collapsed_values(text)
+    assert values['POSIX_OPENS'] == '3' and values['POSIX_READS'] == '60' and values['POSIX_BYTES_READ'] == '6000'
+    assert values['POSIX_MMAPS'] == '-1'
+    assert values['POSIX_MODE'] == '436'
+    assert values['POSIX_MAX_BYTE_READ'] == '2999'
+    assert values['POSIX_F_OPEN_START_TIMESTAMP'] == '1.500000'
+    assert values['POSIX_F_CLOSE_END_TIMESTAMP'] == '9.000000'
+    assert values['POSIX_F_READ_TIME'] == '6.000000'
+    assert (values['POSIX_F_MAX_READ_TIME'], values['POSIX_MAX_READ_TIME_SIZE']) == ('0.750000', '4096')
+    # 100: 8 + 1 + 3, 4096: 2 + 5, 8: 1
+    assert [values[f'POSIX_ACCESS{slot}_{part}'] for slot in (1, 2) for part in ('ACCESS', 'COUNT')] == \
+        ['100', '12', '4096', '7']
+    # I/O time per rank: 1.5, 3.0, 2.0
+    assert (values['POSIX_FASTEST_RANK'], values['POSIX_FASTEST_RANK_BYTES']) == ('0', '1000')
+    assert (values['POSIX_SLOWEST_RANK'], values['POSIX_F_SLOWEST_RANK_TIME']) == ('1', '3.000000')
+    assert float(values['POSIX_F_VARIANCE_RANK_TIME']) == pytest.approx(0.388889, abs=1e-6)
+    assert float(values['POSIX_F_VARIANCE_RANK_BYTES']) == pytest.approx(2e6 / 3, abs=1e-6)
+
+
+def test_collapse_sample_trace(tmp_path):
+    single = open_collapsed_stream(TRACE_PATH, workers=1)
+    parallel = open_collapsed_stream(TRACE_PATH, workers=2, block_size=5000)
+    with single() as stream, parallel() as other:
+        data = stream.read()
+        assert other.read() == data
+
+    # Only the MPI-IO heatmap has records of two ranks
+    assert (single.plan.records, single.plan.files) == (2, 1)
+    text = data.decode()
+    assert 'HEATMAP\t1\t' not in text
+    assert 'HEATMAP\t-1\t3668870418325792824\tHEATMAP_F_BIN_WIDTH_SECONDS\t6.400000\t' in text
+    with open(TRACE_PATH) as f:
+        original = f.read()
+    assert sum(int(line.split('\t')[4]) for line in original.splitlines()
+               if line.startswith('HEATMAP') and '\t3668870418325792824\tHEATMAP_WRITE_BIN' in line) == \
+        sum(int(line.split('\t')[4]) for line in text.splitlines()
+            if line.startswith('HEATMAP\t-1\t3668870418325792824\tHEATMAP_WRITE_BIN'))
+
+    path = tmp_path / 'collapsed.txt'
+    path.write_bytes(data)
+    assert check_trace_structure(str(path)).ok
+
+
+def test_collapse_then_reduce(tmp_path):
+    collapsed = open_collapsed_stream(make_trace(tmp_path), workers=1)
+    reduced = open_reduced_stream('trace.txt', read_lines=collapsed.read_lines)
+    with reduced() as stream:
+        data = stream.read()
+    assert len(data) == reduced.plan.output_bytes
+    assert '# ion-cli collapse:' in data.decode() and '# ion-cli reduce:' in data.decode()
+    assert 'POSIX_MMAPS' not in data.decode()
+
+
+def test_main_upload_collapse_ranks(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+
+    assert main(['-e', 'user@example.com', '--upload', TRACE_PATH, '--collapse_ranks', '--reduce', '--chunked']) == 0
+
+    data = ion_server.files[(user_id, 'valid_trace')].decode()
+    assert 'HEATMAP\t1\t' not in data
+    assert '# ion-cli collapse: merged 2 per-rank records of 1 files' in data
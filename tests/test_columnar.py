@@ -0,0 +1,128 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from ion_cli.cli import main
+from ion_cli.columnar import (
+    ColumnarError, check_trace, columnar_format, load_trace, open_text_stream, render_lines, save_trace
+)
+from ion_cli.darshan import parse_trace
+from ion_cli.diff import diff_traces
+from ion_cli.output import set_mode
+from ion_cli.summary import summarize, summarize_trace
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+
+def assert_same_columns(actual, expected):
+    for table, reference in ((actual.ints, expected.ints), (actual.floats, expected.floats)):
+        for name, column in reference.columns.items():
+            assert getattr(table, name).dtype == column.dtype, name
+            assert np.array_equal(getattr(table, name), column), name
+    assert actual.counters.strings == expected.counters.strings
+    assert actual.files.strings == expected.files.strings
+
+
+@pytest.fixture
+def trace():
+    return parse_trace(TRACE_PATH)
+
+
+@pytest.mark.parametrize('fmt', ['npz', 'arrow', 'parquet'])
+def test_round_trip(tmp_path, trace, fmt):
+    if fmt != 'npz':
+        pytest.importorskip('pyarrow')
+    path = str(tmp_path / f'trace.{fmt}')
+
+    assert save_trace(trace, path, source='valid_trace.txt') == os.path.getsize(path)
+    assert columnar_format(path) == fmt
+    loaded = load_trace(path)
+
+    assert_same_columns(loaded, trace)
+    assert loaded.header.fields == trace.header.fields
+    assert loaded.header.metadata == trace.header.metadata
+    assert loaded.header.mounts == trace.header.mounts
+    assert loaded.fs_types == trace.fs_types
+    assert check_trace(path) == []
+
+
+@pytest.mark.parametrize('fmt', ['npz', 'arrow'])
+def test_memory_mapped(tmp_path, trace, fmt):
+    if fmt != 'npz':
+        pytest.importorskip('pyarrow')
+    path = str(tmp_path / f'trace.{fmt}')
+    save_trace(trace, path)
+
+    loaded = load_trace(path)
+    for column in list(loaded.ints.columns.values()) + list(loaded.floats.columns.values()):
+        assert not column.flags.owndata and not column.flags.writeable
+
+
+def test_render_matches_original(tmp_path, trace):
+    path = str(tmp_path / 'trace.npz')
+    save_trace(trace, path)
+
+    text = ''.join(render_lines(load_trace(path)))
+    with open(TRACE_PATH) as f:
+        original = [line for line in f if line[0] not in '# \n']
+    assert [line for line in text.splitlines(keepends=True) if line[0] not in '# \n'] == original
+    assert text.startswith('# darshan log version: 3.41\n')
+
+    # Parsing the rendered text gives the same trace
+    assert_same_columns(parse_trace(text.splitlines(keepends=True)), trace)
+    with open_text_stream(path)() as stream:
+        assert stream.read().decode() == text
+
+
+def test_local_commands_take_columnar_traces(tmp_path, trace):
+    path = str(tmp_path / 'trace.npz')
+    save_trace(trace, path)
+
+    expected = summarize_trace(TRACE_PATH)
+    summary = summarize(load_trace(path))
+    assert summary.rows == expected.rows and summary.findings == expected.findings
+
+    result = diff_traces([TRACE_PATH, load_trace(path)], paths=[TRACE_PATH, path])
+    assert not result.settings and result.rows[0] == result.rows[1]
+    assert all(delta == 0 for change in result.totals for delta in change.deltas)
+
+
+def test_check_trace(tmp_path):
+    path = tmp_path / 'other.npz'
+    np.savez(str(path), values=np.arange(3))
+    assert check_trace(str(path)) and 'not a columnar trace' in check_trace(str(path))[0]
+
+    with pytest.raises(ColumnarError):
+        load_trace(str(tmp_path / 'trace.txt'))
+
+
+def test_main_convert(tmp_path, capsys):
+    source = tmp_path / 'run.txt'
+    shutil.copy(TRACE_PATH, source)
+    try:
+        assert main(['--plain', '--convert', str(source), '--reduce']) == 0
+        assert main(['--plain', '--validate', str(tmp_path / 'run.npz')]) == 0
+        assert main(['--plain', '--summarize', str(tmp_path / 'run.npz')]) == 0
+        assert main(['--plain', '--diff', str(source), str(tmp_path / 'run.npz')]) == 0
+    finally:
+        set_mode('rich')
+
+    out = capsys.readouterr().out
+    assert f"'{source}' -> '{tmp_path / 'run.npz'}'" in out
+    assert 'is well formed' in out and 'POSIX\t11\t' in out
+    # Reduction drops the zero counters before the trace is parsed
+    assert len(load_trace(str(tmp_path / 'run.npz'))) < len(parse_trace(TRACE_PATH))
+
+
+def test_main_upload_columnar(ion_server, tmp_path, trace):
+    user_id = ion_server.add_user('user@example.com')
+    path = str(tmp_path / 'run.npz')
+    save_trace(trace, path)
+
+    assert main(['-e', 'user@example.com', '--upload', path, '--reduce', '--chunked']) == 0
+
+    data = ion_server.files[(user_id, 'run')].decode()
+    assert data.startswith('# darshan log version: 3.41\n') and '# ion-cli reduce:' in data
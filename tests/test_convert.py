@@ -0,0 +1,155 @@
+import os
+import stat
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from ion_cli.batch import FAILED, UPLOADED, BatchUploader
+from ion_cli.cli import main, upload_file
+from ion_cli.convert import ConversionError, find_darshan_parser, open_darshan_stream, text_file_name
+from ion_cli.reduce import open_reduced_stream
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DARSHAN_PATH = os.path.join(TESTS_DIR, 'valid_trace.darshan')
+TRACE_PATH = os.path.join(TESTS_DIR, 'valid_trace.txt')
+
+# Prints the text trace for logs that start with a Darshan version string and
+# records when it ran, so tests can check that conversions overlap
+FAKE_PARSER = '''#!{python}
+import sys, time
+path = sys.argv[1]
+with open(path, 'rb') as f:
+    header = f.read(4)
+if not header.startswith(b'3.'):
+    sys.stderr.write("Error: failed to read log header of " + path + "\\n")
+    sys.exit(1)
+start = time.time()
+time.sleep({delay})
+with open({trace!r}, 'rb') as f:
+    sys.stdout.buffer.write(f.read())
+with open({log!r}, 'a') as f:
+    f.write("%f %f\\n" % (start, time.time()))
+'''
+
+
+@pytest.fixture
+def darshan_parser(tmp_path):
+    def install(delay=0.0):
+        path = tmp_path / 'darshan-parser'
+        path.write_text(FAKE_PARSER.format(python=sys.executable, delay=delay, trace=TRACE_PATH,
+                                           log=str(tmp_path / 'runs.log')))
+        path.chmod(path.stat().st_mode | stat.S_IXUSR)
+        return str(path)
+
+    with patch('ion_cli.convert.DARSHAN_PARSER', install()):
+        yield install
+
+
+def runs(tmp_path):
+    with open(tmp_path / 'runs.log') as f:
+        return [tuple(map(float, line.split())) for line in f]
+
+
+def make_logs(directory, count):
+    with open(DARSHAN_PATH, 'rb') as f:
+        content = f.read()
+    paths = []
+    for i in range(count):
+        path = directory / f'log_{i}.darshan'
+        path.write_bytes(content + bytes([i]))
+        paths.append(str(path))
+    return paths
+
+
+def test_find_darshan_parser(darshan_parser, tmp_path):
+    assert find_darshan_parser() == str(tmp_path / 'darshan-parser')
+    assert find_darshan_parser('') is None
+    assert find_darshan_parser(str(tmp_path / 'missing')) is None
+
+
+def test_darshan_stream(darshan_parser):
+    open_stream = open_darshan_stream(DARSHAN_PATH, find_darshan_parser())
+    with open(TRACE_PATH, 'rb') as f:
+        expected = f.read()
+    with open_stream() as stream:
+        assert stream.read() == expected
+    assert ''.join(open_stream.read_lines()).encode('utf-8') == expected
+    assert text_file_name(DARSHAN_PATH) == 'valid_trace.txt'
+
+
+def test_darshan_stream_error(darshan_parser, tmp_path):
+    corrupt = tmp_path / 'corrupt.darshan'
+    corrupt.write_bytes(b'junk')
+    with pytest.raises(ConversionError, match='failed to read log header'):
+        with open_darshan_stream(str(corrupt), find_darshan_parser())() as stream:
+            stream.read()
+
+
+def test_reduce_converted_log(darshan_parser):
+    converted = open_darshan_stream(DARSHAN_PATH, find_darshan_parser())
+    reduced = open_reduced_stream(DARSHAN_PATH, read_lines=converted.read_lines)
+    with reduced() as stream, open_reduced_stream(TRACE_PATH)() as expected:
+        assert stream.read() == expected.read()
+
+
+def test_batch_conversions_overlap(ion_server, darshan_parser, tmp_path):
+    darshan_parser(delay=0.5)
+    user_id = ion_server.add_user('user@example.com')
+    paths = make_logs(tmp_path, 3)
+
+    results = BatchUploader(user_id, concurrency=3, chunked=True, endpoint=ion_server.url).run(paths)
+
+    assert [result.status for result in results] == [UPLOADED] * 3
+    assert all('converted' in result.message for result in results)
+    with open(TRACE_PATH, 'rb') as f:
+        text = f.read()
+    assert all(ion_server.files[(user_id, f'log_{i}')] == text for i in range(3))
+    intervals = runs(tmp_path)
+    assert max(start for start, end in intervals) < min(end for start, end in intervals)
+
+
+def test_batch_conversion_error(ion_server, darshan_parser, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    corrupt = tmp_path / 'corrupt.darshan'
+    corrupt.write_bytes(b'junk')
+
+    result = BatchUploader(user_id, endpoint=ion_server.url).upload(str(corrupt))
+
+    assert result.status == FAILED
+    assert 'darshan-parser failed' in result.message
+    assert 'corrupt' not in ion_server.traces[user_id]
+
+
+def test_upload_file_converts(ion_server, darshan_parser):
+    user_id = ion_server.add_user('user@example.com')
+    assert upload_file(DARSHAN_PATH, user_id, chunked=True, reduce=True)
+    with open_reduced_stream(TRACE_PATH)() as expected:
+        assert ion_server.files[(user_id, 'valid_trace')] == expected.read()
+
+
+def test_raw_darshan_fallback(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    with open(DARSHAN_PATH, 'rb') as f:
+        raw = f.read()
+
+    with patch('ion_cli.convert.DARSHAN_PARSER', 'no-such-darshan-parser'):
+        assert upload_file(DARSHAN_PATH, user_id, chunked=True)
+    assert ion_server.files[(user_id, 'valid_trace')] == raw
+
+
+def test_main_raw_darshan(ion_server, darshan_parser):
+    user_id = ion_server.add_user('user@example.com')
+    with open(DARSHAN_PATH, 'rb') as f:
+        raw = f.read()
+
+    assert main(['-e', 'user@example.com', '--upload', DARSHAN_PATH, '--chunked', '--raw_darshan']) == 0
+    assert ion_server.files[(user_id, 'valid_trace')] == raw
+
+
+def test_upload_file_converts_multipart(ion_server, darshan_parser):
+    user_id = ion_server.add_user('user@example.com')
+    assert upload_file(DARSHAN_PATH, user_id)
+    with open(TRACE_PATH) as f:
+        assert ion_server.files[(user_id, 'valid_trace')] == f.read()
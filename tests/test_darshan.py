@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+
+from ion_cli.darshan import StringTable, TraceReader, is_float_counter, parse_trace
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+HEADER = [
+    "# darshan log version: 3.41\n",
+    "# exe: ./app --flag\n",
+    "# nprocs: 4\n",
+    "# run time: 12.5\n",
+    "# metadata: lib_ver = 3.4.4\n",
+    "# mount entry:\t/scratch\tlustre\n",
+    "# mount entry:\t/home\tnfs\n",
+    "\n",
+    "# description of columns:\n",
+    "#   <module>: module responsible for this I/O record.\n",
+]
+
+RECORDS = [
+    "POSIX\t0\t100\tPOSIX_OPENS\t2\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t0\t100\tPOSIX_BYTES_READ\t4096\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t0\t100\tPOSIX_F_READ_TIME\t0.250000\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t-1\t18446744073709551615\tPOSIX_OPENS\t8\t/scratch/b\t/scratch\tlustre\n",
+    "POSIX\t-1\t18446744073709551615\tPOSIX_BYTES_READ\t-1\t/scratch/b\t/scratch\tlustre\n",
+]
+
+
+def test_string_table_interning():
+    table = StringTable(['a', 'b'])
+    assert table.intern('a') == 0
+    assert table.intern('c') == 2
+    assert table.code('missing') == -1
+    assert list(table) == ['a', 'b', 'c']
+
+
+def test_is_float_counter():
+    assert is_float_counter('POSIX_F_READ_TIME')
+    assert is_float_counter('HEATMAP_F_BIN_WIDTH_SECONDS')
+    assert not is_float_counter('POSIX_FILE_NOT_ALIGNED')
+
+
+def test_parse_header():
+    header = parse_trace(HEADER + RECORDS).header
+    assert header.version == '3.41'
+    assert header.exe == './app --flag'
+    assert header.nprocs == 4
+    assert header.run_time == 12.5
+    assert header.metadata == {'lib_ver': '3.4.4'}
+    assert header.mounts == [('/scratch', 'lustre'), ('/home', 'nfs')]
+    # Module descriptions after the column legend are not job header fields
+    assert '<module>' not in header.fields
+
+
+def test_parse_columns():
+    trace = parse_trace(HEADER + RECORDS)
+    assert len(trace) == 5
+    assert trace.ints.value.dtype == np.int64
+    assert trace.floats.value.dtype == np.float64
+    assert trace.ints.record_id.dtype == np.uint64
+
+    opens = trace.counter('POSIX_OPENS')
+    assert opens.value.tolist() == [2, 8]
+    assert opens.rank.tolist() == [0, -1]
+    assert opens.record_id.tolist() == [100, 2 ** 64 - 1]
+    assert [trace.files[code] for code in opens.file] == ['/scratch/a', '/scratch/b']
+    assert trace.counter('POSIX_F_READ_TIME').value.tolist() == [0.25]
+    assert trace.counter('POSIX_SEEKS').value.size == 0
+    assert trace.fs_types == {'/scratch': 'lustre'}
+
+
+def test_malformed_lines_are_skipped():
+    reader = TraceReader(HEADER + RECORDS[:2] + ["POSIX\t0\tgarbage\n", "POSIX\t0\t1\tPOSIX_OPENS\tx\tf\tm\tfs\n"])
+    trace = reader.read()
+    assert len(trace) == 2
+    assert reader.skipped_lines == 2
+
+
+def test_batches_match_full_parse():
+    full = parse_trace(TRACE_PATH)
+    reader = TraceReader(TRACE_PATH, batch_size=100)
+    batches = list(reader.batches())
+    assert all(len(batch) <= 100 for batch in batches)
+    assert sum(len(batch) for batch in batches) == len(full)
+    np.testing.assert_array_equal(np.concatenate([batch.ints.value for batch in batches]), full.ints.value)
+    np.testing.assert_array_equal(np.concatenate([batch.floats.file for batch in batches]), full.floats.file)
+
+
+def test_parse_sample_trace():
+    trace = parse_trace(TRACE_PATH)
+    assert trace.header.nprocs == 8
+    assert trace.header.exe.startswith('h5bench_amrex_sync')
+    assert len(trace.header.mounts) == 64
+    assert trace.modules.strings == ['POSIX', 'MPI-IO', 'LUSTRE', 'STDIO', 'HEATMAP']
+    assert int(trace.counter('POSIX_BYTES_WRITTEN').value.sum()) == 10 * 51631889792
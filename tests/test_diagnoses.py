@@ -0,0 +1,72 @@
+from ion_cli.api import APIClient
+from ion_cli.client import IONClient
+from ion_cli.cli import main
+from ion_cli.diagnoses import DiagnosisCache
+from ion_cli.traces import invalidate_user_traces
+
+
+def diagnosis_requests(server):
+    return sum(1 for method, path in server.request_log if path.endswith('/final_diagnosis'))
+
+
+def test_cache_keys(tmp_path):
+    with DiagnosisCache(str(tmp_path / 'diagnoses.sqlite')) as cache:
+        cache.put('http://ion', 'u1', 'run', 'gpt-4o', 'v1', '# old', [])
+        cache.put('http://ion', 'u1', 'run', 'gpt-4o', 'v2', '# new', [{'file': 'a', 'text': ['b']}])
+        assert cache.get('http://ion', 'u1', 'run', 'gpt-4o', 'v1')[0] == '# old'
+        assert cache.get('http://ion', 'u1', 'run', 'gpt-4o', 'v2') == ('# new', [{'file': 'a', 'text': ['b']}],
+                                                                       'gpt-4o')
+        assert cache.get('http://ion', 'u1', 'run', 'gpt-4.1', 'v2') is None
+        assert cache.get('http://ion', 'u2', 'run') is None
+        # Without model and version, the most recently used entry wins
+        assert cache.get('http://ion', 'u1', 'run')[0] == '# new'
+        assert cache.forget('http://ion', 'u1', 'run') == 2
+        assert cache.get('http://ion', 'u1', 'run') is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    with DiagnosisCache(str(tmp_path / 'diagnoses.sqlite'), max_bytes=250) as cache:
+        for name in ['a', 'b', 'c']:
+            cache.put('http://ion', 'u1', name, 'm', 'v', name * 100, [])
+        assert cache.get('http://ion', 'u1', 'a') is None
+        # Touch b so c is evicted next
+        assert cache.get('http://ion', 'u1', 'b')
+        cache.put('http://ion', 'u1', 'd', 'm', 'v', 'd' * 100, [])
+        assert cache.get('http://ion', 'u1', 'c') is None
+        assert cache.get('http://ion', 'u1', 'b') and cache.get('http://ion', 'u1', 'd')
+        assert cache.total_bytes <= 250
+
+
+def test_repeat_views_use_cache(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    ion_server.complete_analysis(user_id, 'run', content='# Diagnosis')
+    ion = IONClient(user_id, api=APIClient(ion_server.url))
+
+    first = ion.diagnosis('run')
+    second = ion.diagnosis('run')
+    assert (first.cached, second.cached) == (False, True)
+    assert second.content == '# Diagnosis'
+    assert diagnosis_requests(ion_server) == 1
+
+    assert not ion.diagnosis('run', refresh=True).cached
+    assert diagnosis_requests(ion_server) == 2
+
+    # A new analysis with another model must not show the old diagnosis
+    ion_server.traces[user_id]['run']['model'] = 'openai/gpt-4.1'
+    ion_server.complete_analysis(user_id, 'run', content='# Second opinion')
+    invalidate_user_traces(user_id, ion_server.url)
+    assert ion.diagnosis('run').content == '# Second opinion'
+
+
+def test_cached_diagnosis_offline(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    ion_server.complete_analysis(user_id, 'run', content='# Diagnosis')
+    assert main(['-e', 'user@example.com', '--view', 'run']) == 0
+    url = ion_server.url
+    ion_server.stop()
+
+    invalidate_user_traces(user_id, url)
+    diagnosis = IONClient(user_id, api=APIClient(url, timeout=(0.5, 0.5))).cached_diagnosis('run')
+    assert diagnosis.cached and diagnosis.content == '# Diagnosis'
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from ion_cli.cli import main
+from ion_cli.diff import KIND_BYTES, KIND_OPERATIONS, KIND_TIME, counter_kind, diff_traces
+from ion_cli.output import set_mode
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_PATH = os.path.join(TESTS_DIR, 'valid_trace.txt')
+FILE = '/pscratch/h5bench/build-offsets/plt00003.h5'
+
+
+def variant(tmp_path, name, scale=None, rename=None, hints=None):
+    """
+    Copy the sample trace, scaling the counters in `scale` of FILE, renaming files and replacing the hints.
+    """
+    with open(TRACE_PATH) as f:
+        text = f.read()
+    lines = []
+    for line in text.splitlines(keepends=True):
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) == 8 and scale and fields[5] == FILE and fields[3] in scale:
+            value = float(fields[4]) * scale[fields[3]]
+            fields[4] = repr(value) if '_F_' in fields[3] else str(int(value))
+            line = '\t'.join(fields) + '\n'
+        lines.append(line)
+    text = ''.join(lines)
+    for old, new in (rename or {}).items():
+        text = text.replace(old, new)
+    if hints:
+        text = text.replace('romio_no_indep_rw=true;cb_nodes=4', hints)
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_counter_kind():
+    assert counter_kind('POSIX_BYTES_WRITTEN') == KIND_BYTES
+    assert counter_kind('MPIIO_F_META_TIME') == KIND_TIME
+    assert counter_kind('MPIIO_COLL_WRITES') == KIND_OPERATIONS
+    assert counter_kind('STDIO_OPENS') == KIND_OPERATIONS
+    assert counter_kind('POSIX_F_WRITE_END_TIMESTAMP') is None
+    assert counter_kind('POSIX_MAX_BYTE_WRITTEN') is None
+    assert counter_kind('HEATMAP_READ_BIN_0') is None
+
+
+def test_identical_traces(tmp_path):
+    result = diff_traces([TRACE_PATH, variant(tmp_path, 'copy.txt')])
+
+    assert result.labels == ['valid_trace', 'copy']
+    assert result.settings == []
+    assert all(not changes for changes in result.changes.values())
+    assert [(total.module, total.kind) for total in result.totals][:3] == \
+        [('MPI-IO', KIND_BYTES), ('MPI-IO', KIND_TIME), ('MPI-IO', KIND_OPERATIONS)]
+    assert all(total.values[0] == total.values[1] for total in result.totals)
+    assert result.files == 23
+
+
+@pytest.mark.parametrize('batch_size', [1 << 18, 100])
+def test_ranked_changes(tmp_path, batch_size):
+    slower = variant(tmp_path, 'slower.txt', scale={'POSIX_F_WRITE_TIME': 3.0, 'POSIX_WRITES': 2},
+                     hints='romio_no_indep_rw=false;cb_nodes=8')
+    larger = variant(tmp_path, 'larger.txt', scale={'POSIX_BYTES_WRITTEN': 2})
+
+    result = diff_traces([TRACE_PATH, slower, larger], top=3, batch_size=batch_size)
+
+    assert result.settings == [('romio_no_indep_rw', ['true', 'false', 'true']), ('cb_nodes', ['4', '8', '4'])]
+    (time_change,) = result.changes[KIND_TIME]
+    assert (time_change.file, time_change.module, time_change.counter) == (FILE, 'POSIX', 'POSIX_F_WRITE_TIME')
+    assert time_change.ratios == pytest.approx([1.0, 3.0, 1.0])
+    (bytes_change,) = result.changes[KIND_BYTES]
+    assert bytes_change.deltas == [0, 0, bytes_change.values[0]]
+    assert [change.counter for change in result.changes[KIND_OPERATIONS]] == ['POSIX_WRITES']
+
+    posix_bytes = next(total for total in result.totals if total.module == 'POSIX' and total.kind == KIND_BYTES)
+    assert posix_bytes.deltas == [0, 0, bytes_change.values[0]]
+
+
+def test_files_are_aligned_by_path(tmp_path):
+    moved = variant(tmp_path, 'moved.txt', rename={'plt00003.h5': 'plt00003-new.h5'})
+
+    result = diff_traces([TRACE_PATH, moved], top=100)
+
+    changes = result.changes[KIND_BYTES]
+    assert {change.file for change in changes} == {FILE, FILE.replace('plt00003', 'plt00003-new')}
+    assert all(0 in change.values for change in changes)
+    # The file has POSIX and MPI-IO records
+    assert result.files == 25
+
+
+def test_main_diff(tmp_path, capsys):
+    slower = variant(tmp_path, 'slower.txt', scale={'POSIX_F_WRITE_TIME': 3.0}, hints='cb_nodes=8')
+    try:
+        assert main(['--plain', '--diff', TRACE_PATH, slower]) == 0
+    finally:
+        set_mode('rich')
+
+    out = capsys.readouterr().out
+    assert 'Largest changes in time' in out
+    assert f'{FILE}\tPOSIX_F_WRITE_TIME\t' in out
+    assert '(+200%)' in out
+    assert 'cb_nodes\t4\t8' in out
+
+
+def test_main_diff_needs_two_traces(capsys):
+    try:
+        assert main(['--plain', '--diff', TRACE_PATH]) == 1
+    finally:
+        set_mode('rich')
+    assert 'at least two traces' in capsys.readouterr().out
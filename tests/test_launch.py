@@ -0,0 +1,104 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from ion_cli.api import retry_after_seconds
+from ion_cli.cli import main
+from ion_cli.launch import BUSY, FAILED, LAUNCHED, NOT_FOUND, RATE_LIMITED, BatchLauncher, TokenBucket
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 tokens are available at once, the other 10 arrive at 50/s
+    assert time.monotonic() - start >= 0.18
+
+
+def test_token_bucket_pause():
+    bucket = TokenBucket(rate=1000, burst=10)
+    bucket.pause(0.1)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_retry_after_seconds():
+    response = MagicMock(headers={'Retry-After': '3'})
+    assert retry_after_seconds(response, default=1) == 3
+    response.headers = {'Retry-After': 'Thu, 01 Jan 1970 00:00:00 GMT'}
+    assert retry_after_seconds(response, default=1) == 0
+    response.headers = {'Retry-After': 'soon'}
+    assert retry_after_seconds(response, default=1) == 1
+    response.headers = {}
+    assert retry_after_seconds(response, default=2) == 2
+
+
+def test_batch_launch(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    for name in ['a.txt', 'b.txt', 'busy.txt']:
+        ion_server.store_trace(user_id, name, b'data')
+    ion_server.traces[user_id]['busy']['status'] = 'in_progress'
+    models = ['openai/gpt-4o', 'openai/gpt-4o-mini']
+
+    results = BatchLauncher(user_id, concurrency=4, rate=0, endpoint=ion_server.url).run(
+        ['a', 'missing', 'b', 'busy'], models)
+
+    assert [(result.trace_name, result.model, result.status) for result in results] == [
+        ('a', models[0], LAUNCHED), ('a', models[1], LAUNCHED),
+        ('missing', models[0], NOT_FOUND), ('missing', models[1], NOT_FOUND),
+        ('b', models[0], LAUNCHED), ('b', models[1], LAUNCHED),
+        ('busy', models[0], BUSY), ('busy', models[1], BUSY),
+    ]
+    assert {result.task_id for result in results if result.ok} == set(ion_server.tasks)
+    assert ion_server.request_log.count(('POST', '/api/user_traces')) == 1
+
+
+def test_batch_launch_honours_retry_after(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'a.txt', b'data')
+    ion_server.rate_limited = 2
+    ion_server.retry_after = '0'
+    launcher = BatchLauncher(user_id, concurrency=1, rate=0, endpoint=ion_server.url)
+    with patch.object(launcher.bucket, 'pause', wraps=launcher.bucket.pause) as pause:
+        results = launcher.run(['a'], ['openai/gpt-4o'])
+    assert results[0].status == LAUNCHED
+    assert results[0].attempts == 3
+    assert [call.args[0] for call in pause.call_args_list] == [0, 0]
+
+
+def test_batch_launch_gives_up_when_rate_limited(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'a.txt', b'data')
+    ion_server.rate_limited = 10
+    ion_server.retry_after = '0'
+    results = BatchLauncher(user_id, rate=0, max_retries=2, endpoint=ion_server.url).run(['a'], ['openai/gpt-4o'])
+    assert results[0].status == RATE_LIMITED
+    assert ion_server.tasks == {}
+
+
+def test_main_launches_patterns_with_several_models(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    for name in ['amrex_1.txt', 'amrex_2.txt', 'hacc.txt']:
+        ion_server.store_trace(user_id, name, b'data')
+    assert main(['-e', 'user@example.com', '--analyze', 'amrex*', 'hacc',
+                 '--llm', 'openai/gpt-4o', 'openai/gpt-4.1', '--rate', '100']) == 0
+    launched = sorted((task['trace_name'], task['llm']) for task in ion_server.tasks.values())
+    assert launched == sorted((name, model) for name in ['amrex_1', 'amrex_2', 'hacc']
+                              for model in ['openai/gpt-4o', 'openai/gpt-4.1'])
+
+
+def test_batch_launch_not_repeated_after_read_timeout(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'a.txt', b'data')
+    launcher = BatchLauncher(user_id, rate=0, max_retries=3, endpoint=ion_server.url)
+    ion_server.latency = 0.5
+
+    # The server accepts the launch after the client stopped waiting for the answer
+    with patch.object(launcher.client, 'timeout', (5, 0.1)):
+        result = launcher._launch('a', 'openai/gpt-4o')
+    time.sleep(0.8)
+
+    assert result.status == FAILED and result.attempts == 1
+    assert ion_server.request_log.count(('POST', '/api/run_analysis')) == 1
+    assert len(ion_server.tasks) == 1
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import shutil
+from unittest.mock import patch
+
+from ion_cli.cli import upload_file
+from ion_cli.ledger import UploadLedger, hash_file
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+
+def test_hash_file_matches_hashlib():
+    with open(TRACE_PATH, 'rb') as f:
+        expected = hashlib.blake2b(f.read(), digest_size=32).hexdigest()
+    assert hash_file(TRACE_PATH, block_size=4096) == expected
+
+
+def test_hash_file_empty(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    assert hash_file(str(path)) == hashlib.blake2b(b'', digest_size=32).hexdigest()
+
+
+def test_content_hash_is_cached(tmp_path):
+    with UploadLedger(str(tmp_path / 'ledger.sqlite')) as ledger:
+        first = ledger.content_hash(TRACE_PATH)
+        with patch('ion_cli.ledger.hash_file') as rehash:
+            assert ledger.content_hash(TRACE_PATH) == first
+            rehash.assert_not_called()
+
+
+def test_ledger_record_lookup_forget(tmp_path):
+    with UploadLedger(str(tmp_path / 'ledger.sqlite')) as ledger:
+        assert ledger.lookup('abc', 'http://ion', 'u1') is None
+        ledger.record('abc', 'http://ion', 'u1', 'trace', 'trace.txt', 10)
+        entry = ledger.lookup('abc', 'http://ion', 'u1')
+        assert (entry.trace_name, entry.size) == ('trace', 10)
+        assert ledger.lookup('abc', 'http://other', 'u1') is None
+        assert ledger.lookup('abc', 'http://ion', 'u2') is None
+        assert ledger.forget('http://ion', 'u1', 'trace') == 1
+        assert ledger.lookup('abc', 'http://ion', 'u1') is None
+
+
+def test_reupload_is_skipped(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    assert upload_file(TRACE_PATH, user_id) is True
+    sent = len(ion_server.request_log)
+
+    assert upload_file(TRACE_PATH, user_id) is True
+    assert len(ion_server.request_log) == sent
+
+
+def test_renamed_copy_is_skipped(ion_server, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    copy = str(tmp_path / 'renamed_copy.txt')
+    shutil.copy(TRACE_PATH, copy)
+    assert upload_file(TRACE_PATH, user_id, chunked=True) is True
+
+    assert upload_file(copy, user_id) is True
+    assert ('renamed_copy' in ion_server.traces[user_id]) is False
+
+
+def test_force_reupload(ion_server, tmp_path):
+    user_id = ion_server.add_user('user@example.com')
+    copy = str(tmp_path / 'renamed_copy.txt')
+    shutil.copy(TRACE_PATH, copy)
+    assert upload_file(TRACE_PATH, user_id) is True
+
+    assert upload_file(copy, user_id, force=True) is True
+    assert 'renamed_copy' in ion_server.traces[user_id]
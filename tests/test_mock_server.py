@@ -0,0 +1,32 @@
+import time
+
+from ion_cli.api import APIClient
+from ion_cli.mock_server import MockIONServer
+
+
+def test_latency():
+    with MockIONServer(latency=0.1) as server:
+        client = APIClient(server.url)
+        start = time.perf_counter()
+        for _ in range(3):
+            client.post('/api/user', json={'email': 'user@example.com'})
+        assert time.perf_counter() - start >= 0.3
+        client.close()
+
+
+def test_bandwidth_is_shared():
+    with MockIONServer(bandwidth=1e6) as server:
+        start = time.perf_counter()
+        server.delay(100000)
+        server.delay(100000)
+        assert time.perf_counter() - start >= 0.2
+
+
+def test_add_traces():
+    with MockIONServer() as server:
+        user_id = server.add_user('user@example.com')
+        assert server.add_traces(user_id, 3) == ['trace_0', 'trace_1', 'trace_2']
+        client = APIClient(server.url)
+        response = client.post('/api/user_traces', json={'user_id': user_id})
+        assert [trace['trace_name'] for trace in response.json()] == ['trace_0', 'trace_1', 'trace_2']
+        client.close()
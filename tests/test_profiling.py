@@ -0,0 +1,108 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from ion_cli import profiling
+from ion_cli.api import APIClient
+from ion_cli.batch import UPLOADED, BatchUploader
+from ion_cli.cli import main
+from ion_cli.output import set_mode
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+
+@pytest.fixture
+def profile():
+    yield profiling.enable()
+    profiling.disable()
+
+
+def rows(profile):
+    return {row['name']: row for row in profile.summary()}
+
+
+def test_disabled_records_nothing(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    assert profiling.active() is None
+    with profiling.phase('hash') as span:
+        assert span is None
+    profiling.mark('retry')
+    client = APIClient(ion_server.url)
+    assert client.post('/api/user_traces', json={'user_id': user_id}).status_code == 200
+    client.close()
+    assert profiling.disable() is None
+
+
+def test_http_requests(ion_server, profile):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    client = APIClient(ion_server.url)
+    client.post('/api/user_traces', json={'user_id': user_id})
+    client.post('/api/user_traces', json={'user_id': 'unknown'})
+    client.close()
+
+    row = rows(profile)['POST /api/user_traces']
+    assert row['category'] == profiling.HTTP
+    assert row['calls'] == 2
+    assert row['statuses'] == {'200': 1, '403': 1}
+    assert row['bytes_sent'] > 0 and row['bytes_received'] > 0
+    assert row['new_connections'] == 1
+
+
+def test_phases_and_retries(ion_server, profile):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.fail_chunks = {2}
+
+    with patch('ion_cli.upload.time.sleep'):
+        result = BatchUploader(user_id, chunked=True, chunk_size=64 * 1024, endpoint=ion_server.url).upload(
+            TRACE_PATH)
+
+    assert result.status == UPLOADED
+    summary = rows(profile)
+    assert summary['validate']['calls'] == 1
+    assert summary['hash']['calls'] == 1
+    assert summary['retry upload chunk']['category'] == profiling.EVENT
+    assert summary['retry upload chunk']['calls'] == 1
+    assert summary['POST /api/upload_trace/chunk']['statuses']['500'] == 1
+
+
+def test_errors_are_recorded(profile):
+    with pytest.raises(ValueError):
+        with profiling.phase('parse trace'):
+            raise ValueError('bad line')
+    assert rows(profile)['parse trace']['errors'] == 1
+
+
+def test_chrome_trace(profile, tmp_path):
+    with profiling.phase('hash', bytes=10):
+        pass
+    profiling.mark('retry run_analysis', status=429)
+    path = tmp_path / 'profile.json'
+    profile.write(str(path))
+
+    with open(path) as f:
+        trace = json.load(f)
+    complete, instant = trace['traceEvents']
+    assert complete['ph'] == 'X' and complete['name'] == 'hash' and complete['args'] == {'bytes': 10}
+    assert instant['ph'] == 'i' and instant['args'] == {'status': 429}
+    assert [row['name'] for row in trace['summary']] == ['hash', 'retry run_analysis']
+
+
+def test_main_profile(ion_server, tmp_path, capsys):
+    ion_server.add_user('user@example.com')
+    path = tmp_path / 'profile.json'
+
+    try:
+        assert main(['--plain', '-e', 'user@example.com', '--list', '--profile', str(path)]) == 0
+    finally:
+        set_mode('rich')
+
+    out = capsys.readouterr().out
+    assert 'Profile (' in out
+    assert 'POST /api/user_traces\t1\t' in out
+    assert profiling.active() is None
+    with open(path) as f:
+        assert any(event['name'] == 'POST /api/user' for event in json.load(f)['traceEvents'])
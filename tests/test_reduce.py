@@ -0,0 +1,89 @@
+import os
+
+from ion_cli.cli import upload_file
+from ion_cli.darshan import parse_trace
+from ion_cli.reduce import (
+    is_uninformative, open_reduced_stream, plan_reduction, reduce_file, reduce_lines, zero_is_significant
+)
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+LINES = [
+    "# nprocs: 2\n",
+    "# mount entry:\t/scratch\tlustre\n",
+    "# mount entry:\t/home\tnfs\n",
+    "\n",
+    "# description of columns:\n",
+    "POSIX\t0\t1\tPOSIX_OPENS\t2\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t0\t1\tPOSIX_MMAPS\t-1\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t0\t1\tPOSIX_SIZE_READ_0_100\t0\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t0\t1\tPOSIX_F_READ_TIME\t0.000000\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t0\t1\tPOSIX_FASTEST_RANK\t0\t/scratch/a\t/scratch\tlustre\n",
+    "LUSTRE\t-1\t1\tLUSTRE_OST_ID_0\t0\t/scratch/a\t/scratch\tlustre\n",
+    "POSIX\t0\t2\tPOSIX_OPENS\t0\t/home/b\t/home\tnfs\n",
+]
+
+
+def test_is_uninformative():
+    assert is_uninformative('POSIX_MMAPS', '-1')
+    assert is_uninformative('POSIX_SIZE_READ_0_100', '0')
+    assert is_uninformative('POSIX_F_READ_TIME', '0.000000')
+    assert not is_uninformative('POSIX_OPENS', '10')
+    assert not is_uninformative('POSIX_F_READ_TIME', '0.000100')
+    assert not is_uninformative('HEATMAP_WRITE_BIN_3', '-3668')
+    # Zero is a valid rank id and OST index
+    assert zero_is_significant('POSIX_FASTEST_RANK')
+    assert not is_uninformative('LUSTRE_OST_ID_0', '0')
+
+
+def test_reduce_lines():
+    plan = plan_reduction(LINES)
+    reduced = list(reduce_lines(LINES, plan))
+
+    assert plan.mounts == {'/scratch'}
+    assert plan.dropped_counters == 4
+    assert plan.dropped_mounts == 1
+    assert "# mount entry:\t/home\tnfs\n" not in reduced
+    assert "# mount entry:\t/scratch\tlustre\n" in reduced
+    assert reduced.index(plan.note) == reduced.index("# description of columns:\n") - 1
+    assert [line.split('\t')[3] for line in reduced if not line.startswith('#') and line.strip()] == [
+        'POSIX_OPENS', 'POSIX_FASTEST_RANK', 'LUSTRE_OST_ID_0'
+    ]
+    assert plan.output_bytes == len(''.join(reduced).encode())
+
+
+def test_reduced_trace_keeps_information(tmp_path):
+    output = str(tmp_path / 'reduced.txt')
+    plan = reduce_file(TRACE_PATH, output)
+
+    assert plan.output_bytes == os.path.getsize(output)
+    assert plan.output_bytes < 0.7 * plan.input_bytes
+
+    original = parse_trace(TRACE_PATH)
+    reduced = parse_trace(output)
+    assert reduced.header.nprocs == original.header.nprocs
+    assert reduced.header.mounts == [('/pscratch', 'lustre')]
+    for name in ['POSIX_BYTES_WRITTEN', 'MPIIO_COLL_WRITES', 'POSIX_F_WRITE_TIME']:
+        assert original.counter(name).value.sum() == reduced.counter(name).value.sum()
+
+
+def test_reduced_stream_is_repeatable():
+    open_stream = open_reduced_stream(TRACE_PATH)
+    with open_stream() as first, open_stream() as second:
+        assert first.read(1000) == second.read(1000)
+        assert len(first.read()) == open_stream.plan.output_bytes - 1000
+
+
+def test_upload_file_reduce(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    assert upload_file(TRACE_PATH, user_id, reduce=True) is True
+    stored = ion_server.files[(user_id, 'valid_trace')]
+    assert len(stored) == open_reduced_stream(TRACE_PATH).plan.output_bytes
+
+
+def test_upload_file_reduce_chunked(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    assert upload_file(TRACE_PATH, user_id, chunked=True, chunk_size=16 * 1024, reduce=True) is True
+    with open_reduced_stream(TRACE_PATH)() as stream:
+        assert ion_server.files[(user_id, 'valid_trace')] == stream.read()
@@ -0,0 +1,136 @@
+import hashlib
+import os
+
+import pytest
+
+from ion_cli.cli import main, upload_file
+from ion_cli.shard import SHARD_MODES, ShardedUpload, open_shard_stream, plan_shards, sharded_upload
+from ion_cli.upload import TraceExistsError, UploadError
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+
+def read_trace():
+    with open(TRACE_PATH, 'rb') as f:
+        return f.read()
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+def reassemble(plan, data):
+    """
+    Rebuild the trace from the shard bytes and their ranges, like the server does.
+    """
+    result = bytearray(plan.total_size)
+    for shard in plan.shards:
+        with open_shard_stream(plan, shard)() as stream:
+            shard_data = stream.read()
+        assert len(shard_data) == shard.size
+        assert shard_data[:len(plan.header)] == plan.header
+        position = len(plan.header)
+        for start, end in shard.ranges:
+            result[start:end] = shard_data[position:position + end - start]
+            position += end - start
+    result[:len(plan.header)] = plan.header
+    return bytes(result)
+
+
+@pytest.mark.parametrize('mode', SHARD_MODES)
+@pytest.mark.parametrize('block_size', [16 << 20, 3000])
+def test_plan_covers_trace(mode, block_size):
+    data = read_trace()
+    plan = plan_shards(TRACE_PATH, mode, rank_groups=8, block_size=block_size)
+
+    assert plan.nprocs == 8
+    assert plan.header.startswith(b'# darshan log version: 3.41\n')
+    assert not plan.header.endswith(b'# *******************************************************\n')
+    ranges = sorted(byte_range for shard in plan.shards for byte_range in shard.ranges)
+    assert ranges[0][0] == len(plan.header) and ranges[-1][1] == len(data)
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+    assert reassemble(plan, data) == data
+
+
+def test_plan_modules_and_ranks():
+    by_module = plan_shards(TRACE_PATH, 'module')
+    assert [shard.name for shard in by_module.shards] == [
+        'valid_trace.POSIX.txt', 'valid_trace.MPI-IO.txt', 'valid_trace.LUSTRE.txt',
+        'valid_trace.STDIO.txt', 'valid_trace.HEATMAP.txt']
+    posix = by_module.shards[0]
+    with open_shard_stream(by_module, posix)() as stream:
+        lines = stream.read().decode().splitlines()
+    assert {line.split('\t')[0] for line in lines if line and not line.startswith('#')} == {'POSIX'}
+    assert '# POSIX module data' in lines
+
+    # Only rank 0 and 1 write records of their own; shared records (rank -1) go with the first range
+    by_rank = plan_shards(TRACE_PATH, 'module+rank', rank_groups=4)
+    assert [(shard.module, shard.ranks) for shard in by_rank.shards] == [
+        ('POSIX', (0, 1)), ('MPI-IO', (0, 1)), ('LUSTRE', (0, 1)), ('STDIO', (0, 1)), ('HEATMAP', (0, 1))]
+    by_rank = plan_shards(TRACE_PATH, 'rank', rank_groups=8)
+    assert [(shard.name, shard.ranks) for shard in by_rank.shards] == [
+        ('valid_trace.rank0.txt', (0, 0)), ('valid_trace.rank1.txt', (1, 1))]
+
+
+def test_plan_without_sections(tmp_path):
+    path = tmp_path / 'trace.txt'
+    path.write_bytes(b'# nprocs: 2\n\n'
+                     b'POSIX\t0\t1\tPOSIX_READS\t1\t/a\t/\tlustre\n'
+                     b'POSIX\t1\t1\tPOSIX_READS\t2\t/a\t/\tlustre\n'
+                     b'STDIO\t-1\t2\tSTDIO_OPENS\t3\t/b\t/\tlustre')
+
+    plan = plan_shards(str(path), 'rank', rank_groups=2)
+
+    assert plan.header == b'# nprocs: 2\n\n'
+    assert [(shard.ranks, shard.ranges) for shard in plan.shards] == [((0, 0), [(13, 49), (85, 121)]),
+                                                                       ((1, 1), [(49, 85)])]
+
+
+@pytest.mark.parametrize('mode', SHARD_MODES)
+def test_sharded_upload(ion_server, mode):
+    user_id = ion_server.add_user('user@example.com')
+    data = read_trace()
+    received = []
+
+    upload = sharded_upload(TRACE_PATH, user_id, mode=mode, rank_groups=8, chunk_size=16 * 1024,
+                            concurrency=3, on_bytes=received.append)
+
+    assert upload.result == {'trace_name': 'valid_trace', 'size': len(data), 'shards': len(upload.plan.shards)}
+    assert ion_server.files[(user_id, 'valid_trace')] == data
+    # Shards are not traces of their own
+    assert list(ion_server.traces[user_id]) == ['valid_trace']
+    assert ion_server.shards == {}
+    assert sum(received) == sum(shard.size for shard in upload.plan.shards)
+
+
+def test_sharded_upload_rejects_wrong_hash(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    upload = ShardedUpload(user_id, plan_shards(TRACE_PATH), content_hash(b'something else'))
+
+    with pytest.raises(UploadError, match='content hash'):
+        upload.run()
+    assert not ion_server.traces.get(user_id)
+
+
+def test_sharded_upload_existing_trace(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'valid_trace.txt', b'')
+
+    with pytest.raises(TraceExistsError):
+        sharded_upload(TRACE_PATH, user_id)
+    assert upload_file(TRACE_PATH, user_id, shard='module', force=True) is True
+
+
+def test_main_upload_shard(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+
+    assert main(['-e', 'user@example.com', '--upload', TRACE_PATH, '--shard', 'module+rank',
+                 '--shard_ranks', '2', '--jobs', '2', '--compress', 'gzip']) == 0
+
+    assert ion_server.files[(user_id, 'valid_trace')] == read_trace()
+    inits = [path for method, path in ion_server.request_log if path == '/api/upload_trace/init']
+    assert len(inits) == 5
+    # The ledger knows the content now
+    assert main(['-e', 'user@example.com', '--upload', TRACE_PATH, '--shard', 'module']) == 0
+    assert inits == [path for method, path in ion_server.request_log if path == '/api/upload_trace/init']
@@ -0,0 +1,75 @@
+import subprocess
+import sys
+
+import pytest
+
+from ion_cli.cli import main
+from ion_cli.output import PlainTable, set_mode, strip_markup
+
+HEAVY_MODULES = ['requests', 'urllib3', 'rich', 'sqlite3', 'subprocess']
+
+
+def loaded_modules(code):
+    result = subprocess.run([sys.executable, '-c', code + "\nimport sys; print(' '.join(sys.modules))"],
+                            capture_output=True, text=True, check=True)
+    return {name.split('.')[0] for name in result.stdout.split()}
+
+
+@pytest.fixture
+def output_mode():
+    yield set_mode
+    set_mode('rich')
+
+
+def test_import_is_lazy():
+    loaded = loaded_modules("import ion_cli.cli")
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_help_is_lazy():
+    loaded = loaded_modules("import ion_cli.cli\ntry:\n    ion_cli.cli.main(['--help'])\nexcept SystemExit:\n    pass")
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_plain_mode_does_not_import_rich():
+    loaded = loaded_modules(
+        "from ion_cli.output import Panel, Table, console, set_mode\n"
+        "set_mode('plain')\n"
+        "console.print(Panel('[error]Error:[/] failed', title='Error'))\n"
+        "table = Table(title='Traces')\ntable.add_column('Name')\ntable.add_row('[green]run[/]')\n"
+        "console.print(table)"
+    )
+    assert 'rich' not in loaded
+
+
+def test_strip_markup():
+    assert strip_markup("[bold cyan]ION-cli[/bold cyan] [error]Error:[/] x[1]") == "ION-cli Error: x[1]"
+
+
+def test_plain_table():
+    table = PlainTable(title="Traces")
+    table.add_column("Name", style="cyan")
+    table.add_column("Status")
+    table.add_row("run", "[green]Completed[/]")
+    assert str(table) == "Traces\nName\tStatus\nrun\tCompleted"
+
+
+def test_quiet_list(ion_server, output_mode, capsys):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+
+    assert main(['--quiet', '-e', 'user@example.com', '--list']) == 0
+    out = capsys.readouterr().out
+    assert 'ION-cli' not in out
+    assert 'verified' not in out
+    assert '\nrun\t' in out
+    assert '\x1b' not in out and '─' not in out
+
+
+def test_plain_errors(ion_server, output_mode, capsys):
+    ion_server.add_user('user@example.com')
+
+    assert main(['--plain', '-e', 'user@example.com', '--view', 'missing']) == 1
+    out = capsys.readouterr().out
+    assert 'User verified: user@example.com' in out
+    assert "Trace 'missing' is not ready for viewing" in out
@@ -0,0 +1,135 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from ion_cli.cli import main
+from ion_cli.darshan import parse_trace
+from ion_cli.output import set_mode
+from ion_cli.summary import METRICS, summarize, summarize_trace
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_PATH = os.path.join(TESTS_DIR, 'valid_trace.txt')
+
+HEADER = b'# darshan log version: 3.41\n# nprocs: 4\n# run time: 10.0\n\n'
+
+
+def record(module, rank, record_id, counter, value, name):
+    return f'{module}\t{rank}\t{record_id}\t{counter}\t{value}\t{name}\t/scratch\tlustre\n'.encode()
+
+
+def assert_same(actual, expected):
+    assert (actual.name, actual.module, actual.alignment, actual.shared) == \
+        (expected.name, expected.module, expected.alignment, expected.shared)
+    for metric in METRICS:
+        assert actual.metrics[metric] == pytest.approx(expected.metrics[metric], rel=1e-12), metric
+
+
+@pytest.mark.parametrize('block_size', [16 << 20, 1000, 300])
+def test_scan_matches_parser(block_size):
+    expected = summarize(parse_trace(TRACE_PATH), top=5)
+    summary = summarize_trace(TRACE_PATH, top=5, block_size=block_size)
+
+    assert summary.rows == expected.rows
+    assert summary.file_count == expected.file_count == 23
+    assert summary.header.nprocs == 8
+    assert [stats.name for stats in summary.modules] == ['POSIX', 'MPI-IO', 'STDIO']
+    for actual, reference in zip(summary.modules + summary.files + summary.imbalanced,
+                                 expected.modules + expected.files + expected.imbalanced):
+        assert_same(actual, reference)
+    assert len(summary.files) == 5
+    assert summary.findings == expected.findings
+
+
+def test_findings():
+    with open(TRACE_PATH, 'rb') as f:
+        summary = summarize_trace(f)
+
+    posix = summary.module('POSIX')
+    assert posix.files == 11
+    assert posix.alignment == 1048576
+    assert posix.small_read_fraction == 1.0 and posix.sequential_read_fraction == pytest.approx(60 / 121)
+    assert summary.imbalanced_count == 10
+    assert summary.imbalanced[0].ranks == 8
+    assert summary.findings[0].startswith('100% of POSIX reads (121) are smaller than 1 MiB')
+    assert summary.findings[2] == '50% of POSIX reads go to lower offsets than the previous access (random access)'
+    assert summary.findings[-1].startswith('Ranks of 10 shared files spend unequal time in I/O')
+
+
+def test_values(tmp_path):
+    lines = [
+        HEADER,
+        record('POSIX', 0, 11, 'POSIX_READS', 200, '/a'),
+        record('POSIX', 0, 11, 'POSIX_BYTES_READ', 12345678901, '/a'),
+        record('POSIX', 0, 11, 'POSIX_SIZE_READ_0_100', 150, '/a'),
+        record('POSIX', 0, 11, 'POSIX_SIZE_READ_1M_4M', 50, '/a'),
+        record('POSIX', 0, 11, 'POSIX_SEQ_READS', -1, '/a'),
+        record('POSIX', 0, 11, 'POSIX_F_READ_TIME', '1.250000', '/a'),
+        record('POSIX', 0, 11, 'POSIX_F_META_TIME', '2e-1', '/a'),
+        record('POSIX', 0, 11, 'POSIX_OPENS', 4, '/a'),
+        b'POSIX\t0\t11\tPOSIX_WRITES\n',
+        record('POSIX', 1, 11, 'POSIX_READS', 100, '/a'),
+        record('STDIO', -1, 12, 'STDIO_BYTES_WRITTEN', 10, '/b'),
+    ]
+    path = tmp_path / 'trace.txt'
+    # The last line has no newline, as in a truncated file
+    path.write_bytes(b''.join(lines).rstrip(b'\n'))
+
+    summary = summarize_trace(str(path), block_size=200)
+
+    posix = summary.module('POSIX')
+    assert posix.files == 1
+    assert posix.metrics['reads'] == 300
+    assert posix.metrics['bytes_read'] == 12345678901
+    assert posix.metrics['records'] == 1
+    assert posix.small_read_fraction == 0.75
+    assert posix.metrics['seq_reads'] == 0
+    assert posix.metrics['read_time'] == pytest.approx(1.25)
+    assert posix.metrics['meta_time'] == pytest.approx(0.2)
+    assert summary.module('MPI-IO') is None
+    stdio = summary.module('STDIO')
+    assert stdio.metrics['bytes_written'] == 10
+    assert [(stats.name, stats.shared, stats.ranks) for stats in summary.files] == \
+        [('/a', False, 1), ('/b', True, 4)]
+
+
+def test_empty_trace(tmp_path):
+    path = tmp_path / 'trace.txt'
+    path.write_bytes(HEADER)
+    summary = summarize_trace(str(path))
+    assert summary.modules == [] and summary.files == [] and summary.findings == []
+    assert summary.header.run_time == 10.0
+
+
+def test_main_summarize(capsys):
+    try:
+        assert main(['--plain', '--summarize', TRACE_PATH, '--top', '3']) == 0
+    finally:
+        set_mode('rich')
+
+    out = capsys.readouterr().out
+    assert 'POSIX\t11\t' in out
+    assert 'Files by bytes moved (top 3 of 23)' in out
+    assert '100% of POSIX writes' in out
+
+
+def test_main_summarize_missing(tmp_path, capsys):
+    try:
+        assert main(['--plain', '--summarize', str(tmp_path / 'missing.txt')]) == 1
+    finally:
+        set_mode('rich')
+    assert 'does not exist' in capsys.readouterr().out
+
+
+def test_main_summarize_darshan_without_parser(capsys):
+    darshan_path = os.path.join(TESTS_DIR, 'valid_trace.darshan')
+    try:
+        with patch('ion_cli.convert.DARSHAN_PARSER', ''):
+            assert main(['--plain', '--summarize', darshan_path]) == 1
+    finally:
+        set_mode('rich')
+
+    out = capsys.readouterr().out
+    assert 'without darshan-parser' in out
+    assert 'uploading' not in out
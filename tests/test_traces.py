@@ -0,0 +1,112 @@
+import os
+import stat
+from unittest.mock import patch
+
+import pytest
+
+from ion_cli.api import APIClient
+from ion_cli.cli import get_trace_status, list_user_traces, main
+from ion_cli.traces import (
+    TraceIndex, TraceListCache, TraceListError, fetch_user_traces, get_trace_index, invalidate_user_traces
+)
+
+
+def traces_requests(server):
+    return server.request_log.count(('POST', '/api/user_traces'))
+
+
+def test_unchanged_list_is_revalidated(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    client = APIClient(ion_server.url)
+
+    with patch.object(client.session, 'post', wraps=client.session.post) as post:
+        first = fetch_user_traces(user_id, client=client)
+        assert 'If-None-Match' not in post.call_args.kwargs['headers']
+        second = fetch_user_traces(user_id, client=client)
+        assert post.call_args.kwargs['headers']['If-None-Match']
+    assert first == second
+    assert [trace['trace_name'] for trace in second] == ['run']
+
+    path = TraceListCache().path(ion_server.url, user_id)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_changed_list_is_refetched(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    client = APIClient(ion_server.url)
+    assert fetch_user_traces(user_id, client=client) == []
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    assert [trace['trace_name'] for trace in fetch_user_traces(user_id, client=client)] == ['run']
+
+
+def test_max_age_skips_request(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    client = APIClient(ion_server.url)
+    fetch_user_traces(user_id, client=client)
+    fetch_user_traces(user_id, max_age=60, client=client)
+    assert traces_requests(ion_server) == 1
+
+    invalidate_user_traces(user_id, ion_server.url)
+    fetch_user_traces(user_id, max_age=60, client=client)
+    assert traces_requests(ion_server) == 2
+
+
+def test_fetch_error(ion_server):
+    with pytest.raises(TraceListError, match='Unknown user'):
+        fetch_user_traces('nobody', client=APIClient(ion_server.url))
+
+
+def test_status_checks_share_cached_list(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    assert list_user_traces(user_id)
+    assert get_trace_status('run', user_id) == ion_server.traces[user_id]['run']['status']
+    assert get_trace_status('missing', user_id) is None
+    assert traces_requests(ion_server) == 1
+
+
+def test_trace_index_lookup():
+    index = TraceIndex([
+        {'trace_name': 'amrex_2', 'status': 'completed'},
+        {'trace_name': 'amrex_10', 'status': 'not_started'},
+        {'trace_name': 'amr', 'status': 'failed'},
+        {'trace_name': 'hacc', 'status': 'in_progress'},
+    ])
+    assert len(index) == 4
+    assert index.status('hacc') == 'in_progress'
+    assert index.status('missing') is None
+    assert index.with_prefix('amr') == ['amr', 'amrex_10', 'amrex_2']
+    assert index.match('amrex*') == ['amrex_10', 'amrex_2']
+    assert index.match('amrex_?') == ['amrex_2']
+    assert index.match('[ah]*c') == ['hacc']
+    assert index.match('amr') == ['amr']
+    assert index.match('amre') == []
+
+
+def test_trace_index_is_shared(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    client = APIClient(ion_server.url)
+    index = get_trace_index(user_id, client=client)
+    assert get_trace_index(user_id, client=client) is index
+    assert get_trace_status('run', user_id, max_age=0) == 'not_started'
+    assert traces_requests(ion_server) == 1
+
+    invalidate_user_traces(user_id, ion_server.url)
+    assert get_trace_index(user_id, client=client) is not index
+    assert traces_requests(ion_server) == 2
+
+
+def test_main_expands_trace_patterns(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    for name in ['amrex_1.txt', 'amrex_2.txt', 'hacc.txt']:
+        ion_server.store_trace(user_id, name, b'data')
+    with patch('ion_cli.cli.stop_analysis', return_value=True) as stop:
+        assert main(['-e', 'user@example.com', '--stop', 'amrex*']) == 0
+    assert [call.args[0] for call in stop.call_args_list] == ['amrex_1', 'amrex_2']
+    assert traces_requests(ion_server) == 1
+
+    with patch('ion_cli.cli.stop_analysis', return_value=True) as stop:
+        assert main(['-e', 'user@example.com', '--stop', 'nothing*']) == 1
+    stop.assert_not_called()
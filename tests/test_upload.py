@@ -0,0 +1,149 @@
+import gzip
+import io
+import os
+
+import pytest
+import requests
+from unittest.mock import patch
+
+from ion_cli.cli import upload_file
+from ion_cli.upload import ChunkedUpload, UploadError, chunked_upload, get_encoder, seek_stream
+
+
+TRACE_PATH = os.path.join(os.path.dirname(__file__), 'valid_trace.txt')
+
+
+def read_trace():
+    with open(TRACE_PATH, 'rb') as f:
+        return f.read()
+
+
+class NonSeekable(io.RawIOBase):
+    def __init__(self, data):
+        self.inner = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.inner.read(size)
+
+
+def test_seek_stream_non_seekable():
+    stream = NonSeekable(b'0123456789')
+    seek_stream(stream, 7, block_size=3)
+    assert stream.read() == b'789'
+
+
+def test_seek_stream_past_end():
+    with pytest.raises(UploadError):
+        seek_stream(NonSeekable(b'0123'), 10)
+
+
+def test_chunked_upload_roundtrip(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    offsets = []
+
+    upload = chunked_upload(TRACE_PATH, user_id, chunk_size=64 * 1024, on_progress=offsets.append)
+
+    assert upload.result['trace_name'] == 'valid_trace'
+    assert ion_server.files[(user_id, 'valid_trace')] == read_trace()
+    assert offsets[-1] == os.path.getsize(TRACE_PATH)
+    assert ion_server.chunk_requests == -(-os.path.getsize(TRACE_PATH) // (64 * 1024))
+
+
+def test_chunked_upload_resumes_after_lost_ack(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    # Second chunk is stored but its acknowledgement is lost
+    ion_server.fail_chunks = {2}
+
+    with patch('ion_cli.upload.time.sleep') as sleep:
+        chunked_upload(TRACE_PATH, user_id, chunk_size=32 * 1024)
+
+    sleep.assert_called_once()
+
+    assert ion_server.files[(user_id, 'valid_trace')] == read_trace()
+
+
+def test_chunked_upload_resumes_server_side_partial(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    data = read_trace()
+    first = ChunkedUpload(user_id, 'valid_trace.txt', lambda: io.BytesIO(data),
+                          total_size=len(data), chunk_size=16 * 1024)
+    first.start()
+    first.send_chunk(0, data[:16 * 1024])
+
+    # A fresh client re-attaches and only sends the remainder
+    second = ChunkedUpload(user_id, 'valid_trace.txt', lambda: NonSeekable(data),
+                           total_size=len(data), chunk_size=16 * 1024)
+    second.run()
+
+    assert second.upload_id == first.upload_id
+    assert ion_server.files[(user_id, 'valid_trace')] == data
+
+
+def test_chunked_upload_gives_up(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    upload = ChunkedUpload(user_id, 'valid_trace.txt', lambda: io.BytesIO(b'x' * 10),
+                           chunk_size=4, max_retries=2)
+    with patch.object(upload, 'send_chunk', side_effect=requests.ConnectionError('reset')) as send, \
+            patch('ion_cli.upload.time.sleep'):
+        with pytest.raises(UploadError):
+            upload.run()
+    assert send.call_count == 3
+
+
+def test_upload_file_chunked_existing_trace(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'valid_trace.txt', b'')
+    assert upload_file(TRACE_PATH, user_id, chunked=True) is True
+
+
+def test_upload_file_chunked_success(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    assert upload_file(TRACE_PATH, user_id, chunked=True, chunk_size=100 * 1024) is True
+    assert ion_server.files[(user_id, 'valid_trace')] == read_trace()
+
+
+def test_get_encoder_gzip_members_concatenate():
+    encode = get_encoder('gzip')
+    assert gzip.decompress(encode(b'abc' * 100) + encode(b'def')) == b'abc' * 100 + b'def'
+
+
+def test_get_encoder_unknown():
+    with pytest.raises(UploadError):
+        get_encoder('brotli')
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'zstd'])
+def test_chunked_upload_compressed(ion_server, encoding):
+    if encoding == 'zstd':
+        pytest.importorskip('zstandard')
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.fail_chunks = {2}
+
+    with patch('ion_cli.upload.time.sleep'):
+        upload = chunked_upload(TRACE_PATH, user_id, chunk_size=64 * 1024, encoding=encoding)
+
+    assert upload.encoding == encoding
+    assert upload.raw_bytes == os.path.getsize(TRACE_PATH)
+    # Repeated paths and mount points make text traces highly compressible
+    assert upload.sent_bytes * 5 < upload.raw_bytes
+    assert ion_server.files[(user_id, 'valid_trace')] == read_trace()
+
+
+def test_chunked_upload_falls_back_to_identity(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.encodings = ['identity']
+
+    upload = chunked_upload(TRACE_PATH, user_id, encoding='gzip')
+
+    assert upload.encoding == 'identity'
+    assert upload.sent_bytes == upload.raw_bytes
+    assert ion_server.files[(user_id, 'valid_trace')] == read_trace()
+
+
+def test_upload_file_compress_implies_chunked(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    assert upload_file(TRACE_PATH, user_id, compression='gzip') is True
+    assert ('POST', '/api/upload_trace/complete') in ion_server.request_log
@@ -0,0 +1,65 @@
+import os
+import stat
+from unittest.mock import patch
+
+from ion_cli.api import APIClient, get_client
+from ion_cli.cli import check_user_verified
+from ion_cli.user_cache import UserCache
+
+
+def test_user_cache_put_get(tmp_path):
+    cache = UserCache(str(tmp_path / 'users.json'), ttl=60)
+    assert cache.get('http://ion', 'user@example.com') is None
+    cache.put('http://ion/', 'User@Example.com', 'u1')
+    assert cache.get('http://ion', 'user@example.com') == 'u1'
+    assert cache.get('http://other', 'user@example.com') is None
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+
+
+def test_user_cache_expires(tmp_path):
+    cache = UserCache(str(tmp_path / 'users.json'), ttl=60)
+    with patch('ion_cli.user_cache.time.time', return_value=1000.0):
+        cache.put('http://ion', 'user@example.com', 'u1')
+    with patch('ion_cli.user_cache.time.time', return_value=1059.0):
+        assert cache.get('http://ion', 'user@example.com') == 'u1'
+    with patch('ion_cli.user_cache.time.time', return_value=1061.0):
+        assert cache.get('http://ion', 'user@example.com') is None
+
+
+def test_user_cache_disabled(tmp_path):
+    cache = UserCache(str(tmp_path / 'users.json'), ttl=0)
+    cache.put('http://ion', 'user@example.com', 'u1')
+    assert cache.get('http://ion', 'user@example.com') is None
+    assert not os.path.exists(cache.path)
+
+
+def test_user_cache_ignores_corrupt_file(tmp_path):
+    path = tmp_path / 'users.json'
+    path.write_text('not json')
+    assert UserCache(str(path)).get('http://ion', 'user@example.com') is None
+
+
+def test_warm_verification_skips_request(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    assert check_user_verified('user@example.com') == user_id
+    assert check_user_verified('user@example.com') == user_id
+    assert ion_server.request_log.count(('POST', '/api/user')) == 1
+
+
+def test_verification_error_is_reported(ion_server, capsys):
+    ion_server.add_user('user@example.com')
+    ion_server.unavailable = 1
+    with patch.object(get_client(ion_server.url), 'max_retries', 0):
+        assert check_user_verified('user@example.com') is None
+    assert 'Service unavailable' in capsys.readouterr().out
+    assert UserCache().get(ion_server.url, 'user@example.com') is None
+
+
+def test_rejected_user_is_forgotten(ion_server):
+    cache = UserCache()
+    cache.put(ion_server.url, 'user@example.com', 'stale-id')
+    assert check_user_verified('user@example.com') == 'stale-id'
+
+    response = APIClient(ion_server.url).post('/api/user_traces', json={'user_id': 'stale-id'})
+    assert response.status_code == 403
+    assert cache.get(ion_server.url, 'user@example.com') is None
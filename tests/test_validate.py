@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from ion_cli.batch import INVALID, UPLOADED, BatchUploader
+from ion_cli.cli import main
+from ion_cli.validate import check_trace_structure
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_PATH = os.path.join(TESTS_DIR, 'valid_trace.txt')
+
+
+@pytest.fixture
+def trace_lines():
+    with open(TRACE_PATH, 'rb') as f:
+        return f.read().splitlines(keepends=True)
+
+
+def first_record(lines):
+    return next(i for i, line in enumerate(lines) if line.strip() and not line.startswith(b'#'))
+
+
+def write_trace(tmp_path, lines, name='trace.txt'):
+    path = tmp_path / name
+    path.write_bytes(b''.join(lines))
+    return str(path)
+
+
+def corrupt(lines, index, column, value):
+    fields = lines[index].rstrip(b'\n').split(b'\t')
+    fields[column] = value
+    lines[index] = b'\t'.join(fields) + b'\n'
+
+
+@pytest.mark.parametrize('block_size', [1 << 20, 1000, 100])
+def test_valid_trace(block_size):
+    report = check_trace_structure(TRACE_PATH, block_size=block_size)
+    assert report.ok, report.errors
+    assert report.summary() is None
+    with open(TRACE_PATH, 'rb') as f:
+        lines = f.read().splitlines()
+    assert report.lines == len(lines)
+    assert report.records == sum(1 for line in lines if line.strip() and not line.startswith(b'#'))
+    assert report.header['darshan log version'] == '3.41'
+    assert report.header['nprocs'] == '8'
+
+
+@pytest.mark.parametrize('block_size', [1 << 20, 1000])
+def test_record_errors(tmp_path, trace_lines, block_size):
+    start = first_record(trace_lines)
+    corrupt(trace_lines, start, 1, b'x1')
+    corrupt(trace_lines, start + 5, 0, b'NOSUCH')
+    corrupt(trace_lines, start + 9, 4, b'12,5')
+    corrupt(trace_lines, start + 9, 2, b'')
+    trace_lines[start + 20] = trace_lines[start + 20].replace(b'\t', b' ', 1)
+
+    report = check_trace_structure(write_trace(tmp_path, trace_lines), block_size=block_size)
+
+    assert report.errors == [
+        (start + 1, "rank is not a number: 'x1'"),
+        (start + 6, "unknown module 'NOSUCH'"),
+        (start + 10, "record id is not a number: ''"),
+        (start + 10, "value is not a number: '12,5'"),
+        (start + 21, "expected 8 tab-separated columns, found 7"),
+    ]
+    assert report.error_count == 5
+    assert report.summary() == f"line {start + 1}: rank is not a number: 'x1' (and 4 more problems)"
+
+
+def test_signed_and_float_values(tmp_path, trace_lines):
+    start = first_record(trace_lines)
+    corrupt(trace_lines, start, 1, b'-1')
+    corrupt(trace_lines, start, 4, b'-1.5e+03')
+    assert check_trace_structure(write_trace(tmp_path, trace_lines)).ok
+
+
+def test_truncated_trace(tmp_path, trace_lines):
+    trace_lines[-1] = trace_lines[-1][:10]
+    report = check_trace_structure(write_trace(tmp_path, trace_lines))
+    assert report.truncated
+    assert (len(trace_lines), "file ends in the middle of a line (truncated?)") in report.errors
+
+
+def test_binary_data(tmp_path, trace_lines):
+    start = first_record(trace_lines)
+    trace_lines[start + 3] = b'\0\0\0' + trace_lines[start + 3]
+    trace_lines[start + 4] = b'\xff' + trace_lines[start + 4]
+    report = check_trace_structure(write_trace(tmp_path, trace_lines))
+    assert (start + 4, "NUL byte (binary data)") in report.errors
+    assert (start + 5, "invalid UTF-8 text") in report.errors
+
+
+def test_header_errors(tmp_path, trace_lines):
+    lines = [line for line in trace_lines if not line.startswith(b'# darshan log version')]
+    lines = [line.replace(b'# nprocs: 8', b'# nprocs: zero') for line in lines]
+    report = check_trace_structure(write_trace(tmp_path, lines))
+    assert report.errors[:2] == [
+        (1, "header field '# darshan log version:' is missing"),
+        (1, "header field '# nprocs:' is not a positive integer: 'zero'"),
+    ]
+
+
+def test_empty_and_header_only(tmp_path, trace_lines):
+    assert check_trace_structure(write_trace(tmp_path, [])).errors == [(0, "file is empty")]
+    header = trace_lines[:first_record(trace_lines)]
+    assert check_trace_structure(write_trace(tmp_path, header)).errors == [(len(header), "no counter records")]
+
+
+def test_max_errors(tmp_path, trace_lines):
+    start = first_record(trace_lines)
+    for index in range(start, start + 50):
+        corrupt(trace_lines, index, 1, b'?')
+    report = check_trace_structure(write_trace(tmp_path, trace_lines), max_errors=3, block_size=2000)
+    assert [line for line, message in report.errors] == [start + 1, start + 2, start + 3]
+    assert report.error_count == 50
+
+
+def test_main_validate(tmp_path, trace_lines, capsys):
+    good = write_trace(tmp_path, trace_lines, 'good.txt')
+    assert main(['--validate', good]) == 0
+    assert 'well formed' in capsys.readouterr().out
+
+    trace_lines[-1] = trace_lines[-1][:10]
+    write_trace(tmp_path, trace_lines, 'bad.txt')
+    assert main(['--validate', str(tmp_path)]) == 1
+    assert 'truncated' in capsys.readouterr().out
+
+
+def test_batch_check(ion_server, tmp_path, trace_lines):
+    user_id = ion_server.add_user('user@example.com')
+    good = write_trace(tmp_path, trace_lines, 'good.txt')
+    corrupt(trace_lines, first_record(trace_lines), 0, b'NOSUCH')
+    bad = write_trace(tmp_path, trace_lines, 'bad.txt')
+
+    results = BatchUploader(user_id, check=True, endpoint=ion_server.url).run([good, bad])
+
+    assert [result.status for result in results] == [UPLOADED, INVALID]
+    assert "unknown module 'NOSUCH'" in results[1].message
+    assert 'bad' not in ion_server.traces[user_id]
+
+
+def test_main_upload_check(ion_server, tmp_path, trace_lines):
+    user_id = ion_server.add_user('user@example.com')
+    trace_lines[-1] = trace_lines[-1][:10]
+    bad = write_trace(tmp_path, trace_lines, 'bad.txt')
+
+    assert main(['-e', 'user@example.com', '--upload', bad, '--check']) == 1
+    assert 'bad' not in ion_server.traces.get(user_id, {})
@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+from ion_cli.api import APIClient
+from ion_cli.cli import main
+from ion_cli.watch import FINISHED_STATUSES, MISSING, PollSchedule, TraceWatcher
+
+
+def test_poll_schedule_backoff_and_reset():
+    schedule = PollSchedule(initial=1, maximum=5, factor=2, jitter=0)
+    assert [schedule.next_delay(False) for _ in range(4)] == [2, 4, 5, 5]
+    assert schedule.next_delay(True) == 1
+    assert schedule.next_delay(False) == 2
+
+
+def test_poll_schedule_jitter():
+    schedule = PollSchedule(initial=10, maximum=10, factor=1, jitter=0.5)
+    delays = [schedule.next_delay(False) for _ in range(50)]
+    assert all(5 <= delay <= 10 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_watcher_multiplexes_traces(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    names = [f'run_{i}' for i in range(20)]
+    for name in names:
+        ion_server.store_trace(user_id, f'{name}.txt', b'data')
+        ion_server.traces[user_id][name]['status'] = 'in_progress'
+
+    def finish_some(delay):
+        # Every tick, the next five analyses finish
+        pending = [name for name in names if ion_server.traces[user_id][name]['status'] == 'in_progress']
+        for name in pending[:5]:
+            ion_server.traces[user_id][name]['status'] = 'completed'
+
+    watcher = TraceWatcher(user_id, names + ['gone'], terminal=FINISHED_STATUSES,
+                           client=APIClient(ion_server.url), schedule=PollSchedule(jitter=0))
+    with patch('ion_cli.watch.time.sleep', side_effect=finish_some) as sleep:
+        assert watcher.run()
+    assert watcher.ticks == 5
+    assert sleep.call_count == 4
+    assert ion_server.request_log.count(('POST', '/api/user_traces')) == 5
+    assert watcher.statuses['gone'] == MISSING
+    assert all(watcher.statuses[name] == 'completed' for name in names)
+
+
+def test_watcher_timeout(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    ion_server.traces[user_id]['run']['status'] = 'in_progress'
+    watcher = TraceWatcher(user_id, ['run'], client=APIClient(ion_server.url),
+                           schedule=PollSchedule(initial=0.01, maximum=0.01, jitter=0))
+    assert not watcher.run(timeout=0.05)
+    assert watcher.pending() == ['run']
+
+
+def test_main_analyze_and_wait(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+
+    def complete(delay):
+        ion_server.traces[user_id]['run']['status'] = 'completed'
+
+    with patch('ion_cli.watch.time.sleep', side_effect=complete), \
+            patch('ion_cli.cli.view_trace_diagnosis', return_value=True) as view:
+        assert main(['-e', 'user@example.com', '--analyze', 'run', '--wait', '--show_diagnosis']) == 0
+    assert view.call_args.args[0] == 'run'
+
+
+def test_main_watch_reports_failures(ion_server):
+    user_id = ion_server.add_user('user@example.com')
+    ion_server.store_trace(user_id, 'run.txt', b'data')
+    ion_server.traces[user_id]['run']['status'] = 'failed'
+    assert main(['-e', 'user@example.com', '--watch', 'run']) == 1